@@ -140,6 +140,12 @@ class AccessDemultiplexer(metaclass=ABCMeta):
         for iface in self._interfaces:
             iface.statistics()
 
+    def metrics(self):
+        """Collect metrics of every interface, as expected by
+        :class:`glasgow.support.telemetry.MetricRegistry`."""
+        for index, iface in enumerate(self._interfaces):
+            yield {"interface": index}, iface.metrics()
+
 
 class AccessDemultiplexerInterface(metaclass=ABCMeta):
     def __init__(self, device, applet):
@@ -169,3 +175,6 @@ class AccessDemultiplexerInterface(metaclass=ABCMeta):
 
     def statistics(self):
         pass
+
+    def metrics(self):
+        return {}
@@ -1,10 +1,13 @@
 import math
+import time
 import usb1
 import asyncio
+import logging
 
 from ...support.logging import *
 from ...support.chunked_fifo import *
 from ...support.task_queue import *
+from ...support.telemetry import *
 from .. import AccessDemultiplexer, AccessDemultiplexerInterface
 
 
@@ -193,6 +196,20 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
         self._in_stalls  = 0
         self._out_stalls = 0
 
+        # These are updated on every transfer, and are cheap enough to always be enabled.
+        self._in_xfer_size      = Histogram()
+        self._out_xfer_size     = Histogram()
+        self._in_xfer_latency   = Histogram(scale=1e-6)
+        self._out_xfer_latency  = Histogram(scale=1e-6)
+        self._read_latency      = Histogram(scale=1e-6)
+        self._out_xfer_depth    = Histogram()
+        self._in_pushbacks      = Counter()
+        self._out_pushbacks     = Counter()
+        self._in_errors         = Counter()
+        self._out_errors        = Counter()
+        self._in_buffer_peak    = HighWaterMark()
+        self._out_buffer_peak   = HighWaterMark()
+
     async def cancel(self):
         if self._in_tasks or self._out_tasks:
             self.logger.trace("FIFO: cancelling operations")
@@ -227,15 +244,25 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
             async with self._in_pushback:
                 while len(self._in_buffer) > self._read_buffer_size:
                     self.logger.trace("FIFO: read pushback")
+                    self._in_pushbacks.inc()
                     await self._in_pushback.wait()
 
         size = self._in_packet_size * _packets_per_xfer
-        data = await self.device.bulk_read(self._endpoint_in, size)
+        started_at = time.perf_counter()
+        try:
+            data = await self.device.bulk_read(self._endpoint_in, size)
+        except usb1.USBError:
+            self._in_errors.inc()
+            raise
+        self._in_xfer_latency.observe(time.perf_counter() - started_at)
+        self._in_xfer_size.observe(len(data))
         self._in_buffer.write(data)
+        self._in_buffer_peak.update(len(self._in_buffer))
 
         self._in_tasks.submit(self._in_task())
 
     async def read(self, length=None, *, flush=True):
+        started_at = time.perf_counter()
         if flush and len(self._out_buffer) > 0:
             # Flush the buffer, so that everything written before the read reaches the device.
             await self.flush(wait=False)
@@ -272,7 +299,12 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
             # Always return a memoryview object, to avoid hard to detect edge cases downstream.
             result = memoryview(b"".join(chunks))
 
-        self.logger.trace("FIFO: read <%s>", dump_hex(result))
+        self._read_latency.observe(time.perf_counter() - started_at)
+        # `dump_hex` only formats the data if the message is logged, but this is called for every
+        # FIFO read and write, so avoid even creating it unless tracing is enabled (`isEnabledFor`
+        # is cached by the logger until its level changes).
+        if self.logger.isEnabledFor(logging.TRACE):
+            self.logger.trace("FIFO: read <%s>", dump_hex(result))
         return result
 
     def _out_slice(self):
@@ -302,14 +334,20 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
     async def _out_task(self, data):
         assert len(data) > 0
 
+        started_at = time.perf_counter()
         try:
             await self.device.bulk_write(self._endpoint_out, data)
+        except usb1.USBError:
+            self._out_errors.inc()
+            raise
         finally:
             self._out_inflight -= len(data)
+        self._out_xfer_latency.observe(time.perf_counter() - started_at)
+        self._out_xfer_size.observe(len(data))
 
         # See the comment in `write` below for an explanation of the following code.
         if len(self._out_buffer) >= self._out_threshold:
-            self._out_tasks.submit(self._out_task(self._out_slice()))
+            self._submit_out_task(self._out_slice())
 
     async def write(self, data):
         if self._write_buffer_size is not None:
@@ -319,13 +357,16 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
                 self._out_stalls += 1
             while self._out_inflight >= self._write_buffer_size:
                 self.logger.trace("FIFO: write pushback")
+                self._out_pushbacks.inc()
                 await self._out_tasks.wait_one()
 
         # Eagerly check if any of our previous queued writes errored out.
         await self._out_tasks.poll()
 
-        self.logger.trace("FIFO: write <%s>", dump_hex(data))
+        if self.logger.isEnabledFor(logging.TRACE):
+            self.logger.trace("FIFO: write <%s>", dump_hex(data))
         self._out_buffer.write(data)
+        self._out_buffer_peak.update(len(self._out_buffer))
 
         # The write scheduling algorithm attempts to satisfy several partially conflicting goals:
         #  * We want to schedule writes as early as possible, because this reduces buffer bloat and
@@ -350,7 +391,11 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
         # calls to `write`.
         while len(self._out_tasks) < _xfers_per_queue and \
                     len(self._out_buffer) >= self._out_threshold:
-            self._out_tasks.submit(self._out_task(self._out_slice()))
+            self._submit_out_task(self._out_slice())
+
+    def _submit_out_task(self, data):
+        self._out_tasks.submit(self._out_task(data))
+        self._out_xfer_depth.observe(len(self._out_tasks))
 
     async def flush(self, wait=True):
         self.logger.trace("FIFO: flush")
@@ -372,7 +417,7 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
             while self._out_buffer:
                 data += self._out_buffer.read()
             self._out_inflight += len(data)
-            self._out_tasks.submit(self._out_task(data))
+            self._submit_out_task(data)
 
         if wait:
             self.logger.trace("FIFO: wait for flush")
@@ -399,3 +444,44 @@ class DirectDemultiplexerInterface(AccessDemultiplexerInterface):
                          self._in_tasks.total_wait_count)
         self.logger.info("  write wakeups : %d",
                          self._out_tasks.total_wait_count)
+
+    def metrics(self):
+        return {
+            "fifo_read_bytes":
+                ("bytes read from the IN FIFO", Counter(self._in_buffer.total_read_bytes)),
+            "fifo_written_bytes":
+                ("bytes written to the OUT FIFO", Counter(self._out_buffer.total_written_bytes)),
+            "fifo_read_wait_seconds":
+                ("time spent waiting for IN transfers", Counter(self._in_tasks.total_wait_time)),
+            "fifo_write_wait_seconds":
+                ("time spent waiting for OUT transfers", Counter(self._out_tasks.total_wait_time)),
+            "fifo_read_stalls":
+                ("reads that had to wait for an IN transfer", Counter(self._in_stalls)),
+            "fifo_write_stalls":
+                ("writes or flushes that had to wait for an OUT transfer",
+                 Counter(self._out_stalls)),
+            "fifo_read_pushbacks":
+                ("IN transfers delayed because the read buffer was full", self._in_pushbacks),
+            "fifo_write_pushbacks":
+                ("writes delayed because the write buffer was full", self._out_pushbacks),
+            "usb_in_errors":
+                ("failed IN transfers", self._in_errors),
+            "usb_out_errors":
+                ("failed OUT transfers", self._out_errors),
+            "usb_in_transfer_bytes":
+                ("size of IN transfers", self._in_xfer_size),
+            "usb_out_transfer_bytes":
+                ("size of OUT transfers", self._out_xfer_size),
+            "usb_in_transfer_seconds":
+                ("latency of IN transfers", self._in_xfer_latency),
+            "usb_out_transfer_seconds":
+                ("latency of OUT transfers", self._out_xfer_latency),
+            "usb_out_transfers_in_flight":
+                ("OUT transfers in flight when submitting another one", self._out_xfer_depth),
+            "fifo_read_seconds":
+                ("latency of FIFO reads", self._read_latency),
+            "fifo_read_buffer_peak_bytes":
+                ("largest amount of data in the read buffer", self._in_buffer_peak),
+            "fifo_write_buffer_peak_bytes":
+                ("largest amount of data in the write buffer", self._out_buffer_peak),
+        }
@@ -119,6 +119,7 @@ from ..access.simulation import *
 from ..access.direct import *
 from ..target.simulation import *
 from ..target.hardware import *
+from ..device import GlasgowDeviceError
 from ..device.simulation import *
 from ..device.hardware import *
 from ..target.toolchain import find_toolchain
@@ -310,7 +311,10 @@ class GlasgowAppletTestCase(unittest.TestCase):
 
         if mode == "record":
             self.device = None # in case the next line raises
-            self.device = GlasgowHardwareDevice()
+            try:
+                self.device = GlasgowHardwareDevice()
+            except (GlasgowDeviceError, OSError) as e: # OSError if libusb is not available
+                raise unittest.SkipTest(f"fixture is missing, and cannot be recorded: {e}")
             self.device.demultiplexer = DirectDemultiplexer(self.device, pipe_count=1)
             revision = self.device.revision
         else:
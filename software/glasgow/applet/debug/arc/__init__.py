@@ -15,10 +15,18 @@
 #   on the rising edge of TCK when TMS is low. This state is employed to initiate a read/write
 #   access or place the JTAG module in the idle state. The read/write access defined by the
 #   address, data and command registers only occurs once on entry to Run-Test/Idle.
+#
+# The command register keeps its value after a transaction, and the address register is
+# incremented after each transaction (by 4 for memory, and by 1 for core and aux registers).
+# This makes it possible to transfer a block of words by only scanning the data register and
+# entering Run-Test/Idle for each word. Since any later entry to Run-Test/Idle would start another
+# transaction, the command register is set to NOP once a block transfer is complete.
 
 import logging
 import argparse
+import asyncio
 
+from ....support.bits import *
 from ....arch.jtag import *
 from ....arch.arc import *
 from ....database.arc import *
@@ -30,6 +38,104 @@ class ARCDebugError(GlasgowAppletError):
     pass
 
 
+def _txn_command(space, write):
+    if space == "memory":
+        return DR_TXN_COMMAND_WRITE_MEMORY if write else DR_TXN_COMMAND_READ_MEMORY
+    elif space == "core":
+        return DR_TXN_COMMAND_WRITE_CORE   if write else DR_TXN_COMMAND_READ_CORE
+    elif space == "aux":
+        return DR_TXN_COMMAND_WRITE_AUX    if write else DR_TXN_COMMAND_READ_AUX
+    else:
+        assert False
+
+
+class ARCDebugBatch:
+    """Sequence of ARC debug transactions submitted at once.
+
+    Transactions are recorded by :meth:`read` and :meth:`write`, and are only sent when the batch
+    is submitted. Instead of polling the status after each transaction, the status is captured
+    once, right after the transaction is started, and all of the captured values are read back
+    after every transaction has been sent. The futures returned for the transactions are resolved
+    with the data read (or ``None`` for writes), or with :exc:`ARCDebugError` if the transaction
+    failed or has not completed by the time its status was captured; the caller is expected to
+    retry such transactions individually.
+
+    Since the status is not polled, the address, data and command registers for a transaction are
+    scanned in without waiting for the previous transaction to complete. If a transaction takes
+    longer than that (e.g. at a high TCK frequency, or when the target memory is slow), any of
+    the transactions after it may be performed with the wrong arguments, or not at all, even if
+    their own status is captured as successful. Every transaction after the first failed one
+    should therefore be considered suspect.
+    """
+
+    def __init__(self, iface):
+        self._iface = iface
+        self._txns  = []
+
+    def __len__(self):
+        return len(self._txns)
+
+    def read(self, address, space):
+        future = asyncio.get_running_loop().create_future()
+        self._txns.append((_txn_command(space, write=False), address, None, future))
+        return future
+
+    def write(self, address, data, space):
+        future = asyncio.get_running_loop().create_future()
+        self._txns.append((_txn_command(space, write=True), address, data, future))
+        return future
+
+    async def submit(self):
+        txns, self._txns = self._txns, []
+        lower = self._iface.lower
+        self._iface._log("batch submit txns=%d", len(txns))
+        results = []
+        try:
+            for dr_txn_command, address, data, future in txns:
+                await lower.write_ir(IR_ADDRESS)
+                await lower.write_dr(DR_ADDRESS(Address=address).to_bits())
+                if data is not None:
+                    await lower.write_ir(IR_DATA)
+                    await lower.write_dr(DR_DATA(Data=data).to_bits())
+                await lower.write_ir(IR_TXN_COMMAND)
+                await lower.write_dr(dr_txn_command)
+                await lower.run_test_idle(1)
+                await lower.write_ir(IR_STATUS)
+                status_bits = await lower.read_dr(4, defer=True)
+                if data is None:
+                    await lower.write_ir(IR_DATA)
+                    data_bits = await lower.read_dr(32, defer=True)
+                else:
+                    data_bits = None
+                results.append((address, status_bits, data_bits, future))
+
+            for address, status_bits, data_bits, future in results:
+                status = DR_STATUS.from_bits(await status_bits)
+                if data_bits is not None:
+                    data_bits = await data_bits
+                if status.FL or not status.RD:
+                    self._iface._log("batch address=%08x status %s",
+                                     address, status.bits_repr())
+                    future.set_exception(ARCDebugError(
+                        "transaction at address {:08x} failed: {}"
+                        .format(address, status.bits_repr())))
+                elif data_bits is not None:
+                    future.set_result(DR_DATA.from_bits(data_bits).Data)
+                else:
+                    future.set_result(None)
+        finally:
+            for _, _, _, future in txns:
+                if not future.done():
+                    future.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.submit()
+
+
 class ARCDebugInterface:
     def __init__(self, interface, logger):
         self.lower   = interface
@@ -59,14 +165,7 @@ class ARCDebugInterface:
                 raise ARCDebugError("transaction failed: %s" % status.bits_repr())
 
     async def read(self, address, space):
-        if space == "memory":
-            dr_txn_command = DR_TXN_COMMAND_READ_MEMORY
-        elif space == "core":
-            dr_txn_command = DR_TXN_COMMAND_READ_CORE
-        elif space == "aux":
-            dr_txn_command = DR_TXN_COMMAND_READ_AUX
-        else:
-            assert False
+        dr_txn_command = _txn_command(space, write=False)
 
         self._log("read %s address=%08x", space, address)
         dr_address = DR_ADDRESS(Address=address)
@@ -83,14 +182,7 @@ class ARCDebugInterface:
         return dr_data.Data
 
     async def write(self, address, data, space):
-        if space == "memory":
-            dr_txn_command = DR_TXN_COMMAND_WRITE_MEMORY
-        elif space == "core":
-            dr_txn_command = DR_TXN_COMMAND_WRITE_CORE
-        elif space == "aux":
-            dr_txn_command = DR_TXN_COMMAND_WRITE_AUX
-        else:
-            assert False
+        dr_txn_command = _txn_command(space, write=True)
 
         self._log("write %s address=%08x data=%08x", space, address, data)
         dr_address = DR_ADDRESS(Address=address)
@@ -104,6 +196,87 @@ class ARCDebugInterface:
         await self.lower.run_test_idle(1)
         await self._wait_txn()
 
+    async def _end_block(self):
+        try:
+            await self._wait_txn()
+        finally:
+            await self.lower.write_ir(IR_TXN_COMMAND)
+            await self.lower.write_dr(DR_TXN_COMMAND_NOP)
+
+    async def _check_txn(self):
+        # Compares the status with the expected one in the probe, without waiting for it.
+        await self.lower.write_ir(IR_STATUS)
+        return await self.lower.check_dr(bits(0, 4), DR_STATUS(RD=1).to_bits(),
+                                         DR_STATUS(FL=1, RD=1).to_bits(), defer=True)
+
+    async def read_block(self, address, count, space):
+        """Read ``count`` consecutive words starting at ``address``.
+
+        The status of each transaction is checked by the probe before its result is captured,
+        and the results of the checks are only read back after all of the words have been read.
+        """
+        if count == 0:
+            return []
+        dr_txn_command = _txn_command(space, write=False)
+
+        self._log("read block %s address=%08x count=%d", space, address, count)
+        await self.lower.write_ir(IR_ADDRESS)
+        await self.lower.write_dr(DR_ADDRESS(Address=address).to_bits())
+        await self.lower.write_ir(IR_TXN_COMMAND)
+        await self.lower.write_dr(dr_txn_command)
+        await self.lower.run_test_idle(1)
+        deferred = []
+        for index in range(count):
+            # Capturing the data register returns the result of the previous transaction (or
+            # the one before it, if the previous transaction has not completed yet), and entering
+            # Run-Test/Idle afterwards starts the next one.
+            status_check = await self._check_txn()
+            await self.lower.write_ir(IR_DATA)
+            deferred.append((status_check, await self.lower.read_dr(32, defer=True)))
+            if index != count - 1:
+                await self.lower.run_test_idle(1)
+        await self._end_block()
+
+        words = []
+        for index, (status_check, dr_data_bits) in enumerate(deferred):
+            if await status_check is not None:
+                raise ARCDebugError("block read of word %d at address %08x has not completed"
+                                    % (index, address))
+            words.append(DR_DATA.from_bits(await dr_data_bits).Data)
+        if self._logger.isEnabledFor(self._level):
+            self._log("read block data=<%s>", " ".join(f"{word:08x}" for word in words))
+        return words
+
+    async def write_block(self, address, words, space):
+        """Write ``words`` to consecutive locations starting at ``address``.
+
+        The status is only checked once, after all of the words have been written.
+        """
+        if not words:
+            return
+        dr_txn_command = _txn_command(space, write=True)
+
+        if self._logger.isEnabledFor(self._level):
+            self._log("write block %s address=%08x data=<%s>", space, address,
+                      " ".join(f"{word:08x}" for word in words))
+        await self.lower.write_ir(IR_ADDRESS)
+        await self.lower.write_dr(DR_ADDRESS(Address=address).to_bits())
+        await self.lower.write_ir(IR_TXN_COMMAND)
+        await self.lower.write_dr(dr_txn_command)
+        await self.lower.write_ir(IR_DATA)
+        for word in words:
+            await self.lower.write_dr(DR_DATA(Data=word).to_bits())
+            await self.lower.run_test_idle(1)
+        await self._end_block()
+
+    def batch(self):
+        """Start recording an :class:`ARCDebugBatch` of transactions.
+
+        The batch may be used as an asynchronous context manager, in which case it is submitted
+        on exit.
+        """
+        return ARCDebugBatch(self)
+
     async def is_halted(self):
         status32 = AUX_STATUS32.from_int(await self.read(AUX_STATUS32_addr, space="aux"))
         return status32.H
@@ -172,3 +345,8 @@ class DebugARCApplet(JTAGProbeApplet):
                                      % idcode.to_int())
         self.logger.info("IDCODE=%08x device=%s rev=%d",
                          idcode.to_int(), device.name, idcode.version)
+
+    @classmethod
+    def tests(cls):
+        from . import test
+        return test.DebugARCAppletTestCase
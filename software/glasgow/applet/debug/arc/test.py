@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import unittest
+
+from ....support.bits import *
+from ....arch.jtag import *
+from ....arch.arc import *
+from ...interface.jtag_probe.test import MockJTAGProbeDeferredResult
+from ... import *
+from . import ARCDebugInterface, ARCDebugError, DebugARCApplet
+
+
+class MockMemory:
+    def __init__(self, size):
+        self.words = [0] * (size // 4)
+
+    def read(self, address):
+        return self.words[address // 4]
+
+    def write(self, address, data):
+        self.words[address // 4] = data
+
+
+class MockARCTAP:
+    """Model of the ARC JTAG TAP of an ARC6xx core with ``memory`` mapped into its memory space.
+
+    Only the operations used by :class:`ARCDebugInterface` are implemented.
+    """
+    def __init__(self, memory):
+        self.memory   = memory
+        self.core     = {}
+        self.aux      = {AUX_STATUS32_addr: AUX_STATUS32(H=1).to_int()}
+        self.ir       = IR_IDCODE
+        self.address  = 0
+        self.data     = 0
+        self.command  = DR_TXN_COMMAND_NOP
+        self.status   = DR_STATUS(RD=1)
+        # Indexes of transactions that fail; the failure is reported until the command register
+        # is written again.
+        self.stalls   = set()
+        # Indexes of transactions that are performed, but are still in progress the first time
+        # the status is captured; until then, the data register is not updated by reads.
+        self.slow     = set()
+        self.pending  = None
+        # Indexes of transactions that are silently not performed, as may happen to a transaction
+        # that is started while a slow one is still in progress.
+        self.dropped  = set()
+        self.txns     = 0
+        self.round_trips = 0
+
+    async def test_reset(self):
+        self.ir = IR_IDCODE
+
+    async def flush(self):
+        pass
+
+    async def write_ir(self, data, *, elide=True):
+        self.ir = data
+
+    async def write_dr(self, data):
+        if self.ir == IR_ADDRESS:
+            self.address = DR_ADDRESS.from_bits(data).Address
+        elif self.ir == IR_DATA:
+            self.data = DR_DATA.from_bits(data).Data
+        elif self.ir == IR_TXN_COMMAND:
+            self.command = data
+            self.status  = DR_STATUS(RD=1)
+        else:
+            assert False
+
+    def _complete(self):
+        if self.pending is not None:
+            self.data, self.pending = self.pending, None
+        if not self.status.FL:
+            self.status = DR_STATUS(RD=1)
+
+    async def run_test_idle(self, count):
+        self._complete()
+        if self.command == DR_TXN_COMMAND_NOP:
+            return
+        index, self.txns = self.txns, self.txns + 1
+        previous = self.data
+        if index in self.stalls:
+            self.status = DR_STATUS(FL=1)
+        if self.status.FL or index in self.dropped:
+            return
+        if self.command == DR_TXN_COMMAND_READ_MEMORY:
+            self.data = self.memory.read(self.address)
+        elif self.command == DR_TXN_COMMAND_WRITE_MEMORY:
+            self.memory.write(self.address, self.data)
+        elif self.command == DR_TXN_COMMAND_READ_CORE:
+            self.data = self.core.get(self.address, 0)
+        elif self.command == DR_TXN_COMMAND_WRITE_CORE:
+            self.core[self.address] = self.data
+        elif self.command == DR_TXN_COMMAND_READ_AUX:
+            self.data = self.aux.get(self.address, 0)
+        elif self.command == DR_TXN_COMMAND_WRITE_AUX:
+            self.aux[self.address] = self.data
+        else:
+            assert False
+        if self.command in (DR_TXN_COMMAND_READ_MEMORY, DR_TXN_COMMAND_WRITE_MEMORY):
+            self.address += 4
+        else:
+            self.address += 1
+        if index in self.slow:
+            self.status = DR_STATUS(RD=0)
+            if self.command in (DR_TXN_COMMAND_READ_MEMORY, DR_TXN_COMMAND_READ_CORE,
+                                DR_TXN_COMMAND_READ_AUX):
+                self.data, self.pending = previous, self.data
+
+    async def read_dr(self, count, *, defer=False):
+        if self.ir == IR_IDCODE:
+            data = DR_IDCODE(present=1, mfg_id=0x258, part_id=0x0002, version=1).to_bits()
+        elif self.ir == IR_STATUS:
+            data = self.status.to_bits()
+            self._complete()
+        elif self.ir == IR_DATA:
+            data = DR_DATA(Data=self.data).to_bits()
+        else:
+            assert False
+        assert len(data) == count
+        if defer:
+            return MockJTAGProbeDeferredResult(data)
+        self.round_trips += 1
+        return data
+
+    async def check_dr(self, data, expected, mask=None, *, defer=False):
+        captured = await self.read_dr(len(data), defer=True)
+        mask = bits((1,)) * len(data) if mask is None else mask
+        mismatch = None
+        for offset in range(len(data)):
+            if mask[offset] and captured.result()[offset] != expected[offset]:
+                mismatch = offset
+                break
+        if defer:
+            return MockJTAGProbeDeferredResult(mismatch)
+        self.round_trips += 1
+        return mismatch
+
+
+class ARCDebugInterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.memory = MockMemory(0x1000)
+        self.memory.words[:] = [(index * 0x01010101) & 0xffffffff
+                                for index in range(len(self.memory.words))]
+        self.tap   = MockARCTAP(self.memory)
+        self.iface = ARCDebugInterface(self.tap, logging.getLogger(__name__))
+
+    def run_case(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def test_read_write(self):
+        self.assertEqual(self.run_case(self.iface.read(0x10, space="memory")), 0x04040404)
+        self.run_case(self.iface.write(0x10, 0xdeadbeef, space="memory"))
+        self.assertEqual(self.memory.words[4], 0xdeadbeef)
+
+    def test_read_block(self):
+        self.assertEqual(self.run_case(self.iface.read_block(0x100, 100, space="memory")),
+                         self.memory.words[0x40:0x40 + 100])
+        self.assertEqual(self.tap.txns, 100)
+        self.assertEqual(self.tap.round_trips, 1)
+        # A later entry to Run-Test/Idle does not start another transaction.
+        self.run_case(self.tap.run_test_idle(1))
+        self.assertEqual(self.tap.txns, 100)
+
+    def test_write_block(self):
+        words = [0x11111111 * n for n in range(10)]
+        self.run_case(self.iface.write_block(0x20, words, space="memory"))
+        self.assertEqual(self.memory.words[8:18], words)
+        self.assertEqual(self.memory.words[18], 18 * 0x01010101)
+        self.assertEqual(self.tap.round_trips, 1)
+
+    def test_block_aux(self):
+        self.run_case(self.iface.write_block(0x100, [1, 2, 3], space="aux"))
+        self.assertEqual(self.tap.aux[0x102], 3)
+        self.assertEqual(self.run_case(self.iface.read_block(0x101, 2, space="aux")), [2, 3])
+
+    def test_block_core(self):
+        self.run_case(self.iface.write_block(0, [5, 6], space="core"))
+        self.assertEqual(self.run_case(self.iface.read_block(0, 2, space="core")), [5, 6])
+
+    def test_read_block_fail(self):
+        self.tap.stalls = {10}
+        with self.assertRaisesRegex(ARCDebugError, r"transaction failed"):
+            self.run_case(self.iface.read_block(0, 20, space="memory"))
+        self.assertEqual(self.tap.command, DR_TXN_COMMAND_NOP)
+
+    def test_read_block_slow(self):
+        # The read of word 10 has not completed when the data register is captured.
+        self.tap.slow = {10}
+        with self.assertRaisesRegex(ARCDebugError,
+                r"block read of word 10 at address 00000000 has not completed"):
+            self.run_case(self.iface.read_block(0, 20, space="memory"))
+        self.assertEqual(self.tap.command, DR_TXN_COMMAND_NOP)
+
+    def test_batch(self):
+        self.tap.stalls = {1}
+        async def case():
+            async with self.iface.batch() as batch:
+                read_1 = batch.read(0x20, space="memory")
+                write  = batch.write(0x24, 0x12345678, space="memory")
+                read_2 = batch.read(0x24, space="memory")
+            return read_1, write, read_2
+        read_1, write, read_2 = self.run_case(case())
+        self.assertEqual(read_1.result(), 0x08080808)
+        self.assertIsInstance(write.exception(), ARCDebugError)
+        self.assertEqual(read_2.result(), 0x09090909)
+
+
+class DebugARCAppletTestCase(GlasgowAppletTestCase, applet=DebugARCApplet):
+    @synthesis_test
+    def test_build(self):
+        self.assertBuilds()
@@ -21,6 +21,10 @@ class ARMJTAGDPInterface(ARMDPInterface, aobject):
         CDBGPWRUPREQ=0b1, CDBGPWRUPACK=0b1,
         CSYSPWRUPREQ=0b1, CSYSPWRUPACK=0b1).to_int()
 
+    # Expected value and mask for checking the ACK field of a captured xPACC DR in the probe.
+    _DR_xPACC_OK_FAULT = DR_xPACC_capture(ACK=DR_xPACC_ACK.OK_FAULT).to_bits()
+    _DR_xPACC_ACK_mask = DR_xPACC_capture(ACK=0b111).to_bits()
+
     async def __init__(self, interface, logger):
         self.lower   = interface
         self._logger = logger
@@ -38,17 +42,17 @@ class ARMJTAGDPInterface(ARMDPInterface, aobject):
         await self.lower.write_ir(IR_DPACC)
 
         dr_update = DR_xPACC_update(RnW=0, A=(addr & 0xf) >> 2, DATAIN=value)
-        # TODO: use JTAG masked compare when implemented
-        dr_capture = DR_xPACC_capture.from_bits(await self.lower.exchange_dr(dr_update.to_bits()))
-        assert dr_capture.ACK == DR_xPACC_ACK.OK_FAULT
+        mismatch = await self.lower.check_dr(dr_update.to_bits(),
+            self._DR_xPACC_OK_FAULT, self._DR_xPACC_ACK_mask)
+        assert mismatch is None
 
     async def _read_dpacc(self, addr):
         await self.lower.write_ir(IR_DPACC)
 
         dr_update = DR_xPACC_update(RnW=1, A=(addr & 0xf) >> 2)
-        # TODO: use JTAG masked compare when implemented
-        dr_capture = DR_xPACC_capture.from_bits(await self.lower.exchange_dr(dr_update.to_bits()))
-        assert dr_capture.ACK == DR_xPACC_ACK.OK_FAULT
+        mismatch = await self.lower.check_dr(dr_update.to_bits(),
+            self._DR_xPACC_OK_FAULT, self._DR_xPACC_ACK_mask)
+        assert mismatch is None
 
         # TODO: pick a better nop than repeated read?
         dr_capture = DR_xPACC_capture.from_bits(await self.lower.exchange_dr(dr_update.to_bits()))
@@ -86,9 +90,9 @@ class ARMJTAGDPInterface(ARMDPInterface, aobject):
         await self.lower.write_ir(IR_APACC)
 
         dr_update = DR_xPACC_update(RnW=0, A=(addr & 0xf) >> 2, DATAIN=value)
-        # TODO: use JTAG masked compare when implemented
-        dr_capture = DR_xPACC_capture.from_bits(await self.lower.exchange_dr(dr_update.to_bits()))
-        assert dr_capture.ACK == DR_xPACC_ACK.OK_FAULT
+        mismatch = await self.lower.check_dr(dr_update.to_bits(),
+            self._DR_xPACC_OK_FAULT, self._DR_xPACC_ACK_mask)
+        assert mismatch is None
 
         await self._poll_apacc()
 
@@ -96,9 +100,9 @@ class ARMJTAGDPInterface(ARMDPInterface, aobject):
         await self.lower.write_ir(IR_APACC)
 
         dr_update = DR_xPACC_update(RnW=1, A=(addr & 0xf) >> 2)
-        # TODO: use JTAG masked compare when implemented
-        dr_capture = DR_xPACC_capture.from_bits(await self.lower.exchange_dr(dr_update.to_bits()))
-        assert dr_capture.ACK == DR_xPACC_ACK.OK_FAULT
+        mismatch = await self.lower.check_dr(dr_update.to_bits(),
+            self._DR_xPACC_OK_FAULT, self._DR_xPACC_ACK_mask)
+        assert mismatch is None
 
         return await self._poll_apacc()
 
@@ -16,14 +16,16 @@ import asyncio
 from amaranth import *
 from amaranth.lib import io, cdc
 
+from ....support.endpoint import *
 from ... import *
 
 
 # FPGA commands
-XFER_BIT_DATA = 0b0001
-XFER_BIT_READ = 0b0010
-XFER_BIT_HALF = 0b0100
-XFER_BIT_WAIT = 0b1000
+XFER_BIT_DATA  = 0b00001
+XFER_BIT_READ  = 0b00010
+XFER_BIT_HALF  = 0b00100
+XFER_BIT_WAIT  = 0b01000
+XFER_BIT_TIMED = 0b10000
 
 XFER_COMMAND  = 0
 XFER_POLL     = XFER_BIT_READ
@@ -82,8 +84,12 @@ class HD44780Subtarget(Elaboratable):
         rx_setup_cyc = math.ceil(60e-9 * self.sys_clk_freq)
         e_pulse_cyc  = math.ceil(500e-9 * self.sys_clk_freq)
         e_wait_cyc   = math.ceil(700e-9 * self.sys_clk_freq)
+        # Most commands (and data writes) take 37 us with a 270 kHz oscillator; allow for it being
+        # as slow as 190 kHz.
+        exec_wait_cyc = math.ceil(53e-6 * self.sys_clk_freq)
         cmd_wait_cyc = math.ceil(1.52e-3 * self.sys_clk_freq)
-        timer        = Signal(range(max([rx_setup_cyc, e_pulse_cyc, e_wait_cyc, cmd_wait_cyc])))
+        timer        = Signal(range(max([rx_setup_cyc, e_pulse_cyc, e_wait_cyc, exec_wait_cyc,
+                                         cmd_wait_cyc])))
 
         cmd  = Signal(8)
         rdata = Signal(8)
@@ -137,6 +143,9 @@ class HD44780Subtarget(Elaboratable):
                     with m.If(msb):
                         m.next = "WRITE"
                     with m.Else():
+                        with m.If(cmd & XFER_BIT_TIMED):
+                            # wait for the command to finish executing instead of polling BF
+                            m.d.sync += timer.eq(exec_wait_cyc)
                         m.next = "WAIT"
                 with m.Else():
                     m.d.sync += timer.eq(timer - 1)
@@ -192,6 +201,133 @@ class HD44780Subtarget(Elaboratable):
         return m
 
 
+class HD44780Interface:
+    """
+    Framebuffer-backed interface to an HD44780-compatible display.
+
+    The contents of the display are kept on the host; :meth:`update` only writes the cells that
+    differ from what is displayed, setting the DDRAM address only where the address counter
+    would not already point at the next changed cell.
+    """
+    def __init__(self, interface, logger, *, rows=2, columns=16):
+        self.lower    = interface
+        self._logger  = logger
+        self._level   = logging.DEBUG if self._logger.name == __name__ else logging.TRACE
+        self.rows     = rows
+        self.columns  = columns
+        self._shown   = [bytearray(b" " * columns) for _ in range(rows)]
+        self._address = None
+        # text mode state, see `write_text`
+        self._text    = [bytearray(b" " * columns) for _ in range(rows)]
+        self._row     = 0
+        self._column  = 0
+
+    def _log(self, message, *args):
+        self._logger.log(self._level, "HD44780: " + message, *args)
+
+    def _row_address(self, row):
+        return (0x00, 0x40, self.columns, 0x40 + self.columns)[row]
+
+    async def _init_nibble(self, command, poll):
+        await self.lower.write([XFER_INIT, command, XFER_POLL if poll else XFER_WAIT])
+
+    async def command(self, command):
+        await self.lower.write([XFER_COMMAND, command, XFER_POLL])
+
+    async def initialize(self):
+        self._log("initialize")
+        # HD44780 may be in either 4-bit or 8-bit mode and we don't know which.
+        # The following sequence brings it to 4-bit mode regardless of which one it was in.
+        await self._init_nibble(0x03, poll=False) # either CMD_FUNCTION_SET|BIT_IFACE_8BIT or
+                                                  # CMD_CURSOR_HOME or the second nibble of
+                                                  # an unknown command/data
+        await self._init_nibble(0x03, poll=False) # either CMD_FUNCTION_SET|BIT_IFACE_8BIT or
+                                                  # CMD_CURSOR_HOME or the second nibble of
+                                                  # CMD_FUNCTION_SET (the set bits are ignored)
+        await self._init_nibble(0x03, poll=False) # CMD_FUNCTION_SET|BIT_IFACE_8BIT
+        await self._init_nibble(0x02, poll=True)  # CMD_FUNCTION_SET
+
+        await self.command(CMD_FUNCTION_SET|(BIT_DISPLAY_2_LINE if self.rows > 1 else 0))
+        await self.command(CMD_DISPLAY_ON_OFF|BIT_DISPLAY_ON)
+        await self.command(CMD_CLEAR_DISPLAY)
+        await self.command(CMD_ENTRY_MODE|BIT_CURSOR_INC_POS)
+        await self.lower.flush()
+        for row in self._shown:
+            row[:] = b" " * self.columns
+        self._address = 0
+
+    def _diff(self, lines):
+        # Yields `(address, data)` runs of changed cells. An unchanged cell between two changed
+        # ones is rewritten rather than skipped, since setting the address costs as much.
+        for row, line in enumerate(lines):
+            shown = self._shown[row]
+            start = end = None
+            for column in range(self.columns):
+                if line[column] == shown[column]:
+                    continue
+                if start is not None and column - end > 2:
+                    yield self._row_address(row) + start, line[start:end + 1]
+                    start = None
+                if start is None:
+                    start = column
+                end = column
+            if start is not None:
+                yield self._row_address(row) + start, line[start:end + 1]
+
+    async def update(self, lines):
+        """
+        Display ``lines`` (a sequence of byte strings or ASCII strings, one per row), writing only
+        the cells that have changed. Rows that are too short are padded with spaces.
+        """
+        lines = [(line.encode("ascii", "replace") if isinstance(line, str) else bytes(line))
+                 [:self.columns].ljust(self.columns) for line in lines]
+        lines += [b" " * self.columns] * (self.rows - len(lines))
+        commands = bytearray()
+        for address, data in self._diff(lines[:self.rows]):
+            self._log("write address=%#04x data=%r", address, data)
+            if address != self._address:
+                commands += bytes([XFER_COMMAND|XFER_BIT_TIMED, CMD_DDRAM_ADDRESS|address])
+            for byte in data:
+                commands += bytes([XFER_WRITE|XFER_BIT_TIMED, byte])
+            self._address = address + len(data)
+        for row, line in enumerate(lines[:self.rows]):
+            self._shown[row][:] = line
+        if commands:
+            await self.lower.write(commands)
+            await self.lower.flush()
+
+    async def write_text(self, text):
+        """
+        Write ``text`` (bytes) to the display as if it was a terminal. Line feed moves to the next
+        row, scrolling the display up once the last row is filled; carriage return moves to
+        the beginning of the row, and form feed clears the display. Other control characters are
+        ignored. The display is updated once all of ``text`` has been processed.
+        """
+        def new_line():
+            self._row += 1
+            if self._row == self.rows:
+                self._row -= 1
+                self._text.append(self._text.pop(0))
+                self._text[-1][:] = b" " * self.columns
+        for byte in text:
+            if byte == 0x0a: # LF
+                new_line()
+                self._column = 0
+            elif byte == 0x0d: # CR
+                self._column = 0
+            elif byte == 0x0c: # FF
+                for row in self._text:
+                    row[:] = b" " * self.columns
+                self._row = self._column = 0
+            elif byte >= 0x20:
+                if self._column == self.columns:
+                    new_line()
+                    self._column = 0
+                self._text[self._row][self._column] = byte
+                self._column += 1
+        await self.update(self._text)
+
+
 class DisplayHD44780Applet(GlasgowApplet):
     preview = True
     logger = logging.getLogger(__name__)
@@ -233,6 +369,12 @@ class DisplayHD44780Applet(GlasgowApplet):
         parser.add_argument(
             "--reset", default=False, action="store_true",
             help="power-cycle the port on startup")
+        parser.add_argument(
+            "--rows", metavar="COUNT", type=int, choices=(1, 2, 4), default=2,
+            help="the display has COUNT rows (one of: 1 2 4, default: %(default)s)")
+        parser.add_argument(
+            "--columns", metavar="COUNT", type=int, default=16,
+            help="the display has COUNT columns (default: %(default)s)")
 
     async def run(self, device, args):
         iface = await device.demultiplexer.claim_interface(self, self.mux_interface, args=None)
@@ -243,45 +385,42 @@ class DisplayHD44780Applet(GlasgowApplet):
         await device.set_voltage(args.port_spec, 5.0)
         await asyncio.sleep(0.040) # wait 40ms after reset
 
-        # TODO: abstract this away into a HD44780Interface
-        async def init(command, poll):
-            await iface.write([XFER_INIT, command, XFER_POLL if poll else XFER_WAIT])
+        hd44780_iface = HD44780Interface(iface, self.logger, rows=args.rows, columns=args.columns)
+        await hd44780_iface.initialize()
+        return hd44780_iface
 
-        async def cmd(command):
-            await iface.write([XFER_COMMAND, command, XFER_POLL])
+    @classmethod
+    def add_interact_arguments(cls, parser):
+        p_operation = parser.add_subparsers(dest="operation", metavar="OPERATION")
 
-        async def data(bytes):
-            for byte in bytes:
-                await iface.write([XFER_WRITE, byte, XFER_POLL])
+        p_operation.add_parser(
+            "clock", help="display current time and date (default)")
 
-        # HD44780 may be in either 4-bit or 8-bit mode and we don't know which.
-        # The following sequence brings it to 4-bit mode regardless of which one it was in.
-        await init(0x03, poll=False) # either CMD_FUNCTION_SET|BIT_IFACE_8BIT or CMD_CURSOR_HOME
-                                     # or the second nibble of an unknown command/data
-        await init(0x03, poll=False) # either CMD_FUNCTION_SET|BIT_IFACE_8BIT or CMD_CURSOR_HOME
-                                     # or the second nibble of CMD_FUNCTION_SET (the set bits
-                                     # are ignored)
-        await init(0x03, poll=False) # CMD_FUNCTION_SET|BIT_IFACE_8BIT
-        await init(0x02, poll=True)  # CMD_FUNCTION_SET
-
-        await cmd(CMD_FUNCTION_SET|BIT_DISPLAY_2_LINE)
-        await cmd(CMD_DISPLAY_ON_OFF|BIT_DISPLAY_ON|BIT_CURSOR_BLINK)
-        await cmd(CMD_CLEAR_DISPLAY)
-        await cmd(CMD_ENTRY_MODE|BIT_CURSOR_INC_POS)
-        await data(b"Hello")
-        await cmd(CMD_DDRAM_ADDRESS|0x40)
-        await data(b"  World")
-        await iface.flush()
-        await asyncio.sleep(1)
-
-        from datetime import datetime
-        while True:
+        p_socket = p_operation.add_parser(
+            "socket", help="display text received from a socket")
+        ServerEndpoint.add_argument(p_socket, "endpoint")
+
+    async def interact(self, device, args, hd44780_iface):
+        if args.operation in (None, "clock"):
+            await hd44780_iface.update([b"Hello", b"  World"])
             await asyncio.sleep(1)
-            await cmd(CMD_DDRAM_ADDRESS|0x00)
-            await data(datetime.now().strftime("%H:%M:%S").encode("ascii"))
-            await cmd(CMD_DDRAM_ADDRESS|0x40)
-            await data(datetime.now().strftime("%y-%m-%d").encode("ascii"))
-            await iface.flush()
+
+            from datetime import datetime
+            while True:
+                await hd44780_iface.update([
+                    datetime.now().strftime("%H:%M:%S"),
+                    datetime.now().strftime("%y-%m-%d"),
+                ])
+                await asyncio.sleep(1)
+
+        if args.operation == "socket":
+            endpoint = await ServerEndpoint("socket", self.logger, args.endpoint)
+            while True:
+                try:
+                    data = await asyncio.shield(endpoint.recv())
+                except asyncio.CancelledError:
+                    continue
+                await hd44780_iface.write_text(data)
 
     @classmethod
     def tests(cls):
@@ -1,7 +1,59 @@
+import asyncio
+import logging
+import unittest
+
 from ... import *
+from . import *
 from . import DisplayHD44780Applet
 
 
+class MockInterface:
+    def __init__(self):
+        self.data = bytearray()
+
+    async def write(self, data):
+        self.data += bytes(data)
+
+    async def flush(self):
+        pass
+
+
+class HD44780InterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.lower = MockInterface()
+        self.iface = HD44780Interface(self.lower, logging.getLogger(__name__))
+        asyncio.get_event_loop().run_until_complete(self.iface.initialize())
+        self.lower.data.clear()
+
+    def assertWrites(self, coro, commands):
+        asyncio.get_event_loop().run_until_complete(coro)
+        expected = bytearray()
+        for command in commands:
+            if isinstance(command, int):
+                expected += bytes([XFER_COMMAND|XFER_BIT_TIMED, CMD_DDRAM_ADDRESS|command])
+            else:
+                for byte in command:
+                    expected += bytes([XFER_WRITE|XFER_BIT_TIMED, byte])
+        self.assertEqual(self.lower.data, expected)
+        self.lower.data.clear()
+
+    def test_update(self):
+        self.assertWrites(self.iface.update(["Hello"]), [b"Hello"])
+        self.assertWrites(self.iface.update(["Hello"]), [])
+        self.assertWrites(self.iface.update(["Help!"]), [0x03, b"p!"])
+        self.assertWrites(self.iface.update(["Help!", "World"]), [0x40, b"World"])
+        # a single unchanged cell between changed ones is rewritten
+        self.assertWrites(self.iface.update(["HeLp?", "World"]), [0x02, b"Lp?"])
+        # the address counter points at the next changed cell
+        self.assertWrites(self.iface.update(["HeLp? x", "World"]), [0x06, b"x"])
+        self.assertWrites(self.iface.update(["HeLp? xy", "World"]), [b"y"])
+
+    def test_write_text(self):
+        self.assertWrites(self.iface.write_text(b"ab\ncd"), [b"ab", 0x40, b"cd"])
+        self.assertWrites(self.iface.write_text(b"\nef"), [0x00, b"cd", 0x40, b"ef"])
+        self.assertWrites(self.iface.write_text(b"\x0c"), [0x00, b"  ", 0x40, b"  "])
+
+
 class DisplayHD44780AppletTestCase(GlasgowAppletTestCase, applet=DisplayHD44780Applet):
     @synthesis_test
     def test_build(self):
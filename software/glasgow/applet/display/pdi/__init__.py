@@ -158,7 +158,8 @@ class PDIDisplayInterface:
         self._log("cog-id=%#04x", cog_id)
         return cog_id
 
-    async def _write(self, index, value, delay_ms=0):
+    def _batch_write(self, batch, index, value, delay_ms=0):
+        # Records a register write in an `SPIControllerBatch`.
         if isinstance(value, int):
             value = bytes([value])
         else:
@@ -167,11 +168,15 @@ class PDIDisplayInterface:
             self._log("[%02x] <= %s + %d ms", index, value.hex(), delay_ms)
         else:
             self._log("[%02x] <= %s", index, value.hex())
-        await self.lower.delay_us(10)
-        await self.lower.write([0x70, index])
-        await self.lower.delay_us(10)
-        await self.lower.write([0x72, *value])
-        await self.lower.delay_ms(delay_ms)
+        batch.delay_us(10)
+        batch.write([0x70, index])
+        batch.delay_us(10)
+        batch.write([0x72, *value])
+        batch.delay_ms(delay_ms)
+
+    async def _write(self, index, value, delay_ms=0):
+        async with self.lower.batch() as batch:
+            self._batch_write(batch, index, value, delay_ms)
 
     async def _read(self, index, length=1):
         await self.lower.delay_us(10)
@@ -266,23 +271,71 @@ class PDIG1DisplayInterface(PDIDisplayInterface):
         # Flush command queue
         await self._flush()
 
-    async def _display_line(self, data, scan, delay_ms=0, padding=0x00):
+    def _batch_line(self, batch, data, scan, delay_ms=0, padding=0x00):
         # Set Chargepump voltage level reduce voltage shift
         if self.epd_size in ("1.44", "2"):
-            await self._write(REG_VGS_LEVEL, 0x03)
+            self._batch_write(batch, REG_VGS_LEVEL, 0x03)
         if self.epd_size == "2.7":
-            await self._write(REG_VGS_LEVEL, 0x00)
+            self._batch_write(batch, REG_VGS_LEVEL, 0x00)
         # Sending Data
         if self.epd_size == "1.44":
             prefix, suffix = [padding], []
         if self.epd_size in ("2", "2.7"):
             prefix, suffix = [], [padding]
-        await self._write(REG_DATA,
+        self._batch_write(batch, REG_DATA,
             prefix + data[:len(data)//2] + scan + data[len(data)//2:] + suffix)
         # Turn on Output Enable
-        await self._write(REG_OUTPUT_EN, 0x2F, delay_ms=delay_ms)
+        self._batch_write(batch, REG_OUTPUT_EN, 0x2F, delay_ms=delay_ms)
 
-    async def display_frame(self, mode, time_ms=0, image=None):
+    async def _display_line(self, data, scan, delay_ms=0, padding=0x00):
+        async with self.lower.batch() as batch:
+            self._batch_line(batch, data, scan, delay_ms, padding)
+
+    @staticmethod
+    def _spread_table(bit_order, fill):
+        # Maps a byte of the image to a byte of line data: the pixels are taken from the bits of
+        # the image byte in `bit_order`, and each set pixel inverts the low bit of its 2-bit slot
+        # in `fill`, the first pixel being in the most significant slot.
+        table = bytearray(256)
+        for byte in range(256):
+            for slot, bit in enumerate(bit_order):
+                if byte & (1 << bit):
+                    table[byte] |= 0b01_00_00_00 >> (slot * 2)
+            table[byte] ^= fill
+        return bytes(table)
+
+    def _encode_frame(self, fill, image):
+        # Returns the data portion of each line. Odd pixels (0, 2, ...) are sent in order, and even
+        # pixels (1, 3, ...) in reverse order; the panel widths are all multiples of 8, so each
+        # byte of the image row maps to one byte of the even data and one of the odd data.
+        if image is None:
+            return [bytes([fill]) * (self.width // 4)] * self.height
+        odd_table  = self._spread_table((0, 2, 4, 6), fill)
+        even_table = self._spread_table((7, 5, 3, 1), fill)
+        image_data = image.to_bytes()
+        row_size   = self.width // 8
+        lines = []
+        for y in range(self.height):
+            row = image_data[y * row_size:(y + 1) * row_size]
+            lines.append(row[::-1].translate(even_table) + row.translate(odd_table))
+        return lines
+
+    @staticmethod
+    def changed_rows(old_image, new_image, width):
+        """Return the set of rows that differ between ``old_image`` and ``new_image``."""
+        old_data = old_image.to_bytes()
+        new_data = new_image.to_bytes()
+        row_size = width // 8
+        return {y for y in range(len(new_data) // row_size)
+                if old_data[y * row_size:(y + 1) * row_size] !=
+                   new_data[y * row_size:(y + 1) * row_size]}
+
+    async def display_frame(self, mode, time_ms=0, image=None, *, rows=None):
+        """
+        Drive a frame in ``mode``. If ``image`` is specified, the pixels set in it are driven
+        inversely. If ``rows`` is specified, only the rows in it are driven (in order from top
+        to bottom); this is useful to update only the changed part of an image.
+        """
         assert mode in ("black", "white", "nothing0", "nothing1")
         if mode == "black":
             fill = 0b11_11_11_11
@@ -293,23 +346,22 @@ class PDIG1DisplayInterface(PDIDisplayInterface):
         if mode == "nothing1":
             fill = 0b01_01_01_01
 
-        for y in range(self.height):
-            data_even = [fill for _ in range(self.width // 8)]
-            data_odd  = [fill for _ in range(self.width // 8)]
-            if image is not None:
-                offset = y * self.width
-                even = image[offset + 1:offset + self.width:2]
-                odd  = image[offset    :offset + self.width:2]
-                for x, bit in enumerate(reversed(even)):
-                    if bit: data_even[x // 4] ^= 0b01_00_00_00 >> ((x % 4) * 2)
-                for x, bit in enumerate(odd):
-                    if bit: data_odd [x // 4] ^= 0b01_00_00_00 >> ((x % 4) * 2)
-
-            scan = [0x00 for _ in range(self.height // 4)]
-            scan[y // 4] |= 0xc0 >> ((y % 4) * 2)
-
-            await self._display_line(data_even + data_odd, scan,
-                delay_ms=time_ms if y == self.height - 1 else 0)
+        if rows is None:
+            rows = range(self.height)
+        else:
+            rows = sorted(rows)
+        if not rows:
+            return
+
+        # The entire frame is sent to the device in one write.
+        lines = self._encode_frame(fill, image)
+        async with self.lower.batch() as batch:
+            for y in rows:
+                scan = [0x00 for _ in range(self.height // 4)]
+                scan[y // 4] |= 0xc0 >> ((y % 4) * 2)
+
+                self._batch_line(batch, list(lines[y]), scan,
+                    delay_ms=time_ms if y == rows[-1] else 0)
 
     async def power_off(self):
         self._log("display nothing frame")
@@ -457,6 +509,25 @@ class DisplayPDIApplet(GlasgowApplet):
             "image_file", metavar="IMAGE-FILE", type=argparse.FileType("rb"), nargs="?",
             help="image file to display (format: pbm)")
 
+        parser.add_argument(
+            "--previous", metavar="IMAGE-FILE", type=argparse.FileType("rb"),
+            help="only update the rows that differ from the image in IMAGE-FILE, which must be "
+                 "the image currently displayed (format: pbm)")
+
+    @staticmethod
+    def _read_image(image_file, pdi_iface):
+        image_header = image_file.readline()
+        if image_header != b"P4\n":
+            raise GlasgowAppletError("image file is not a raw PBM file")
+        image_comment = image_file.readline()
+        image_size = re.match(rb"^(\d+) (\d+)$", image_file.readline())
+        if not image_size:
+            raise GlasgowAppletError("image file is corrupt")
+        image_width, image_height = int(image_size[1]), int(image_size[2])
+        if image_width != pdi_iface.width or image_height != pdi_iface.height:
+            raise GlasgowAppletError("image size does not match display size")
+        return bitarray(image_file.read())
+
     async def interact(self, device, args, pdi_iface):
         if args.checkerboard:
             image = bitarray(([0,0,1,1] * (pdi_iface.width // 2) +
@@ -464,26 +535,22 @@ class DisplayPDIApplet(GlasgowApplet):
                              * (pdi_iface.height // 4))
 
         if args.image_file:
-            image_header = args.image_file.readline()
-            if image_header != b"P4\n":
-                raise GlasgowAppletError("image file is not a raw PBM file")
-            image_comment = args.image_file.readline()
-            image_size = re.match(rb"^(\d+) (\d+)$", args.image_file.readline())
-            if not image_size:
-                raise GlasgowAppletError("image file is corrupt")
-            image_width, image_height = int(image_size[1]), int(image_size[2])
-            if image_width != pdi_iface.width or image_height != pdi_iface.height:
-                raise GlasgowAppletError("image size does not match display size")
-            image = bitarray(args.image_file.read())
+            image = self._read_image(args.image_file, pdi_iface)
+
+        rows = None
+        if args.previous:
+            rows = pdi_iface.changed_rows(self._read_image(args.previous, pdi_iface), image,
+                                          pdi_iface.width)
+            self.logger.info("updating %d rows out of %d", len(rows), pdi_iface.height)
 
         stage_ms = 300
 
         await pdi_iface.power_on()
         for _ in range(2):
-            await pdi_iface.display_frame(mode="black", time_ms=stage_ms)
-            await pdi_iface.display_frame(mode="white", time_ms=stage_ms)
-        await pdi_iface.display_frame(mode="white", time_ms=stage_ms, image=image)
-        await pdi_iface.display_frame(mode="white", time_ms=stage_ms, image=image)
+            await pdi_iface.display_frame(mode="black", time_ms=stage_ms, rows=rows)
+            await pdi_iface.display_frame(mode="white", time_ms=stage_ms, rows=rows)
+        await pdi_iface.display_frame(mode="white", time_ms=stage_ms, image=image, rows=rows)
+        await pdi_iface.display_frame(mode="white", time_ms=stage_ms, image=image, rows=rows)
         await pdi_iface.power_off()
 
     @classmethod
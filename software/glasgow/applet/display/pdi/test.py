@@ -1,5 +1,102 @@
+import asyncio
+import logging
+import unittest
+
+from glasgow.support.bits import bitarray
 from ... import *
-from . import DisplayPDIApplet
+from ...interface.spi_controller import SPIControllerInterface
+from . import PDIG1DisplayInterface, DisplayPDIApplet
+
+
+class _MockDemultiplexerInterface:
+    def __init__(self):
+        self.data   = bytearray()
+        self.writes = 0
+
+    async def write(self, data):
+        self.data.extend(data)
+        self.writes += 1
+
+    async def flush(self, wait=True):
+        pass
+
+
+class PDIG1DisplayInterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger(__name__)
+
+    def make_iface(self):
+        lower = _MockDemultiplexerInterface()
+        iface = PDIG1DisplayInterface(SPIControllerInterface(lower, self.logger), device=None,
+            logger=self.logger, addr_cog_power=0, addr_cog_disch=1, addr_cog_reset=2,
+            addr_cog_pwmen=3, epd_size="2")
+        return lower, iface
+
+    @staticmethod
+    def make_image(iface, seed=1):
+        bits = []
+        for _ in range(iface.width * iface.height):
+            seed = (seed * 1103515245 + 12345) & 0x7fffffff
+            bits.append((seed >> 16) & 1)
+        return bitarray(bits)
+
+    async def reference_frame(self, iface, fill, time_ms, image, rows):
+        # The straightforward per-pixel encoding of a frame.
+        for y in rows:
+            data_even = [fill for _ in range(iface.width // 8)]
+            data_odd  = [fill for _ in range(iface.width // 8)]
+            if image is not None:
+                offset = y * iface.width
+                even = image[offset + 1:offset + iface.width:2]
+                odd  = image[offset    :offset + iface.width:2]
+                for x, bit in enumerate(reversed(even)):
+                    if bit: data_even[x // 4] ^= 0b01_00_00_00 >> ((x % 4) * 2)
+                for x, bit in enumerate(odd):
+                    if bit: data_odd [x // 4] ^= 0b01_00_00_00 >> ((x % 4) * 2)
+
+            scan = [0x00 for _ in range(iface.height // 4)]
+            scan[y // 4] |= 0xc0 >> ((y % 4) * 2)
+
+            await iface._display_line(data_even + data_odd, scan,
+                delay_ms=time_ms if y == rows[-1] else 0)
+
+    def check_frame(self, mode, fill, image=None, rows=None):
+        async def case():
+            actual, iface = self.make_iface()
+            await iface.display_frame(mode, time_ms=300, image=image, rows=rows)
+            self.assertEqual(actual.writes, 1)
+            expected, iface = self.make_iface()
+            await self.reference_frame(iface, fill, 300, image,
+                sorted(rows) if rows is not None else range(iface.height))
+            self.assertEqual(actual.data, expected.data)
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_frame_fill(self):
+        self.check_frame("black", 0b11_11_11_11)
+
+    def test_frame_image(self):
+        _, iface = self.make_iface()
+        self.check_frame("white", 0b10_10_10_10, self.make_image(iface))
+
+    def test_frame_rows(self):
+        _, iface = self.make_iface()
+        self.check_frame("white", 0b10_10_10_10, self.make_image(iface), rows={50, 3, 4})
+
+    def test_frame_no_rows(self):
+        async def case():
+            lower, iface = self.make_iface()
+            await iface.display_frame("white", time_ms=300, rows=set())
+            self.assertEqual(lower.data, b"")
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_changed_rows(self):
+        _, iface = self.make_iface()
+        old_image = self.make_image(iface)
+        new_image = bitarray(list(old_image))
+        new_image[5 * iface.width + 17] = not new_image[5 * iface.width + 17]
+        new_image[90 * iface.width] = not new_image[90 * iface.width]
+        self.assertEqual(iface.changed_rows(old_image, new_image, iface.width), {5, 90})
+        self.assertEqual(iface.changed_rows(old_image, old_image, iface.width), set())
 
 
 class DisplayPDIAppletTestCase(GlasgowAppletTestCase, applet=DisplayPDIApplet):
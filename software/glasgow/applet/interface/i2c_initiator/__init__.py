@@ -3,6 +3,7 @@ import logging
 import math
 from amaranth import *
 
+from ....support.logging import *
 from ....gateware.i2c import I2CInitiator
 from ... import *
 
@@ -165,10 +166,10 @@ class I2CInitiatorInterface:
 
         if stop:
             self._logger.log(self._level, "I2C: start addr=%s write=<%s> stop",
-                             bin(addr), data.hex())
+                             bin(addr), dump_hex(data))
         else:
             self._logger.log(self._level, "I2C: start addr=%s write=<%s>",
-                             bin(addr), data.hex())
+                             bin(addr), dump_hex(data))
 
         await self._cmd_start()
         await self._cmd_count(1 + len(data))
@@ -205,7 +206,7 @@ class I2CInitiatorInterface:
         unacked, = await self._data_read(1)
         data = await self._data_read(size)
         if unacked == 0:
-            self._logger.log(self._level, "I2C: acked data=<%s>", data.hex())
+            self._logger.log(self._level, "I2C: acked data=<%s>", dump_hex(data))
             return data
         else:
             self._logger.log(self._level, "I2C: unacked")
@@ -21,7 +21,9 @@
 
 import struct
 import logging
+import asyncio
 import argparse
+import collections
 import enum
 from amaranth import *
 from amaranth.lib import io, cdc
@@ -165,6 +167,8 @@ BIT_DATA_IN    =     0b0010
 BIT_LAST       =     0b0100
 # CMD_SHIFT_TMS
 BIT_TDI        =     0b1000
+# CMD_SHIFT_TDIO
+BIT_CHECK      =     0b1000
 
 
 class JTAGProbeDriver(Elaboratable):
@@ -182,6 +186,23 @@ class JTAGProbeDriver(Elaboratable):
         shreg_o = Signal(8)
         shreg_i = Signal(8)
 
+        # With BIT_CHECK, every captured byte is compared with an expected byte under a mask
+        # instead of (or in addition to) being sent to the host, and once the shift is complete,
+        # the result of the comparison and the offset of the first mismatched bit are sent.
+        check       = Signal()
+        check_data  = Signal(8)
+        check_exp   = Signal(8)
+        check_mask  = Signal(8)
+        check_diff  = Signal(8)
+        check_fail  = Signal()
+        check_byte  = Signal(13)
+        check_index = Signal(16)
+        m.d.comb += [
+            check.eq(((cmd & CMD_MASK) == CMD_SHIFT_TDIO) & ((cmd & BIT_CHECK) != 0)),
+            check_data.eq(Mux(count == 0, shreg_i >> align, shreg_i)),
+            check_diff.eq((check_data ^ check_exp) & check_mask),
+        ]
+
         with m.FSM() as fsm:
             with m.State("RECV-COMMAND"):
                 m.d.comb += self._in_fifo.flush.eq(1)
@@ -214,6 +235,11 @@ class JTAGProbeDriver(Elaboratable):
                     m.next = "RECV-COMMAND"
 
             with m.State("RECV-COUNT-1"):
+                m.d.sync += [
+                    check_fail.eq(0),
+                    check_byte.eq(0),
+                    check_index.eq(0),
+                ]
                 with m.If(self._out_fifo.r_rdy):
                     m.d.comb += self._out_fifo.r_en.eq(1)
                     m.d.sync += count[0:8].eq(self._out_fifo.r_data)
@@ -227,7 +253,10 @@ class JTAGProbeDriver(Elaboratable):
 
             with m.State("RECV-BITS"):
                 with m.If(count == 0):
-                    m.next = "RECV-COMMAND"
+                    with m.If(check):
+                        m.next = "SEND-CHECK-RESULT"
+                    with m.Else():
+                        m.next = "RECV-COMMAND"
                 with m.Else():
                     with m.If(count > 8):
                         m.d.sync += bitno.eq(0)
@@ -240,10 +269,28 @@ class JTAGProbeDriver(Elaboratable):
                         with m.If(self._out_fifo.r_rdy):
                             m.d.comb += self._out_fifo.r_en.eq(1)
                             m.d.sync += shreg_o.eq(self._out_fifo.r_data)
-                            m.next = "SHIFT-SETUP"
+                            with m.If(check):
+                                m.next = "RECV-CHECK-EXP"
+                            with m.Else():
+                                m.next = "SHIFT-SETUP"
                     with m.Else():
                         m.d.sync += shreg_o.eq(0b11111111)
-                        m.next = "SHIFT-SETUP"
+                        with m.If(check):
+                            m.next = "RECV-CHECK-EXP"
+                        with m.Else():
+                            m.next = "SHIFT-SETUP"
+
+            with m.State("RECV-CHECK-EXP"):
+                with m.If(self._out_fifo.r_rdy):
+                    m.d.comb += self._out_fifo.r_en.eq(1)
+                    m.d.sync += check_exp.eq(self._out_fifo.r_data)
+                    m.next = "RECV-CHECK-MASK"
+
+            with m.State("RECV-CHECK-MASK"):
+                with m.If(self._out_fifo.r_rdy):
+                    m.d.comb += self._out_fifo.r_en.eq(1)
+                    m.d.sync += check_mask.eq(self._out_fifo.r_data)
+                    m.next = "SHIFT-SETUP"
 
             with m.State("SHIFT-SETUP"):
                 m.d.sync += self.adapter.stb.eq(1)
@@ -267,10 +314,23 @@ class JTAGProbeDriver(Elaboratable):
                 with m.If(self.adapter.rdy):
                     m.d.sync += shreg_i.eq(Cat(shreg_i[1:], self.adapter.tdo))
                     with m.If(bitno == 0):
-                        m.next = "SEND-BITS"
+                        with m.If(check):
+                            m.next = "CHECK-BITS"
+                        with m.Else():
+                            m.next = "SEND-BITS"
                     with m.Else():
                         m.next = "SHIFT-SETUP"
 
+            with m.State("CHECK-BITS"):
+                with m.If((check_diff != 0) & ~check_fail):
+                    m.d.sync += check_fail.eq(1)
+                    # The last assignment takes priority, so the lowest mismatched bit wins.
+                    for bit in reversed(range(8)):
+                        with m.If(check_diff[bit]):
+                            m.d.sync += check_index.eq(Cat(C(bit, 3), check_byte))
+                m.d.sync += check_byte.eq(check_byte + 1)
+                m.next = "SEND-BITS"
+
             with m.State("SEND-BITS"):
                 with m.If(cmd & BIT_DATA_IN):
                     with m.If(self._in_fifo.w_rdy):
@@ -283,6 +343,30 @@ class JTAGProbeDriver(Elaboratable):
                 with m.Else():
                     m.next = "RECV-BITS"
 
+            with m.State("SEND-CHECK-RESULT"):
+                with m.If(self._in_fifo.w_rdy):
+                    m.d.comb += [
+                        self._in_fifo.w_en.eq(1),
+                        self._in_fifo.w_data.eq(check_fail),
+                    ]
+                    m.next = "SEND-CHECK-INDEX-1"
+
+            with m.State("SEND-CHECK-INDEX-1"):
+                with m.If(self._in_fifo.w_rdy):
+                    m.d.comb += [
+                        self._in_fifo.w_en.eq(1),
+                        self._in_fifo.w_data.eq(check_index[0:8]),
+                    ]
+                    m.next = "SEND-CHECK-INDEX-2"
+
+            with m.State("SEND-CHECK-INDEX-2"):
+                with m.If(self._in_fifo.w_rdy):
+                    m.d.comb += [
+                        self._in_fifo.w_en.eq(1),
+                        self._in_fifo.w_data.eq(check_index[8:16]),
+                    ]
+                    m.next = "RECV-COMMAND"
+
         return m
 
 
@@ -312,6 +396,166 @@ class JTAGProbeStateTransitionError(JTAGProbeError):
         self.new_state = new_state
 
 
+class JTAGProbeDeferredResult:
+    """TDO data of a scan that has been submitted but not yet read back.
+
+    Awaiting the deferred result reads back the TDO data of this scan together with that of every
+    scan deferred before it, and returns the captured bits. This makes it possible to queue many
+    scans without waiting for a round trip after each of them, and to check the results later.
+
+    For a scan whose TDO data is compared with an expected value by the probe, the result is
+    ``None`` if it matched, or the offset of the first mismatched bit otherwise.
+    """
+
+    def __init__(self, iface, counts=(), *, check=False):
+        self._iface  = iface
+        self._counts = counts
+        self._check  = check
+        self._done   = not counts
+        self._value  = None if check else bits()
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        assert self._done, "deferred result has not been read back yet"
+        return self._value
+
+    def __await__(self):
+        return self._iface._read_deferred(until=self).__await__()
+
+
+class JTAGProbeBatch:
+    """Sequence of JTAG operations submitted to the probe at once.
+
+    Scans, TMS paths and Run-Test/Idle cycles are recorded by the methods of the batch, which
+    mirror the methods of :class:`JTAGProbeInterface`, and are only sent when the batch is
+    submitted. The commands are written as a single OUT stream, after which the TDO data of every
+    capturing scan is read back; the futures returned for these scans are resolved with it.
+
+    A capturing scan may be given an ``expected`` value, and optionally a ``mask`` value (by
+    default, all bits); if the captured data differs from ``expected`` in any bit set in ``mask``,
+    :meth:`submit` raises :class:`JTAGProbeError` once every future has been resolved. The
+    :meth:`check_ir` and :meth:`check_dr` scans perform the same comparison in the probe, and
+    resolve to the offset of the first mismatched bit (or ``None``) instead of the captured data.
+    """
+
+    def __init__(self, iface):
+        self._iface = iface
+        self._ops   = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def _record(self, method, *args, capture=False, expected=None, mask=None, probe_check=False,
+                **kwargs):
+        if capture:
+            future = asyncio.get_running_loop().create_future()
+        else:
+            assert expected is None and mask is None
+            future = None
+        if probe_check:
+            check = "probe"
+        elif expected is not None:
+            check = (bits(expected), None if mask is None else bits(mask))
+        else:
+            assert mask is None, "a mask may only be given together with an expected value"
+            check = None
+        self._ops.append((method, args, kwargs, future, check))
+        return future
+
+    def set_aux(self, value):
+        self._record(self._iface.set_aux, value)
+
+    def shift_tms(self, tms_bits, tdi=False):
+        self._record(self._iface.shift_tms, tms_bits, tdi)
+
+    def traverse_state_path(self, path):
+        self._record(self._iface.traverse_state_path, path)
+
+    def test_reset(self):
+        self._record(self._iface.test_reset)
+
+    def run_test_idle(self, count):
+        self._record(self._iface.run_test_idle, count)
+
+    def write_ir(self, data, *, prefix=0, suffix=0, elide=True):
+        self._record(self._iface.write_ir, data, prefix=prefix, suffix=suffix, elide=elide)
+
+    def exchange_ir(self, data, *, prefix=0, suffix=0, expected=None, mask=None):
+        return self._record(self._iface.exchange_ir, data, prefix=prefix, suffix=suffix,
+                            defer=True, capture=True, expected=expected, mask=mask)
+
+    def check_ir(self, data, expected, mask=None, *, prefix=0, suffix=0):
+        return self._record(self._iface.check_ir, data, expected, mask,
+                            prefix=prefix, suffix=suffix, defer=True, capture=True,
+                            probe_check=True)
+
+    def read_ir(self, count, *, prefix=0, suffix=0, expected=None, mask=None):
+        return self._record(self._iface.read_ir, count, prefix=prefix, suffix=suffix,
+                            defer=True, capture=True, expected=expected, mask=mask)
+
+    def write_dr(self, data, *, prefix=0, suffix=0):
+        self._record(self._iface.write_dr, data, prefix=prefix, suffix=suffix)
+
+    def exchange_dr(self, data, *, prefix=0, suffix=0, expected=None, mask=None):
+        return self._record(self._iface.exchange_dr, data, prefix=prefix, suffix=suffix,
+                            defer=True, capture=True, expected=expected, mask=mask)
+
+    def check_dr(self, data, expected, mask=None, *, prefix=0, suffix=0):
+        return self._record(self._iface.check_dr, data, expected, mask,
+                            prefix=prefix, suffix=suffix, defer=True, capture=True,
+                            probe_check=True)
+
+    def read_dr(self, count, *, prefix=0, suffix=0, expected=None, mask=None):
+        return self._record(self._iface.read_dr, count, prefix=prefix, suffix=suffix,
+                            defer=True, capture=True, expected=expected, mask=mask)
+
+    async def submit(self):
+        ops, self._ops = self._ops, []
+        self._iface._log_h("batch submit ops=%d", len(ops))
+        scans = []
+        try:
+            for method, args, kwargs, future, check in ops:
+                deferred = await method(*args, **kwargs)
+                if future is not None:
+                    scans.append((deferred, future, check))
+
+            failures = []
+            for index, (deferred, future, check) in enumerate(scans):
+                data = await deferred
+                future.set_result(data)
+                if check == "probe":
+                    if data is not None:
+                        failures.append("batch scan #{} mismatched at bit {}"
+                                        .format(index, data))
+                elif check is not None:
+                    expected, mask = check
+                    if mask is None:
+                        mask = bits((1,)) * len(data)
+                    if (data.to_int() ^ expected.to_int()) & mask.to_int():
+                        failures.append("batch scan #{} captured <{}>, expected <{}> "
+                                        "with mask <{}>"
+                                        .format(index, dump_bin(data), dump_bin(expected),
+                                                dump_bin(mask)))
+        finally:
+            for _, _, _, future, _ in ops:
+                if future is not None and not future.done():
+                    future.cancel()
+
+        if failures:
+            raise JTAGProbeError("{} ({} of {} checked scans failed)"
+                                 .format(failures[0], len(failures),
+                                         sum(check is not None for _, _, check in scans)))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.submit()
+
+
 class JTAGProbeInterface:
     scan_ir_max_length = 128
     scan_dr_max_length = 1024
@@ -324,12 +568,18 @@ class JTAGProbeInterface:
         self.has_trst    = has_trst
         self._state      = JTAGState.UNKNOWN
         self._current_ir = None
+        self._deferred   = collections.deque()
 
+    # Arguments that are expensive to format are passed lazily (e.g. `dump_bin`), and these only
+    # build the message if it will be logged (`isEnabledFor` is cached by the logger until its
+    # level changes), so that hot paths can call them unconditionally.
     def _log_l(self, message, *args):
-        self._logger.log(self._level, "JTAG-L: " + message, *args)
+        if self._logger.isEnabledFor(self._level):
+            self._logger.log(self._level, "JTAG-L: " + message, *args)
 
     def _log_h(self, message, *args):
-        self._logger.log(self._level, "JTAG-H: " + message, *args)
+        if self._logger.isEnabledFor(self._level):
+            self._logger.log(self._level, "JTAG-H: " + message, *args)
 
     # Low-level operations
 
@@ -337,12 +587,50 @@ class JTAGProbeInterface:
         self._log_l("flush")
         await self.lower.flush()
 
+    def _defer(self, counts, *, check=False):
+        deferred = JTAGProbeDeferredResult(self, counts, check=check)
+        if not deferred.done():
+            self._deferred.append(deferred)
+        return deferred
+
+    async def _read_deferred(self, until=None):
+        # The IN FIFO returns data in the order in which the commands were submitted, so all of
+        # the deferred scans must be read back (in order) before any data submitted after them.
+        while self._deferred and not (until is not None and until.done()):
+            deferred = self._deferred.popleft()
+            if deferred._check:
+                offset, mismatch = 0, None
+                for count in deferred._counts:
+                    failed, index = struct.unpack("<BH", await self.lower.read(3))
+                    if failed and mismatch is None:
+                        mismatch = offset + index
+                    offset += count
+                deferred._value = mismatch
+            else:
+                tdo_bits = bits()
+                for count in deferred._counts:
+                    tdo_bytes = await self.lower.read((count + 7) // 8)
+                    tdo_bits += bits(tdo_bytes, count)
+                deferred._value = tdo_bits
+            deferred._done  = True
+        if until is not None:
+            return until.result()
+
+    def batch(self):
+        """Start recording a :class:`JTAGProbeBatch` of operations.
+
+        The batch may be used as an asynchronous context manager, in which case it is submitted
+        on exit.
+        """
+        return JTAGProbeBatch(self)
+
     async def set_aux(self, value):
         self._log_l("set aux=%s", format(value, "08b"))
         await self.lower.write(struct.pack("<BB",
             CMD_SET_AUX, value))
 
     async def get_aux(self):
+        await self._read_deferred()
         await self.lower.write(struct.pack("<B",
             CMD_GET_AUX))
         value, = await self.lower.read(1)
@@ -396,23 +684,25 @@ class JTAGProbeInterface:
             await self.lower.write(struct.pack("<BH",
                 CMD_SHIFT_TDIO|(BIT_LAST if chunk_last else 0), count))
 
-    async def shift_tdio(self, tdi_bits, *, prefix=0, suffix=0, last=True):
+    async def shift_tdio(self, tdi_bits, *, prefix=0, suffix=0, last=True, defer=False):
         assert self._state in (JTAGState.IRSHIFT, JTAGState.DRSHIFT)
         tdi_bits = bits(tdi_bits)
-        tdo_bits = bits()
+        counts   = []
         self._log_l("shift tdio-i=%d,<%s>,%d", prefix, dump_bin(tdi_bits), suffix)
         await self._shift_dummy(prefix)
         for tdi_bits, chunk_last in self._chunk_bits(tdi_bits, last and suffix == 0):
             await self.lower.write(struct.pack("<BH",
                 CMD_SHIFT_TDIO|BIT_DATA_IN|BIT_DATA_OUT|(BIT_LAST if chunk_last else 0),
                 len(tdi_bits)))
-            tdi_bytes = bytes(tdi_bits)
-            await self.lower.write(tdi_bytes)
-            tdo_bytes = await self.lower.read(len(tdi_bytes))
-            tdo_bits += bits(tdo_bytes, len(tdi_bits))
+            await self.lower.write(bytes(tdi_bits))
+            counts.append(len(tdi_bits))
         await self._shift_dummy(suffix, last)
-        self._log_l("shift tdio-o=%d,<%s>,%d", prefix, dump_bin(tdo_bits), suffix)
         self._shift_last(last)
+        deferred = self._defer(counts)
+        if defer:
+            return deferred
+        tdo_bits = await deferred
+        self._log_l("shift tdio-o=%d,<%s>,%d", prefix, dump_bin(tdo_bits), suffix)
         return tdo_bits
 
     async def shift_tdi(self, tdi_bits, *, prefix=0, suffix=0, last=True):
@@ -429,21 +719,67 @@ class JTAGProbeInterface:
         await self._shift_dummy(suffix, last)
         self._shift_last(last)
 
-    async def shift_tdo(self, count, *, prefix=0, suffix=0, last=True):
+    async def shift_tdo(self, count, *, prefix=0, suffix=0, last=True, defer=False):
         assert self._state in (JTAGState.IRSHIFT, JTAGState.DRSHIFT)
-        tdo_bits = bits()
+        counts = []
         await self._shift_dummy(prefix)
         for count, chunk_last in self._chunk_count(count, last and suffix == 0):
             await self.lower.write(struct.pack("<BH",
                 CMD_SHIFT_TDIO|BIT_DATA_IN|(BIT_LAST if chunk_last else 0),
                 count))
-            tdo_bytes = await self.lower.read((count + 7) // 8)
-            tdo_bits += bits(tdo_bytes, count)
+            counts.append(count)
         await self._shift_dummy(suffix, last)
-        self._log_l("shift tdo=%d,<%s>,%d", prefix, dump_bin(tdo_bits), suffix)
         self._shift_last(last)
+        deferred = self._defer(counts)
+        if defer:
+            return deferred
+        tdo_bits = await deferred
+        self._log_l("shift tdo=%d,<%s>,%d", prefix, dump_bin(tdo_bits), suffix)
         return tdo_bits
 
+    async def shift_tdio_check(self, tdi_bits, tdo_bits, tdo_mask=None, *,
+                               prefix=0, suffix=0, last=True, defer=False):
+        """Shift ``tdi_bits`` and compare the captured TDO bits with ``tdo_bits`` in the probe.
+
+        Only the bits set in ``tdo_mask`` (by default, all bits) are compared, and the TDO data
+        is not sent back. Returns ``None`` if the comparison succeeded, or the offset of the first
+        mismatched bit otherwise.
+        """
+        assert self._state in (JTAGState.IRSHIFT, JTAGState.DRSHIFT)
+        tdi_bits = bits(tdi_bits)
+        tdo_bits = bits(tdo_bits)
+        tdo_mask = bits((1,)) * len(tdi_bits) if tdo_mask is None else bits(tdo_mask)
+        assert len(tdi_bits) == len(tdo_bits) == len(tdo_mask)
+        counts   = []
+        self._log_l("shift tdio-i=%d,<%s>,%d check tdo=<%s> mask=<%s>", prefix,
+                    dump_bin(tdi_bits), suffix, dump_bin(tdo_bits), dump_bin(tdo_mask))
+        await self._shift_dummy(prefix)
+        offset   = 0
+        for tdi_chunk, chunk_last in self._chunk_bits(tdi_bits, last and suffix == 0):
+            count = len(tdi_chunk)
+            # Each byte of TDI data is followed by the corresponding expected TDO and mask bytes.
+            chunk = bytearray(3 * ((count + 7) // 8))
+            chunk[0::3] = bytes(tdi_chunk)
+            chunk[1::3] = bytes(tdo_bits[offset:offset + count])
+            chunk[2::3] = bytes(tdo_mask[offset:offset + count])
+            await self.lower.write(struct.pack("<BH",
+                CMD_SHIFT_TDIO|BIT_CHECK|BIT_DATA_OUT|(BIT_LAST if chunk_last else 0),
+                count))
+            await self.lower.write(chunk)
+            counts.append(count)
+            offset += count
+        await self._shift_dummy(suffix, last)
+        self._shift_last(last)
+        deferred = self._defer(counts, check=True)
+        if defer:
+            return deferred
+        mismatch = await deferred
+        if mismatch is None:
+            self._log_l("shift tdio-o check pass")
+        else:
+            self._log_l("shift tdio-o check fail offset=%d", mismatch)
+        return mismatch
+
     async def pulse_tck(self, count):
         assert self._state in (JTAGState.IDLE, JTAGState.IRPAUSE, JTAGState.DRPAUSE)
         self._log_l("pulse tck count=%d", count)
@@ -600,7 +936,8 @@ class JTAGProbeInterface:
     async def traverse_state_path(self, path):
         if not path:
             return
-        self._log_l(f"state {self._state.value} → {' → '.join(s.value for s in path)}")
+        self._log_l("state %s → %s", self._state.value,
+                    dump_mapseq(" → ", lambda state: state.value, path))
         state = self._state
         bits = []
         for target in path:
@@ -637,29 +974,53 @@ class JTAGProbeInterface:
         await self.enter_run_test_idle()
         await self.pulse_tck(count)
 
-    async def exchange_ir(self, data, *, prefix=0, suffix=0):
+    async def exchange_ir(self, data, *, prefix=0, suffix=0, defer=False):
         data = bits(data)
         self._current_ir = (prefix, data, suffix)
         self._log_h("exchange ir-i=%d,<%s>,%d", prefix, dump_bin(data), suffix)
         if not data:
             await self.enter_capture_ir()
-            data = bits()
+            data = JTAGProbeDeferredResult(self)
         else:
             await self.enter_shift_ir()
-            data = await self.shift_tdio(data, prefix=prefix, suffix=suffix)
+            data = await self.shift_tdio(data, prefix=prefix, suffix=suffix, defer=True)
         await self.enter_update_ir()
+        if defer:
+            return data
+        data = await data
         self._log_h("exchange ir-o=%d,<%s>,%d", prefix, dump_bin(data), suffix)
         return data
 
-    async def read_ir(self, count, *, prefix=0, suffix=0):
+    async def check_ir(self, data, expected, mask=None, *, prefix=0, suffix=0, defer=False):
+        data = bits(data)
+        self._current_ir = (prefix, data, suffix)
+        self._log_h("check ir-i=%d,<%s>,%d", prefix, dump_bin(data), suffix)
+        if not data:
+            await self.enter_capture_ir()
+            mismatch = JTAGProbeDeferredResult(self, check=True)
+        else:
+            await self.enter_shift_ir()
+            mismatch = await self.shift_tdio_check(data, expected, mask,
+                                                   prefix=prefix, suffix=suffix, defer=True)
+        await self.enter_update_ir()
+        if defer:
+            return mismatch
+        mismatch = await mismatch
+        self._log_h("check ir-o mismatch=%s", mismatch)
+        return mismatch
+
+    async def read_ir(self, count, *, prefix=0, suffix=0, defer=False):
         self._current_ir = (prefix, bits((1,)) * count, suffix)
         if not count:
             await self.enter_capture_ir()
-            data = bits()
+            data = JTAGProbeDeferredResult(self)
         else:
             await self.enter_shift_ir()
-            data = await self.shift_tdo(count, prefix=prefix, suffix=suffix)
+            data = await self.shift_tdo(count, prefix=prefix, suffix=suffix, defer=True)
         await self.enter_update_ir()
+        if defer:
+            return data
+        data = await data
         self._log_h("read ir=%d,<%s>,%d", prefix, dump_bin(data), suffix)
         return data
 
@@ -677,26 +1038,48 @@ class JTAGProbeInterface:
             await self.shift_tdi(data, prefix=prefix, suffix=suffix)
         await self.enter_update_ir()
 
-    async def exchange_dr(self, data, *, prefix=0, suffix=0):
+    async def exchange_dr(self, data, *, prefix=0, suffix=0, defer=False):
         self._log_h("exchange dr-i=%d,<%s>,%d", prefix, dump_bin(data), suffix)
         if not data:
             await self.enter_capture_dr()
-            data = bits()
+            data = JTAGProbeDeferredResult(self)
         else:
             await self.enter_shift_dr()
-            data = await self.shift_tdio(data, prefix=prefix, suffix=suffix)
+            data = await self.shift_tdio(data, prefix=prefix, suffix=suffix, defer=True)
         await self.enter_update_dr()
+        if defer:
+            return data
+        data = await data
         self._log_h("exchange dr-o=%d,<%s>,%d", prefix, dump_bin(data), suffix)
         return data
 
-    async def read_dr(self, count, *, prefix=0, suffix=0):
+    async def check_dr(self, data, expected, mask=None, *, prefix=0, suffix=0, defer=False):
+        self._log_h("check dr-i=%d,<%s>,%d", prefix, dump_bin(data), suffix)
+        if not data:
+            await self.enter_capture_dr()
+            mismatch = JTAGProbeDeferredResult(self, check=True)
+        else:
+            await self.enter_shift_dr()
+            mismatch = await self.shift_tdio_check(data, expected, mask,
+                                                   prefix=prefix, suffix=suffix, defer=True)
+        await self.enter_update_dr()
+        if defer:
+            return mismatch
+        mismatch = await mismatch
+        self._log_h("check dr-o mismatch=%s", mismatch)
+        return mismatch
+
+    async def read_dr(self, count, *, prefix=0, suffix=0, defer=False):
         if not count:
             await self.enter_capture_dr()
-            data = bits()
+            data = JTAGProbeDeferredResult(self)
         else:
             await self.enter_shift_dr()
-            data = await self.shift_tdo(count, prefix=prefix, suffix=suffix)
+            data = await self.shift_tdo(count, prefix=prefix, suffix=suffix, defer=True)
         await self.enter_update_dr()
+        if defer:
+            return data
+        data = await data
         self._log_h("read dr=%d,<%s>,%d", prefix, dump_bin(data), suffix)
         return data
 
@@ -941,14 +1324,20 @@ class TAPInterface:
     async def run_test_idle(self, count):
         await self.lower.run_test_idle(count)
 
-    async def exchange_ir(self, data):
+    async def exchange_ir(self, data, *, defer=False):
         data = bits(data)
         assert len(data) == self.ir_length
-        return await self.lower.exchange_ir(data,
+        return await self.lower.exchange_ir(data, defer=defer,
             prefix=self._ir_prefix, suffix=self._ir_suffix)
 
-    async def read_ir(self):
-        return await self.lower.read_ir(self.ir_length,
+    async def check_ir(self, data, expected, mask=None, *, defer=False):
+        data = bits(data)
+        assert len(data) == self.ir_length
+        return await self.lower.check_ir(data, expected, mask, defer=defer,
+            prefix=self._ir_prefix, suffix=self._ir_suffix)
+
+    async def read_ir(self, *, defer=False):
+        return await self.lower.read_ir(self.ir_length, defer=defer,
             prefix=self._ir_prefix, suffix=self._ir_suffix)
 
     async def write_ir(self, data, *, elide=True):
@@ -957,12 +1346,16 @@ class TAPInterface:
         await self.lower.write_ir(data, elide=elide,
             prefix=self._ir_prefix, suffix=self._ir_suffix)
 
-    async def exchange_dr(self, data):
-        return await self.lower.exchange_dr(data,
+    async def exchange_dr(self, data, *, defer=False):
+        return await self.lower.exchange_dr(data, defer=defer,
+            prefix=self._dr_prefix, suffix=self._dr_suffix)
+
+    async def check_dr(self, data, expected, mask=None, *, defer=False):
+        return await self.lower.check_dr(data, expected, mask, defer=defer,
             prefix=self._dr_prefix, suffix=self._dr_suffix)
 
-    async def read_dr(self, length):
-        return await self.lower.read_dr(length,
+    async def read_dr(self, length, *, defer=False):
+        return await self.lower.read_dr(length, defer=defer,
             prefix=self._dr_prefix, suffix=self._dr_suffix)
 
     async def write_dr(self, data):
@@ -1,8 +1,28 @@
+import types
+import asyncio
 import unittest
+from amaranth import *
 
 from ....support.bits import *
 from ... import *
-from . import JTAGProbeApplet, JTAGProbeInterface, JTAGProbeError
+from . import JTAGProbeApplet, JTAGProbeInterface, JTAGProbeError, JTAGState
+
+
+class MockJTAGProbeDeferredResult:
+    """Stand-in for a :class:`JTAGProbeDeferredResult` that has already been read back, for use
+    in models of targets that replace :class:`JTAGProbeInterface` in tests."""
+    def __init__(self, value):
+        self._value = value
+
+    def done(self):
+        return True
+
+    def result(self):
+        return self._value
+
+    def __await__(self):
+        return self._value
+        yield
 
 
 class JTAGInterrogationTestCase(unittest.TestCase):
@@ -125,7 +145,192 @@ class JTAGInterrogationTestCase(unittest.TestCase):
                          [3, 5])
 
 
+class JTAGDeferredScanTestCase(unittest.TestCase):
+    class MockInterface:
+        def __init__(self, data):
+            self.data  = bytearray(data)
+            self.reads = []
+
+        async def write(self, data):
+            pass
+
+        async def read(self, length):
+            self.reads.append(length)
+            data, self.data = self.data[:length], self.data[length:]
+            return data
+
+    def setUp(self):
+        self.lower = self.MockInterface(b"\x01\x02\x03")
+        self.iface = JTAGProbeInterface(interface=self.lower, logger=JTAGProbeApplet.logger)
+
+    def test_deferred(self):
+        async def case():
+            await self.iface.test_reset()
+            res_1 = await self.iface.read_dr(8, defer=True)
+            res_2 = await self.iface.exchange_dr(bits(0, 8), defer=True)
+            self.assertFalse(res_1.done())
+            self.assertFalse(res_2.done())
+            self.assertEqual(self.lower.reads, [])
+            self.assertEqual(await res_2, bits(0x02, 8))
+            self.assertTrue(res_1.done())
+            self.assertEqual(res_1.result(), bits(0x01, 8))
+            self.assertEqual(await res_1, bits(0x01, 8))
+            self.assertEqual(self.lower.reads, [1, 1])
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_deferred_drain(self):
+        async def case():
+            await self.iface.test_reset()
+            res_1 = await self.iface.read_dr(8, defer=True)
+            res_2 = await self.iface.read_dr(8, defer=True)
+            self.assertEqual(await self.iface.read_dr(8), bits(0x03, 8))
+            self.assertEqual(res_1.result(), bits(0x01, 8))
+            self.assertEqual(res_2.result(), bits(0x02, 8))
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_deferred_empty(self):
+        async def case():
+            await self.iface.test_reset()
+            res = await self.iface.read_dr(0, defer=True)
+            self.assertTrue(res.done())
+            self.assertEqual(await res, bits())
+        asyncio.get_event_loop().run_until_complete(case())
+
+
+class JTAGBatchTestCase(unittest.TestCase):
+    class MockInterface:
+        def __init__(self, data):
+            self.data = bytearray(data)
+            self.log  = []
+
+        async def write(self, data):
+            if not self.log or self.log[-1] != "write":
+                self.log.append("write")
+
+        async def read(self, length):
+            self.log.append(length)
+            data, self.data = self.data[:length], self.data[length:]
+            return data
+
+    def setUp(self):
+        self.lower = self.MockInterface(b"\x05\xa5\x5a")
+        self.iface = JTAGProbeInterface(interface=self.lower, logger=JTAGProbeApplet.logger)
+
+    def test_batch(self):
+        async def case():
+            batch = self.iface.batch()
+            batch.test_reset()
+            ir = batch.exchange_ir(bits(0b0010, 4))
+            batch.run_test_idle(10)
+            dr_1 = batch.read_dr(8)
+            batch.write_dr(bits(0, 8))
+            dr_2 = batch.exchange_dr(bits(0xff, 8))
+            self.assertEqual(len(batch), 6)
+            self.assertEqual(self.lower.log, [])
+            await batch.submit()
+            self.assertEqual(self.lower.log, ["write", 1, 1, 1])
+            self.assertEqual(ir.result(), bits(0b0101, 4))
+            self.assertEqual(dr_1.result(), bits(0xa5, 8))
+            self.assertEqual(dr_2.result(), bits(0x5a, 8))
+            self.assertEqual(self.iface.get_state(), JTAGState.DRUPDATE)
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_batch_context(self):
+        async def case():
+            async with self.iface.batch() as batch:
+                batch.test_reset()
+                ir = batch.read_ir(4)
+            self.assertEqual(ir.result(), bits(0b0101, 4))
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_batch_compare(self):
+        async def case():
+            batch = self.iface.batch()
+            batch.test_reset()
+            batch.read_ir(4, expected=bits(0b0001, 4), mask=bits(0b0011, 4))
+            dr = batch.read_dr(8, expected=bits(0xa5, 8))
+            await batch.submit()
+            self.assertEqual(dr.result(), bits(0xa5, 8))
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_batch_compare_fail(self):
+        async def case():
+            batch = self.iface.batch()
+            batch.test_reset()
+            ir = batch.read_ir(4)
+            dr_1 = batch.read_dr(8, expected=bits(0x00, 8), mask=bits(0x0f, 8))
+            dr_2 = batch.read_dr(8, expected=bits(0x00, 8), mask=bits(0x00, 8))
+            with self.assertRaisesRegex(JTAGProbeError,
+                    r"^batch scan #1 captured <10100101>, expected <00000000> "
+                    r"with mask <11110000> \(1 of 2 checked scans failed\)$"):
+                await batch.submit()
+            self.assertEqual(ir.result(), bits(0b0101, 4))
+            self.assertEqual(dr_1.result(), bits(0xa5, 8))
+            self.assertEqual(dr_2.result(), bits(0x5a, 8))
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_batch_compare_mask_only(self):
+        async def case():
+            batch = self.iface.batch()
+            with self.assertRaisesRegex(AssertionError, r"mask may only be given together"):
+                batch.exchange_dr(bits(0, 8), mask=bits(0x0f, 8))
+        asyncio.get_event_loop().run_until_complete(case())
+
+    def test_batch_check(self):
+        async def case():
+            self.lower.data = bytearray(b"\x00\x00\x00\x01\x0b\x00")
+            batch = self.iface.batch()
+            batch.test_reset()
+            dr_1 = batch.check_dr(bits(0, 16), bits(0, 16))
+            dr_2 = batch.check_dr(bits(0, 16), bits(0, 16), bits(0xff00, 16))
+            with self.assertRaisesRegex(JTAGProbeError,
+                    r"^batch scan #1 mismatched at bit 11 \(1 of 2 checked scans failed\)$"):
+                await batch.submit()
+            self.assertEqual(self.lower.log, ["write", 3, 3])
+            self.assertEqual(dr_1.result(), None)
+            self.assertEqual(dr_2.result(), 11)
+        asyncio.get_event_loop().run_until_complete(case())
+
+
 class JTAGProbeAppletTestCase(GlasgowAppletTestCase, applet=JTAGProbeApplet):
     @synthesis_test
     def test_build(self):
         self.assertBuilds()
+
+    def setup_loopback(self):
+        self.build_simulated_applet()
+        ports = self.applet.mux_interface._subtargets[0]._ports
+        m = Module()
+        m.d.comb += ports.tdo.i.eq(ports.tdi.o)
+        self.target.add_submodule(m)
+
+    @applet_simulation_test("setup_loopback", ["--frequency", "3000"])
+    @types.coroutine
+    def test_loopback(self):
+        jtag_iface = yield from self.run_simulated_applet()
+        yield from jtag_iface.test_reset()
+        yield from jtag_iface.enter_shift_dr()
+        data = bits("0110100110010110101")
+        self.assertEqual((yield from jtag_iface.shift_tdio(data, last=False)), data)
+
+    @applet_simulation_test("setup_loopback", ["--frequency", "3000"])
+    @types.coroutine
+    def test_check(self):
+        jtag_iface = yield from self.run_simulated_applet()
+        yield from jtag_iface.test_reset()
+        yield from jtag_iface.enter_shift_dr()
+        data = bits("0110100110010110101")
+        self.assertEqual((yield from jtag_iface.shift_tdio_check(data, data, last=False)),
+                         None)
+        self.assertEqual((yield from jtag_iface.shift_tdio_check(data, ~data,
+                                                                 bits("0000000100100000000"),
+                                                                 last=False)),
+                         8)
+        self.assertEqual((yield from jtag_iface.shift_tdio_check(data, ~data,
+                                                                 bits("1000000000000000000"),
+                                                                 last=False)),
+                         18)
+        self.assertEqual((yield from jtag_iface.shift_tdio_check(data, ~data,
+                                                                 bits("0000000000000000000"),
+                                                                 last=False)),
+                         None)
@@ -226,10 +226,10 @@ class SVFInterface(SVFEventHandler):
         if op.tdo is None:
             await self.lower.shift_tdi(op.tdi)
         else:
-            tdo = await self.lower.shift_tdio(op.tdi)
-            if tdo & op.mask != op.tdo & op.mask:
-                raise SVFError("SIR command failed: TDO <%s> & <%s> != <%s>"
-                               % (dump_bin(tdo), dump_bin(op.mask), dump_bin(op.tdo)))
+            mismatch = await self.lower.shift_tdio_check(op.tdi, op.tdo, op.mask)
+            if mismatch is not None:
+                raise SVFError("SIR command failed: TDO bit %d differs from <%s> & <%s>"
+                               % (mismatch, dump_bin(op.tdo), dump_bin(op.mask)))
         await self._enter_state(self._endir)
 
     async def svf_sdr(self, tdi, smask, tdo, mask):
@@ -238,10 +238,10 @@ class SVFInterface(SVFEventHandler):
         if op.tdo is None:
             await self.lower.shift_tdi(op.tdi)
         else:
-            tdo = await self.lower.shift_tdio(op.tdi)
-            if tdo & op.mask != op.tdo & op.mask:
-                raise SVFError("SDR command failed: TDO <%s> & <%s> != <%s>"
-                               % (dump_bin(tdo), dump_bin(op.mask), dump_bin(op.tdo)))
+            mismatch = await self.lower.shift_tdio_check(op.tdi, op.tdo, op.mask)
+            if mismatch is not None:
+                raise SVFError("SDR command failed: TDO bit %d differs from <%s> & <%s>"
+                               % (mismatch, dump_bin(op.tdo), dump_bin(op.mask)))
         await self._enter_state(self._enddr)
 
     async def svf_runtest(self, run_state, run_count, run_clock, min_time, max_time, end_state):
@@ -8,7 +8,7 @@ from amaranth.lib import io
 from amaranth.lib.cdc import FFSynchronizer
 
 from ... import *
-from ..jtag_probe import JTAGProbeDriver, JTAGProbeInterface
+from ..jtag_probe import JTAGProbeDriver, JTAGProbeInterface, JTAGState
 
 
 class SpyBiWireProbeBus(Elaboratable):
@@ -116,7 +116,7 @@ class SpyBiWireProbeAdapter(Elaboratable):
                     with m.If(self.tclk_latch):
                         m.d.sync += self.tclk.eq(self.tclk_level)
                     with m.Elif(self.tclk_toggle):
-                        m.d.sync += self.tclk.eq(self.tclk)
+                        m.d.sync += self.tclk.eq(~self.tclk)
 
                 with m.Elif(timer == 0):
                     m.d.sync += bus.sbwtck.eq(1),
@@ -171,21 +171,41 @@ class SpyBiWireProbeSubtarget(Elaboratable):
 
 
 class SpyBiWireProbeInterface(JTAGProbeInterface):
+    # In Run-Test/Idle, the TDI slot carries TCLK instead of TDI, so every TCK cycle that starts in
+    # Run-Test/Idle must drive the current TCLK level to keep it unchanged.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tclk = True
+
     def _log_s(self, message, *args):
         self._logger.log(self._level, "SBW: " + message, *args)
 
+    async def shift_tms(self, tms_bits, tdi=False):
+        if self._state == JTAGState.IDLE:
+            tdi = self._tclk
+        await super().shift_tms(tms_bits, tdi)
+
+    async def pulse_tck(self, count):
+        if self._state == JTAGState.IDLE:
+            await self.set_aux(BIT_AUX_TCLK_LATCH|(BIT_AUX_TCLK_LEVEL if self._tclk else 0))
+            await super().pulse_tck(count)
+            await self.set_aux(0)
+        else:
+            await super().pulse_tck(count)
+
     async def set_tclk(self, active):
         self._log_s("set tclk=%d", active)
         await self.enter_run_test_idle()
-        await self.set_aux(BIT_AUX_TCLK_LATCH|(BIT_AUX_TCLK_LEVEL if active else 0))
+        self._tclk = bool(active)
         await self.pulse_tck(1)
-        await self.set_aux(0)
 
     async def pulse_tclk(self, count):
+        """Pulse TCLK ``count`` times, at half of the TCK frequency. The probe toggles TCLK once
+        per TCK cycle, so the entire sequence is sent as a single command."""
         self._log_s("pulse tclk count=%d", count)
         await self.enter_run_test_idle()
         await self.set_aux(BIT_AUX_TCLK_TOGGLE)
-        await self.pulse_tck(count)
+        await super().pulse_tck(count * 2)
         await self.set_aux(0)
 
 
@@ -1,5 +1,6 @@
 import math
 import struct
+import asyncio
 import logging
 import contextlib
 from amaranth import *
@@ -79,6 +80,8 @@ CMD_SELECT   = 0b00000000
 CMD_SHIFT    = 0b00010000
 CMD_DELAY    = 0b00100000
 CMD_SYNC     = 0b00110000
+CMD_SET_AUX  = 0b01000000
+CMD_WAIT_AUX = 0b01010000
 # CMD_SHIFT
 BIT_DATA_OUT =     0b0001
 BIT_DATA_IN  =     0b0010
@@ -95,6 +98,11 @@ class SPIControllerSubtarget(Elaboratable):
 
         self.bus = SPIControllerBus(ports, sck_idle, sck_edge)
 
+        # Auxiliary signals for the applets that build upon this one, e.g. to control a chip enable
+        # pin or to wait for an interrupt pin in sequence with the SPI transfers.
+        self.aux_o = Signal(4)
+        self.aux_i = Signal()
+
     def elaborate(self, platform):
         m = Module()
 
@@ -129,6 +137,9 @@ class SPIControllerSubtarget(Elaboratable):
         count = Signal(16)
         bitno = Signal(range(8 + 1))
 
+        aux_timeout  = Signal()
+        aux_asserted = Signal()
+
         with m.FSM() as fsm:
             with m.State("RECV-COMMAND"):
                 m.d.comb += self.in_fifo.flush.eq(1)
@@ -139,6 +150,8 @@ class SPIControllerSubtarget(Elaboratable):
                         m.d.sync += self.bus.cs.eq(self.out_fifo.r_data[0])
                     with m.Elif((self.out_fifo.r_data & CMD_MASK) == CMD_SYNC):
                         m.next = "SYNC"
+                    with m.Elif((self.out_fifo.r_data & CMD_MASK) == CMD_SET_AUX):
+                        m.d.sync += self.aux_o.eq(self.out_fifo.r_data[0:4])
                     with m.Else():
                         m.next = "RECV-COUNT-1"
 
@@ -150,6 +163,26 @@ class SPIControllerSubtarget(Elaboratable):
                     ]
                     m.next = "RECV-COMMAND"
 
+            with m.State("WAIT-AUX"):
+                with m.If(self.aux_i):
+                    m.d.sync += aux_asserted.eq(1)
+                    m.next = "WAIT-AUX-REPLY"
+                with m.Elif(aux_timeout & (timer == 0)):
+                    with m.If(count == 0):
+                        m.d.sync += aux_asserted.eq(0)
+                        m.next = "WAIT-AUX-REPLY"
+                    with m.Else():
+                        m.d.sync += count.eq(count - 1)
+                        m.d.comb += timer_en.eq(1)
+
+            with m.State("WAIT-AUX-REPLY"):
+                with m.If(self.in_fifo.w_rdy):
+                    m.d.comb += [
+                        self.in_fifo.w_en.eq(1),
+                        self.in_fifo.w_data.eq(aux_asserted),
+                    ]
+                    m.next = "RECV-COMMAND"
+
             with m.State("RECV-COUNT-1"):
                 with m.If(self.out_fifo.r_rdy):
                     m.d.comb += self.out_fifo.r_en.eq(1)
@@ -162,6 +195,11 @@ class SPIControllerSubtarget(Elaboratable):
                     m.d.sync += count[8:16].eq(self.out_fifo.r_data)
                     with m.If((cmd & CMD_MASK) == CMD_DELAY):
                         m.next = "DELAY"
+                    with m.Elif((cmd & CMD_MASK) == CMD_WAIT_AUX):
+                        # A count of zero waits for as long as it takes.
+                        m.d.sync += aux_timeout.eq((self.out_fifo.r_data != 0) |
+                                                   (count[0:8] != 0))
+                        m.next = "WAIT-AUX"
                     with m.Else():
                         m.next = "COUNT-CHECK"
 
@@ -217,6 +255,133 @@ class SPIControllerSubtarget(Elaboratable):
         return m
 
 
+def _encode_shift(mode, count, octets=b""):
+    # The count of a shift command is 16-bit, so longer shifts are split into several commands.
+    commands = bytearray()
+    for offset in range(0, count, 0xffff):
+        chunk = min(count - offset, 0xffff)
+        commands += struct.pack("<BH", CMD_SHIFT|mode, chunk)
+        if mode & BIT_DATA_OUT:
+            commands.extend(octets[offset:offset + chunk])
+    return commands
+
+
+def _encode_delay(duration_us):
+    commands = bytearray()
+    for offset in range(0, duration_us, 0xffff):
+        commands += struct.pack("<BH", CMD_DELAY, min(duration_us - offset, 0xffff))
+    return commands
+
+
+def _encode_wait_aux(timeout_us):
+    if timeout_us is None:
+        timeout_us = 0
+    else:
+        assert timeout_us in range(1, 0x10000), "timeout must be between 1 and 65535 us"
+    return struct.pack("<BH", CMD_WAIT_AUX, timeout_us)
+
+
+class SPIControllerBatch:
+    """Sequence of SPI controller operations submitted at once.
+
+    Operations are recorded by the methods of the batch, which mirror the methods of
+    :class:`SPIControllerInterface`, and are only sent when the batch is submitted. The commands
+    are written to the controller as a single buffered write, after which the data shifted in by
+    every reading operation is read back at once; the futures returned for these operations are
+    resolved with it. This way, many independent SPI transactions can be queued back to back
+    without waiting for a round trip after each of them.
+    """
+
+    def __init__(self, iface):
+        self._iface    = iface
+        self._commands = bytearray()
+        self._reads    = []
+
+    def __len__(self):
+        return len(self._reads)
+
+    def _read(self, count, *, decode=None):
+        future = asyncio.get_running_loop().create_future()
+        self._reads.append((count, decode, future))
+        return future
+
+    @contextlib.contextmanager
+    def select(self, index=0):
+        """Select chip ``index`` for the operations recorded within the context."""
+        assert index == 0, "only one chip is supported"
+        self._commands.append(CMD_SELECT|(1 + index))
+        try:
+            yield
+        finally:
+            self._commands.append(CMD_SELECT|0)
+
+    def exchange(self, octets):
+        octets = bytes(octets)
+        self._commands += _encode_shift(BIT_DATA_IN|BIT_DATA_OUT, len(octets), octets)
+        return self._read(len(octets))
+
+    def write(self, octets, *, x=1):
+        assert x == 1, "only x1 mode is supported"
+        octets = bytes(octets)
+        self._commands += _encode_shift(BIT_DATA_OUT, len(octets), octets)
+
+    def read(self, count, *, x=1):
+        assert x == 1, "only x1 mode is supported"
+        self._commands += _encode_shift(BIT_DATA_IN, count)
+        return self._read(count)
+
+    def dummy(self, count):
+        assert count % 8 == 0, "only multiples of 8 dummy cycles are supported"
+        self._commands += _encode_shift(0, count // 8)
+
+    def delay_us(self, duration):
+        self._commands += _encode_delay(duration)
+
+    def delay_ms(self, duration):
+        self._commands += _encode_delay(duration * 1000)
+
+    def set_aux(self, value):
+        assert value in range(16)
+        self._commands.append(CMD_SET_AUX|value)
+
+    def wait_aux(self, *, timeout_us=None):
+        """Wait until the auxiliary input of the controller is asserted, or until ``timeout_us``
+        microseconds have passed, if it is not ``None``. The returned future is resolved with
+        ``True`` if the input was asserted, and ``False`` if the wait has timed out."""
+        self._commands += _encode_wait_aux(timeout_us)
+        return self._read(1, decode=lambda octets: bool(octets[0]))
+
+    async def submit(self):
+        commands, self._commands = self._commands, bytearray()
+        reads, self._reads = self._reads, []
+        self._iface._log("batch submit commands=%d reads=%d", len(commands), len(reads))
+        try:
+            await self._iface.lower.write(commands)
+            length = sum(count for count, _, _ in reads)
+            if length == 0:
+                await self._iface.lower.flush()
+                return
+            octets = await self._iface.lower.read(length)
+            offset = 0
+            for count, decode, future in reads:
+                if decode is None:
+                    future.set_result(octets[offset:offset + count])
+                else:
+                    future.set_result(decode(octets[offset:offset + count]))
+                offset += count
+        finally:
+            for _, _, future in reads:
+                if not future.done():
+                    future.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.submit()
+
+
 class SPIControllerInterface:
     def __init__(self, interface, logger):
         self.lower   = interface
@@ -226,18 +391,22 @@ class SPIControllerInterface:
     def _log(self, message, *args):
         self._logger.log(self._level, "SPI: " + message, *args)
 
+    def batch(self):
+        """Start recording a :class:`SPIControllerBatch` of operations.
+
+        The batch may be used as an asynchronous context manager, in which case it is submitted
+        on exit.
+        """
+        return SPIControllerBatch(self)
+
     async def reset(self):
         self._log("reset")
         await self.lower.reset()
 
-    @staticmethod
-    def _chunked(items, *, count=0xffff):
-        while items:
-            yield items[:count]
-            items = items[count:]
-
     @contextlib.asynccontextmanager
-    async def select(self, index=0):
+    async def select(self, index=0, *, wait=True):
+        """Select chip ``index`` for the duration of the context. When the context is exited,
+        the commands are flushed to the device, and if ``wait`` is true, the transfer is awaited."""
         assert index == 0, "only one chip is supported"
         try:
             self._log("select chip=%d", index)
@@ -248,14 +417,14 @@ class SPIControllerInterface:
             self._log("deselect")
             await self.lower.write(struct.pack("<B",
                 CMD_SELECT|0))
-            await self.lower.flush()
+            if wait:
+                await self.lower.flush()
+            else:
+                await self.lower.flush(wait=False)
 
     async def exchange(self, octets):
         self._log("xchg-o=<%s>", dump_hex(octets))
-        for chunk in self._chunked(octets):
-            await self.lower.write(struct.pack("<BH",
-                CMD_SHIFT|BIT_DATA_IN|BIT_DATA_OUT, len(chunk)))
-            await self.lower.write(chunk)
+        await self.lower.write(_encode_shift(BIT_DATA_IN|BIT_DATA_OUT, len(octets), octets))
         octets = await self.lower.read(len(octets))
         self._log("xchg-i=<%s>", dump_hex(octets))
         return octets
@@ -263,38 +432,27 @@ class SPIControllerInterface:
     async def write(self, octets, *, x=1):
         assert x == 1, "only x1 mode is supported"
         self._log("write=<%s>", dump_hex(octets))
-        for chunk in self._chunked(octets):
-            await self.lower.write(struct.pack("<BH",
-                CMD_SHIFT|BIT_DATA_OUT, len(chunk)))
-            await self.lower.write(chunk)
+        await self.lower.write(_encode_shift(BIT_DATA_OUT, len(octets), octets))
 
     async def read(self, count, *, x=1):
         assert x == 1, "only x1 mode is supported"
-        for chunk in self._chunked(range(count)):
-            await self.lower.write(struct.pack("<BH",
-                CMD_SHIFT|BIT_DATA_IN, len(chunk)))
+        await self.lower.write(_encode_shift(BIT_DATA_IN, count))
         octets = await self.lower.read(count)
         self._log("read=<%s>", dump_hex(octets))
         return octets
 
     async def dummy(self, count):
         self._log("dummy=%d", count)
-        for chunk in self._chunked(range(count)):
-            assert count % 8 == 0, "only multiples of 8 dummy cycles are supported"
-            await self.lower.write(struct.pack("<BH",
-                CMD_SHIFT, len(chunk) // 8))
+        assert count % 8 == 0, "only multiples of 8 dummy cycles are supported"
+        await self.lower.write(_encode_shift(0, count // 8))
 
     async def delay_us(self, duration):
         self._log("delay us=%d", duration)
-        for chunk in self._chunked(range(duration)):
-            await self.lower.write(struct.pack("<BH",
-                CMD_DELAY, len(chunk)))
+        await self.lower.write(_encode_delay(duration))
 
     async def delay_ms(self, duration):
         self._log("delay ms=%d", duration)
-        for chunk in self._chunked(range(duration * 1000)):
-            await self.lower.write(struct.pack("<BH",
-                CMD_DELAY, len(chunk)))
+        await self.lower.write(_encode_delay(duration * 1000))
 
     async def synchronize(self):
         self._log("sync-o")
@@ -302,6 +460,24 @@ class SPIControllerInterface:
         await self.lower.read(1)
         self._log("sync-i")
 
+    async def set_aux(self, value):
+        """Set the auxiliary outputs of the controller to ``value`` once the commands before
+        this one have been executed."""
+        assert value in range(16)
+        self._log("set aux=%s", format(value, "04b"))
+        await self.lower.write([CMD_SET_AUX|value])
+
+    async def wait_aux(self, *, timeout_us=None):
+        """Wait until the auxiliary input of the controller is asserted, or until ``timeout_us``
+        microseconds have passed, if it is not ``None``. The commands after this one are not
+        executed until then. Returns ``True`` if the input was asserted, and ``False`` if the wait
+        has timed out."""
+        self._log("wait aux-o timeout=%s", timeout_us)
+        await self.lower.write(_encode_wait_aux(timeout_us))
+        asserted, = await self.lower.read(1)
+        self._log("wait aux-i asserted=%d", asserted)
+        return bool(asserted)
+
 
 class SPIControllerApplet(GlasgowApplet):
     logger = logging.getLogger(__name__)
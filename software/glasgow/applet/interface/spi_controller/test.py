@@ -1,9 +1,111 @@
 import types
+import asyncio
+import logging
+import unittest
 from amaranth import *
 from amaranth.lib import io
 
 from ... import *
-from . import SPIControllerApplet
+from . import *
+
+
+class MockLoopback:
+    """Model of the SPI controller with COPI connected to CIPO, as seen through
+    the demultiplexer interface."""
+    def __init__(self):
+        self.writes = []
+        self.reads  = 0
+        self._in    = bytearray()
+
+    async def write(self, data):
+        data = bytes(data)
+        self.writes.append(data)
+        while data:
+            cmd = data[0]
+            if cmd & CMD_MASK in (CMD_SELECT, CMD_SET_AUX):
+                data = data[1:]
+            elif cmd & CMD_MASK == CMD_SYNC:
+                self._in += b"\0"
+                data = data[1:]
+            else:
+                count = data[1] | data[2] << 8
+                data = data[3:]
+                if cmd & CMD_MASK == CMD_WAIT_AUX:
+                    self._in += b"\1"
+                if cmd & CMD_MASK == CMD_SHIFT and cmd & BIT_DATA_OUT:
+                    octets, data = data[:count], data[count:]
+                else:
+                    octets = bytes(count)
+                if cmd & CMD_MASK == CMD_SHIFT and cmd & BIT_DATA_IN:
+                    self._in += octets
+
+    async def flush(self, wait=True):
+        pass
+
+    async def read(self, length):
+        self.reads += 1
+        data, self._in = self._in[:length], self._in[length:]
+        assert len(data) == length
+        return data
+
+
+class SPIControllerBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.lower = MockLoopback()
+        self.iface = SPIControllerInterface(self.lower, logging.getLogger(__name__))
+
+    def run_case(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def test_batch(self):
+        async def case():
+            async with self.iface.batch() as batch:
+                with batch.select():
+                    batch.write(b"\x03")
+                    batch.dummy(8)
+                    read = batch.read(2)
+                batch.delay_us(10)
+                with batch.select():
+                    exchange = batch.exchange([0x12, 0x34])
+                wait = batch.wait_aux()
+                batch.wait_aux(timeout_us=1000)
+            return read, exchange, wait
+        read, exchange, wait = self.run_case(case())
+        self.assertEqual(read.result(), b"\x00\x00")
+        self.assertEqual(exchange.result(), b"\x12\x34")
+        self.assertTrue(wait.result())
+        self.assertEqual(self.lower.writes, [
+            b"\x01\x11\x01\x00\x03\x10\x01\x00\x12\x02\x00\x00"
+            b"\x20\x0a\x00"
+            b"\x01\x13\x02\x00\x12\x34\x00"
+            b"\x50\x00\x00"
+            b"\x50\xe8\x03"
+        ])
+        self.assertEqual(self.lower.reads, 1)
+
+    def test_batch_chunked(self):
+        async def case():
+            async with self.iface.batch() as batch:
+                exchange = batch.exchange(bytes(range(256)) * 512)
+                batch.delay_ms(100)
+            return exchange
+        self.assertEqual(self.run_case(case()).result(), bytes(range(256)) * 512)
+        self.assertEqual(self.lower.writes[0][0:3], b"\x13\xff\xff")
+        self.assertEqual(self.lower.writes[0][0x20004:0x20007], b"\x13\x02\x00")
+        self.assertEqual(self.lower.writes[0][-6:], b"\x20\xff\xff\x20\xa1\x86")
+
+    def test_batch_empty(self):
+        async def case():
+            async with self.iface.batch() as batch:
+                with batch.select():
+                    batch.write(b"\x06")
+        self.run_case(case())
+        self.assertEqual(self.lower.writes, [b"\x01\x11\x01\x00\x06\x00"])
+        self.assertEqual(self.lower.reads, 0)
+
+    def test_exchange(self):
+        self.assertEqual(self.run_case(self.iface.exchange([1, 2, 3])), b"\x01\x02\x03")
+        self.assertEqual(self.lower.writes, [b"\x13\x03\x00\x01\x02\x03"])
 
 
 class SPIControllerAppletTestCase(GlasgowAppletTestCase, applet=SPIControllerApplet):
@@ -34,3 +136,28 @@ class SPIControllerAppletTestCase(GlasgowAppletTestCase, applet=SPIControllerApp
         result = yield from spi_iface.exchange([0xAA, 0x55, 0x12, 0x34])
         self.assertEqual(result, bytearray([0xAA, 0x55, 0x12, 0x34]))
         self.assertEqual((yield ports.cs.o), 1)
+
+    def setup_aux_loopback(self):
+        self.build_simulated_applet()
+        mux_iface = self.applet.mux_interface
+        controller = mux_iface._subtargets[0]
+        m = Module()
+        m.d.comb += controller.aux_i.eq(controller.aux_o[1])
+        self.target.add_submodule(m)
+
+    @applet_simulation_test("setup_aux_loopback",
+                            ["--pin-sck",  "0", "--pin-cs", "1",
+                             "--pin-copi", "2", "--pin-cipo",   "3",
+                             "--frequency", "5000"])
+    @types.coroutine
+    def test_aux(self):
+        mux_iface = self.applet.mux_interface
+        spi_iface = yield from self.run_simulated_applet()
+
+        controller = mux_iface._subtargets[0]
+        yield from spi_iface.set_aux(0b0110)
+        self.assertTrue((yield from spi_iface.wait_aux()))
+        self.assertEqual((yield controller.aux_o), 0b0110)
+        yield from spi_iface.set_aux(0b0100)
+        self.assertFalse((yield from spi_iface.wait_aux(timeout_us=5)))
+        self.assertEqual((yield controller.aux_o), 0b0100)
@@ -19,6 +19,20 @@ class SPISerprogInterface:
             await self.lower.write(sdata)
             return await self.lower.read(rlen)
 
+    async def write(self, sdata):
+        # Nothing depends on the completion of the write, so it is submitted to the device without
+        # waiting for it; the next read (or `synchronize`) will wait for it.
+        assert len(sdata) > 0
+        async with self.lower.select(wait=False):
+            await self.lower.write(sdata)
+
+    async def delay_us(self, duration):
+        # The delay is sent to the device together with the next SPI operation.
+        await self.lower.delay_us(duration)
+
+    async def synchronize(self):
+        await self.lower.synchronize()
+
 
 class SerprogCommand(enum.IntEnum):
     """
@@ -71,11 +85,19 @@ class SerprogCommandHandler:
         (1 << SerprogCommand.CMD_Q_PGMNAME) |
         (1 << SerprogCommand.CMD_Q_SERBUF)  |
         (1 << SerprogCommand.CMD_Q_BUSTYPE) |
+        (1 << SerprogCommand.CMD_Q_OPBUF)   |
+        (1 << SerprogCommand.CMD_O_INIT)    |
+        (1 << SerprogCommand.CMD_O_DELAY)   |
+        (1 << SerprogCommand.CMD_O_EXEC)    |
         (1 << SerprogCommand.CMD_SYNCNOP)   |
         (1 << SerprogCommand.CMD_O_SPIOP)   |
         (1 << SerprogCommand.CMD_S_BUSTYPE)
     )
 
+    # Flashrom accounts 1 byte per `O_WRITEB` and `O_WRITEN` data byte, and 5 bytes per
+    # `O_DELAY`; the operation buffer is stored on the host, so the size is arbitrary.
+    OPBUF_SIZE = 0x1000
+
     PROGNAME = b'Glasgow serprog\0'
     assert len(PROGNAME) == 16
 
@@ -83,6 +105,7 @@ class SerprogCommandHandler:
         self.interface = interface
         self.endpoint  = endpoint
         self.logger    = logger
+        self.opbuf     = []
 
     async def get_u8(self):
         data, = await self.endpoint.recv(1)
@@ -92,6 +115,10 @@ class SerprogCommandHandler:
         data = await self.endpoint.recv(3)
         return int.from_bytes(data, byteorder='little')
 
+    async def get_u32(self):
+        data = await self.endpoint.recv(4)
+        return int.from_bytes(data, byteorder='little')
+
     async def put_u8(self, value):
         await self.endpoint.send([value])
 
@@ -134,14 +161,49 @@ class SerprogCommandHandler:
                 await self.ack()
             else:
                 await self.nak()
+        elif cmd == SerprogCommand.CMD_Q_OPBUF:
+            await self.ack()
+            await self.put_u16(self.OPBUF_SIZE)
+        elif cmd == SerprogCommand.CMD_O_INIT:
+            self.opbuf.clear()
+            await self.ack()
+        elif cmd == SerprogCommand.CMD_O_WRITEB:
+            await self.get_u24() # address
+            await self.get_u8()  # data
+            # Only the SPI bus is supported, and it has no memory cycles to buffer.
+            await self.nak()
+        elif cmd == SerprogCommand.CMD_O_WRITEN:
+            length = await self.get_u24()
+            await self.get_u24() # address
+            await self.endpoint.recv(length)
+            await self.nak()
+        elif cmd == SerprogCommand.CMD_O_DELAY:
+            self.opbuf.append(("delay", await self.get_u32()))
+            await self.ack()
+        elif cmd == SerprogCommand.CMD_O_EXEC:
+            # The delays are executed by the gateware, in order with the SPI operations,
+            # so there is no need to wait for them here.
+            for op, duration in self.opbuf:
+                assert op == "delay"
+                if duration > 0:
+                    await self.interface.delay_us(duration)
+            self.opbuf.clear()
+            await self.ack()
         elif cmd == SerprogCommand.CMD_O_SPIOP:
             slen = await self.get_u24()
             rlen = await self.get_u24()
             await self.ack()
             sdata = await self.endpoint.recv(slen)
             assert len(sdata) == slen
-            rdata = await self.interface.write_read(sdata, rlen)
-            await self.endpoint.send(rdata)
+            if rlen == 0:
+                # Flashrom does not wait for the reply to a command before sending the next one,
+                # so if there is nothing to read back, the next command can be handled while
+                # the SPI operation is in progress.
+                if slen > 0:
+                    await self.interface.write(sdata)
+            else:
+                rdata = await self.interface.write_read(sdata, rlen)
+                await self.endpoint.send(rdata)
         else:
             self.logger.warning(f"Unhandled command {cmd:#04x}")
             await self.nak()
@@ -196,12 +258,17 @@ class SPIFlashromApplet(SPIControllerApplet):
     async def interact(self, device, args, iface):
         endpoint = await ServerEndpoint("socket", self.logger, args.endpoint)
         async def handle():
+            handler = SerprogCommandHandler(iface, endpoint, self.logger)
             while True:
                 try:
-                    handler = SerprogCommandHandler(iface, endpoint, self.logger)
                     await handler.handle_cmd()
                 except asyncio.CancelledError:
-                    pass
+                    handler.opbuf.clear()
         handle_fut = asyncio.ensure_future(handle())
         # This `asyncio.wait()` call is necessary for ^C to be handled correctly.
         await asyncio.wait([handle_fut], return_when=asyncio.FIRST_EXCEPTION)
+
+    @classmethod
+    def tests(cls):
+        from . import test
+        return test.SPIFlashromAppletTestCase
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import unittest
+
+from ... import *
+from . import SPIFlashromApplet, SerprogCommand, SerprogCommandHandler
+
+
+class MockEndpoint:
+    def __init__(self, data):
+        self.rx_data = bytearray(data)
+        self.tx_data = bytearray()
+
+    async def recv(self, length):
+        data = self.rx_data[:length]
+        del self.rx_data[:length]
+        return data
+
+    async def send(self, data):
+        self.tx_data += bytes(data)
+
+
+class MockSerprogInterface:
+    def __init__(self):
+        self.log = []
+
+    async def write_read(self, sdata, rlen):
+        self.log.append(("write_read", bytes(sdata), rlen))
+        return bytes(rlen)
+
+    async def write(self, sdata):
+        self.log.append(("write", bytes(sdata)))
+
+    async def delay_us(self, duration):
+        self.log.append(("delay_us", duration))
+
+
+class SerprogCommandHandlerTestCase(unittest.TestCase):
+    def run_commands(self, data):
+        endpoint  = MockEndpoint(data)
+        interface = MockSerprogInterface()
+        handler   = SerprogCommandHandler(interface, endpoint, logging.getLogger(__name__))
+        async def case():
+            while endpoint.rx_data:
+                await handler.handle_cmd()
+        asyncio.get_event_loop().run_until_complete(case())
+        return endpoint.tx_data, interface.log
+
+    def test_spiop(self):
+        tx_data, log = self.run_commands([
+            SerprogCommand.CMD_O_SPIOP, 1, 0, 0, 0, 0, 0, 0x06,
+            SerprogCommand.CMD_O_SPIOP, 1, 0, 0, 2, 0, 0, 0x05,
+        ])
+        self.assertEqual(tx_data, bytes([SerprogCommand.ACK, SerprogCommand.ACK, 0, 0]))
+        self.assertEqual(log, [("write", b"\x06"), ("write_read", b"\x05", 2)])
+
+    def test_opbuf(self):
+        tx_data, log = self.run_commands([
+            SerprogCommand.CMD_Q_OPBUF,
+            SerprogCommand.CMD_O_INIT,
+            SerprogCommand.CMD_O_DELAY, 0x10, 0x27, 0, 0,
+            SerprogCommand.CMD_O_DELAY, 5, 0, 0, 0,
+            SerprogCommand.CMD_O_EXEC,
+            SerprogCommand.CMD_O_EXEC,
+            SerprogCommand.CMD_O_WRITEB, 0, 0, 0, 0xff,
+        ])
+        self.assertEqual(tx_data, bytes([
+            SerprogCommand.ACK, 0x00, 0x10,
+            SerprogCommand.ACK,
+            SerprogCommand.ACK,
+            SerprogCommand.ACK,
+            SerprogCommand.ACK,
+            SerprogCommand.ACK,
+            SerprogCommand.NAK,
+        ]))
+        self.assertEqual(log, [("delay_us", 10000), ("delay_us", 5)])
+
+
+class SPIFlashromAppletTestCase(GlasgowAppletTestCase, applet=SPIFlashromApplet):
+    @synthesis_test
+    def test_build(self):
+        self.assertBuilds(args=["--pin-cs", "0", "--pin-cipo", "1",
+                                "--pin-copi", "2", "--pin-sck", "3"])
@@ -1,5 +1,7 @@
 import os
 import sys
+import time
+import struct
 import logging
 import asyncio
 import argparse
@@ -130,6 +132,60 @@ class UARTSubtarget(Elaboratable):
         return m
 
 
+class UARTCaptureSink:
+    """
+    Capture of the data received from and transmitted to the UART, in the pcap format.
+
+    Each packet starts with a direction byte (0 for data received from the UART, 1 for data
+    transmitted to the UART), followed by the data, and uses the ``LINKTYPE_USER0`` link type.
+    The timestamps have nanosecond resolution; they are derived from the monotonic clock and
+    anchored to the wall clock time when the capture was started.
+
+    Recording a packet only appends it to a buffer; the buffer is written to the file from
+    a separate task, so that capturing does not delay forwarding.
+    """
+    DIR_RX = 0
+    DIR_TX = 1
+
+    LINKTYPE_USER0 = 147
+
+    def __init__(self, file, *, interval=0.1):
+        self._file     = file
+        self._interval = interval
+        self._buffer   = bytearray()
+        self._time_ns  = time.time_ns() - time.monotonic_ns()
+        # pcap header, nanosecond-resolution variant
+        self._buffer += struct.pack("<IHHiIII", 0xa1b23c4d, 2, 4, 0, 0, 0xffff,
+                                    self.LINKTYPE_USER0)
+
+    def record(self, direction, data):
+        timestamp = self._time_ns + time.monotonic_ns()
+        self._buffer += struct.pack("<IIII", timestamp // 1_000_000_000,
+                                    timestamp % 1_000_000_000, len(data) + 1, len(data) + 1)
+        self._buffer.append(direction)
+        self._buffer += data
+
+    def flush(self):
+        buffer, self._buffer = self._buffer, bytearray()
+        self._file.write(buffer)
+        self._file.flush()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        write_fut = None
+        try:
+            while True:
+                await asyncio.sleep(self._interval)
+                if self._buffer:
+                    buffer, self._buffer = self._buffer, bytearray()
+                    write_fut = loop.run_in_executor(None, self._file.write, buffer)
+                    await asyncio.shield(write_fut)
+        finally:
+            if write_fut is not None and not write_fut.done():
+                await write_fut # keep the packets in order
+            self.flush()
+
+
 class UARTApplet(GlasgowApplet):
     logger = logging.getLogger(__name__)
     help = "communicate via UART"
@@ -231,6 +287,11 @@ class UARTApplet(GlasgowApplet):
 
     @classmethod
     def add_interact_arguments(cls, parser):
+        parser.add_argument(
+            "--capture", metavar="FILE", type=argparse.FileType("wb"),
+            help="capture received and transmitted data with timestamps to FILE, "
+                 "in the pcap format")
+
         p_operation = parser.add_subparsers(dest="operation", metavar="OPERATION")
 
         p_tty = p_operation.add_parser(
@@ -244,6 +305,10 @@ class UARTApplet(GlasgowApplet):
 
         p_socket = p_operation.add_parser(
             "socket", help="connect UART to a socket")
+        p_socket.add_argument(
+            "--max-clients", metavar="COUNT", type=int, default=1,
+            help="allow up to COUNT clients at once; data received from UART is sent to all of "
+                 "them (default: %(default)s, a new client disconnects the previous one)")
         ServerEndpoint.add_argument(p_socket, "endpoint")
 
     async def _monitor_errors(self, device):
@@ -269,50 +334,106 @@ class UARTApplet(GlasgowApplet):
 
             await asyncio.sleep(1)
 
-    async def _forward(self, in_fileno, out_fileno, uart, quit_sequence=False, stream=False):
+    async def _forward(self, in_fileno, out_fileno, uart, quit_sequence=False, stream=False,
+                       capture=None):
+        loop = asyncio.get_running_loop()
+
+        # Input is collected by a reader callback (or, where the event loop cannot watch the file
+        # descriptor, by a thread), and sent to the UART by `forward_in`. Everything that arrives
+        # while a write to the UART is in progress is sent in the next write, so small writes are
+        # coalesced when there is a lot of input without delaying the first keystroke. Once the
+        # input ends, `forward_in` sends whatever is still buffered and then returns.
+        in_buffer = bytearray()
+        in_ready  = asyncio.Event()
+        in_done   = loop.create_future()
         quit = 0
-        dev_fut = uart_fut = None
-        while True:
-            if dev_fut is None:
-                dev_fut = asyncio.get_event_loop().run_in_executor(None,
-                    lambda: os.read(in_fileno, 1024))
-            if uart_fut is None:
-                uart_fut = asyncio.ensure_future(uart.read())
-
-            await asyncio.wait([uart_fut, dev_fut], return_when=asyncio.FIRST_COMPLETED)
-
-            if dev_fut.done():
-                data = await dev_fut
-                dev_fut = None
-
-                if not data and not stream:
-                    break
-
-                if os.isatty(in_fileno):
-                    if quit == 0 and data == b"\034":
-                        quit = 1
-                        continue
-                    elif quit == 1 and data == b"q":
-                        break
-                    else:
-                        quit = 0
-
-                self.logger.trace("in->UART: <%s>", data.hex())
-                await uart.write(data)
-                await uart.flush()
-
-            if uart_fut.done():
-                data = await uart_fut
-                uart_fut = None
 
-                self.logger.trace("UART->out: <%s>", data.hex())
-                os.write(out_fileno, data)
+        def input_received(data):
+            nonlocal quit
+            if not data:
+                if not stream and not in_done.done():
+                    in_done.set_result(None)
+                    in_ready.set()
+                return False
+
+            if quit_sequence and os.isatty(in_fileno):
+                if quit == 0 and data == b"\034":
+                    quit = 1
+                    return True
+                elif (quit == 1 and data == b"q") or data == b"\034q":
+                    if not in_done.done():
+                        in_done.set_result(None)
+                        in_ready.set()
+                    return False
+                else:
+                    quit = 0
+
+            in_buffer.extend(data)
+            in_ready.set()
+            return True
+
+        def on_readable():
+            try:
+                data = os.read(in_fileno, 65536)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            if not input_received(data):
+                loop.remove_reader(in_fileno)
+
+        async def read_in_thread():
+            while input_received(await loop.run_in_executor(None, os.read, in_fileno, 65536)):
+                pass
 
-        for fut in [uart_fut, dev_fut]:
-            if fut is not None and not fut.done():
-                fut.cancel()
+        async def forward_in():
+            while in_buffer or not in_done.done():
+                await in_ready.wait()
+                in_ready.clear()
+                if not in_buffer:
+                    continue
+                data = bytes(in_buffer)
+                in_buffer.clear()
+                if self.logger.isEnabledFor(logging.TRACE):
+                    self.logger.trace("in->UART: <%s>", data.hex())
+                if capture is not None:
+                    capture.record(UARTCaptureSink.DIR_TX, data)
+                await uart.write(data)
+                await uart.flush()
 
-    async def _interact_tty(self, uart, stream):
+        async def forward_out():
+            while True:
+                data = await uart.read()
+                if self.logger.isEnabledFor(logging.TRACE):
+                    self.logger.trace("UART->out: <%s>", data.hex())
+                if capture is not None:
+                    capture.record(UARTCaptureSink.DIR_RX, data)
+                data = memoryview(data)
+                while data:
+                    data = data[os.write(out_fileno, data):]
+
+        try:
+            loop.add_reader(in_fileno, on_readable)
+            in_reader = None
+        except (NotImplementedError, PermissionError):
+            # Windows event loops and regular files do not support watching the descriptor.
+            in_reader = asyncio.ensure_future(read_in_thread())
+
+        tasks = [asyncio.ensure_future(forward_in()), asyncio.ensure_future(forward_out())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task.done():
+                    await task # re-raise exceptions
+        finally:
+            if in_reader is None:
+                loop.remove_reader(in_fileno)
+            else:
+                in_reader.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def _interact_tty(self, uart, stream, capture):
         in_fileno  = sys.stdin.fileno()
         out_fileno = sys.stdout.fileno()
 
@@ -334,29 +455,34 @@ class UARTApplet(GlasgowApplet):
             self.logger.info("running on a TTY; enter `Ctrl+\\ q` to quit")
 
         await self._forward(in_fileno, out_fileno, uart,
-                            quit_sequence=True, stream=stream)
+                            quit_sequence=True, stream=stream, capture=capture)
 
-    async def _interact_pty(self, uart):
+    async def _interact_pty(self, uart, capture):
         import pty
 
         master, slave = pty.openpty()
         print(os.ttyname(slave))
 
-        await self._forward(master, master, uart)
+        await self._forward(master, master, uart, capture=capture)
 
-    async def _interact_socket(self, uart, endpoint):
-        endpoint = await ServerEndpoint("socket", self.logger, endpoint)
+    async def _interact_socket(self, uart, endpoint, max_clients, capture):
+        endpoint = await ServerEndpoint("socket", self.logger, endpoint,
+                                        max_clients=max_clients)
         async def forward_out():
             while True:
                 try:
                     data = await asyncio.shield(endpoint.recv())
                 except asyncio.CancelledError:
                     continue
+                if capture is not None:
+                    capture.record(UARTCaptureSink.DIR_TX, data)
                 await uart.write(data)
                 await uart.flush()
         async def forward_in():
             while True:
                 data = await uart.read()
+                if capture is not None:
+                    capture.record(UARTCaptureSink.DIR_RX, data)
                 try:
                     await asyncio.shield(endpoint.send(data))
                 except asyncio.CancelledError:
@@ -369,14 +495,24 @@ class UARTApplet(GlasgowApplet):
     async def interact(self, device, args, uart):
         asyncio.create_task(self._monitor_errors(device))
 
-        if args.operation is None:
-            await self._interact_tty(uart, stream=False)
-        if args.operation == "tty":
-            await self._interact_tty(uart, args.stream)
-        if args.operation == "pty":
-            await self._interact_pty(uart)
-        if args.operation == "socket":
-            await self._interact_socket(uart, args.endpoint)
+        capture = None
+        if args.capture:
+            capture = UARTCaptureSink(args.capture)
+            capture_fut = asyncio.ensure_future(capture.run())
+
+        try:
+            if args.operation is None:
+                await self._interact_tty(uart, stream=False, capture=capture)
+            if args.operation == "tty":
+                await self._interact_tty(uart, args.stream, capture)
+            if args.operation == "pty":
+                await self._interact_pty(uart, capture)
+            if args.operation == "socket":
+                await self._interact_socket(uart, args.endpoint, args.max_clients, capture)
+        finally:
+            if capture is not None:
+                capture_fut.cancel()
+                await asyncio.wait([capture_fut])
 
     @classmethod
     def tests(cls):
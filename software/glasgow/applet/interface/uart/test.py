@@ -1,7 +1,13 @@
+import io
+import os
+import struct
+import asyncio
+import tempfile
+import unittest
 from amaranth import *
 
 from ... import *
-from . import UARTApplet
+from . import UARTApplet, UARTCaptureSink
 
 
 class UARTAppletTestCase(GlasgowAppletTestCase, applet=UARTApplet):
@@ -22,3 +28,94 @@ class UARTAppletTestCase(GlasgowAppletTestCase, applet=UARTApplet):
         uart_iface = await self.run_simulated_applet()
         await uart_iface.write(bytes([0xAA, 0x55]))
         self.assertEqual(await uart_iface.read(2), bytes([0xAA, 0x55]))
+
+
+class UARTForwardTestCase(unittest.TestCase):
+    class MockUART:
+        def __init__(self, rx_data):
+            self.rx_data = rx_data
+            self.tx_data = bytearray()
+            self.tx_buffer = bytearray()
+
+        async def write(self, data):
+            self.tx_buffer += data
+
+        async def flush(self):
+            # Data is only sent once the flush completes, which takes a while.
+            await asyncio.sleep(0.01)
+            self.tx_data += self.tx_buffer
+            self.tx_buffer.clear()
+
+        async def read(self):
+            if not self.rx_data:
+                await asyncio.Future() # block forever
+            data, self.rx_data = self.rx_data, b""
+            return data
+
+    def test_forward(self):
+        applet = UARTApplet()
+        uart = self.MockUART(b"world")
+        in_r, in_w = os.pipe()
+        out_r, out_w = os.pipe()
+        capture_file = io.BytesIO()
+        capture = UARTCaptureSink(capture_file)
+        async def case():
+            forward_fut = asyncio.ensure_future(
+                applet._forward(in_r, out_w, uart, capture=capture))
+            os.write(in_w, b"hello")
+            await asyncio.sleep(0.01)
+            os.close(in_w)
+            await asyncio.wait_for(forward_fut, timeout=1)
+        try:
+            asyncio.get_event_loop().run_until_complete(case())
+            self.assertEqual(uart.tx_data, b"hello")
+            self.assertEqual(os.read(out_r, 100), b"world")
+        finally:
+            for fd in (in_r, out_r, out_w):
+                os.close(fd)
+
+        capture.flush()
+        data = capture_file.getvalue()
+        self.assertEqual(struct.unpack_from("<IHHiIII", data, 0),
+                         (0xa1b23c4d, 2, 4, 0, 0, 0xffff, 147))
+        packets = []
+        offset = 24
+        while offset < len(data):
+            _, _, length, _ = struct.unpack_from("<IIII", data, offset)
+            packets.append(data[offset + 16:offset + 16 + length])
+            offset += 16 + length
+        self.assertEqual(sorted(packets), [b"\x00world", b"\x01hello"])
+
+    def run_forward(self, in_fileno, uart, write=None):
+        out_r, out_w = os.pipe()
+        async def case():
+            forward_fut = asyncio.ensure_future(UARTApplet()._forward(in_fileno, out_w, uart))
+            if write is not None:
+                write()
+            await asyncio.wait_for(forward_fut, timeout=1)
+        try:
+            asyncio.get_event_loop().run_until_complete(case())
+        finally:
+            os.close(out_r)
+            os.close(out_w)
+
+    def test_forward_pipe_eof(self):
+        uart = self.MockUART(b"")
+        in_r, in_w = os.pipe()
+        def write():
+            os.write(in_w, b"hello")
+            os.close(in_w)
+        try:
+            self.run_forward(in_r, uart, write)
+        finally:
+            os.close(in_r)
+        self.assertEqual(uart.tx_data, b"hello")
+
+    def test_forward_file_eof(self):
+        uart = self.MockUART(b"")
+        data = bytes(range(256)) * 400
+        with tempfile.TemporaryFile() as in_file:
+            in_file.write(data)
+            in_file.seek(0)
+            self.run_forward(in_file.fileno(), uart)
+        self.assertEqual(uart.tx_data, data)
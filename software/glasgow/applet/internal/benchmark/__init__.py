@@ -1,12 +1,19 @@
 import logging
 import asyncio
+import argparse
+import platform
 import struct
 import array
+import math
+import json
 import time
 import statistics
 import enum
+import usb1
 from amaranth import *
 
+from .... import __version__
+
 from ....gateware.lfsr import *
 from ... import *
 
@@ -82,6 +89,60 @@ class BenchmarkSubtarget(Elaboratable):
         return m
 
 
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile ``fraction`` (between 0 and 1) of ``sorted_values``."""
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def latency_summary(samples):
+    """Summarize round-trip times (in µs)."""
+    samples = sorted(samples)
+    return {
+        "mean":   statistics.mean(samples),
+        "stddev": statistics.pstdev(samples),
+        "min":    samples[0],
+        "p50":    percentile(samples, 0.50),
+        "p99":    percentile(samples, 0.99),
+        "p999":   percentile(samples, 0.999),
+        "max":    samples[-1],
+    }
+
+
+def _result_key(result):
+    return (result["mode"], result["pipe"], result["transfer_size"], result["queue_depth"])
+
+
+def compare_results(baseline, results, tolerance):
+    """Compare benchmark ``results`` with ``baseline`` results (both lists of result dicts, as
+    stored in the JSON output), and return a list of regressions.
+
+    A result regresses if its throughput is lower, or its 99th percentile latency is higher,
+    than the baseline by more than ``tolerance`` (a fraction), or if it failed while the baseline
+    did not. Results without a baseline are not compared.
+    """
+    baseline = {_result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        key = _result_key(result)
+        if key not in baseline:
+            continue
+        name = "mode {} pipe {} size {} depth {}".format(*key)
+        before = baseline[key]
+        if result["error"] and not before["error"]:
+            regressions.append(f"{name}: failed")
+            continue
+        if result.get("throughput") and before.get("throughput"):
+            if result["throughput"] < before["throughput"] * (1 - tolerance):
+                regressions.append("{}: throughput {:.2f} MiB/s, baseline {:.2f} MiB/s".format(
+                    name, result["throughput"] / (1 << 20), before["throughput"] / (1 << 20)))
+        if result.get("latency") and before.get("latency"):
+            if result["latency"]["p99"] > before["latency"]["p99"] * (1 + tolerance):
+                regressions.append("{}: p99 latency {:.2f} µs, baseline {:.2f} µs".format(
+                    name, result["latency"]["p99"], before["latency"]["p99"]))
+    return regressions
+
+
 class BenchmarkApplet(GlasgowApplet):
     logger = logging.getLogger(__name__)
     help = "evaluate communication performance"
@@ -100,21 +161,47 @@ class BenchmarkApplet(GlasgowApplet):
           on the host is measured
           (simulates cases where a transaction with the DUT relies on feedback from the host;
           also useful for comparing different usb stacks or usb data paths like hubs or network bridges)
+
+    Data is transferred in chunks of the transfer size, either until the byte count is reached,
+    or, with `--duration`, until the time runs out. In the loopback and latency modes, the queue
+    depth is the number of chunks written to the device before waiting for the first one to be
+    received back. Several transfer sizes and queue depths may be specified to run the benchmark
+    for each combination of them.
+
+    With `--pipes 2`, the benchmark runs on two pipes at once, showing how the interfaces share
+    the bandwidth of the link.
+
+    The results may be saved with `--json`, and compared with previously saved results using
+    `--baseline`; in this case, the applet fails if the throughput or the 99th percentile latency
+    regressed by more than the tolerance.
     """
 
     __all_modes = ["source", "sink", "loopback", "latency"]
 
+    @classmethod
+    def add_build_arguments(cls, parser, access):
+        super().add_build_arguments(parser, access)
+
+        parser.add_argument(
+            "--pipes", metavar="COUNT", type=int, choices=(1, 2), default=1,
+            help="run the benchmark on COUNT pipes at once (one of: 1 2, default: %(default)s)")
+
     def build(self, target, args):
-        self.mux_interface = iface = \
-            target.multiplexer.claim_interface(self, args=None, throttle="none")
-        mode,  self.__addr_mode  = target.registers.add_rw(2)
-        error, self.__addr_error = target.registers.add_ro(1)
-        count, self.__addr_count = target.registers.add_ro(32)
-        subtarget = iface.add_subtarget(BenchmarkSubtarget(
-            reg_mode=mode, reg_error=error, reg_count=count,
-            in_fifo=iface.get_in_fifo(auto_flush=False),
-            out_fifo=iface.get_out_fifo(),
-        ))
+        self.mux_interfaces = []
+        self.__addrs = []
+        for _ in range(args.pipes):
+            iface = target.multiplexer.claim_interface(self, args=None, throttle="none")
+            mode,  addr_mode  = target.registers.add_rw(2)
+            error, addr_error = target.registers.add_ro(1)
+            count, addr_count = target.registers.add_ro(32)
+            subtarget = iface.add_subtarget(BenchmarkSubtarget(
+                reg_mode=mode, reg_error=error, reg_count=count,
+                in_fifo=iface.get_in_fifo(auto_flush=False),
+                out_fifo=iface.get_out_fifo(),
+            ))
+            self.mux_interfaces.append(iface)
+            self.__addrs.append((addr_mode, addr_error, addr_count))
+        self.mux_interface = self.mux_interfaces[0]
 
         sequence = array.array("H")
         sequence.extend(subtarget.lfsr.generate())
@@ -124,120 +211,235 @@ class BenchmarkApplet(GlasgowApplet):
 
     @classmethod
     def add_run_arguments(cls, parser, access):
+        def sizes(arg):
+            return [int(size, 0) for size in arg.split(",")]
+
         parser.add_argument(
             "-c", "--count", metavar="COUNT", type=int, default=1 << 23,
             help="transfer COUNT bytes (default: %(default)s)")
+        parser.add_argument(
+            "-d", "--duration", metavar="SECONDS", type=float,
+            help="transfer data for SECONDS seconds instead of a fixed byte count")
+        parser.add_argument(
+            "-s", "--transfer-size", metavar="SIZE", type=sizes,
+            help="transfer data in chunks of SIZE bytes; may be a comma-separated list "
+                 "(default: 65536, or 512 in latency mode)")
+        parser.add_argument(
+            "-q", "--queue-depth", metavar="DEPTH", type=sizes,
+            help="keep DEPTH chunks in flight in loopback and latency modes; may be "
+                 "a comma-separated list (default: 8, or 1 in latency mode)")
+        parser.add_argument(
+            "--json", metavar="FILENAME", type=argparse.FileType("w"),
+            help="save the results as JSON to FILENAME")
+        parser.add_argument(
+            "--baseline", metavar="FILENAME", type=argparse.FileType("r"),
+            help="compare the results with JSON results in FILENAME, and fail on regressions")
+        parser.add_argument(
+            "--tolerance", metavar="PERCENT", type=float, default=10,
+            help="allow the results to be worse than the baseline by up to PERCENT percent "
+                 "(default: %(default)s)")
 
         parser.add_argument(
             dest="modes", metavar="MODE", type=str, nargs="*", choices=[[]] + cls.__all_modes,
             help="run benchmark mode MODE (default: {})".format(" ".join(cls.__all_modes)))
 
     async def run(self, device, args):
-        return await device.demultiplexer.claim_interface(self, self.mux_interface, args=None)
-
-    async def interact(self, device, args, iface):
-        golden = bytearray()
-        while len(golden) < args.count:
-            golden += self._sequence[:args.count - len(golden)]
+        ifaces = []
+        for mux_interface in self.mux_interfaces:
+            ifaces.append(await device.demultiplexer.claim_interface(
+                self, mux_interface, args=None))
+        return ifaces
+
+    def _golden(self, transfer_size):
+        # The LFSR sequence is periodic, so any chunk of the expected data is a slice of
+        # the sequence repeated enough times to cover a chunk starting at any offset in it.
+        period = len(self._sequence)
+        return period, memoryview(self._sequence * (transfer_size // period + 2))
+
+    async def _run_pipe(self, device, args, pipe, iface, mode, transfer_size, queue_depth):
+        addr_mode, addr_error, addr_count = self.__addrs[pipe]
+        period, golden = self._golden(transfer_size)
+        if args.duration is None:
+            deadline = None
+            total    = args.count
+        else:
+            deadline = time.perf_counter() + args.duration
+            total    = None
+
+        def chunks():
+            offset = 0
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                if total is not None:
+                    if offset >= total:
+                        return
+                    size = min(transfer_size, total - offset)
+                else:
+                    size = transfer_size
+                start = offset % period
+                yield golden[start:start + size]
+                offset += size
 
         # These requests are essentially free, as the data and control requests are independent,
         # both on the FX2 and on the USB bus.
         async def counter():
             while True:
                 await asyncio.sleep(0.1)
-                count = await device.read_register(self.__addr_count, width=4)
-                self.logger.debug("transferred %#x/%#x", count, args.count)
-
-        for mode in args.modes or self.__all_modes:
-            self.logger.info("running benchmark mode %s for %.3f MiB",
-                             mode, len(golden) / (1 << 20))
-
+                count = await device.read_register(addr_count, width=4)
+                self.logger.debug("pipe %d: transferred %#x", pipe, count)
+
+        await device.write_register(addr_mode,
+            (Mode.LOOPBACK if mode in ("loopback", "latency") else
+             Mode.SOURCE if mode == "source" else Mode.SINK).value)
+        await iface.reset()
+        counter_fut = asyncio.ensure_future(counter())
+
+        length  = 0
+        error   = False
+        count   = None
+        samples = []
+        try:
+            begin = time.perf_counter()
             if mode == "source":
-                await device.write_register(self.__addr_mode, Mode.SOURCE.value)
-                await iface.reset()
-
-                counter_fut = asyncio.ensure_future(counter())
-                begin  = time.time()
-                actual = await iface.read(len(golden))
-                end    = time.time()
-                length = len(golden)
-                counter_fut.cancel()
-
-                error = (actual != golden)
-                count = None
+                for expected in chunks():
+                    actual = await iface.read(len(expected))
+                    length += len(actual)
+                    if actual != expected:
+                        error = True
+                        break
 
             if mode == "sink":
-                await device.write_register(self.__addr_mode, Mode.SINK.value)
-                await iface.reset()
-
-                counter_fut = asyncio.ensure_future(counter())
-                begin  = time.time()
-                await iface.write(golden)
+                for chunk in chunks():
+                    await iface.write(chunk)
+                    length += len(chunk)
                 await iface.flush()
-                end    = time.time()
-                length = len(golden)
-                counter_fut.cancel()
-
-                error = bool(await device.read_register(self.__addr_error))
-                count = await device.read_register(self.__addr_count, width=4)
 
-            if mode == "loopback":
-                await device.write_register(self.__addr_mode, Mode.LOOPBACK.value)
-                await iface.reset()
-                counter_fut = asyncio.ensure_future(counter())
-
-                begin  = time.time()
-                await iface.write(golden)
-                actual = await iface.read(len(golden))
-                end    = time.time()
-                length = len(golden) * 2
-                counter_fut.cancel()
-
-                error = (actual != golden)
-                count = None
-
-            if mode == "latency":
-                packetmax = golden[:512]
-                count = 0
-                error = False
-                roundtriptime = []
-
-                await device.write_register(self.__addr_mode, Mode.LOOPBACK.value)
-                await iface.reset()
-                counter_fut = asyncio.ensure_future(counter())
-
-                while count < args.count:
-                    begin = time.perf_counter()
-                    await iface.write(packetmax)
-                    actual = await iface.read(len(packetmax))
-                    end = time.perf_counter()
-
-                    # calculate roundtrip time in µs
-                    roundtriptime.append((end - begin) * 1000000)
-                    if actual != packetmax:
+            if mode in ("loopback", "latency"):
+                in_flight = []
+                pending   = chunks()
+                while True:
+                    for chunk in pending:
+                        if mode == "latency":
+                            in_flight.append((chunk, time.perf_counter()))
+                        else:
+                            in_flight.append((chunk, None))
+                        await iface.write(chunk)
+                        if len(in_flight) >= queue_depth:
+                            break
+                    if not in_flight:
+                        break
+                    expected, started_at = in_flight.pop(0)
+                    actual = await iface.read(len(expected))
+                    if started_at is not None:
+                        # calculate roundtrip time in µs
+                        samples.append((time.perf_counter() - started_at) * 1000000)
+                    length += len(actual) * 2
+                    if actual != expected:
                         error = True
                         break
-                    count += len(packetmax) * 2
-
-                counter_fut.cancel()
-
-            if error:
-                if count is None:
-                    self.logger.error("mode %s failed!", mode)
-                else:
-                    self.logger.error("mode %s failed at %#x!", mode, count)
+            end = time.perf_counter()
+        finally:
+            counter_fut.cancel()
+
+        if mode == "sink":
+            error = bool(await device.read_register(addr_error))
+            count = await device.read_register(addr_count, width=4)
+
+        result = {
+            "mode":          mode,
+            "pipe":          pipe,
+            "transfer_size": transfer_size,
+            "queue_depth":   queue_depth if mode in ("loopback", "latency") else None,
+            "bytes":         length,
+            "seconds":       end - begin,
+            "throughput":    length / (end - begin) if end > begin else None,
+            "error":         error,
+        }
+        if error and count is not None:
+            result["error_at"] = count
+        if samples:
+            result["latency"] = latency_summary(samples)
+        return result
+
+    def _log_result(self, result):
+        name = "mode {mode} pipe {pipe} size {transfer_size}".format(**result)
+        if result["queue_depth"] is not None:
+            name += " depth {queue_depth}".format(**result)
+        if result["error"]:
+            if "error_at" in result:
+                self.logger.error("%s failed at %#x!", name, result["error_at"])
             else:
-                if mode == "latency":
-                    self.logger.info("mode %s: mean: %.2f µs stddev: %.2f µs worst: %.2f µs",
-                                 mode,
-                                 statistics.mean(roundtriptime),
-                                 statistics.pstdev(roundtriptime),
-                                 max(roundtriptime))
-                else:
-                    self.logger.info("mode %s: %.2f MiB/s (%.2f Mb/s)",
-                                 mode,
-                                 (length / (end - begin)) / (1 << 20),
-                                 (length / (end - begin)) / (1 << 17))
+                self.logger.error("%s failed!", name)
+        elif result.get("latency"):
+            self.logger.info("%s: mean: %.2f µs stddev: %.2f µs p50: %.2f µs p99: %.2f µs "
+                             "p99.9: %.2f µs worst: %.2f µs", name,
+                             *(result["latency"][key]
+                               for key in ("mean", "stddev", "p50", "p99", "p999", "max")))
+        elif result["throughput"] is not None:
+            self.logger.info("%s: %.2f MiB/s (%.2f Mb/s)", name,
+                             result["throughput"] / (1 << 20),
+                             result["throughput"] / (1 << 17))
+
+    async def interact(self, device, args, ifaces):
+        results = []
+        for mode in args.modes or self.__all_modes:
+            if mode == "latency":
+                transfer_sizes = args.transfer_size or [512]
+                queue_depths   = args.queue_depth or [1]
+            elif mode == "loopback":
+                transfer_sizes = args.transfer_size or [65536]
+                queue_depths   = args.queue_depth or [8]
+            else:
+                transfer_sizes = args.transfer_size or [65536]
+                queue_depths   = [None]
+
+            for transfer_size in transfer_sizes:
+                for queue_depth in queue_depths:
+                    if args.duration is None:
+                        self.logger.info("running benchmark mode %s for %.3f MiB",
+                                         mode, args.count / (1 << 20))
+                    else:
+                        self.logger.info("running benchmark mode %s for %.3f s",
+                                         mode, args.duration)
+
+                    pipe_results = await asyncio.gather(*[
+                        self._run_pipe(device, args, pipe, iface, mode,
+                                       transfer_size, queue_depth)
+                        for pipe, iface in enumerate(ifaces)
+                    ])
+                    for result in pipe_results:
+                        self._log_result(result)
+                    if (len(pipe_results) > 1 and mode != "latency" and
+                            not any(r["error"] for r in pipe_results)):
+                        seconds = max(r["seconds"] for r in pipe_results)
+                        self.logger.info("mode %s all pipes: %.2f MiB/s", mode,
+                                         sum(r["bytes"] for r in pipe_results) / seconds
+                                         / (1 << 20))
+                    results += pipe_results
+
+        if args.json:
+            json.dump({
+                "glasgow": __version__,
+                "python":  platform.python_version(),
+                "platform": platform.platform(),
+                "libusb":  "{0.major}.{0.minor}.{0.micro}.{0.nano}{0.rc}".format(
+                    usb1.getVersion()),
+                "revision": device.revision,
+                "results": results,
+            }, args.json, indent=2)
+
+        if any(result["error"] for result in results):
+            return 1
+
+        if args.baseline:
+            baseline = json.load(args.baseline)["results"]
+            regressions = compare_results(baseline, results, args.tolerance / 100)
+            for regression in regressions:
+                self.logger.error("regression: %s", regression)
+            if regressions:
+                return 1
+            self.logger.info("no regressions compared to baseline")
 
     @classmethod
     def tests(cls):
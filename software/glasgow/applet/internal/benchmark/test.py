@@ -1,8 +1,54 @@
+import unittest
+
 from ... import *
-from . import BenchmarkApplet
+from . import BenchmarkApplet, percentile, latency_summary, compare_results
+
+
+class BenchmarkStatisticsTestCase(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 1001))
+        self.assertEqual(percentile(values, 0.50), 500)
+        self.assertEqual(percentile(values, 0.99), 990)
+        self.assertEqual(percentile(values, 0.999), 999)
+        self.assertEqual(percentile(values, 1), 1000)
+        self.assertEqual(percentile([7], 0.999), 7)
+
+    def test_latency_summary(self):
+        summary = latency_summary([3, 1, 2, 4])
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 4)
+        self.assertEqual(summary["p50"], 2)
+        self.assertEqual(summary["mean"], 2.5)
+
+    def result(self, mode="source", throughput=None, p99=None, error=False):
+        result = {"mode": mode, "pipe": 0, "transfer_size": 512, "queue_depth": None,
+                  "throughput": throughput, "error": error}
+        if p99 is not None:
+            result["latency"] = {"p99": p99}
+        return result
+
+    def test_compare(self):
+        baseline = [self.result("source", throughput=100),
+                    self.result("latency", p99=100)]
+        self.assertEqual(compare_results(baseline, [
+            self.result("source", throughput=95),
+            self.result("latency", p99=105),
+            self.result("sink", throughput=1),
+        ], 0.1), [])
+        self.assertEqual(len(compare_results(baseline, [
+            self.result("source", throughput=80),
+            self.result("latency", p99=120),
+        ], 0.1)), 2)
+        self.assertEqual(compare_results(baseline, [
+            self.result("source", throughput=100, error=True),
+        ], 0.1), ["mode source pipe 0 size 512 depth None: failed"])
 
 
 class BenchmarkAppletTestCase(GlasgowAppletTestCase, applet=BenchmarkApplet):
     @synthesis_test
     def test_build(self):
         self.assertBuilds()
+
+    @synthesis_test
+    def test_build_pipes(self):
+        self.assertBuilds(args=["--pipes", "2"])
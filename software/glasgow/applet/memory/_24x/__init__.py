@@ -1,6 +1,8 @@
 import logging
 import argparse
 
+from ....support.endpoint import *
+from ....protocol.nbd import NBDMemoryServer
 from ...interface.i2c_initiator import I2CInitiatorApplet
 from ... import *
 
@@ -81,6 +83,23 @@ class Memory24xInterface:
         return True
 
 
+class Memory24xNBDServer(NBDMemoryServer):
+    def __init__(self, endpoint, logger, m24x_iface, *, size, page_size, writable, cache_size):
+        super().__init__(endpoint, logger, size=size, page_size=page_size,
+                         writable=writable, cache_pages=cache_size // page_size)
+        self._m24x_iface = m24x_iface
+
+    async def memory_read(self, address, length):
+        data = await self._m24x_iface.read(address, length)
+        if data is None:
+            raise GlasgowAppletError("memory did not acknowledge read")
+        return data
+
+    async def memory_write(self, address, data):
+        if not await self._m24x_iface.write(address, data):
+            raise GlasgowAppletError("memory did not acknowledge write")
+
+
 class Memory24xApplet(I2CInitiatorApplet):
     logger = logging.getLogger(__name__)
     help = "read and write 24-series I²C EEPROM memories"
@@ -195,6 +214,19 @@ class Memory24xApplet(I2CInitiatorApplet):
             "-f", "--file", metavar="FILENAME", type=argparse.FileType("rb"),
             help="compare memory with contents of FILENAME")
 
+        p_nbd = p_operation.add_parser(
+            "nbd", help="export memory as a Network Block Device")
+        p_nbd.add_argument(
+            "-s", "--size", metavar="SIZE", type=length, required=True,
+            help="export SIZE bytes of memory")
+        p_nbd.add_argument(
+            "-w", "--writable", default=False, action="store_true",
+            help="allow the client to write to the memory")
+        p_nbd.add_argument(
+            "--cache-size", metavar="SIZE", type=length, default=1 << 16,
+            help="cache up to SIZE bytes of memory contents (default: %(default)s)")
+        ServerEndpoint.add_argument(p_nbd, "endpoint")
+
     async def interact(self, device, args, m24x_iface):
         if args.operation == "read":
             data = await m24x_iface.read(args.address, args.length)
@@ -235,3 +267,15 @@ class Memory24xApplet(I2CInitiatorApplet):
                 self.logger.error("first differing byte at %#08x (expected %#04x, actual %#04x)",
                                   different_at, gold_byte, flash_byte)
                 raise GlasgowAppletError("verify FAIL")
+
+        if args.operation == "nbd":
+            if args.size % args.page_size != 0:
+                raise GlasgowAppletError(f"memory size {args.size} is not a multiple of page size "
+                                         f"{args.page_size}")
+
+            endpoint = await ServerEndpoint("nbd", self.logger, args.endpoint)
+            server = Memory24xNBDServer(endpoint, self.logger, m24x_iface,
+                size=args.size, page_size=args.page_size, writable=args.writable,
+                cache_size=args.cache_size)
+            while True:
+                await server.handle()
@@ -9,8 +9,10 @@ import argparse
 from amaranth import *
 
 from ....support.logging import dump_hex
+from ....support.endpoint import *
 from ....database.jedec import *
 from ....protocol.sfdp import *
+from ....protocol.nbd import NBDMemoryServer
 from ...interface.qspi_controller import QSPIControllerApplet
 from ... import *
 
@@ -236,6 +238,22 @@ class Memory25xSFDPParser(SFDPParser):
         return await self._m25x_iface.read_sfdp(offset, length)
 
 
+class Memory25xNBDServer(NBDMemoryServer):
+    def __init__(self, endpoint, logger, m25x_iface, *, size, sector_size, page_size,
+                 writable, cache_size):
+        super().__init__(endpoint, logger, size=size, page_size=sector_size,
+                         writable=writable, cache_pages=cache_size // sector_size)
+        self._m25x_iface = m25x_iface
+        self._program_page_size = page_size
+
+    async def memory_read(self, address, length):
+        return await self._m25x_iface.fast_read(address, length)
+
+    async def memory_write(self, address, data):
+        await self._m25x_iface.erase_program(address, data, self._block_size,
+                                             self._program_page_size)
+
+
 class Memory25xApplet(QSPIControllerApplet):
     logger = logging.getLogger(__name__)
     help = "read and write 25-series SPI Flash memories"
@@ -264,6 +282,11 @@ class Memory25xApplet(QSPIControllerApplet):
     The default pin assignment follows the pinouts above in the clockwise direction, making it easy
     to connect the memory with probes or, alternatively, crimp an IDC cable wired to a SOIC clip.
 
+    The `nbd` operation exports the memory as a Network Block Device, which can be accessed with
+    e.g. `nbd-client` or `qemu-nbd`. Reads are cached in sector-sized pages, and writes are
+    collected in the cache and committed (using SECTOR ERASE and PAGE PROGRAM commands) when
+    the client flushes or disconnects.
+
     It is also possible to flash 25-series flash chips using the `spi-flashrom` applet, which
     requires a third-party tool `flashrom`.
     The advantage of using the `spi-flashrom` applet is that flashrom offers compatibility with
@@ -379,6 +402,25 @@ class Memory25xApplet(QSPIControllerApplet):
             "verify", help="read memory using READ command and verify contents")
         add_program_arguments(p_verify)
 
+        p_nbd = p_operation.add_parser(
+            "nbd", help="export memory as a Network Block Device")
+        p_nbd.add_argument(
+            "-s", "--size", metavar="SIZE", type=length,
+            help="export SIZE bytes of memory (default: memory density from SFDP)")
+        p_nbd.add_argument(
+            "-S", "--sector-size", metavar="SIZE", type=length, default=4096,
+            help="erase and cache memory in SIZE byte sectors (default: %(default)s)")
+        p_nbd.add_argument(
+            "-P", "--page-size", metavar="SIZE", type=length,
+            help="program memory using SIZE byte pages (required with --writable)")
+        p_nbd.add_argument(
+            "-w", "--writable", default=False, action="store_true",
+            help="allow the client to write to the memory")
+        p_nbd.add_argument(
+            "--cache-size", metavar="SIZE", type=length, default=1 << 20,
+            help="cache up to SIZE bytes of memory contents (default: %(default)s)")
+        ServerEndpoint.add_argument(p_nbd, "endpoint")
+
     @staticmethod
     def _show_progress(done, total, status):
         if sys.stdout.isatty():
@@ -394,7 +436,7 @@ class Memory25xApplet(QSPIControllerApplet):
 
         if args.operation in ("program-page", "program",
                               "erase-sector", "erase-block", "erase-chip",
-                              "erase-program"):
+                              "erase-program") or (args.operation == "nbd" and args.writable):
             status = await m25x_iface.read_status()
             if status & MSK_PROT:
                 self.logger.warning("block protect bits are set to %s, program/erase command "
@@ -512,6 +554,34 @@ class Memory25xApplet(QSPIControllerApplet):
                 await m25x_iface.write_enable()
                 await m25x_iface.write_status(status)
 
+        if args.operation == "nbd":
+            if args.writable and args.page_size is None:
+                raise Memory25xError("page size must be specified with --page-size "
+                                     "for a writable export")
+
+            size = args.size
+            if size is None:
+                try:
+                    sfdp = await Memory25xSFDPParser(m25x_iface)
+                    for table in sfdp:
+                        if table.vendor_id == 0x00 and table.table_id == 0xff:
+                            size = table.density // 8
+                except ValueError:
+                    pass
+            if size is None:
+                raise Memory25xError("memory size is not available from SFDP; specify it "
+                                     "with --size")
+            if size % args.sector_size != 0:
+                raise Memory25xError(f"memory size {size} is not a multiple of sector size "
+                                     f"{args.sector_size}")
+
+            endpoint = await ServerEndpoint("nbd", self.logger, args.endpoint)
+            server = Memory25xNBDServer(endpoint, self.logger, m25x_iface,
+                size=size, sector_size=args.sector_size, page_size=args.page_size,
+                writable=args.writable, cache_size=args.cache_size)
+            while True:
+                await server.handle()
+
     @classmethod
     def tests(cls):
         from . import test
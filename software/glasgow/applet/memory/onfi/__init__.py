@@ -84,8 +84,10 @@ from amaranth.lib import io
 from amaranth.lib.cdc import FFSynchronizer
 
 from ....support.logging import *
+from ....support.endpoint import *
 from ....database.jedec import *
 from ....protocol.onfi import *
+from ....protocol.nbd import NBDMemoryServer
 from ... import *
 
 
@@ -402,6 +404,45 @@ class ONFIInterface:
         return (await self.read_status() & BIT_STATUS_FAIL) == 0
 
 
+class MemoryONFINBDServer(NBDMemoryServer):
+    # Only the data area of each page is exported. Since erasing a block also erases the spare
+    # area of its pages, the spare area is read before erasing and programmed back afterwards,
+    # which preserves bad block markers and any other metadata (but not its consistency with
+    # the new data; e.g. ECC bytes will not match).
+    def __init__(self, endpoint, logger, onfi_iface, *, page_count, page_size, spare_size,
+                 block_size, writable, cache_size):
+        super().__init__(endpoint, logger, size=page_count * page_size, page_size=page_size,
+                         block_size=block_size * page_size, writable=writable,
+                         cache_pages=cache_size // page_size)
+        self._onfi_iface = onfi_iface
+        self._spare_size = spare_size
+
+    async def memory_read(self, address, length):
+        chunks = []
+        for row in range(address // self._page_size, (address + length) // self._page_size):
+            chunks.append(await self._onfi_iface.read(column=0, row=row, length=self._page_size))
+        return b"".join(chunks)
+
+    async def memory_write(self, address, data):
+        first_row = address // self._page_size
+        rows      = range(first_row, first_row + self._block_size // self._page_size)
+        spares = []
+        for row in rows:
+            spares.append(await self._onfi_iface.read(column=self._page_size, row=row,
+                                                      length=self._spare_size))
+        if not await self._onfi_iface.erase(row=first_row):
+            raise GlasgowAppletError(f"failed to erase block at row {first_row}")
+        for index, (row, spare) in enumerate(zip(rows, spares)):
+            page = data[index * self._page_size:(index + 1) * self._page_size]
+            chunks = []
+            if page != b"\xff" * self._page_size:
+                chunks.append((0, page))
+            if spare != b"\xff" * self._spare_size:
+                chunks.append((self._page_size, spare))
+            if chunks and not await self._onfi_iface.program(row=row, chunks=chunks):
+                raise GlasgowAppletError(f"failed to program page (row) {row}")
+
+
 class MemoryONFIApplet(GlasgowApplet):
     preview = True
     logger = logging.getLogger(__name__)
@@ -550,6 +591,20 @@ class MemoryONFIApplet(GlasgowApplet):
             "count", metavar="COUNT", type=count, nargs="?", default=1,
             help="erase blocks containing the next COUNT pages")
 
+        p_nbd = p_operation.add_parser(
+            "nbd", help="export data area of the memory as a Network Block Device")
+        p_nbd.add_argument(
+            "-C", "--block-count", metavar="COUNT", type=count,
+            help="export COUNT blocks (default: autodetect)")
+        p_nbd.add_argument(
+            "-w", "--writable", default=False, action="store_true",
+            help="allow the client to write to the memory; this does not update ECC data "
+                 "in the spare area")
+        p_nbd.add_argument(
+            "--cache-size", metavar="SIZE", type=size, default=1 << 22,
+            help="cache up to SIZE bytes of memory contents (default: %(default)s)")
+        ServerEndpoint.add_argument(p_nbd, "endpoint")
+
     async def interact(self, device, args, onfi_iface):
         manufacturer_id, device_id = await onfi_iface.read_jedec_id()
         if manufacturer_id in (0x00, 0xff):
@@ -711,7 +766,7 @@ class MemoryONFIApplet(GlasgowApplet):
             spare_size = args.spare_size
             block_size = args.block_size
 
-        if args.operation in ("program", "erase"):
+        if args.operation in ("program", "erase") or (args.operation == "nbd" and args.writable):
             if await onfi_iface.is_write_protected():
                 self.logger.error("device is write-protected")
                 return
@@ -765,6 +820,22 @@ class MemoryONFIApplet(GlasgowApplet):
                 row   += block_size
                 count -= block_size
 
+        if args.operation == "nbd":
+            if args.block_count is not None:
+                block_count = args.block_count
+            elif onfi_param is not None:
+                block_count = onfi_param.luns_per_target * onfi_param.blocks_per_lun
+            else:
+                self.logger.error("configure the Flash array size explicitly via --block-count")
+                return
+
+            endpoint = await ServerEndpoint("nbd", self.logger, args.endpoint)
+            server = MemoryONFINBDServer(endpoint, self.logger, onfi_iface,
+                page_count=block_count * block_size, page_size=page_size, spare_size=spare_size,
+                block_size=block_size, writable=args.writable, cache_size=args.cache_size)
+            while True:
+                await server.handle()
+
     @classmethod
     def tests(cls):
         from . import test
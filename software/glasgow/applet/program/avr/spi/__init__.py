@@ -39,6 +39,8 @@ class ProgramAVRSPIInterface(ProgramAVRInterface):
         self._addr_dut_reset = addr_dut_reset
         self._extended_addr  = None
         self.erase_time      = None
+        self.poll_count      = 8
+        self.batch_size      = 256
 
     def _log(self, message, *args):
         self._logger.log(self._level, "AVR SPI: " + message, *args)
@@ -50,6 +52,14 @@ class ProgramAVRSPIInterface(ProgramAVRInterface):
         self._log("result  %s", "{:08b} {:08b} {:08b} {:08b}".format(*result))
         return result
 
+    async def _commands(self, commands):
+        # The device echoes the bytes of each instruction with a one byte delay, and does not
+        # care about the boundaries between SPI exchanges, so any number of 4-byte instructions
+        # can be issued back to back in a single exchange.
+        self._log("commands count=%d", len(commands))
+        result = await self.lower.exchange(b"".join(bytes(command) for command in commands))
+        return [result[offset:offset + 4] for offset in range(0, len(result), 4)]
+
     async def programming_enable(self):
         self._log("programming enable")
 
@@ -68,14 +78,18 @@ class ProgramAVRSPIInterface(ProgramAVRInterface):
         await self.lower.lower.device.write_register(self._addr_dut_reset, 0)
         await self.lower.delay_ms(20)
 
-    async def _is_busy(self):
+    async def _wait_ready(self):
         if self.erase_time is not None:
             self._log("wait for completion")
             await self.lower.delay_ms(self.erase_time)
-            return False
-        self._log("poll ready/busy flag")
-        _, _, _, busy = await self._command(0b1111_0000, 0b0000_0000, 0, 0)
-        return bool(busy & 1)
+            return
+        # Issue a batch of polls per round trip; once the device reports that it is ready, it
+        # stays ready, so the rest of the batch is harmless.
+        while True:
+            self._log("poll ready/busy flag count=%d", self.poll_count)
+            results = await self._commands([(0b1111_0000, 0b0000_0000, 0, 0)] * self.poll_count)
+            if any(not (busy & 1) for _, _, _, busy in results):
+                break
 
     async def read_signature(self):
         self._log("read signature")
@@ -110,7 +124,7 @@ class ProgramAVRSPIInterface(ProgramAVRInterface):
             0b1010_0000 | a,
             0,
             data)
-        while await self._is_busy(): pass
+        await self._wait_ready()
 
     async def read_lock_bits(self):
         self._log("read lock bits")
@@ -124,78 +138,162 @@ class ProgramAVRSPIInterface(ProgramAVRInterface):
             0b1110_0000,
             0,
             0b1100_0000 | data)
-        while await self._is_busy(): pass
+        await self._wait_ready()
 
     async def read_calibration(self, address):
         self._log("read calibration address %#04x", address)
         _, _, _, data = await self._command(0b0011_1000, 0b0000_0000, address, 0)
         return data
 
-    async def load_extended_address_byte(self, address):
+    def _extended_address_commands(self, address):
         extended_addr = (address >> 17) & 0xff
         if self._extended_addr != extended_addr:
             self._log("load extended address %#02x", extended_addr)
-            await self._command(0b0100_1101, 0, extended_addr, 0)
             self._extended_addr = extended_addr
+            return [(0b0100_1101, 0, extended_addr, 0)]
+        return []
+
+    async def load_extended_address_byte(self, address):
+        for command in self._extended_address_commands(address):
+            await self._command(*command)
+
+    @staticmethod
+    def _read_program_memory_command(address):
+        return (0b0010_0000 | (address & 1) << 3,
+                (address >> 9) & 0xff,
+                (address >> 1) & 0xff,
+                0)
+
+    @staticmethod
+    def _load_program_memory_page_command(address, data):
+        return (0b0100_0000 | (address & 1) << 3,
+                (address >> 9) & 0xff,
+                (address >> 1) & 0xff,
+                data)
+
+    @staticmethod
+    def _write_program_memory_page_command(address):
+        return (0b0100_1100,
+                (address >> 9) & 0xff,
+                (address >> 1) & 0xff,
+                0)
+
+    @staticmethod
+    def _read_eeprom_command(address):
+        return (0b1010_0000,
+                (address >> 8) & 0xff,
+                (address >> 0) & 0xff,
+                0)
+
+    @staticmethod
+    def _load_eeprom_page_command(address, data):
+        return (0b1100_0001,
+                (address >> 8) & 0xff,
+                (address >> 0) & 0xff,
+                data)
+
+    @staticmethod
+    def _write_eeprom_page_command(address):
+        return (0b1100_0010,
+                (address >> 8) & 0xff,
+                (address >> 0) & 0xff,
+                0)
+
+    @staticmethod
+    def _paginate(address, chunk, page_size):
+        page_mask = page_size - 1
+        offset = 0
+        while offset < len(chunk):
+            page_address = (address + offset) & ~page_mask
+            count = min(len(chunk) - offset, page_address + page_size - (address + offset))
+            yield page_address, address + offset, chunk[offset:offset + count]
+            offset += count
 
     async def read_program_memory(self, address):
         await self.load_extended_address_byte(address)
         self._log("read program memory address %#06x", address)
-        _, _, _, data = await self._command(
-            0b0010_0000 | (address & 1) << 3,
-            (address >> 9) & 0xff,
-            (address >> 1) & 0xff,
-            0)
+        _, _, _, data = await self._command(*self._read_program_memory_command(address))
+        return data
+
+    async def read_program_memory_range(self, addresses):
+        addresses = list(addresses)
+        data = bytearray()
+        for start in range(0, len(addresses), self.batch_size):
+            batch = addresses[start:start + self.batch_size]
+            self._log("read program memory range %#06x+%#x", batch[0], len(batch))
+            commands, indices = [], []
+            for address in batch:
+                commands += self._extended_address_commands(address)
+                indices.append(len(commands))
+                commands.append(self._read_program_memory_command(address))
+            results = await self._commands(commands)
+            data += bytes(results[index][3] for index in indices)
         return data
 
     async def load_program_memory_page(self, address, data):
         self._log("load program memory address %#06x data %02x", address, data)
-        await self._command(
-            0b0100_0000 | (address & 1) << 3,
-            (address >> 9) & 0xff,
-            (address >> 1) & 0xff,
-            data)
+        await self._command(*self._load_program_memory_page_command(address, data))
 
     async def write_program_memory_page(self, address):
         await self.load_extended_address_byte(address)
         self._log("write program memory page at %#06x", address)
-        await self._command(
-            0b0100_1100,
-            (address >> 9) & 0xff,
-            (address >> 1) & 0xff,
-            0)
-        while await self._is_busy(): pass
+        await self._command(*self._write_program_memory_page_command(address))
+        await self._wait_ready()
+
+    async def write_program_memory_range(self, address, chunk, page_size):
+        page_mask = page_size - 1
+        for page_address, start, data in self._paginate(address, chunk, page_size):
+            self._log("load and write program memory page at %#06x", page_address)
+            commands = [
+                self._load_program_memory_page_command((start + offset) & page_mask, byte)
+                for offset, byte in enumerate(data)
+            ]
+            commands += self._extended_address_commands(page_address)
+            commands.append(self._write_program_memory_page_command(page_address))
+            await self._commands(commands)
+            await self._wait_ready()
 
     async def read_eeprom(self, address):
         self._log("read EEPROM address %#06x", address)
-        _, _, _, data = await self._command(
-            0b1010_0000,
-            (address >> 8) & 0xff,
-            (address >> 0) & 0xff,
-            0)
+        _, _, _, data = await self._command(*self._read_eeprom_command(address))
+        return data
+
+    async def read_eeprom_range(self, addresses):
+        addresses = list(addresses)
+        data = bytearray()
+        for start in range(0, len(addresses), self.batch_size):
+            batch = addresses[start:start + self.batch_size]
+            self._log("read EEPROM range %#06x+%#x", batch[0], len(batch))
+            results = await self._commands(
+                [self._read_eeprom_command(address) for address in batch])
+            data += bytes(result[3] for result in results)
         return data
 
     async def load_eeprom_page(self, address, data):
         self._log("load EEPROM address %#06x data %02x", address, data)
-        await self._command(
-            0b1100_0001,
-            (address >> 8) & 0xff,
-            (address >> 0) & 0xff,
-            data)
+        await self._command(*self._load_eeprom_page_command(address, data))
 
     async def write_eeprom_page(self, address):
         self._log("write EEPROM page at %#06x", address)
-        await self._command(
-            0b1100_0010,
-            (address >> 8) & 0xff,
-            (address >> 0) & 0xff,
-            0)
-        while await self._is_busy(): pass
+        await self._command(*self._write_eeprom_page_command(address))
+        await self._wait_ready()
+
+    async def write_eeprom_range(self, address, chunk, page_size):
+        page_mask = page_size - 1
+        for page_address, start, data in self._paginate(address, chunk, page_size):
+            self._log("load and write EEPROM page at %#06x", page_address)
+            commands = [
+                self._load_eeprom_page_command((start + offset) & page_mask, byte)
+                for offset, byte in enumerate(data)
+            ]
+            commands.append(self._write_eeprom_page_command(page_address))
+            await self._commands(commands)
+            await self._wait_ready()
 
     async def chip_erase(self):
         self._log("chip erase")
         await self._command(0b1010_1100, 0b1000_0000, 0, 0)
-        while await self._is_busy(): pass
+        await self._wait_ready()
 
 
 class ProgramAVRSPIApplet(ProgramAVRApplet):
@@ -15,6 +15,12 @@
 #
 # No partial reprogram functionality is provided because it requires knowing the erase block map.
 # In the future, a database may be used to provide these.
+#
+# The bootloader handles one command at a time, and is not documented to buffer commands received
+# while it is busy, so commands are never sent ahead of the response to the previous one. Instead,
+# the round trips are minimized: each command is issued as soon as the previous response arrives,
+# a page program command is sent together with the status poll that follows it, and the programmed
+# pages are verified in one pass after all of them are programmed.
 
 import logging
 import argparse
@@ -40,6 +46,8 @@ BAUD_RATES = {
 
 PAGE_SIZE = 0x100
 
+EMPTY_PAGE = b"\xff" * PAGE_SIZE
+
 
 class Command(enum.IntEnum):
     # Flash array commands.
@@ -173,10 +181,12 @@ class ProgramM16CInterface:
         await self.lower.write([BAUD_RATES[baud_rate]])
         async def response():
             new_baud, = await self.lower.read(1)
-            assert new_baud == BAUD_RATES[baud_rate]
+            return new_baud
         try:
-            return await asyncio.wait_for(response(), timeout=self.timeout)
+            new_baud = await asyncio.wait_for(response(), timeout=self.timeout)
         except asyncio.TimeoutError:
+            new_baud = None
+        if new_baud != BAUD_RATES[baud_rate]:
             raise M16CBootloaderError(f"bootloader does not support baud rate {baud_rate}")
 
     async def bootloader_version(self):
@@ -185,7 +195,7 @@ class ProgramM16CInterface:
         async def response():
             version = await self.lower.read(8)
             self._log("response version=<%s>", version.hex())
-            return str(version, encoding="ASCII")
+            return str(version, encoding="ASCII", errors="replace")
         try:
             return await asyncio.wait_for(response(), timeout=self.timeout)
         except asyncio.TimeoutError:
@@ -203,10 +213,14 @@ class ProgramM16CInterface:
         except asyncio.TimeoutError:
             raise M16CBootloaderError("command timeout")
 
-    async def _bootloader_poll_status(self, timeout):
+    async def _bootloader_poll_status(self, timeout, *, sent=False):
+        # If `sent` is true, the first read-status command has already been sent together with
+        # the command whose completion is being awaited.
         while timeout >= 0:
-            self._log("command read-status")
-            await self.lower.write([Command.READ_STATUS])
+            if not sent:
+                self._log("command read-status")
+                await self.lower.write([Command.READ_STATUS])
+            sent = False
             async def response():
                 srd1, srd2 = await self.lower.read(2)
                 self._log("response srd1=%s srd2=%s", f"{srd1:08b}", f"{srd2:08b}")
@@ -261,23 +275,44 @@ class ProgramM16CInterface:
         except asyncio.TimeoutError:
             raise M16CBootloaderError(f"cannot read page {address:06x}")
 
+    async def read_pages(self, address, count):
+        """Read ``count`` consecutive pages starting at ``address``, yielding the address and
+        the data of each page as it arrives."""
+        assert address % PAGE_SIZE == 0
+        for page_address in range(address, address + count * PAGE_SIZE, PAGE_SIZE):
+            yield page_address, await self.read_page(page_address)
+
     async def program_page(self, address, data):
         assert address % PAGE_SIZE == 0 and len(data) == PAGE_SIZE
         self._log("command program-page page=%04x data=<%s>",
                   (address >> 8) & 0xFFFF, dump_hex(data))
-        await self.lower.write([Command.CLEAR_STATUS, Command.PROGRAM_PAGE])
-        await self.lower.write([
+        self._log("command read-status")
+        await self.lower.write(bytes([
+            Command.CLEAR_STATUS, Command.PROGRAM_PAGE,
             (address >> 8)  & 0xFF,
             (address >> 16) & 0xFF,
-        ])
-        await self.lower.write(data)
-        try:
-            srd1, srd2 = await self._bootloader_poll_status(1.0)
-            assert (srd1 & ST_READY) != 0
-            if (srd1 & ST_PROGRAM_FAIL) != 0:
-                raise M16CBootloaderError(f"cannot program page {address:06x}")
-        except asyncio.TimeoutError:
+            *data,
+            Command.READ_STATUS
+        ]))
+        status = await self._bootloader_poll_status(1.0, sent=True)
+        if status is None:
             raise M16CBootloaderError("page program timeout")
+        srd1, srd2 = status
+        if (srd1 & ST_READY) == 0 or (srd1 & ST_PROGRAM_FAIL) != 0:
+            raise M16CBootloaderError(f"cannot program page {address:06x}")
+
+    async def program_pages(self, address, data, *, skip_empty=True):
+        """Program ``data`` starting at ``address``, yielding the address of each page as it
+        is programmed. If ``skip_empty`` is true, pages that are entirely erased (filled with
+        ``0xFF``) are not programmed; an erased page already contains this data."""
+        assert address % PAGE_SIZE == 0 and len(data) % PAGE_SIZE == 0
+        for offset in range(0, len(data), PAGE_SIZE):
+            page_data = data[offset:offset + PAGE_SIZE]
+            if skip_empty and page_data == EMPTY_PAGE:
+                self._log("skip empty page=%04x", ((address + offset) >> 8) & 0xFFFF)
+                continue
+            await self.program_page(address + offset, page_data)
+            yield address + offset
 
     async def erase_block(self, address):
         assert address % PAGE_SIZE == 0
@@ -362,8 +397,9 @@ class ProgramM16CApplet(GlasgowApplet):
         access.add_run_arguments(parser)
 
         parser.add_argument(
-            "-b", "--baud", metavar="RATE", type=int, default=9600, choices=BAUD_RATES.keys(),
-            help="set baud rate to RATE bits per second (default: %(default)s)")
+            "-b", "--baud", metavar="RATE", type=int, default=None, choices=BAUD_RATES.keys(),
+            help="set baud rate to RATE bits per second (default: highest rate supported by "
+                 "the bootloader)")
 
     async def run(self, device, args):
         iface = await device.demultiplexer.claim_interface(self, self.mux_interface, args)
@@ -430,36 +466,70 @@ class ProgramM16CApplet(GlasgowApplet):
             "address", metavar="ADDRESS", type=page_address,
             help="erase block at address ADDRESS, which must be page-aligned")
 
-    async def interact(self, device, args, iface):
-        try:
-            await device.write_register(
-                self.__addr_bit_cyc, self.__bit_cyc_for_baud[9600], width=3)
-            await iface.sync_bootloader()
-            self.logger.info("bootloader identification %s", await iface.bootloader_version())
+    async def _enter_bootloader(self, device, iface, args, *, verbose=True):
+        await device.write_register(
+            self.__addr_bit_cyc, self.__bit_cyc_for_baud[9600], width=3)
+        await iface.sync_bootloader()
+        version = await iface.bootloader_version()
+        if verbose:
+            self.logger.info("bootloader identification %s", version)
 
-            is_locked = await iface.is_bootloader_locked()
+        is_locked = await iface.is_bootloader_locked()
+        if verbose:
             self.logger.info("bootloader is %s", "locked" if is_locked else "unlocked")
 
-            if is_locked:
-                for key in args.key or [b"\xff" * 7, b"\x00" * 7]:
-                    # Hardcode M16C key address for now.
-                    if await iface.unlock_bootloader(key, address=0x0FFFDF):
+        if is_locked:
+            for key in args.key or [b"\xff" * 7, b"\x00" * 7]:
+                # Hardcode M16C key address for now.
+                if await iface.unlock_bootloader(key, address=0x0FFFDF):
+                    if verbose:
                         self.logger.info("unlocked with key %s", key.hex())
-                        break
-                    else:
-                        self.logger.info("failed to unlock with key %s", key.hex())
+                    break
                 else:
-                    raise M16CBootloaderError("cannot unlock bootloader")
+                    if verbose:
+                        self.logger.info("failed to unlock with key %s", key.hex())
+            else:
+                raise M16CBootloaderError("cannot unlock bootloader")
+
+        return version
+
+    async def _set_baud(self, device, iface, baud_rate, version):
+        await iface.bootloader_set_baud(baud_rate)
+        await device.write_register(
+            self.__addr_bit_cyc, self.__bit_cyc_for_baud[baud_rate], width=3)
+        # Make sure the link works at the new baud rate by repeating a command with a known
+        # response.
+        if await iface.bootloader_version() != version:
+            raise M16CBootloaderError(f"communication at baud rate {baud_rate} is unreliable")
+
+    async def _negotiate_baud(self, device, iface, args, version):
+        # Try the baud rates from the highest to the lowest. After a failure, it is not known which
+        # baud rate the bootloader is using, so it is reset to get back to 9600 baud.
+        for baud_rate in sorted(BAUD_RATES, reverse=True):
+            if baud_rate == 9600:
+                break
+            try:
+                await self._set_baud(device, iface, baud_rate, version)
+                break
+            except M16CBootloaderError as error:
+                self.logger.debug("%s", error)
+                await self._enter_bootloader(device, iface, args, verbose=False)
+        self.logger.info("using baud rate %d", baud_rate)
+
+    async def interact(self, device, args, iface):
+        try:
+            version = await self._enter_bootloader(device, iface, args)
 
-            if args.baud != 9600:
-                await iface.bootloader_set_baud(args.baud)
-                await device.write_register(
-                    self.__addr_bit_cyc, self.__bit_cyc_for_baud[args.baud], width=3)
+            if args.baud is None:
+                await self._negotiate_baud(device, iface, args, version)
+            elif args.baud != 9600:
+                await self._set_baud(device, iface, args.baud, version)
 
             if args.operation == "read":
-                for address in range(args.address, args.address + args.length, PAGE_SIZE):
+                async for address, page_data in \
+                        iface.read_pages(args.address, args.length // PAGE_SIZE):
                     self.logger.info("reading page %0.*x", 5, address)
-                    args.file.write(await iface.read_page(address))
+                    args.file.write(page_data)
 
             if args.operation == "program":
                 firmware = args.file.read()
@@ -467,13 +537,16 @@ class ProgramM16CApplet(GlasgowApplet):
                     raise M16CBootloaderError("file size ({}) is not a multiple of page size"
                                               .format(len(firmware)))
 
-                for offset in range(0, len(firmware), PAGE_SIZE):
-                    address   = args.address + offset
-                    page_data = firmware[offset:offset + PAGE_SIZE]
+                async for address in iface.program_pages(args.address, firmware):
+                    self.logger.info("programmed page %0.*x", 5, address)
 
-                    self.logger.info("programming page %0.*x", 5, address)
-                    await iface.program_page(address, page_data)
-                    if await iface.read_page(address) != page_data:
+                # Empty pages are verified as well, since they are only skipped on the assumption
+                # that the array has been erased.
+                async for address, page_data in \
+                        iface.read_pages(args.address, len(firmware) // PAGE_SIZE):
+                    self.logger.info("verifying page %0.*x", 5, address)
+                    offset = address - args.address
+                    if page_data != firmware[offset:offset + PAGE_SIZE]:
                         raise M16CBootloaderError("verifying page {:0{}x} failed"
                                                   .format(address, 5))
 
@@ -1,6 +1,110 @@
+import asyncio
+import logging
+import unittest
+
 from ... import *
-from . import ProgramM16CApplet
+from . import (ProgramM16CApplet, ProgramM16CInterface, M16CBootloaderError, Command,
+               BAUD_RATES, PAGE_SIZE, ST_READY, ST_PROGRAM_FAIL)
+
+
+class _MockBootloader:
+    """Executes bootloader commands written to it against a memory array."""
+    def __init__(self, memory, baud_rates=BAUD_RATES):
+        self.memory    = memory
+        self.baud_rate = 9600
+        self._bauds    = {code: rate for rate, code in baud_rates.items()}
+        self._output   = bytearray()
+        self._parser   = self._parse()
+        self.commands  = []
+        self.writes    = 0
+        next(self._parser)
+
+    def _parse(self):
+        srd1 = ST_READY
+        while True:
+            command = yield
+            self.commands.append(command)
+            if command in self._bauds:
+                self.baud_rate = self._bauds[command]
+                self._output.append(command)
+            elif command in BAUD_RATES.values():
+                pass # unsupported baud rates are ignored
+            elif command == Command.VERSION:
+                self._output += b"VER.1.00"
+            elif command == Command.READ_STATUS:
+                self._output += bytes([srd1, 0b0000_11_00])
+            elif command == Command.CLEAR_STATUS:
+                srd1 = ST_READY
+            elif command == Command.READ_PAGE:
+                page = (yield) | ((yield) << 8)
+                self._output += self.memory[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+            elif command == Command.PROGRAM_PAGE:
+                page = (yield) | ((yield) << 8)
+                for offset in range(PAGE_SIZE):
+                    byte = yield
+                    self.memory[page * PAGE_SIZE + offset] &= byte
+                    if self.memory[page * PAGE_SIZE + offset] != byte:
+                        srd1 |= ST_PROGRAM_FAIL
+            else:
+                assert False, f"unexpected command {command:#04x}"
+
+    async def write(self, data):
+        self.writes += 1
+        for byte in data:
+            self._parser.send(byte)
+
+    async def read(self, length):
+        if len(self._output) < length:
+            await asyncio.sleep(10) # never responds
+        data, self._output = self._output[:length], self._output[length:]
+        return bytes(data)
+
+
+class ProgramM16CInterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.memory = bytearray(b"\xff" * PAGE_SIZE * 8)
+        self.lower  = _MockBootloader(self.memory)
+        self.iface  = ProgramM16CInterface(self.lower, logging.getLogger(__name__),
+                                           addr_reset=None, addr_mode=None, timeout=0.1)
+
+    def run_case(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def test_read_pages(self):
+        self.memory[:] = bytes(range(256)) * 8
+        async def case():
+            return [item async for item in self.iface.read_pages(0x200, 3)]
+        self.assertEqual(self.run_case(case()), [
+            (0x200, bytes(range(256))),
+            (0x300, bytes(range(256))),
+            (0x400, bytes(range(256))),
+        ])
+
+    def test_program_pages(self):
+        data = bytes(range(256)) + b"\xff" * PAGE_SIZE + bytes(PAGE_SIZE)
+        async def case():
+            return [address async for address in self.iface.program_pages(0x100, data)]
+        self.assertEqual(self.run_case(case()), [0x100, 0x300])
+        self.assertEqual(self.memory[0x100:0x400], data)
+        # The status poll is sent together with the page.
+        self.assertEqual(self.lower.writes, 2)
+
+    def test_program_fail(self):
+        self.memory[0x100] = 0x00
+        async def case():
+            await self.iface.program_page(0x100, b"\x01" * PAGE_SIZE)
+        with self.assertRaisesRegex(M16CBootloaderError, r"cannot program page 000100"):
+            self.run_case(case())
+
+    def test_set_baud(self):
+        self.run_case(self.iface.bootloader_set_baud(115200))
+        self.assertEqual(self.lower.baud_rate, 115200)
 
+    def test_set_baud_unsupported(self):
+        self.iface.lower = self.lower = _MockBootloader(self.memory, baud_rates={9600: 0xB0})
+        with self.assertRaisesRegex(M16CBootloaderError, r"does not support baud rate 115200"):
+            self.run_case(self.iface.bootloader_set_baud(115200))
+        self.assertEqual(self.lower.baud_rate, 9600)
 
 class ProgramM16CAppletTestCase(GlasgowAppletTestCase, applet=ProgramM16CApplet):
     @synthesis_test
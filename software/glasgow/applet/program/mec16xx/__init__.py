@@ -15,13 +15,17 @@ import textwrap
 from ....support.aobject import *
 from ....arch.arc import *
 from ....arch.arc.mec16xx import *
-from ...debug.arc import DebugARCApplet
+from ...debug.arc import DebugARCApplet, ARCDebugError
 from ... import *
 
 
 FLASH_SIZE_MAX = 0x40_000
 EEPROM_SIZE = 2048
 
+# Number of ARC debug transactions submitted at once when reading or programming memory. Each batch
+# costs one round trip, and the status of the Flash controller is only checked after each batch.
+BATCH_SIZE = 256
+
 
 class MEC16xxError(GlasgowAppletError):
     pass
@@ -46,9 +50,15 @@ class MEC16xxInterface(aobject):
 
     async def read_firmware_mapped(self, size):
         words = []
-        for offset in range(0, size, 4):
-            self._log("read firmware mapped offset=%05x", offset)
-            words.append(await self.lower.read(offset, space="memory"))
+        for chunk_offset in range(0, size, BATCH_SIZE * 4):
+            self._log("read firmware mapped offset=%05x", chunk_offset)
+            chunk_count = (min(size, chunk_offset + BATCH_SIZE * 4) - chunk_offset + 3) // 4
+            try:
+                words += await self.lower.read_block(chunk_offset, chunk_count, space="memory")
+            except ARCDebugError as error:
+                self._log("retry firmware mapped offset=%05x: %s", chunk_offset, error)
+                for offset in range(chunk_offset, chunk_offset + chunk_count * 4, 4):
+                    words.append(await self.lower.read(offset, space="memory"))
         return words
 
     async def emergency_mass_erase(self):
@@ -203,48 +213,80 @@ class MEC16xxInterface(aobject):
                                    % (fail_msg,
                                       flash_status.bits_repr(omit_zero=True)))
 
+    async def _read_flash_word(self, address):
+        await self._flash_command(mode=Flash_Mode_Read, address=address)
+        data_1 = await self.lower.read(Flash_Data_addr, space="memory")
+        self._log("read Flash_Address=%05x Flash_Data=%08x", address, data_1)
+
+        # This is hella cursed. In theory, we should be able to just enable Burst in
+        # Flash_Command and do a long series of reads from Flash_Data. However, sometimes
+        # we silently get zeroes back for no discernible reason. Since data never gets
+        # corrupted during programming, the most likely explanation is a silicon bug where
+        # the debug interface is not correctly waiting for the Flash memory to acknowledge
+        # the read.
+        await self.lower.write(Flash_Address_addr, address, space="memory")
+        data_2 = await self.lower.read(Flash_Data_addr, space="memory")
+        self._log("read Flash_Address=%05x Flash_Data=%08x", address, data_2)
+
+        if data_1 == data_2:
+            return data_1
+
+        # Third time's the charm.
+        await self.lower.write(Flash_Address_addr, address, space="memory")
+        data_3 = await self.lower.read(Flash_Data_addr, space="memory")
+        self._log("read Flash_Address=%05x Flash_Data=%08x", address, data_3)
+
+        self._logger.warning("read glitch Flash_Address=%05x Flash_Data=%08x/%08x/%08x",
+                             address, data_1, data_2, data_3)
+
+        if data_1 == data_2:
+            return data_1
+        elif data_2 == data_3:
+            return data_2
+        elif data_1 == data_3:
+            return data_3
+        else:
+            raise MEC16xxError("cannot select a read by majority")
+
     async def read_flash(self, address, count):
         await self._flash_clean_start()
+        await self._flash_command(mode=Flash_Mode_Read, address=address)
         words = []
-        for offset in range(count):
-            await self._flash_command(mode=Flash_Mode_Read, address=address + offset * 4)
-            data_1 = await self.lower.read(Flash_Data_addr, space="memory")
-            self._log("read Flash_Address=%05x Flash_Data=%08x",
-                      address + offset * 4, data_1)
-
-            # This is hella cursed. In theory, we should be able to just enable Burst in
-            # Flash_Command and do a long series of reads from Flash_Data. However, sometimes
-            # we silently get zeroes back for no discernible reason. Since data never gets
-            # corrupted during programming, the most likely explanation is a silicon bug where
-            # the debug interface is not correctly waiting for the Flash memory to acknowledge
-            # the read.
-            await self.lower.write(Flash_Address_addr, address + offset * 4, space="memory")
-            data_2 = await self.lower.read(Flash_Data_addr, space="memory")
-            self._log("read Flash_Address=%05x Flash_Data=%08x",
-                      address + offset * 4, data_2)
-
-            if data_1 == data_2:
-                data = data_1
-            else:
-                # Third time's the charm.
-                await self.lower.write(Flash_Address_addr, address + offset * 4, space="memory")
-                data_3 = await self.lower.read(Flash_Data_addr, space="memory")
-                self._log("read Flash_Address=%05x Flash_Data=%08x",
-                          address + offset * 4, data_3)
-
-                self._logger.warning("read glitch Flash_Address=%05x Flash_Data=%08x/%08x/%08x",
-                                     address + offset * 4, data_1, data_2, data_3)
-
-                if data_1 == data_2:
-                    data = data_1
-                elif data_2 == data_3:
-                    data = data_2
-                elif data_1 == data_3:
-                    data = data_3
+        for chunk_offset in range(0, count, BATCH_SIZE // 4):
+            # Each word is read twice, the same way as in `_read_flash_word`, but without waiting
+            # for the transactions to complete. Only the words where the transactions failed or
+            # the reads disagree are read again, one transaction at a time.
+            async with self.lower.batch() as batch:
+                reads = []
+                for offset in range(chunk_offset, min(count, chunk_offset + BATCH_SIZE // 4)):
+                    word_address = address + offset * 4
+                    txns = []
+                    for _ in range(2):
+                        txns.append(batch.write(Flash_Address_addr, word_address, space="memory"))
+                        txns.append(batch.read(Flash_Data_addr, space="memory"))
+                    reads.append((word_address, txns))
+
+            retry = []
+            suspect = False
+            for word_address, txns in reads:
+                if suspect or any(txn.exception() is not None for txn in txns):
+                    # Once a transaction has not completed in time, the transactions after it
+                    # may have been performed with the wrong arguments, or not at all; e.g. if
+                    # a write to Flash_Address is lost, both reads return the same stale data.
+                    suspect = True
+                    retry.append((len(words), word_address))
+                    words.append(None)
+                elif txns[1].result() != txns[3].result():
+                    self._log("read Flash_Address=%05x Flash_Data=%08x/%08x",
+                              word_address, txns[1].result(), txns[3].result())
+                    retry.append((len(words), word_address))
+                    words.append(None)
                 else:
-                    raise MEC16xxError("cannot select a read by majority")
+                    words.append(txns[1].result())
 
-            words.append(data)
+            for index, word_address in retry:
+                self._log("retry Flash_Address=%05x", word_address)
+                words[index] = await self._read_flash_word(word_address)
         await self._flash_command(mode=Flash_Mode_Standby)
         return words
 
@@ -284,13 +326,46 @@ class MEC16xxInterface(aobject):
             address += page_size
             size_bytes -= page_size
 
-    async def program_flash(self, address, words):
-        await self._flash_clean_start()
-        await self._flash_command(mode=Flash_Mode_Program, address=address, burst=1)
+    async def _program_flash_words(self, address, words):
         for offset, data in enumerate(words):
             await self._flash_wait_for_data_not_full()
             await self.lower.write(Flash_Data_addr, data, space="memory")
             self._log("program Flash_Address=%05x Flash_Data=%08x", address + offset * 4, data)
+
+    async def program_flash(self, address, words):
+        await self._flash_clean_start()
+        await self._flash_command(mode=Flash_Mode_Program, address=address, burst=1)
+        for chunk_offset in range(0, len(words), BATCH_SIZE):
+            # A JTAG transaction takes longer than programming a word, so the Flash controller
+            # does not have to be polled for Data_Full before each word is written. If it
+            # overflows anyway, the controller or the transaction reports an error, which is
+            # detected at the end of the burst.
+            async with self.lower.batch() as batch:
+                writes = []
+                for offset, data in enumerate(words[chunk_offset:chunk_offset + BATCH_SIZE],
+                                              start=chunk_offset):
+                    self._log("program Flash_Address=%05x Flash_Data=%08x",
+                              address + offset * 4, data)
+                    writes.append(batch.write(Flash_Data_addr, data, space="memory"))
+            failed = [offset for offset, write in enumerate(writes, start=chunk_offset)
+                      if write.exception() is not None]
+            if failed:
+                # The transaction has most likely not completed by the time its status was
+                # captured, which happens at high TCK frequencies. Restart the burst at the first
+                # word that may not have been programmed, and program the rest of the words one
+                # at a time, waiting for each transaction to complete.
+                resume_address = address + failed[0] * 4
+                self._logger.warning("programming Flash_Address=%05x did not complete; "
+                                     "continuing one word at a time", resume_address)
+                await self._flash_clean_start()
+                await self._flash_command(mode=Flash_Mode_Program, address=resume_address,
+                                          burst=1)
+                await self._program_flash_words(resume_address, words[failed[0]:])
+                break
+            await self._flash_wait_for_data_not_full(
+                "programming Flash_Address=%05x..%05x failed"
+                % (address + chunk_offset * 4,
+                   address + (chunk_offset + len(writes)) * 4))
         await self._flash_wait_for_not_busy()
         await self._flash_command(mode=Flash_Mode_Standby)
 
@@ -475,7 +550,7 @@ class ProgramMEC16xxApplet(DebugARCApplet):
             help="force reading the flash even if it would result in an incomplete image due to security settings")
         p_read_flash.add_argument(
             "-b", "--burst", action='store_true',
-            help="use burst read for speed. this may be unreliable on some MEC16xx variants")
+            help="use Flash controller burst read. this may be unreliable on some MEC16xx variants")
         p_read_flash.add_argument(
             "file", metavar="FILE", type=argparse.FileType("wb"),
             help="write flash binary image to FILE")
@@ -580,8 +655,7 @@ class ProgramMEC16xxApplet(DebugARCApplet):
                 self.logger.warning("beware that burst has been observed to not work correctly in the past on some MEC16xx variants")
                 words = await mec_iface.read_flash_burst(starting_address, (real_size_bytes + 3) // 4)
             else:
-                self.logger.info("this may take many minutes. consider trying higher jtag clock speeds (e.g. '-f 4000'), and consider trying '--burst'. "
-                                 "beware that burst has been observed to not work correctly in the past on some MEC16xx variants")
+                self.logger.info("this may take a few minutes. consider trying higher jtag clock speeds (e.g. '-f 4000')")
                 words = await mec_iface.read_flash(starting_address, (real_size_bytes + 3) // 4)
             await mec_iface.enable_flash_access(enabled=False)
 
@@ -676,3 +750,8 @@ class ProgramMEC16xxApplet(DebugARCApplet):
                 Boot_Block = {flash_status.Boot_Block}
                 Data_Block = {flash_status.Data_Block}
                 EEPROM_Block = {await mec_iface.is_eeprom_blocked()}"""))
+
+    @classmethod
+    def tests(cls):
+        from . import test
+        return test.ProgramMEC16xxAppletTestCase
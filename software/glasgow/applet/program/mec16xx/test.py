@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import unittest
+
+from ....arch.jtag import *
+from ....arch.arc import *
+from ....arch.arc.mec16xx import *
+from ...debug.arc import ARCDebugInterface, ARCDebugError
+from ...debug.arc.test import MockARCTAP
+from ... import *
+from . import MEC16xxInterface, MEC16xxError, ProgramMEC16xxApplet, FLASH_SIZE_MAX
+
+
+class _MockFlashController:
+    """Model of the MEC16xx Flash controller, as seen from the ARC memory space."""
+    def __init__(self, size=FLASH_SIZE_MAX):
+        self.words   = [0xffffffff] * (size // 4)
+        self.command = Flash_Command()
+        self.address = 0
+        self.latch   = 0
+        self.status  = Flash_Status()
+        # Address => number of times the read of this address silently returns zero.
+        self.glitches = {}
+
+    def _latch(self):
+        if self.glitches.get(self.address, 0) > 0:
+            self.glitches[self.address] -= 1
+            self.latch = 0
+        else:
+            self.latch = self.words[self.address // 4]
+
+    def read(self, address):
+        if address < len(self.words) * 4:
+            return self.words[address // 4]
+        if address == Flash_Status_addr:
+            return self.status.to_int()
+        if address == Flash_Data_addr:
+            assert self.command.Flash_Mode == Flash_Mode_Read
+            data = self.latch
+            if self.command.Burst:
+                self.address += 4
+                self._latch()
+            return data
+        assert False, f"unexpected read {address:08x}"
+
+    def write(self, address, data):
+        if address == Flash_Config_addr:
+            pass
+        elif address == Flash_Status_addr:
+            self.status = Flash_Status.from_int(self.status.to_int() & ~data)
+        elif address == Flash_Command_addr:
+            self.command = Flash_Command.from_int(data)
+        elif address == Flash_Address_addr:
+            self.address = data
+            if self.command.Flash_Mode == Flash_Mode_Read:
+                self._latch()
+            elif self.command.Flash_Mode == Flash_Mode_Erase:
+                if data == 0b11111 << 19:
+                    self.words = [0xffffffff] * len(self.words)
+                else:
+                    for index in range(data // 4, (data + 2048) // 4):
+                        self.words[index] = 0xffffffff
+        elif address == Flash_Data_addr:
+            if self.command.Flash_Mode != Flash_Mode_Program:
+                self.status.CMD_Err = 1
+            else:
+                self.words[self.address // 4] &= data
+                if self.command.Burst:
+                    self.address += 4
+        else:
+            assert False, f"unexpected write {address:08x}"
+
+
+class MEC16xxInterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.flash = _MockFlashController()
+        self.tap   = MockARCTAP(self.flash)
+        logger = logging.getLogger(__name__)
+        self.iface = self.run_case(MEC16xxInterface(ARCDebugInterface(self.tap, logger), logger))
+        self.tap.round_trips = 0
+
+    def run_case(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def fill(self, count):
+        for index in range(count):
+            self.flash.words[index] = (index * 0x01010101 + 0x12345678) & 0xffffffff
+
+    def test_read_flash(self):
+        self.fill(1024)
+        self.assertEqual(self.run_case(self.iface.read_flash(0, 1024)), self.flash.words[:1024])
+        self.assertLess(self.tap.round_trips, 20)
+
+    def test_read_flash_glitch(self):
+        self.fill(256)
+        self.flash.glitches = {0x40: 1, 0x84: 1}
+        self.assertEqual(self.run_case(self.iface.read_flash(0, 256)), self.flash.words[:256])
+        self.assertEqual(self.flash.glitches, {0x40: 0, 0x84: 0})
+
+    def test_read_flash_stall(self):
+        self.fill(256)
+        self.tap.stalls = {self.tap.txns + 100, self.tap.txns + 600}
+        self.assertEqual(self.run_case(self.iface.read_flash(0, 256)), self.flash.words[:256])
+
+    def test_read_flash_slow(self):
+        self.fill(256)
+        # Five transactions set up the Flash controller, and each word takes four. The second
+        # read of word 4 is slow, and both of the writes to Flash_Address for word 5 are lost,
+        # so both reads of word 5 return the data of word 4.
+        base = self.tap.txns + 5
+        self.tap.slow    = {base + 4 * 4 + 3}
+        self.tap.dropped = {base + 4 * 5, base + 4 * 5 + 2}
+        self.assertEqual(self.run_case(self.iface.read_flash(0, 256)), self.flash.words[:256])
+
+    def test_read_firmware_mapped(self):
+        self.fill(600)
+        self.tap.stalls = {self.tap.txns + 10}
+        self.assertEqual(self.run_case(self.iface.read_firmware_mapped(600 * 4)),
+                         self.flash.words[:600])
+
+    def test_read_firmware_mapped_slow(self):
+        self.fill(600)
+        self.tap.slow = {self.tap.txns + 300}
+        self.assertEqual(self.run_case(self.iface.read_firmware_mapped(600 * 4)),
+                         self.flash.words[:600])
+
+    def test_program_flash(self):
+        words = [(index * 0x02030405) & 0xffffffff for index in range(1000)]
+        self.run_case(self.iface.program_flash(0x1000, words))
+        self.assertEqual(self.flash.words[0x400:0x400 + 1000], words)
+        self.assertEqual(self.flash.words[0x3ff], 0xffffffff)
+        self.assertEqual(self.flash.words[0x400 + 1000], 0xffffffff)
+        self.assertLess(self.tap.round_trips, 30)
+
+    def test_program_flash_slow(self):
+        # The transaction writing the third word is still in progress when its status is
+        # captured; the rest of the words are programmed one at a time.
+        words = [(index * 0x02030405) & 0xffffffff for index in range(300)]
+        self.tap.slow = {self.tap.txns + 7}
+        self.run_case(self.iface.program_flash(0, words))
+        self.assertEqual(self.flash.words[:300], words)
+        self.assertEqual(self.flash.words[300], 0xffffffff)
+        self.assertGreater(self.tap.round_trips, 300)
+
+    def test_program_flash_error(self):
+        # The transaction writing the third word fails, and so does the slow path.
+        self.tap.stalls = set(range(self.tap.txns + 7, self.tap.txns + 100))
+        with self.assertRaisesRegex(ARCDebugError, r"transaction failed"):
+            self.run_case(self.iface.program_flash(0, [0] * 10))
+
+class ProgramMEC16xxAppletTestCase(GlasgowAppletTestCase, applet=ProgramMEC16xxApplet):
+    @synthesis_test
+    def test_build(self):
+        self.assertBuilds()
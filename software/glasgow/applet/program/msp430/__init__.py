@@ -0,0 +1,442 @@
+# Ref: MSP430™ Programming With the JTAG Interface
+# Accession: G00038
+
+# The algorithms below follow the ones given in G00038 for the 1xx/2xx/4xx families (the ones with
+# JTAG ID 0x89), and so only devices with a 16-bit address bus (the "430" core) are supported.
+#
+# Every memory access in these algorithms is a sequence of IR and DR scans interleaved with TCLK
+# edges. None of the scans that write memory need to be read back, and the scans that read memory
+# can be read back later, so blocks of memory are transferred by sending the sequences for every
+# word in the block at once, with only one round trip at the end. The long TCLK strobe sequences
+# required by the Flash timing generator are performed by the probe as a single burst, with TCLK
+# toggled once per TCK cycle.
+#
+# The Flash timing generator is clocked from TCLK, which must be between 257 kHz and 476 kHz
+# during erase and programming. TCLK runs at 1/6 of the SBW clock frequency, so the default
+# frequency of 2.1 MHz results in TCLK of 350 kHz.
+#
+# Information memory segment A of the 2xx family contains calibration data; it is protected by
+# the LOCKA bit, which is never changed by this applet.
+
+import logging
+import argparse
+import struct
+
+from ....support.bits import *
+from ....arch.msp430.jtag import *
+from ....database.ti.msp430 import *
+from ...interface.sbw_probe import SpyBiWireProbeApplet
+from ... import *
+
+
+JTAG_ID_MSP430  = 0x89
+
+# JTAG control signal values.
+CNTRL_SIG_READ  = DR_CNTRL_SIG_124(R_W=1, TCE1=1, TAGFUNCSAT=1).to_int()               # 0x2401
+CNTRL_SIG_HALT  = DR_CNTRL_SIG_124(R_W=1, HALT_JTAG=1, TCE1=1, TAGFUNCSAT=1).to_int()  # 0x2409
+CNTRL_SIG_WRITE = DR_CNTRL_SIG_124(HALT_JTAG=1, TCE1=1, TAGFUNCSAT=1).to_int()         # 0x2408
+CNTRL_SIG_POR   = DR_CNTRL_SIG_124(R_W=1, TCE1=1, POR=1, TAGFUNCSAT=1).to_int()        # 0x2C01
+
+# Peripheral registers.
+WDTCTL_addr     = 0x0120
+FCTL1_addr      = 0x0128
+FCTL2_addr      = 0x012A
+FCTL3_addr      = 0x012C
+
+# Flash controller register values (the high byte is the password).
+FCTL1_IDLE      = 0xA500
+FCTL1_WRT       = 0xA540
+FCTL1_ERASE     = 0xA502 # segment erase
+FCTL1_MERAS     = 0xA504 # main memory erase
+FCTL1_MASS      = 0xA506 # mass erase
+FCTL2_MCLK      = 0xA540 # MCLK (which is TCLK when the CPU is halted), divided by 1
+FCTL3_UNLOCK    = 0xA500
+FCTL3_LOCK      = 0xA510
+WDTCTL_HOLD     = 0x5A80
+
+# Number of TCLK cycles needed by the Flash timing generator.
+TCLK_WRITE_WORD = 35
+TCLK_ERASE_SEG  = 4820
+TCLK_ERASE_MASS = 5300
+TCLK_ERASE_MASS_FAST = 10600
+
+# Memory map.
+DEVICE_ID_addr  = 0x0FF0
+DEVICE_CFG_addr = 0x0FF7
+INFO_START      = 0x1000
+INFO_END        = 0x1100
+MAIN_END        = 0x10000
+INFO_SEG_SIZE   = 64
+MAIN_SEG_SIZE   = 512
+
+BLOCK_SIZE      = 256 # words
+
+
+class MSP430Error(GlasgowAppletError):
+    pass
+
+
+class ProgramMSP430Interface:
+    def __init__(self, interface, logger):
+        self.lower   = interface
+        self._logger = logger
+        self._level  = logging.DEBUG if self._logger.name == __name__ else logging.TRACE
+        self.device  = None
+
+    def _log(self, message, *args):
+        self._logger.log(self._level, "MSP430: " + message, *args)
+
+    # JTAG access
+
+    async def _ir(self, instruction):
+        await self.lower.write_ir(instruction)
+
+    async def _dr(self, value):
+        # The 16-bit data registers are shifted MSB first.
+        await self.lower.write_dr(bits(value, 16).reversed())
+
+    async def _dr_exchange(self, value=0, *, defer=False):
+        data = await self.lower.exchange_dr(bits(value, 16).reversed(), defer=defer)
+        if defer:
+            return data
+        return int(data.reversed())
+
+    async def _set_tclk(self):
+        await self.lower.set_tclk(1)
+
+    async def _clr_tclk(self):
+        await self.lower.set_tclk(0)
+
+    async def _write_word(self, address, data):
+        # Assumes TCLK is low and the control signal register is selected.
+        await self._dr(CNTRL_SIG_WRITE)
+        await self._ir(IR_ADDR_16BIT)
+        await self._dr(address)
+        await self._ir(IR_DATA_TO_ADDR)
+        await self._dr(data)
+        await self._set_tclk()
+        await self._clr_tclk()
+        await self._ir(IR_CNTRL_SIG_16BIT)
+
+    # CPU control
+
+    async def _set_instr_fetch(self):
+        await self._ir(IR_CNTRL_SIG_CAPTURE)
+        for _ in range(7):
+            cntrl_sig = DR_CNTRL_SIG_124.from_int(await self._dr_exchange())
+            if cntrl_sig.INSTR_LOAD:
+                return
+            await self._clr_tclk()
+            await self._set_tclk()
+        raise MSP430Error("cannot set CPU into instruction fetch state")
+
+    async def halt_cpu(self):
+        self._log("halt cpu")
+        await self._set_instr_fetch()
+        await self._ir(IR_DATA_16BIT)
+        await self._dr(0x3FFF) # "JMP $"
+        await self._clr_tclk()
+        await self._ir(IR_CNTRL_SIG_16BIT)
+        await self._dr(CNTRL_SIG_HALT)
+        await self._set_tclk()
+
+    async def release_cpu(self):
+        self._log("release cpu")
+        await self._clr_tclk()
+        await self._ir(IR_CNTRL_SIG_16BIT)
+        await self._dr(CNTRL_SIG_READ)
+        await self._ir(IR_ADDR_CAPTURE)
+        await self._set_tclk()
+
+    async def _execute_por(self):
+        self._log("execute por")
+        await self._ir(IR_CNTRL_SIG_16BIT)
+        await self._dr(CNTRL_SIG_POR)
+        await self._dr(CNTRL_SIG_READ)
+        await self._clr_tclk()
+        await self._set_tclk()
+        await self._clr_tclk()
+        await self._set_tclk()
+        await self._clr_tclk()
+        await self._ir(IR_ADDR_CAPTURE)
+        await self._set_tclk()
+        # Disable the watchdog, which would otherwise reset the device while it is being
+        # programmed.
+        await self.write_memory(WDTCTL_addr, [WDTCTL_HOLD])
+
+    async def connect(self):
+        """Take control of the device, and identify it.
+
+        Returns the :class:`MSP430Device` from the database.
+        """
+        await self.lower.test_reset()
+        jtag_id = int((await self.lower.exchange_ir(IR_CNTRL_SIG_16BIT)).reversed())
+        self._log("jtag id=%#04x", jtag_id)
+        if jtag_id == 0xff:
+            raise MSP430Error("no target detected; connection problem?")
+        if jtag_id != JTAG_ID_MSP430:
+            raise MSP430Error(f"unsupported MSP430 core with JTAG ID {jtag_id:#04x}")
+
+        await self._dr(CNTRL_SIG_READ)
+        await self._ir(IR_CNTRL_SIG_CAPTURE)
+        for _ in range(50):
+            if DR_CNTRL_SIG_124.from_int(await self._dr_exchange()).TCE:
+                break
+        else:
+            raise MSP430Error("cannot synchronize with the device; is JTAG access fuse blown?")
+
+        await self._execute_por()
+
+        id_word,  = await self.read_memory(DEVICE_ID_addr, 1)
+        cfg_word, = await self.read_memory(DEVICE_CFG_addr & ~1, 1)
+        device_id = ((id_word & 0xff) << 8) | (id_word >> 8)
+        ext_id    = (cfg_word >> 8) & 0x7f
+        self._log("device id=%#06x ext id=%#04x", device_id, ext_id)
+
+        candidates = devices_by_ids.get(jtag_id, {}).get(device_id, {})
+        if ext_id in candidates:
+            self.device = candidates[ext_id]
+        elif None in candidates:
+            self.device = candidates[None]
+        elif len(candidates) == 1:
+            self.device, = candidates.values()
+        else:
+            raise MSP430Error(f"unknown device with ID {device_id:#06x}")
+        if self.device.core != "430" or not self.device.is_flash():
+            raise MSP430Error(f"unsupported device {self.device.name}")
+        return self.device
+
+    async def disconnect(self):
+        """Reset the device and release it from JTAG control."""
+        self._log("disconnect")
+        await self._ir(IR_CNTRL_SIG_16BIT)
+        await self._dr(CNTRL_SIG_POR)
+        await self._dr(CNTRL_SIG_READ)
+        await self._ir(IR_CNTRL_SIG_RELEASE)
+        await self.lower.test_reset()
+        await self.lower.flush()
+
+    # Memory access
+
+    async def read_memory(self, address, count):
+        """Read ``count`` words starting at ``address``."""
+        assert address % 2 == 0
+        self._log("read memory address=%04x count=%d", address, count)
+        await self.halt_cpu()
+        await self._clr_tclk()
+        await self._ir(IR_CNTRL_SIG_16BIT)
+        await self._dr(CNTRL_SIG_HALT)
+        deferred = []
+        for offset in range(count):
+            await self._ir(IR_ADDR_16BIT)
+            await self._dr(address + offset * 2)
+            await self._ir(IR_DATA_TO_ADDR)
+            await self._set_tclk()
+            await self._clr_tclk()
+            deferred.append(await self._dr_exchange(defer=True))
+        await self._set_tclk()
+        await self.release_cpu()
+        return [int((await data).reversed()) for data in deferred]
+
+    async def write_memory(self, address, words):
+        """Write ``words`` to RAM or peripheral registers starting at ``address``."""
+        assert address % 2 == 0
+        self._log("write memory address=%04x count=%d", address, len(words))
+        await self.halt_cpu()
+        await self._clr_tclk()
+        await self._ir(IR_CNTRL_SIG_16BIT)
+        for offset, data in enumerate(words):
+            await self._write_word(address + offset * 2, data)
+        await self._set_tclk()
+        await self.release_cpu()
+
+    async def _flash_begin(self, fctl1):
+        await self.halt_cpu()
+        await self._clr_tclk()
+        await self._ir(IR_CNTRL_SIG_16BIT)
+        await self._write_word(FCTL1_addr, fctl1)
+        await self._write_word(FCTL2_addr, FCTL2_MCLK)
+        await self._write_word(FCTL3_addr, FCTL3_UNLOCK)
+
+    async def _flash_end(self):
+        await self._write_word(FCTL1_addr, FCTL1_IDLE)
+        await self._write_word(FCTL3_addr, FCTL3_LOCK)
+        await self._set_tclk()
+        await self.release_cpu()
+
+    async def erase_flash(self, address, *, mode="segment"):
+        """Erase the Flash segment containing ``address``, or, if ``mode`` is ``"main"`` or
+        ``"mass"``, the entire main memory or the entire Flash memory."""
+        assert mode in ("segment", "main", "mass")
+        self._log("erase flash address=%04x mode=%s", address, mode)
+        if mode == "segment":
+            fctl1, strobes = FCTL1_ERASE, TCLK_ERASE_SEG
+        else:
+            fctl1 = FCTL1_MERAS if mode == "main" else FCTL1_MASS
+            if self.device is not None and self.device.has("fast_flash"):
+                strobes = TCLK_ERASE_MASS_FAST
+            else:
+                strobes = TCLK_ERASE_MASS
+        await self._flash_begin(fctl1)
+        # A dummy write starts the erase.
+        await self._write_word(address, 0x55AA)
+        await self._dr(CNTRL_SIG_HALT)
+        await self.lower.pulse_tclk(strobes)
+        await self._flash_end()
+
+    async def program_flash(self, address, words):
+        """Program ``words`` into erased Flash memory starting at ``address``."""
+        assert address % 2 == 0
+        self._log("program flash address=%04x count=%d", address, len(words))
+        await self._flash_begin(FCTL1_WRT)
+        for offset, data in enumerate(words):
+            await self._write_word(address + offset * 2, data)
+            await self._dr(CNTRL_SIG_HALT)
+            await self.lower.pulse_tclk(TCLK_WRITE_WORD)
+        await self._flash_end()
+        await self.lower.flush()
+
+
+def _segments(address, length):
+    """Return the start addresses of the Flash segments overlapping ``address..address+length``."""
+    segments = []
+    end = address + length
+    while address < end:
+        size = INFO_SEG_SIZE if INFO_START <= address < INFO_END else MAIN_SEG_SIZE
+        segment = address - address % size
+        segments.append(segment)
+        address = segment + size
+    return segments
+
+
+class ProgramMSP430Applet(SpyBiWireProbeApplet):
+    logger = logging.getLogger(__name__)
+    help = "program TI MSP430 microcontrollers via Spy-Bi-Wire"
+    description = """
+    Read, erase, and program the Flash memory of Texas Instruments MSP430 microcontrollers
+    via the Spy-Bi-Wire 2-wire JTAG interface.
+
+    Only 1xx, 2xx, and 4xx family devices with a 16-bit address bus are supported.
+
+    The Flash timing generator is clocked by the probe; the default frequency is chosen so that
+    its clock is within the range required by the devices, and should not be changed.
+    """
+
+    async def run(self, device, args):
+        sbw_iface = await super().run(device, args)
+        return ProgramMSP430Interface(sbw_iface, self.logger)
+
+    @classmethod
+    def add_interact_arguments(cls, parser):
+        def address(arg):
+            value = int(arg, 0)
+            if value % 2 != 0 or not 0 <= value < MAIN_END:
+                raise argparse.ArgumentTypeError(f"{arg} is not a valid word address")
+            return value
+        def length(arg):
+            value = int(arg, 0)
+            if value % 2 != 0:
+                raise argparse.ArgumentTypeError(f"{arg} is not a whole number of words")
+            return value
+
+        p_operation = parser.add_subparsers(dest="operation", metavar="OPERATION")
+
+        p_read = p_operation.add_parser(
+            "read", help="read memory")
+        p_read.add_argument(
+            "address", metavar="ADDRESS", type=address,
+            help="read memory from ADDRESS")
+        p_read.add_argument(
+            "length", metavar="LENGTH", type=length,
+            help="read LENGTH bytes from memory")
+        p_read.add_argument(
+            "file", metavar="FILENAME", type=argparse.FileType("wb"),
+            help="read memory contents to binary file FILENAME")
+
+        p_erase = p_operation.add_parser(
+            "erase", help="erase Flash memory")
+        g_erase = p_erase.add_mutually_exclusive_group()
+        g_erase.add_argument(
+            "--main", action="store_true", default=False,
+            help="erase only the main memory (default: main and information memory)")
+        g_erase.add_argument(
+            "--segment", metavar="ADDRESS", type=address,
+            help="erase only the segment containing ADDRESS")
+
+        p_program = p_operation.add_parser(
+            "program", help="erase and program Flash memory")
+        p_program.add_argument(
+            "--no-erase", dest="erase", action="store_false", default=True,
+            help="do not erase the segments being programmed")
+        p_program.add_argument(
+            "--no-verify", dest="verify", action="store_false", default=True,
+            help="do not read back the programmed data")
+        p_program.add_argument(
+            "address", metavar="ADDRESS", type=address,
+            help="program memory starting at ADDRESS")
+        p_program.add_argument(
+            "file", metavar="FILENAME", type=argparse.FileType("rb"),
+            help="program memory contents from binary file FILENAME")
+
+    async def interact(self, device, args, msp430_iface):
+        msp430_device = await msp430_iface.connect()
+        self.logger.info("found MSP430%s", msp430_device.name)
+
+        try:
+            if args.operation == "read":
+                data = bytearray()
+                for offset in range(0, args.length, BLOCK_SIZE * 2):
+                    self.logger.info("reading memory at %#06x", args.address + offset)
+                    count = min(BLOCK_SIZE, (args.length - offset) // 2)
+                    words = await msp430_iface.read_memory(args.address + offset, count)
+                    data += struct.pack(f"<{count}H", *words)
+                args.file.write(data)
+
+            if args.operation == "erase":
+                if args.segment is not None:
+                    self.logger.info("erasing segment at %#06x", args.segment)
+                    await msp430_iface.erase_flash(args.segment)
+                elif args.main:
+                    self.logger.info("erasing main memory")
+                    await msp430_iface.erase_flash(MAIN_END - 2, mode="main")
+                else:
+                    self.logger.info("erasing main and information memory")
+                    await msp430_iface.erase_flash(MAIN_END - 2, mode="mass")
+
+            if args.operation == "program":
+                data = args.file.read()
+                if len(data) % 2 != 0:
+                    data += b"\xff"
+                if args.address + len(data) > MAIN_END:
+                    raise MSP430Error("image does not fit into memory")
+
+                if args.erase:
+                    for segment in _segments(args.address, len(data)):
+                        self.logger.info("erasing segment at %#06x", segment)
+                        await msp430_iface.erase_flash(segment)
+
+                words = [word for word, in struct.iter_unpack("<H", data)]
+                for offset in range(0, len(words), BLOCK_SIZE):
+                    address = args.address + offset * 2
+                    self.logger.info("programming memory at %#06x", address)
+                    await msp430_iface.program_flash(address, words[offset:offset + BLOCK_SIZE])
+
+                if args.verify:
+                    for offset in range(0, len(words), BLOCK_SIZE):
+                        address = args.address + offset * 2
+                        self.logger.info("verifying memory at %#06x", address)
+                        expected = words[offset:offset + BLOCK_SIZE]
+                        actual   = await msp430_iface.read_memory(address, len(expected))
+                        for index, (word_e, word_a) in enumerate(zip(expected, actual)):
+                            if word_e != word_a:
+                                raise MSP430Error("verification failed at {:#06x}: "
+                                                  "expected {:04x}, read {:04x}"
+                                                  .format(address + index * 2, word_e, word_a))
+
+        finally:
+            await msp430_iface.disconnect()
+
+    @classmethod
+    def tests(cls):
+        from . import test
+        return test.ProgramMSP430AppletTestCase
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import unittest
+
+from ....support.bits import *
+from ....arch.msp430.jtag import *
+from ...interface.jtag_probe.test import MockJTAGProbeDeferredResult
+from ... import *
+from . import *
+from . import (CNTRL_SIG_HALT, FCTL1_addr, FCTL2_addr, FCTL3_addr, FCTL1_WRT, FCTL1_ERASE,
+               FCTL1_MERAS, FCTL1_MASS, WDTCTL_addr, WDTCTL_HOLD, _segments)
+
+
+class MockMSP430SBW:
+    """Model of the JTAG interface of an MSP430F20x1 as seen through a Spy-Bi-Wire probe.
+
+    Memory accesses happen on the rising edge of TCLK. Flash operations are started by a write
+    to Flash memory, and complete once the Flash timing generator has received enough TCLK cycles.
+
+    Only the operations used by :class:`ProgramMSP430Interface` are implemented.
+    """
+    FLASH_START = 0xF800
+
+    def __init__(self):
+        self.memory  = [0x0000] * 0x8000
+        for address in range(0x1000, 0x1100, 2):
+            self.memory[address // 2] = 0xffff
+        for address in range(self.FLASH_START, 0x10000, 2):
+            self.memory[address // 2] = 0xffff
+        # Device ID (stored big-endian) and extended ID.
+        self.memory[0x0FF0 // 2] = 0x01f2
+        self.memory[0x0FF6 // 2] = 0x0100
+        self.memory[FCTL3_addr // 2] = 0x9658 # LOCK, LOCKA
+
+        self.ir      = IR_BYPASS
+        self.cntrl   = 0x0000
+        self.address = 0x0000
+        self.data    = 0x0000
+        self.tclk    = True
+        self.pending = None
+        self.released    = False
+        self.por_count   = 0
+        self.round_trips = 0
+        self.strobes     = []
+
+    def read_word(self, address):
+        return self.memory[address // 2]
+
+    def _in_flash(self, address):
+        return 0x1000 <= address < 0x1100 or address >= self.FLASH_START
+
+    def _bus_write(self, address, data):
+        if address in (FCTL1_addr, FCTL2_addr, FCTL3_addr):
+            assert data >> 8 == 0xA5, "flash controller password violation"
+            if address == FCTL3_addr:
+                # LOCKA is toggled by writing 1.
+                locka = (self.memory[address // 2] ^ data) & 0x0040
+                data  = (self.memory[address // 2] & ~0x0050) | locka | (data & 0x0010)
+            self.memory[address // 2] = 0x9600 | (data & 0xff)
+        elif self._in_flash(address):
+            fctl1 = 0xA500 | (self.memory[FCTL1_addr // 2] & 0xff)
+            if self.memory[FCTL3_addr // 2] & 0x0010:
+                return # locked
+            if fctl1 in (FCTL1_WRT, FCTL1_ERASE, FCTL1_MERAS, FCTL1_MASS):
+                self.pending = (fctl1, address, data)
+        else:
+            self.memory[address // 2] = data
+
+    def _flash_operation(self, strobes):
+        fctl1, address, data = self.pending
+        self.pending = None
+        if fctl1 == FCTL1_WRT:
+            assert strobes >= 35
+            self.memory[address // 2] &= data
+            return
+        if fctl1 == FCTL1_ERASE:
+            assert strobes >= 4820
+            size  = 64 if address < 0x1100 else 512
+            start = address - address % size
+            addresses = range(start, start + size, 2)
+            if start == 0x10C0 and self.memory[FCTL3_addr // 2] & 0x0040:
+                return # segment A is locked
+        else:
+            assert strobes >= 10600 # fast_flash device
+            addresses = list(range(self.FLASH_START, 0x10000, 2))
+            if fctl1 == FCTL1_MASS:
+                addresses += range(0x1000, 0x10C0, 2)
+        for address in addresses:
+            self.memory[address // 2] = 0xffff
+
+    async def test_reset(self):
+        self.ir = IR_BYPASS
+
+    async def flush(self):
+        pass
+
+    async def exchange_ir(self, data):
+        self.ir = data
+        return bits(0x89, 8).reversed()
+
+    async def write_ir(self, data):
+        self.ir = data
+        if data == IR_CNTRL_SIG_RELEASE:
+            self.released = True
+
+    async def exchange_dr(self, data, *, defer=False):
+        value = int(data.reversed())
+        if self.ir == IR_CNTRL_SIG_16BIT:
+            if value & 0x0800 and not self.cntrl & 0x0800:
+                self.por_count += 1
+            self.cntrl = value
+            result = 0
+        elif self.ir == IR_CNTRL_SIG_CAPTURE:
+            result = self.cntrl | 0x0080 # INSTR_LOAD
+            if self.cntrl & 0x0400: # TCE1
+                result |= 0x0200 # TCE
+        elif self.ir == IR_ADDR_16BIT:
+            result, self.address = self.address, value
+        elif self.ir in (IR_DATA_TO_ADDR, IR_DATA_16BIT):
+            result, self.data = self.data, value
+        else:
+            assert False
+        result = bits(result, 16).reversed()
+        if defer:
+            return MockJTAGProbeDeferredResult(result)
+        self.round_trips += 1
+        return result
+
+    async def write_dr(self, data):
+        await self.exchange_dr(data, defer=True)
+
+    async def set_tclk(self, active):
+        if active and not self.tclk and self.ir == IR_DATA_TO_ADDR:
+            if self.cntrl & 0x0001: # R_W
+                self.data = self.read_word(self.address)
+            else:
+                self._bus_write(self.address, self.data)
+        self.tclk = bool(active)
+
+    async def pulse_tclk(self, count):
+        assert self.cntrl == CNTRL_SIG_HALT
+        self.strobes.append(count)
+        if self.pending is not None:
+            self._flash_operation(count)
+
+
+class ProgramMSP430InterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.target = MockMSP430SBW()
+        self.iface  = ProgramMSP430Interface(self.target, logging.getLogger(__name__))
+
+    def run_case(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def connect(self):
+        device = self.run_case(self.iface.connect())
+        self.target.round_trips = 0
+        return device
+
+    def test_connect(self):
+        device = self.connect()
+        self.assertEqual(device.name, "F20x1/G2x01/G2x11")
+        self.assertEqual(self.target.por_count, 1)
+        self.assertEqual(self.target.read_word(WDTCTL_addr), WDTCTL_HOLD)
+
+    def test_connect_no_sync(self):
+        async def exchange_dr(data, *, defer=False):
+            return bits(0, 16)
+        self.target.exchange_dr = exchange_dr
+        with self.assertRaisesRegex(MSP430Error, r"cannot synchronize"):
+            self.run_case(self.iface.connect())
+
+    def test_read_memory(self):
+        self.connect()
+        for index in range(100):
+            self.target.memory[0x0200 // 2 + index] = index * 0x0101
+        self.assertEqual(self.run_case(self.iface.read_memory(0x0200, 100)),
+                         [index * 0x0101 for index in range(100)])
+        # Instruction fetch state is polled once; all of the data is read back at the end.
+        self.assertEqual(self.target.round_trips, 1)
+
+    def test_write_memory(self):
+        self.connect()
+        self.run_case(self.iface.write_memory(0x0200, [1, 2, 3]))
+        self.assertEqual(self.target.memory[0x0100:0x0104], [1, 2, 3, 0])
+        self.assertEqual(self.target.round_trips, 1)
+
+    def test_program_flash(self):
+        self.connect()
+        words = [0x1234, 0x5678, 0x9abc, 0xdef0]
+        self.run_case(self.iface.program_flash(0xF800, words))
+        self.assertEqual(self.target.memory[0xF800 // 2:0xF808 // 2], words)
+        self.assertEqual(self.target.strobes, [35] * 4)
+        self.assertEqual(self.target.read_word(FCTL3_addr) & 0x0050, 0x0050)
+        # Programming does not need to wait for any responses.
+        self.assertEqual(self.target.round_trips, 1)
+
+    def test_erase_segment(self):
+        self.connect()
+        self.run_case(self.iface.program_flash(0xFA00, [0, 0]))
+        self.run_case(self.iface.program_flash(0xFC00, [0, 0]))
+        self.run_case(self.iface.erase_flash(0xFA02))
+        self.assertEqual(self.target.memory[0xFA00 // 2:0xFA04 // 2], [0xffff, 0xffff])
+        self.assertEqual(self.target.memory[0xFC00 // 2:0xFC04 // 2], [0, 0])
+        self.assertEqual(self.target.strobes[-1], 4820)
+
+    def test_erase_mass(self):
+        self.connect()
+        self.run_case(self.iface.program_flash(0xFA00, [0]))
+        self.run_case(self.iface.program_flash(0x1000, [0]))
+        self.run_case(self.iface.program_flash(0x10C0, [0]))
+        self.run_case(self.iface.erase_flash(0xFFFE, mode="mass"))
+        self.assertEqual(self.target.read_word(0xFA00), 0xffff)
+        self.assertEqual(self.target.read_word(0x1000), 0xffff)
+        self.assertEqual(self.target.strobes[-1], 10600)
+
+    def test_segment_a_locked(self):
+        self.connect()
+        self.target.memory[0x10C0 // 2] = 0x1234
+        self.run_case(self.iface.erase_flash(0x10C0))
+        self.assertEqual(self.target.read_word(0x10C0), 0x1234)
+
+    def test_segments(self):
+        self.assertEqual(_segments(0xF9FE, 4), [0xF800, 0xFA00])
+        self.assertEqual(_segments(0x1030, 0x60), [0x1000, 0x1040, 0x1080])
+        self.assertEqual(_segments(0xFC00, 0x400), [0xFC00, 0xFE00])
+
+    def test_disconnect(self):
+        self.connect()
+        self.run_case(self.iface.disconnect())
+        self.assertEqual(self.target.por_count, 2)
+        self.assertTrue(self.target.released)
+
+
+class ProgramMSP430AppletTestCase(GlasgowAppletTestCase, applet=ProgramMSP430Applet):
+    @synthesis_test
+    def test_build(self):
+        self.assertBuilds()
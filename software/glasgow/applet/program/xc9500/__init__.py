@@ -3,6 +3,7 @@
 import struct
 import logging
 import argparse
+import collections
 import math
 import re
 from enum import Enum, auto
@@ -163,6 +164,8 @@ class XC9500Interface:
 
 
 class XC95xxInterface:
+    pipeline_depth = 64
+
     def __init__(self, interface, logger, frequency, device):
         self.lower   = interface
         self._logger = logger
@@ -203,6 +206,11 @@ class XC95xxInterface:
         isdata = DR_ISDATA.from_bits(isdata_bits)
         return isdata
 
+    async def _dr_isdata_deferred(self, control, data=0):
+        # Only queues the scan; the captured value has to be awaited and decoded by the caller.
+        isdata = DR_ISDATA(control=control, data=data)
+        return await self.lower.exchange_dr(isdata.to_bits(), defer=True)
+
     async def read(self, fast=True):
         self._log("device read")
         bs = XC9500Bitstream(self.device)
@@ -215,9 +223,13 @@ class XC95xxInterface:
             # Use FVFY just to set the address counter.
             await self._dr_isconfiguration(CTRL_START, 0)
             await self.lower.write_ir(IR_FVFYI)
+            # Queue every scan at once, and validate them once they are all read back.
+            pending = []
             for _, coords in device_addresses(self.device):
                 await self.lower.run_test_idle(1)
-                res = await self._dr_isdata(CTRL_START)
+                pending.append((coords, await self._dr_isdata_deferred(CTRL_START)))
+            for coords, res_bits in pending:
+                res = DR_ISDATA.from_bits(await res_bits)
                 if res.control != CTRL_OK:
                     raise XC9500Error(f"fast read failed {res.bits_repr()} at {coords}")
                 bs.put_byte(coords, res.data)
@@ -286,7 +298,10 @@ class XC95xxInterface:
         if fast:
             # Use FPGM to program first word and set the address counter.
             # Use FPGMI for much faster following writes.
+            # The status of each word is captured by the scan programming the following word.
+            # Up to `self.pipeline_depth` statuses are kept in flight, and checked in order.
             await self.lower.write_ir(IR_FPGM)
+            pending = collections.deque()
             prev_coords = None
             for addr, coords in device_addresses(self.device):
                 byte = bs.get_byte(coords)
@@ -294,16 +309,27 @@ class XC95xxInterface:
                     await self._dr_isconfiguration(CTRL_START, addr, byte)
                     await self.lower.write_ir(IR_FPGMI)
                 else:
-                    res = await self._dr_isdata(CTRL_START, byte)
+                    res_bits = await self._dr_isdata_deferred(CTRL_START, byte)
                     if prev_coords is not None:
-                        if res.control == CTRL_WPROT:
-                            raise XC9500Error("fast programming failed: device is write protected")
-                        elif res.control != CTRL_OK:
-                            raise XC9500Error(f"fast programming failed {res.bits_repr()} at {prev_coords}")
+                        pending.append((prev_coords, res_bits))
                 await self.lower.run_test_idle(self._time_us(WAIT_PROGRAM))
                 prev_coords = coords
 
+                while len(pending) > self.pipeline_depth or (pending and pending[0][1].done()):
+                    res_coords, res_bits = pending.popleft()
+                    res = DR_ISDATA.from_bits(await res_bits)
+                    if res.control == CTRL_WPROT:
+                        raise XC9500Error("fast programming failed: device is write protected")
+                    elif res.control != CTRL_OK:
+                        raise XC9500Error(f"fast programming failed {res.bits_repr()} at {res_coords}")
+
             res = await self._dr_isdata(CTRL_OK)
+            for res_coords, res_bits in pending:
+                res_prev = DR_ISDATA.from_bits(res_bits.result())
+                if res_prev.control == CTRL_WPROT:
+                    raise XC9500Error("fast programming failed: device is write protected")
+                elif res_prev.control != CTRL_OK:
+                    raise XC9500Error(f"fast programming failed {res_prev.bits_repr()} at {res_coords}")
             if res.control == CTRL_WPROT:
                 raise XC9500Error("fast programming failed: device is write protected")
             elif res.control != CTRL_OK:
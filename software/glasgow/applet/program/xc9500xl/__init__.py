@@ -406,6 +406,11 @@ class XC95xxXLInterface:
         isdata = self.DR_ISDATA.from_bits(isdata_bits)
         return isdata
 
+    async def _dr_isdata_deferred(self, control, data=0):
+        # Only queues the scan; the captured value has to be awaited and decoded by the caller.
+        isdata = self.DR_ISDATA(control=control, data=data)
+        return await self.lower.exchange_dr(isdata.to_bits(), defer=True)
+
     async def read(self, fast=True):
         self._log("device read")
         bs = XC9500XLBitstream(self.device)
@@ -418,14 +423,19 @@ class XC95xxXLInterface:
             # Use FVFY just to set the address counter.
             await self._dr_isconfiguration(CTRL_START, 0)
             await self.lower.write_ir(IR_FVFYI)
+            # Queue every scan at once, and validate them once they are all read back.
+            pending = []
             for row in range(BS_ROWS):
                 for col in range(BS_COLS):
                     await self.lower.run_test_idle(1)
                     last = row == BS_ROWS - 1 and col == BS_COLS - 1
-                    res = await self._dr_isdata(CTRL_OK if last else CTRL_START)
-                    if res.control != CTRL_OK:
-                        raise XC9500XLError(f"fast read failed {res.bits_repr()} at ({row}, {col})")
-                    bs.put_word(row, col, res.data)
+                    pending.append((row, col,
+                        await self._dr_isdata_deferred(CTRL_OK if last else CTRL_START)))
+            for row, col, res_bits in pending:
+                res = self.DR_ISDATA.from_bits(await res_bits)
+                if res.control != CTRL_OK:
+                    raise XC9500XLError(f"fast read failed {res.bits_repr()} at ({row}, {col})")
+                bs.put_word(row, col, res.data)
         else:
             # Use FVFY for all reads.
             prev_row = prev_col = None
@@ -473,9 +483,13 @@ class XC95xxXLInterface:
         if fast:
             # Use FPGM to program first word and set the address counter.
             # Use FPGMI for much faster following writes.
+            # The status of each row is captured by the first scan of the following row; it is
+            # only checked after the row that captured it is queued, so that the device always
+            # has a row worth of scans to process while the host waits for the status.
             await self.lower.write_ir(IR_FPGM)
             prev_row = None
             for row in range(BS_ROWS):
+                res_bits = None
                 for col in range(BS_COLS):
                     word = bs.get_word(row, col)
                     if row == 0 and col == 0:
@@ -485,15 +499,18 @@ class XC95xxXLInterface:
                             data=word)
                         await self.lower.write_ir(IR_FPGMI)
                     else:
-                        res = await self._dr_isdata(
+                        deferred = await self._dr_isdata_deferred(
                             CTRL_START if col == BS_COLS - 1 else CTRL_OK,
                             data=word)
-                        if col == 0 and prev_row is not None:
-                            if res.control == CTRL_WPROT:
-                                raise XC9500XLError("fast programming failed: device is write protected")
-                            elif res.control != CTRL_OK:
-                                raise XC9500XLError(f"fast programming failed {res.bits_repr()} at row {prev_row}")
+                        if col == 0:
+                            res_bits = deferred
                 await self.lower.run_test_idle(self._time_us(WAIT_PROGRAM))
+                if res_bits is not None and prev_row is not None:
+                    res = self.DR_ISDATA.from_bits(await res_bits)
+                    if res.control == CTRL_WPROT:
+                        raise XC9500XLError("fast programming failed: device is write protected")
+                    elif res.control != CTRL_OK:
+                        raise XC9500XLError(f"fast programming failed {res.bits_repr()} at row {prev_row}")
                 prev_row = row
 
             res = await self._dr_isdata(CTRL_OK)
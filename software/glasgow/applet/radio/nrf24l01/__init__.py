@@ -5,8 +5,10 @@ import math
 import asyncio
 import logging
 import argparse
+import collections
 from amaranth import *
 from amaranth.lib import io
+from amaranth.lib.cdc import FFSynchronizer
 
 from ....support.logging import *
 from ....support.bits import *
@@ -21,33 +23,157 @@ class RadioNRF24L01Error(GlasgowAppletError):
 
 
 class RadioNRF24L01Subtarget(Elaboratable):
-    def __init__(self, controller, port_ce, dut_ce):
+    def __init__(self, controller, port_ce, port_irq):
         self.controller = controller
         self.port_ce = port_ce
-        self.dut_ce = dut_ce
+        self.port_irq = port_irq
 
     def elaborate(self, platform):
         m = Module()
 
         m.submodules.controller = self.controller
-        
+
+        # CE is driven and IRQ is waited for by SPI controller commands, so that both are sequenced
+        # with the SPI transfers without a round trip to the host.
         m.submodules.ce_buffer = ce_buffer = io.Buffer("o", self.port_ce)
-        m.d.comb += ce_buffer.o.eq(self.dut_ce)
+        m.d.comb += ce_buffer.o.eq(self.controller.aux_o[0])
+
+        m.submodules.irq_buffer = irq_buffer = io.Buffer("i", self.port_irq)
+        irq_n = Signal()
+        m.submodules += FFSynchronizer(irq_buffer.i, irq_n, init=1)
+        m.d.comb += self.controller.aux_i.eq(~irq_n)
 
         return m
 
 
+AUX_CE = 0b0001
+
+# The controller does not execute any commands while it is waiting for the IRQ pin, including
+# the ones that disable the radio after a cancelled transmit or receive; to bound the time this
+# can take, the waits time out, and are restarted by the host if they do.
+IRQ_TIMEOUT_US = 50_000
+
+
+class RadioNRF24L01Batch:
+    """Sequence of nRF24L01 commands submitted at once.
+
+    Commands are recorded by the methods of the batch, which mirror the methods of
+    :class:`RadioNRF24L01Interface`, into an :class:`SPIControllerBatch`, and are only sent when
+    the batch is submitted. The futures returned for the commands are resolved with the data read,
+    or, for the commands that do not read any data, with the value of the ``STATUS`` register at
+    the start of the command.
+    """
+
+    def __init__(self, iface):
+        self._iface    = iface
+        self._lower    = iface.lower.batch()
+        self._commands = []
+
+    def __len__(self):
+        return len(self._commands)
+
+    def _command(self, opcode, data=b"", *, length=0, decode=None):
+        # The first byte shifted in is always the STATUS register; it is followed by the data.
+        with self._lower.select():
+            octets = self._lower.exchange(bytes([opcode, *data]) + bytes(length))
+        if decode is None:
+            decode = lambda octets: REG_STATUS.from_int(octets[0])
+        future = asyncio.get_running_loop().create_future()
+        self._commands.append((octets, decode, future))
+        return future
+
+    def read_register_wide(self, address, length):
+        assert address in range(0x1f)
+        return self._command(OP_R_REGISTER|address, length=length,
+                             decode=lambda octets: octets[1:])
+
+    def write_register_wide(self, address, value):
+        assert address in range(0x1f)
+        return self._command(OP_W_REGISTER|address, value)
+
+    def read_register(self, address):
+        assert address in range(0x1f)
+        return self._command(OP_R_REGISTER|address, length=1,
+                             decode=lambda octets: octets[1])
+
+    def write_register(self, address, value):
+        return self.write_register_wide(address, [value])
+
+    def read_rx_payload_length(self):
+        return self._command(OP_R_RX_PL_WID, length=1,
+                             decode=lambda octets: octets[1])
+
+    def read_rx_payload(self, length):
+        return self._command(OP_R_RX_PAYLOAD, length=length,
+                             decode=lambda octets: octets[1:])
+
+    def write_tx_payload(self, payload, *, ack=True):
+        if ack:
+            return self._command(OP_W_TX_PAYLOAD, payload)
+        else:
+            return self._command(OP_W_TX_PAYLOAD_NOACK, payload)
+
+    def reuse_tx_payload(self):
+        return self._command(OP_REUSE_TX_PL)
+
+    def flush_rx(self):
+        return self._command(OP_FLUSH_RX)
+
+    def flush_tx(self):
+        return self._command(OP_FLUSH_TX)
+
+    def nop(self):
+        return self._command(OP_NOP)
+
+    def enable(self):
+        self._lower.set_aux(AUX_CE)
+
+    def disable(self):
+        self._lower.set_aux(0)
+
+    def delay_us(self, duration):
+        self._lower.delay_us(duration)
+
+    def wait_irq(self, *, timeout_us=IRQ_TIMEOUT_US):
+        return self._lower.wait_aux(timeout_us=timeout_us)
+
+    async def submit(self):
+        commands, self._commands = self._commands, []
+        self._iface._log("batch submit commands=%d", len(commands))
+        try:
+            await self._lower.submit()
+            for octets, decode, future in commands:
+                future.set_result(decode(octets.result()))
+        finally:
+            for _, _, future in commands:
+                if not future.done():
+                    future.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.submit()
+
+
 class RadioNRF24L01Interface:
-    def __init__(self, interface, logger, device, addr_dut_ce):
+    def __init__(self, interface, logger):
         self.lower   = interface
         self._logger = logger
         self._level  = logging.DEBUG if self._logger.name == __name__ else logging.TRACE
-        self._device = device
-        self._addr_dut_ce = addr_dut_ce
 
     def _log(self, message, *args):
         self._logger.log(self._level, "nRF24L01: " + message, *args)
 
+    def batch(self):
+        """Start recording a :class:`RadioNRF24L01Batch` of commands.
+
+        The batch may be used as an asynchronous context manager, in which case it is submitted
+        on exit.
+        """
+        return RadioNRF24L01Batch(self)
+
     async def sync(self):
         self._log("sync")
         async with self.lower.select():
@@ -55,18 +181,25 @@ class RadioNRF24L01Interface:
             await self.lower.read(1)
 
     async def enable(self):
-        await self.sync()
         self._log("enable rf")
-        await self._device.write_register(self._addr_dut_ce, 1)
+        await self.lower.set_aux(AUX_CE)
+        await self.lower.lower.flush()
 
     async def disable(self):
         self._log("disable rf")
-        await self._device.write_register(self._addr_dut_ce, 0)
+        await self.lower.set_aux(0)
+        await self.lower.lower.flush()
 
     async def pulse(self):
-        await self.enable()
-        await asyncio.sleep(0.1) # 10 µs
-        await self.disable()
+        self._log("pulse rf")
+        await self.lower.set_aux(AUX_CE)
+        await self.lower.delay_us(10)
+        await self.lower.set_aux(0)
+        await self.lower.lower.flush()
+
+    async def wait_irq(self, *, timeout_us=IRQ_TIMEOUT_US):
+        self._log("wait irq")
+        return await self.lower.wait_aux(timeout_us=timeout_us)
 
     async def read_register_wide(self, address, length):
         assert address in range(0x1f)
@@ -89,17 +222,22 @@ class RadioNRF24L01Interface:
     async def write_register(self, address, value):
         await self.write_register_wide(address, [value])
 
-    async def poll_rx_status(self, delay=0.010):
-        poll_bits = clear_bits = REG_STATUS(RX_DR=1).to_int()
+    async def _poll_status(self, poll_bits, clear_bits):
+        # The IRQ pin is asserted while any of the unmasked interrupt flags is set, so there is
+        # nothing to read until it is, or until the wait times out.
         while True:
-            async with self.lower.select():
-                status_bits, _ = await self.lower.exchange([OP_W_REGISTER|ADDR_STATUS, clear_bits])
-            status = REG_STATUS.from_int(status_bits)
-            self._log("poll rx status %s", status.bits_repr(omit_zero=True))
-            if status_bits & poll_bits:
-                break
-            await asyncio.sleep(delay)
-        return status
+            async with self.batch() as batch:
+                batch.wait_irq()
+                status = batch.write_register(ADDR_STATUS, clear_bits)
+            status = status.result()
+            self._log("poll status %s", status.bits_repr(omit_zero=True))
+            if status.to_int() & poll_bits:
+                return status
+
+    async def poll_rx_status(self):
+        return await self._poll_status(
+            poll_bits=REG_STATUS(RX_DR=1).to_int(),
+            clear_bits=REG_STATUS(RX_DR=1).to_int())
 
     async def read_rx_payload_length(self):
         async with self.lower.select():
@@ -128,19 +266,11 @@ class RadioNRF24L01Interface:
                 break
             await self.flush_rx()
 
-    async def poll_tx_status(self, delay=0.010):
+    async def poll_tx_status(self):
         # Don't clear MAX_RT, since it prevents REUSE_TX_PL and clears ARC_CNT.
-        poll_bits  = REG_STATUS(TX_DS=1, MAX_RT=1).to_int()
-        clear_bits = REG_STATUS(TX_DS=1).to_int()
-        while True:
-            async with self.lower.select():
-                status_bits, _ = await self.lower.exchange([OP_W_REGISTER|ADDR_STATUS, clear_bits])
-            status = REG_STATUS.from_int(status_bits)
-            self._log("poll rx status %s", status.bits_repr(omit_zero=True))
-            if status_bits & poll_bits:
-                break
-            await asyncio.sleep(delay)
-        return status
+        return await self._poll_status(
+            poll_bits=REG_STATUS(TX_DS=1, MAX_RT=1).to_int(),
+            clear_bits=REG_STATUS(TX_DS=1).to_int())
 
     async def write_tx_payload(self, payload, *, ack=True):
         self._log("write tx payload=<%s> ack=%s", dump_hex(payload), "yes" if ack else "no")
@@ -168,6 +298,95 @@ class RadioNRF24L01Interface:
                 break
             await self.flush_tx()
 
+    async def transmit(self, payloads, *, ack=True):
+        """Transmit ``payloads``, keeping the TX FIFO full until all of them have been written.
+
+        The radio must be configured as a PTX and enabled. Each time the IRQ pin is asserted (or
+        the wait for it times out), ``TX_DS`` is cleared, as many payloads as fit are written into
+        the TX FIFO, and the FIFO status is read, all in one round trip. A payload written while the FIFO is full is
+        discarded by the radio (which is indicated by the ``STATUS`` register value shifted in
+        while it is written), and is written again later.
+
+        Returns the ``STATUS`` register value after the last payload has been transmitted, or
+        after a payload has been lost, in which case ``MAX_RT`` is set and left uncleared.
+        """
+        pending = collections.deque(payloads)
+        wait = False
+        while True:
+            async with self.batch() as batch:
+                if wait:
+                    batch.wait_irq()
+                status = batch.write_register(ADDR_STATUS, REG_STATUS(TX_DS=1).to_int())
+                written = []
+                while pending and len(written) < 3:
+                    payload = pending.popleft()
+                    written.append((payload, batch.write_tx_payload(payload, ack=ack)))
+                fifo_status = batch.read_register(ADDR_FIFO_STATUS)
+            status = status.result()
+            fifo_status = REG_FIFO_STATUS.from_int(fifo_status.result())
+            self._log("transmit status %s fifo %s", status.bits_repr(omit_zero=True),
+                      fifo_status.bits_repr(omit_zero=True))
+
+            for payload, payload_status in reversed(written):
+                if payload_status.result().TX_FULL:
+                    pending.appendleft(payload)
+            self._log("transmit written=%d pending=%d",
+                      len(written) - sum(payload_status.result().TX_FULL
+                                         for _, payload_status in written), len(pending))
+
+            if wait and status.MAX_RT:
+                return status
+            if not pending and fifo_status.TX_EMPTY:
+                return status
+            wait = True
+
+    async def receive(self, *, length=None):
+        """Receive payloads of ``length`` bytes (or of dynamic length, if ``length`` is ``None``)
+        as they arrive, until the generator is closed.
+
+        The radio must be configured as a PRX and enabled. The host waits for the IRQ pin to be
+        asserted (checking the RX FIFO each time the wait times out) and then drains the RX FIFO;
+        each payload with a static length is received in one round trip, and each payload with
+        a dynamic length in two.
+        """
+        wait = True
+        while True:
+            async with self.batch() as batch:
+                if wait:
+                    batch.wait_irq()
+                status = batch.write_register(ADDR_STATUS, REG_STATUS(RX_DR=1).to_int())
+                if length is None:
+                    payload_length = batch.read_rx_payload_length()
+                else:
+                    payload = batch.read_rx_payload(length)
+                fifo_status = batch.read_register(ADDR_FIFO_STATUS)
+            status = status.result()
+            self._log("receive status %s", status.bits_repr(omit_zero=True))
+
+            if status.RX_P_NO == 0b111: # RX FIFO empty
+                wait = REG_FIFO_STATUS.from_int(fifo_status.result()).RX_EMPTY
+                continue
+
+            if length is None:
+                payload_length = payload_length.result()
+                async with self.batch() as batch:
+                    if payload_length > 32:
+                        self._logger.warning("corrupted packet received with length %d",
+                                             payload_length)
+                        batch.flush_rx()
+                        payload = None
+                    else:
+                        payload = batch.read_rx_payload(payload_length)
+                    fifo_status = batch.read_register(ADDR_FIFO_STATUS)
+                if payload is None:
+                    wait = REG_FIFO_STATUS.from_int(fifo_status.result()).RX_EMPTY
+                    continue
+
+            payload = payload.result()
+            self._log("receive payload=<%s>", dump_hex(payload))
+            wait = REG_FIFO_STATUS.from_int(fifo_status.result()).RX_EMPTY
+            yield payload
+
 
 class RadioNRF24L01Applet(GlasgowApplet):
     logger = logging.getLogger(__name__)
@@ -180,6 +399,9 @@ class RadioNRF24L01Applet(GlasgowApplet):
     framing with automatic transaction handling) with one pipe, as well as ShockBurst (old packet
     framing). It does not support multiple pipes or acknowledgement payloads.
 
+    Several payloads may be transmitted at once; they are sent back to back, with the TX FIFO kept
+    full. The IRQ pin is used to wait for packets to be sent or received, so it must be connected.
+
     Note that in the CLI, the addresses are most significant byte first (the same as on-air order,
     and reversed with regards to register access order.)
 
@@ -214,8 +436,6 @@ class RadioNRF24L01Applet(GlasgowApplet):
             help="set SPI frequency to FREQ kHz (default: %(default)s)")
 
     def build(self, target, args):
-        dut_ce, self.__addr_dut_ce = target.registers.add_rw(1)
-
         self.mux_interface = iface = target.multiplexer.claim_interface(self, args)
         ports=iface.get_port_group(
                 ce   = args.pin_ce,
@@ -236,15 +456,14 @@ class RadioNRF24L01Applet(GlasgowApplet):
             sck_edge="rising",
         )
 
-        subtarget = RadioNRF24L01Subtarget(controller, ports.ce, dut_ce)
+        subtarget = RadioNRF24L01Subtarget(controller, ports.ce, ports.irq)
 
         return iface.add_subtarget(subtarget)
 
     async def run(self, device, args):
         iface = await device.demultiplexer.claim_interface(self, self.mux_interface, args)
         spi_iface = SPIControllerInterface(iface, self.logger)
-        nrf24l01_iface = RadioNRF24L01Interface(spi_iface, self.logger, device,
-                                                self.__addr_dut_ce)
+        nrf24l01_iface = RadioNRF24L01Interface(spi_iface, self.logger)
         return nrf24l01_iface
 
     @classmethod
@@ -306,8 +525,8 @@ class RadioNRF24L01Applet(GlasgowApplet):
             "address", metavar="ADDRESS", type=address,
             help="transmit packet with hex address ADDRESS")
         p_transmit.add_argument(
-            "payload", metavar="DATA", type=payload,
-            help="transmit DATA as packet payload")
+            "payload", metavar="DATA", type=payload, nargs="+",
+            help="transmit each DATA as a packet payload, back to back")
         p_transmit.add_argument(
             "--transmit-timeout", metavar="DELAY", type=int, default=1500,
             choices=range(250, 4001, 250),
@@ -380,61 +599,132 @@ class RadioNRF24L01Applet(GlasgowApplet):
         en_dpl = args.dynamic_length
         en_dyn_ack = hasattr(args, "no_ack") and args.no_ack
 
-        await nrf24l01_iface.write_register(ADDR_CONFIG,
-            REG_CONFIG(PWR_UP=0).to_int())
-
-        feature = REG_FEATURE(EN_DPL=en_dpl, EN_DYN_ACK=en_dyn_ack).to_int()
-        await nrf24l01_iface.write_register(ADDR_FEATURE, feature)
-        if (await nrf24l01_iface.read_register(ADDR_FEATURE)) != feature:
-            raise RadioNRF24L01Error("Cannot enable nRF24L01+ features, is this nRF24L01?")
-
-        await nrf24l01_iface.write_register(ADDR_RF_CH,
-            REG_RF_CH(RF_CH=rf_ch).to_int())
-        await nrf24l01_iface.write_register(ADDR_RF_SETUP,
-            REG_RF_SETUP(RF_PWR=rf_pwr, RF_DR_LOW=rf_dr & 1, RF_DR_HIGH=rf_dr >> 1).to_int())
-        await nrf24l01_iface.write_register(ADDR_SETUP_AW,
-            REG_SETUP_AW(AW=aw).to_int())
-
-        if args.operation == "transmit":
+        if args.operation in ("transmit", "receive", "monitor"):
             if len(args.address) != args.address_width:
                 raise RadioNRF24L01Error("Length of address does not match address width")
-            await nrf24l01_iface.write_register_wide(ADDR_TX_ADDR, args.address)
+        if args.operation in ("receive", "monitor"):
+            if en_dpl:
+                if args.length is not None:
+                    raise RadioNRF24L01Error(
+                        "Either --dynamic-length or --length may be specified")
+            else:
+                if args.length is None:
+                    raise RadioNRF24L01Error(
+                        "One of --dynamic-length or --length must be specified")
+
+        if args.operation == "monitor":
             if en_aa:
-                await nrf24l01_iface.write_register(ADDR_EN_AA,
-                    REG_EN_AA(ENAA_P0=1).to_int())
-                await nrf24l01_iface.write_register(ADDR_SETUP_RETR,
-                    REG_SETUP_RETR(ARD=args.transmit_timeout // 250 - 1,
-                                   ARC=args.retransmit_count).to_int())
-                await nrf24l01_iface.write_register(ADDR_EN_RXADDR,
-                    REG_EN_RXADDR(ERX_P0=1).to_int())
-                await nrf24l01_iface.write_register_wide(ADDR_RX_ADDR_Pn(0), args.address)
+                overhead = 2 + args.crc_width
+                if en_dpl:
+                    length = 32 + overhead
+                else:
+                    length = args.length + overhead
             else:
-                await nrf24l01_iface.write_register(ADDR_EN_AA,
+                length = args.length
+            if length > 32:
+                self.logger.warning("packets may be up to %d bytes long, but only %d bytes will "
+                                    "be captured", length, 32)
+                length = 32
+
+        # The entire configuration is written in one batch, and the FEATURE register is verified
+        # once it has been submitted (but before CE is asserted).
+        feature = REG_FEATURE(EN_DPL=en_dpl, EN_DYN_ACK=en_dyn_ack).to_int()
+        async with nrf24l01_iface.batch() as batch:
+            batch.write_register(ADDR_CONFIG,
+                REG_CONFIG(PWR_UP=0).to_int())
+
+            batch.write_register(ADDR_FEATURE, feature)
+            feature_readback = batch.read_register(ADDR_FEATURE)
+
+            batch.write_register(ADDR_RF_CH,
+                REG_RF_CH(RF_CH=rf_ch).to_int())
+            batch.write_register(ADDR_RF_SETUP,
+                REG_RF_SETUP(RF_PWR=rf_pwr, RF_DR_LOW=rf_dr & 1, RF_DR_HIGH=rf_dr >> 1).to_int())
+            batch.write_register(ADDR_SETUP_AW,
+                REG_SETUP_AW(AW=aw).to_int())
+
+            if args.operation == "transmit":
+                batch.write_register_wide(ADDR_TX_ADDR, args.address)
+                if en_aa:
+                    batch.write_register(ADDR_EN_AA,
+                        REG_EN_AA(ENAA_P0=1).to_int())
+                    batch.write_register(ADDR_SETUP_RETR,
+                        REG_SETUP_RETR(ARD=args.transmit_timeout // 250 - 1,
+                                       ARC=args.retransmit_count).to_int())
+                    batch.write_register(ADDR_EN_RXADDR,
+                        REG_EN_RXADDR(ERX_P0=1).to_int())
+                    batch.write_register_wide(ADDR_RX_ADDR_Pn(0), args.address)
+                else:
+                    batch.write_register(ADDR_EN_AA,
+                        REG_EN_AA().to_int()) # disable on all pipes to release EN_CRC
+                    batch.write_register(ADDR_SETUP_RETR,
+                        REG_SETUP_RETR().to_int())
+                if en_dpl:
+                    batch.write_register(ADDR_DYNPD,
+                        REG_DYNPD(DPL_P0=1).to_int())
+
+                batch.flush_tx()
+                batch.write_register(ADDR_STATUS,
+                    REG_STATUS(RX_DR=1, TX_DS=1, MAX_RT=1).to_int())
+                batch.write_register(ADDR_CONFIG,
+                    REG_CONFIG(PRIM_RX=0, PWR_UP=1, CRCO=crco, EN_CRC=en_crc).to_int())
+
+            if args.operation == "receive":
+                if en_aa:
+                    batch.write_register(ADDR_EN_AA,
+                        REG_EN_AA(ENAA_P0=1).to_int())
+                else:
+                    batch.write_register(ADDR_EN_AA,
+                        REG_EN_AA().to_int()) # disable on all pipes to release EN_CRC
+                batch.write_register(ADDR_EN_RXADDR,
+                    REG_EN_RXADDR(ERX_P0=1).to_int())
+                batch.write_register_wide(ADDR_RX_ADDR_Pn(0), args.address)
+                if en_dpl:
+                    batch.write_register(ADDR_DYNPD,
+                        REG_DYNPD(DPL_P0=1).to_int())
+                else:
+                    batch.write_register(ADDR_RX_PW_Pn(0), args.length)
+
+                batch.flush_rx()
+                batch.write_register(ADDR_STATUS,
+                    REG_STATUS(RX_DR=1, TX_DS=1, MAX_RT=1).to_int())
+                batch.write_register(ADDR_CONFIG,
+                    REG_CONFIG(PRIM_RX=1, PWR_UP=1, CRCO=crco, EN_CRC=en_crc).to_int())
+
+            if args.operation == "monitor":
+                batch.write_register(ADDR_FEATURE,
+                    REG_FEATURE(EN_DPL=0, EN_DYN_ACK=0).to_int())
+                batch.write_register(ADDR_EN_AA,
                     REG_EN_AA().to_int()) # disable on all pipes to release EN_CRC
-                await nrf24l01_iface.write_register(ADDR_SETUP_RETR,
-                    REG_SETUP_RETR().to_int())
-            if en_dpl:
-                await nrf24l01_iface.write_register(ADDR_DYNPD,
-                    REG_DYNPD(DPL_P0=1).to_int())
+                batch.write_register(ADDR_EN_RXADDR,
+                    REG_EN_RXADDR(ERX_P0=1).to_int())
+                batch.write_register_wide(ADDR_RX_ADDR_Pn(0), args.address)
+                batch.write_register(ADDR_RX_PW_Pn(0), length)
+
+                batch.flush_rx()
+                batch.write_register(ADDR_STATUS,
+                    REG_STATUS(RX_DR=1, TX_DS=1, MAX_RT=1).to_int())
+                if en_aa:
+                    batch.write_register(ADDR_CONFIG,
+                        REG_CONFIG(PRIM_RX=1, PWR_UP=1, CRCO=CRCO._1_BYTE, EN_CRC=0).to_int())
+                else:
+                    batch.write_register(ADDR_CONFIG,
+                        REG_CONFIG(PRIM_RX=1, PWR_UP=1, CRCO=crco, EN_CRC=en_crc).to_int())
 
-            await nrf24l01_iface.flush_tx_all()
-            await nrf24l01_iface.write_register(ADDR_CONFIG,
-                REG_CONFIG(PRIM_RX=0, PWR_UP=1, CRCO=crco, EN_CRC=en_crc).to_int())
+            # Wait for the oscillator to start up (Tpd2stby).
+            batch.delay_us(1500)
 
-            await nrf24l01_iface.write_tx_payload(args.payload,
-                ack=not args.compat_framing and not args.no_ack)
+        if feature_readback.result() != feature:
+            raise RadioNRF24L01Error("Cannot enable nRF24L01+ features, is this nRF24L01?")
 
+        if args.operation == "transmit":
             await nrf24l01_iface.enable()
             try:
-                status = await nrf24l01_iface.poll_tx_status()
+                status = await nrf24l01_iface.transmit(args.payload,
+                    ack=not args.compat_framing and not args.no_ack)
             finally:
                 await nrf24l01_iface.disable()
 
-            if status.TX_DS:
-                if args.no_ack or args.compat_framing:
-                    self.logger.info("packet sent")
-                else:
-                    self.logger.info("packet acknowledged")
             if status.MAX_RT:
                 if args.retransmit_count > 0:
                     observe_tx = REG_OBSERVE_TX.from_int(
@@ -442,61 +732,22 @@ class RadioNRF24L01Applet(GlasgowApplet):
                     self.logger.error("packet lost after %d retransmits", observe_tx.ARC_CNT)
                 else:
                     self.logger.error("packet lost")
-                await nrf24l01_iface.write_register(ADDR_STATUS,
-                    REG_STATUS(MAX_RT=1).to_int())
-
-        if args.operation in ("receive", "monitor"):
-            if len(args.address) != args.address_width:
-                raise RadioNRF24L01Error("Length of address does not match address width")
-            if en_dpl:
-                if args.length is not None:
-                    raise RadioNRF24L01Error(
-                        "Either --dynamic-length or --length may be specified")
+                async with nrf24l01_iface.batch() as batch:
+                    batch.flush_tx()
+                    batch.write_register(ADDR_STATUS,
+                        REG_STATUS(MAX_RT=1).to_int())
+            elif args.no_ack or args.compat_framing:
+                self.logger.info("%s sent",
+                    "packet" if len(args.payload) == 1 else f"{len(args.payload)} packets")
             else:
-                if args.length is None:
-                    raise RadioNRF24L01Error(
-                        "One of --dynamic-length or --length must be specified")
+                self.logger.info("%s acknowledged",
+                    "packet" if len(args.payload) == 1 else f"{len(args.payload)} packets")
 
         if args.operation == "receive":
-            if en_aa:
-                await nrf24l01_iface.write_register(ADDR_EN_AA,
-                    REG_EN_AA(ENAA_P0=1).to_int())
-            else:
-                await nrf24l01_iface.write_register(ADDR_EN_AA,
-                    REG_EN_AA().to_int()) # disable on all pipes to release EN_CRC
-            await nrf24l01_iface.write_register(ADDR_EN_RXADDR,
-                REG_EN_RXADDR(ERX_P0=1).to_int())
-            await nrf24l01_iface.write_register_wide(ADDR_RX_ADDR_Pn(0), args.address)
-            if en_dpl:
-                await nrf24l01_iface.write_register(ADDR_DYNPD,
-                    REG_DYNPD(DPL_P0=1).to_int())
-            else:
-                await nrf24l01_iface.write_register(ADDR_RX_PW_Pn(0), args.length)
-
-            await nrf24l01_iface.flush_rx_all()
-            await nrf24l01_iface.write_register(ADDR_CONFIG,
-                REG_CONFIG(PRIM_RX=1, PWR_UP=1, CRCO=crco, EN_CRC=en_crc).to_int())
-
             await nrf24l01_iface.enable()
             try:
-                while True:
-                    status = REG_STATUS.from_int(
-                        await nrf24l01_iface.read_register(ADDR_STATUS))
-                    if status.RX_P_NO == 0b111:
-                        await nrf24l01_iface.poll_rx_status()
-                        continue
-
-                    if en_dpl:
-                        length = await nrf24l01_iface.read_rx_payload_length()
-                        if length > 32:
-                            self.logger.warning("corrupted packet received with length %d",
-                                                length)
-                            await nrf24l01_iface.flush_rx()
-                            continue
-                    else:
-                        length = args.length
-
-                    payload = await nrf24l01_iface.read_rx_payload(length)
+                async for payload in nrf24l01_iface.receive(
+                        length=None if en_dpl else args.length):
                     self.logger.info("packet received: %s", dump_hex(payload))
 
                     if not args.repeat:
@@ -505,45 +756,9 @@ class RadioNRF24L01Applet(GlasgowApplet):
                 await nrf24l01_iface.disable()
 
         if args.operation == "monitor":
-            if en_aa:
-                overhead = 2 + args.crc_width
-                if en_dpl:
-                    length = 32 + overhead
-                else:
-                    length = args.length + overhead
-            else:
-                length = args.length
-            if length > 32:
-                self.logger.warning("packets may be up to %d bytes long, but only %d bytes will "
-                                    "be captured", length, 32)
-
-            await nrf24l01_iface.write_register(ADDR_FEATURE,
-                REG_FEATURE(EN_DPL=0, EN_DYN_ACK=0).to_int())
-            await nrf24l01_iface.write_register(ADDR_EN_AA,
-                REG_EN_AA().to_int()) # disable on all pipes to release EN_CRC
-            await nrf24l01_iface.write_register(ADDR_EN_RXADDR,
-                REG_EN_RXADDR(ERX_P0=1).to_int())
-            await nrf24l01_iface.write_register_wide(ADDR_RX_ADDR_Pn(0), args.address)
-            await nrf24l01_iface.write_register(ADDR_RX_PW_Pn(0), min(32, length))
-
-            await nrf24l01_iface.flush_rx_all()
-            if en_aa:
-                await nrf24l01_iface.write_register(ADDR_CONFIG,
-                    REG_CONFIG(PRIM_RX=1, PWR_UP=1, CRCO=CRCO._1_BYTE, EN_CRC=0).to_int())
-            else:
-                await nrf24l01_iface.write_register(ADDR_CONFIG,
-                    REG_CONFIG(PRIM_RX=1, PWR_UP=1, CRCO=crco, EN_CRC=en_crc).to_int())
-
             await nrf24l01_iface.enable()
             try:
-                while True:
-                    status = REG_STATUS.from_int(
-                        await nrf24l01_iface.read_register(ADDR_STATUS))
-                    if status.RX_P_NO == 0b111:
-                        await nrf24l01_iface.poll_rx_status()
-                        continue
-
-                    payload = await nrf24l01_iface.read_rx_payload(length)
+                async for payload in nrf24l01_iface.receive(length=length):
                     if en_aa:
                         dyn_length = payload[0] >> 2
                         packet_id  = payload[0] & 0b11
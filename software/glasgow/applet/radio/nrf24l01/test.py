@@ -1,5 +1,310 @@
+import struct
+import asyncio
+import logging
+import unittest
+
+from ....arch.nrf24l.rf import *
+from ...interface.spi_controller import (SPIControllerInterface, CMD_MASK, CMD_SELECT,
+                                         CMD_SHIFT, CMD_DELAY, CMD_SYNC, CMD_SET_AUX,
+                                         CMD_WAIT_AUX, BIT_DATA_IN, BIT_DATA_OUT)
 from ... import *
-from . import RadioNRF24L01Applet
+from . import RadioNRF24L01Interface, RadioNRF24L01Applet
+
+
+class MockNRF24L01:
+    """Model of an nRF24L01+ attached to the SPI controller, as seen through the demultiplexer
+    interface.
+
+    The radio only does anything while the controller waits for its IRQ pin: a PTX with CE asserted
+    transmits the payload at the head of the TX FIFO, and a PRX with CE asserted receives up to
+    ``rx_burst`` of the payloads in ``air``. If there is nothing to do, the wait times out at once,
+    or, if it has no timeout, stalls the controller forever.
+    """
+    def __init__(self):
+        self.registers = {address: bytearray(1) for address in range(0x1e)}
+        for address in (ADDR_RX_ADDR_Pn(0), ADDR_RX_ADDR_Pn(1), ADDR_TX_ADDR):
+            self.registers[address] = bytearray(5)
+        self.flags    = 0
+        self.tx_fifo  = []
+        self.rx_fifo  = []
+        self.air      = []
+        self.rx_burst = 1
+        self.lost     = set()
+        self.sent     = []
+        self.aux      = 0
+        self.history  = []
+        self.reads    = 0
+
+        self._out     = bytearray()
+        self._in      = bytearray()
+        self._cs      = False
+        self._xfer    = None
+
+    # Radio
+
+    @property
+    def status(self):
+        return REG_STATUS(TX_FULL=len(self.tx_fifo) == 3,
+                          RX_P_NO=0 if self.rx_fifo else 0b111).to_int() | self.flags
+
+    @property
+    def fifo_status(self):
+        return REG_FIFO_STATUS(RX_EMPTY=not self.rx_fifo, RX_FULL=len(self.rx_fifo) == 3,
+                               TX_EMPTY=not self.tx_fifo, TX_FULL=len(self.tx_fifo) == 3).to_int()
+
+    @property
+    def irq(self):
+        config = REG_CONFIG.from_int(self.registers[ADDR_CONFIG][0])
+        mask = REG_STATUS(RX_DR=config.MASK_RX_DR, TX_DS=config.MASK_TX_DS,
+                          MAX_RT=config.MASK_MAX_RT).to_int()
+        return bool(self.flags & ~mask)
+
+    def _run_radio(self):
+        config = REG_CONFIG.from_int(self.registers[ADDR_CONFIG][0])
+        if not (config.PWR_UP and self.aux & 1):
+            return
+        if config.PRIM_RX:
+            for _ in range(self.rx_burst):
+                if self.air and len(self.rx_fifo) < 3:
+                    self.rx_fifo.append(self.air.pop(0))
+                    self.flags |= REG_STATUS(RX_DR=1).to_int()
+        elif self.tx_fifo:
+            if len(self.sent) in self.lost:
+                self.flags |= REG_STATUS(MAX_RT=1).to_int()
+            else:
+                self.sent.append(self.tx_fifo.pop(0))
+                self.flags |= REG_STATUS(TX_DS=1).to_int()
+
+    def _shift(self, octet):
+        # Returns the octet shifted in while ``octet`` is shifted out.
+        self._xfer.append(octet)
+        opcode, index = self._xfer[0], len(self._xfer) - 2
+        if index < 0:
+            return self.status
+        if opcode == OP_R_REGISTER|ADDR_STATUS:
+            return self.status
+        if opcode == OP_R_REGISTER|ADDR_FIFO_STATUS:
+            return self.fifo_status
+        if opcode & 0b111_00000 == OP_R_REGISTER:
+            return self.registers[opcode & 0x1f][index]
+        if opcode == OP_R_RX_PL_WID:
+            return len(self.rx_fifo[0]) if self.rx_fifo else 0
+        if opcode == OP_R_RX_PAYLOAD:
+            return self.rx_fifo[0][index] if self.rx_fifo else 0
+        return 0
+
+    def _deselect(self):
+        if not self._xfer:
+            return
+        opcode, data = self._xfer[0], bytes(self._xfer[1:])
+        if opcode & 0b111_00000 == OP_R_REGISTER:
+            pass
+        elif opcode & 0b111_00000 == OP_W_REGISTER:
+            address = opcode & 0x1f
+            if address == ADDR_STATUS:
+                self.flags &= ~(data[0] & 0x70)
+            else:
+                self.registers[address][:len(data)] = data
+        elif opcode == OP_R_RX_PL_WID:
+            pass
+        elif opcode == OP_R_RX_PAYLOAD:
+            if self.rx_fifo:
+                self.rx_fifo.pop(0)
+        elif opcode in (OP_W_TX_PAYLOAD, OP_W_TX_PAYLOAD_NOACK):
+            if len(self.tx_fifo) < 3:
+                self.tx_fifo.append(data)
+        elif opcode == OP_FLUSH_TX:
+            self.tx_fifo.clear()
+        elif opcode == OP_FLUSH_RX:
+            self.rx_fifo.clear()
+        elif opcode == OP_NOP:
+            pass
+        else:
+            assert False
+
+    # SPI controller
+
+    def _parse(self):
+        while self._out:
+            cmd = self._out[0]
+            if cmd & CMD_MASK == CMD_SELECT:
+                if self._cs and not cmd & 1:
+                    self._deselect()
+                self._cs, self._xfer = bool(cmd & 1), bytearray()
+                del self._out[:1]
+            elif cmd & CMD_MASK == CMD_SET_AUX:
+                self.aux = cmd & 0xf
+                self.history.append(("aux", self.aux))
+                del self._out[:1]
+            elif cmd & CMD_MASK == CMD_SYNC:
+                self._in += b"\0"
+                del self._out[:1]
+            elif len(self._out) < 3:
+                return
+            else:
+                count, = struct.unpack_from("<H", self._out, 1)
+                if cmd & CMD_MASK == CMD_DELAY:
+                    self.history.append(("delay", count))
+                    del self._out[:3]
+                    continue
+                if cmd & CMD_MASK == CMD_WAIT_AUX:
+                    if not self.irq:
+                        self._run_radio()
+                    if self.irq:
+                        self._in += b"\1"
+                    elif count != 0:
+                        self.history.append(("timeout", count))
+                        self._in += b"\0"
+                    else:
+                        return
+                    del self._out[:3]
+                    continue
+                assert cmd & CMD_MASK == CMD_SHIFT and self._cs
+                if cmd & BIT_DATA_OUT:
+                    if len(self._out) < 3 + count:
+                        return
+                    octets = bytes(self._out[3:3 + count])
+                    del self._out[:3 + count]
+                else:
+                    octets = bytes(count)
+                    del self._out[:3]
+                octets = bytes(self._shift(octet) for octet in octets)
+                if cmd & BIT_DATA_IN:
+                    self._in += octets
+
+    async def write(self, data):
+        self._out.extend(data)
+        self._parse()
+
+    async def flush(self, wait=True):
+        pass
+
+    async def read(self, length):
+        self.reads += 1
+        await asyncio.sleep(0)
+        if len(self._in) < length:
+            # The controller is stalled.
+            await asyncio.get_running_loop().create_future()
+        data, self._in = self._in[:length], self._in[length:]
+        return data
+
+
+class RadioNRF24L01InterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.radio = MockNRF24L01()
+        self.iface = RadioNRF24L01Interface(
+            SPIControllerInterface(self.radio, logging.getLogger(__name__)),
+            logging.getLogger(__name__))
+
+    def run_case(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def configure(self, prim_rx):
+        self.radio.registers[ADDR_CONFIG][0] = REG_CONFIG(PRIM_RX=prim_rx, PWR_UP=1).to_int()
+        self.radio.aux = 1
+
+    def test_batch(self):
+        async def case():
+            async with self.iface.batch() as batch:
+                batch.write_register(ADDR_RF_CH, 42)
+                batch.write_register_wide(ADDR_TX_ADDR, b"\x01\x02\x03\x04\x05")
+                rf_ch   = batch.read_register(ADDR_RF_CH)
+                tx_addr = batch.read_register_wide(ADDR_TX_ADDR, 5)
+                status  = batch.nop()
+            return rf_ch.result(), tx_addr.result(), status.result()
+        rf_ch, tx_addr, status = self.run_case(case())
+        self.assertEqual(rf_ch, 42)
+        self.assertEqual(tx_addr, b"\x01\x02\x03\x04\x05")
+        self.assertEqual(status.RX_P_NO, 0b111)
+        self.assertEqual(self.radio.reads, 1)
+
+    def test_batch_compatible(self):
+        async def case():
+            async with self.iface.batch() as batch:
+                batch.write_register(ADDR_SETUP_AW, 3)
+            return await self.iface.read_register(ADDR_SETUP_AW)
+        self.assertEqual(self.run_case(case()), 3)
+
+    def test_pulse(self):
+        self.run_case(self.iface.pulse())
+        self.assertEqual(self.radio.history, [("aux", 1), ("delay", 10), ("aux", 0)])
+
+    def test_poll_rx_status(self):
+        self.configure(prim_rx=1)
+        self.radio.air = [b"abcd"]
+        status = self.run_case(self.iface.poll_rx_status())
+        self.assertTrue(status.RX_DR)
+        self.assertFalse(self.radio.irq)
+
+    def test_receive(self):
+        self.configure(prim_rx=1)
+        self.radio.air = [bytes([n] * 4) for n in range(8)]
+        self.radio.rx_burst = 3
+        async def case():
+            payloads = []
+            async for payload in self.iface.receive(length=4):
+                payloads.append(payload)
+                if len(payloads) == 8:
+                    break
+            return payloads
+        self.assertEqual(self.run_case(case()), [bytes([n] * 4) for n in range(8)])
+        # One round trip per packet, and none while waiting for packets.
+        self.assertEqual(self.radio.reads, 8)
+
+    def test_receive_dynamic(self):
+        self.configure(prim_rx=1)
+        self.radio.air = [b"a", b"bc", b"def"]
+        self.radio.rx_burst = 2
+        async def case():
+            payloads = []
+            async for payload in self.iface.receive():
+                payloads.append(payload)
+                if len(payloads) == 3:
+                    break
+            return payloads
+        self.assertEqual(self.run_case(case()), [b"a", b"bc", b"def"])
+
+    def test_transmit(self):
+        self.configure(prim_rx=0)
+        payloads = [bytes([n] * 8) for n in range(10)]
+        status = self.run_case(self.iface.transmit(payloads))
+        self.assertFalse(status.MAX_RT)
+        self.assertEqual(self.radio.sent, payloads)
+        self.assertEqual(self.radio.tx_fifo, [])
+
+    def test_receive_cancel(self):
+        self.configure(prim_rx=1)
+        async def case():
+            async def receive():
+                async for payload in self.iface.receive(length=4):
+                    pass
+            receive_task = asyncio.ensure_future(receive())
+            for _ in range(10):
+                await asyncio.sleep(0)
+            receive_task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await receive_task
+            await self.iface.disable()
+        self.run_case(case())
+        self.assertIn(("timeout", 50_000), self.radio.history)
+        # The radio is disabled even though no packet was ever received.
+        self.assertEqual(self.radio.history[-1], ("aux", 0))
+        self.assertEqual(self.radio._out, b"")
+
+    def test_wait_irq_timeout(self):
+        self.configure(prim_rx=1)
+        self.assertFalse(self.run_case(self.iface.wait_irq(timeout_us=100)))
+        self.assertEqual(self.radio.history, [("timeout", 100)])
+        self.radio.air = [b"abcd"]
+        self.assertTrue(self.run_case(self.iface.wait_irq(timeout_us=100)))
+
+    def test_transmit_lost(self):
+        self.configure(prim_rx=0)
+        self.radio.lost = {4}
+        payloads = [bytes([n] * 8) for n in range(10)]
+        status = self.run_case(self.iface.transmit(payloads))
+        self.assertTrue(status.MAX_RT)
+        self.assertEqual(self.radio.sent, payloads[:4])
 
 
 class RadioNRF24L01AppletTestCase(GlasgowAppletTestCase, applet=RadioNRF24L01Applet):
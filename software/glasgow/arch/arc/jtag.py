@@ -13,6 +13,7 @@ __all__ = [
     "DR_STATUS",
     "DR_TXN_COMMAND_WRITE_MEMORY", "DR_TXN_COMMAND_WRITE_CORE", "DR_TXN_COMMAND_WRITE_AUX",
     "DR_TXN_COMMAND_READ_MEMORY", "DR_TXN_COMMAND_READ_CORE", "DR_TXN_COMMAND_READ_AUX",
+    "DR_TXN_COMMAND_NOP",
     "DR_ADDRESS",
     "DR_DATA",
 ]
@@ -40,6 +41,7 @@ DR_STATUS = bitstruct("DR_STATUS", 4, [
 DR_TXN_COMMAND_WRITE_MEMORY = bits("0000")
 DR_TXN_COMMAND_WRITE_CORE   = bits("0001")
 DR_TXN_COMMAND_WRITE_AUX    = bits("0010")
+DR_TXN_COMMAND_NOP          = bits("0011")
 DR_TXN_COMMAND_READ_MEMORY  = bits("0100")
 DR_TXN_COMMAND_READ_CORE    = bits("0101")
 DR_TXN_COMMAND_READ_AUX     = bits("0110")
@@ -1,5 +1,6 @@
 import os
 import sys
+import io
 import ast
 import platform
 import logging
@@ -8,17 +9,21 @@ import textwrap
 import re
 import asyncio
 import signal
+import time
+import contextvars
 import unittest
 import importlib.metadata
 from vcd import VCDWriter
 from datetime import datetime
 
 from fx2 import FX2Config, FX2Device, FX2DeviceError, VID_CYPRESS, PID_FX2
-from fx2.format import input_data, diff_data
+from fx2.format import input_data
 
 from . import __version__
 from .support.logging import *
 from .support.asignal import *
+from .support.endpoint import endpoint
+from .support.telemetry import MetricRegistry
 from .support.plugin import PluginRequirementsUnmet, PluginLoadError
 from .device import GlasgowDeviceError
 from .device.config import GlasgowConfig
@@ -112,6 +117,13 @@ def create_argparser():
     parser.add_argument(
         "--statistics", dest="show_statistics", default=False, action="store_true",
         help="display performance counters before exiting")
+    parser.add_argument(
+        "--metrics-endpoint", metavar="ENDPOINT", type=endpoint,
+        help="serve performance metrics in OpenMetrics format over HTTP at ENDPOINT, "
+             "either unix:PATH or tcp:HOST:PORT")
+    parser.add_argument(
+        "--metrics-interval", metavar="SECONDS", type=float,
+        help="log performance metrics as JSON every SECONDS seconds")
 
     return parser
 
@@ -297,6 +309,32 @@ def get_argparser():
     add_run_args(p_run)
     add_applet_arg(p_run, mode="interact", required=True)
 
+    p_farm = subparsers.add_parser(
+        "farm", formatter_class=TextHelpFormatter,
+        help="run an applet on several devices at once",
+        description="""
+        Run the same applet invocation on several devices concurrently. The devices share
+        a single USB context, and the applet bitstream is built or fetched from the cache once
+        per device revision. The exit code is the first non-zero exit code of any device.
+        """)
+    g_farm_devices = p_farm.add_mutually_exclusive_group(required=True)
+    g_farm_devices.add_argument(
+        "--serial", metavar="SERIAL", dest="farm_serials", type=serial, action="append",
+        help="use device with serial number SERIAL (may be specified multiple times)")
+    g_farm_devices.add_argument(
+        "--all-devices", dest="farm_all", default=False, action="store_true",
+        help="use every device connected to the system")
+    add_build_args(p_farm)
+    g_farm_bitstream = p_farm.add_mutually_exclusive_group()
+    g_farm_bitstream.add_argument(
+        "--reload", default=False, action="store_true",
+        help="(advanced) reload bitstream even if an identical one is already loaded")
+    g_farm_bitstream.add_argument(
+        "--prebuilt-at", dest="prebuilt_at", metavar="BITSTREAM-FILE",
+        type=argparse.FileType("rb"),
+        help="(advanced) load prebuilt applet bitstream from BITSTREAM-FILE")
+    add_applet_arg(p_farm, mode="interact", required=True)
+
     p_repl = subparsers.add_parser(
         "repl", formatter_class=TextHelpFormatter,
         help="run an applet and open a REPL to use its programming interface")
@@ -343,6 +381,10 @@ def get_argparser():
         help="remove any bitstream present")
     add_applet_arg(g_flash_bitstream, mode="build")
 
+    p_flash.add_argument(
+        "--full-verify", default=False, action="store_true",
+        help="verify the entire image, not just the changed pages")
+
     p_build = subparsers.add_parser(
         "build", formatter_class=TextHelpFormatter,
         help="(advanced) build applet logic and save it as a file")
@@ -472,6 +514,20 @@ class SubjectFilter:
         return levelno >= self.level
 
 
+# Serial number of the device the current task is operating on; used to tell apart log messages
+# of the applets running concurrently in `glasgow farm`.
+_farm_serial = contextvars.ContextVar("_farm_serial", default=None)
+
+
+class FarmSerialFilter:
+    def filter(self, record):
+        # The same record passes through every handler; only prefix its name once.
+        if (serial := _farm_serial.get()) is not None and not hasattr(record, "farm_serial"):
+            record.farm_serial = serial
+            record.name = f"{serial}: {record.name}"
+        return True
+
+
 def create_logger():
     root_logger = logging.getLogger()
 
@@ -520,7 +576,7 @@ async def main():
 
     device = None
     try:
-        if args.action not in ("build", "test", "tool", "factory", "list"):
+        if args.action not in ("build", "test", "tool", "factory", "list", "farm"):
             device = GlasgowHardwareDevice(args.serial)
 
         if args.action == "voltage":
@@ -687,6 +743,16 @@ async def main():
             if do_trace:
                 analyzer_task = asyncio.ensure_future(run_analyzer())
 
+            metrics_tasks = []
+            if args.metrics_endpoint or args.metrics_interval:
+                metrics = MetricRegistry(device.demultiplexer.metrics)
+                if args.metrics_endpoint:
+                    metrics_tasks.append(asyncio.ensure_future(
+                        metrics.serve(args.metrics_endpoint, logger)))
+                if args.metrics_interval:
+                    metrics_tasks.append(asyncio.ensure_future(
+                        metrics.log_periodically(args.metrics_interval, logger)))
+
             tasks = []
             tasks.append(applet_task := asyncio.ensure_future(run_applet()))
             if args.action != "repl":
@@ -697,6 +763,16 @@ async def main():
                 task.cancel()
             await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
 
+            for task in metrics_tasks:
+                task.cancel()
+            if metrics_tasks:
+                await asyncio.wait(metrics_tasks, return_when=asyncio.ALL_COMPLETED)
+                for task in metrics_tasks:
+                    if not task.cancelled() and task.exception() is not None:
+                        logger.error("cannot export metrics: %s", task.exception())
+                if args.metrics_interval:
+                    logger.info("metrics: %s", metrics.json())
+
             # If the applet task has raised an exception, retrieve it here in case any of the await
             # statements above will fail; if we don't, asyncio will unnecessarily complain.
             applet_task.exception()
@@ -709,6 +785,111 @@ async def main():
 
             return applet_task.result()
 
+        if args.action == "farm":
+            if args.farm_all:
+                devices = GlasgowHardwareDevice.open_many()
+            else:
+                devices = GlasgowHardwareDevice.open_many(args.farm_serials)
+            logger.info("running applet %r on %d devices", args.applet, len(devices))
+            if GlasgowAppletMetadata.get(args.applet).applet_cls.preview:
+                logger.warning("applet %r is PREVIEW QUALITY and may CORRUPT DATA", args.applet)
+
+            farm_filter = None
+            try:
+                # Every device gets an applet of its own, since applets may keep per-run state;
+                # building them all up front reports any build errors before anything runs.
+                farm_runs = []
+                for farm_device in devices:
+                    target, applet = _applet(farm_device.revision, args)
+                    farm_runs.append((farm_device, target, applet, target.build_plan()))
+
+                prebuilt = None
+                if args.prebuilt_at:
+                    with args.prebuilt_at as bitstream_file:
+                        prebuilt = bitstream_file.read()
+                else:
+                    # Obtain the bitstream once per device revision before starting any of the
+                    # devices, so that they do not all build it at the same time; the devices
+                    # will then find it already loaded.
+                    revisions = {}
+                    for farm_device, target, applet, plan in farm_runs:
+                        revisions.setdefault(farm_device.revision, plan)
+                    for plan in revisions.values():
+                        await asyncio.get_running_loop().run_in_executor(None, plan.get_bitstream)
+
+                async def run_farm_device(farm_device, target, applet, plan):
+                    _farm_serial.set(farm_device.serial)
+                    farm_device.demultiplexer = \
+                        DirectDemultiplexer(farm_device, target.multiplexer.pipe_count)
+
+                    started_at = time.perf_counter()
+                    try:
+                        if prebuilt is not None:
+                            bitstream_file = io.BytesIO(prebuilt)
+                            bitstream_file.name = args.prebuilt_at.name
+                            await farm_device.download_prebuilt(plan, bitstream_file)
+                        else:
+                            await farm_device.download_target(plan, reload=args.reload)
+
+                        logger.info("running handler for applet %r", args.applet)
+                        iface = await applet.run(farm_device, args)
+                        result = await applet.interact(farm_device, args, iface) or 0
+
+                    except GlasgowAppletError as e:
+                        applet.logger.error(str(e))
+                        result = 1
+                    except GlasgowDeviceError as e:
+                        logger.error(e)
+                        result = 1
+                    finally:
+                        await farm_device.demultiplexer.flush()
+                        if args.show_statistics:
+                            farm_device.demultiplexer.statistics()
+                        await farm_device.demultiplexer.cancel()
+                    return result, time.perf_counter() - started_at
+
+                farm_filter = FarmSerialFilter()
+                for handler in logging.getLogger().handlers:
+                    handler.addFilter(farm_filter)
+                farm_tasks = [asyncio.ensure_future(run_farm_device(*farm_run))
+                              for farm_run in farm_runs]
+                gather_task = asyncio.ensure_future(
+                    asyncio.gather(*farm_tasks, return_exceptions=True))
+                sigint_task = asyncio.ensure_future(wait_for_signal(signal.SIGINT))
+                done, pending = await asyncio.wait([gather_task, sigint_task],
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if sigint_task in done:
+                    logger.debug("Ctrl+C pressed, terminating")
+                for task in pending:
+                    task.cancel()
+                await asyncio.wait([*farm_tasks, gather_task, sigint_task],
+                                   return_when=asyncio.ALL_COMPLETED)
+
+                farm_result = 0
+                for farm_device, task in zip(devices, farm_tasks):
+                    if task.cancelled():
+                        result, elapsed = 130, None # 128 + SIGINT
+                    elif task.exception() is not None:
+                        logger.error("device %s: %s", farm_device.serial, task.exception())
+                        result, elapsed = 1, None
+                    else:
+                        result, elapsed = task.result()
+                    if elapsed is None:
+                        logger.info("device %s: exit code %d", farm_device.serial, result)
+                    else:
+                        logger.info("device %s: exit code %d, %.3f s",
+                                    farm_device.serial, result, elapsed)
+                    if farm_result == 0:
+                        farm_result = result
+                return farm_result
+
+            finally:
+                if farm_filter is not None:
+                    for handler in logging.getLogger().handlers:
+                        handler.removeFilter(farm_filter)
+                for farm_device in devices:
+                    farm_device.close()
+
         if args.action == "tool":
             tool = GlasgowAppletMetadata.get(args.applet).tool_cls()
             try:
@@ -794,26 +975,24 @@ async def main():
 
             if new_bitstream:
                 logger.info("programming bitstream")
-                old_bitstream = await device.read_eeprom("ice", 0, len(new_bitstream))
-                if old_bitstream != new_bitstream:
-                    for (addr, chunk) in diff_data(old_bitstream, new_bitstream):
-                        await device.write_eeprom("ice", addr, chunk)
-
+                written = await device.update_eeprom("ice", new_bitstream)
+                if written:
                     logger.info("verifying bitstream")
-                    if await device.read_eeprom("ice", 0, len(new_bitstream)) != new_bitstream:
+                    if args.full_verify:
+                        written = [(0, new_bitstream)]
+                    if not await device.verify_eeprom("ice", written):
                         logger.critical("bitstream programming failed")
                         return 1
                 else:
                     logger.info("bitstream identical")
 
             logger.info("programming configuration and firmware")
-            old_image = await device.read_eeprom("fx2", 0, len(new_image))
-            if old_image != new_image:
-                for (addr, chunk) in diff_data(old_image, new_image):
-                    await device.write_eeprom("fx2", addr, chunk)
-
+            written = await device.update_eeprom("fx2", new_image)
+            if written:
                 logger.info("verifying configuration and firmware")
-                if await device.read_eeprom("fx2", 0, len(new_image)) != new_image:
+                if args.full_verify:
+                    written = [(0, new_image)]
+                if not await device.verify_eeprom("fx2", written):
                     logger.critical("configuration/firmware programming failed")
                     return 1
 
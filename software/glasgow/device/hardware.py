@@ -10,6 +10,7 @@ from fx2 import REQ_RAM, REG_CPUCS
 from fx2.format import input_data
 
 from ..support.logging import *
+from ..support.task_queue import TaskQueue
 from . import GlasgowDeviceError, quirks
 from .config import GlasgowConfig
 
@@ -199,6 +200,48 @@ class GlasgowHardwareDevice:
             devices = cls._enumerate_devices(usb_context)
             return list(devices.keys())
 
+    @classmethod
+    def open_many(cls, serials=None):
+        """
+        Open several devices at once, sharing a single libusb context (and its event polling
+        thread) between them. If ``serials`` is ``None``, every connected device is opened.
+        """
+        usb_context = usb1.USBContext()
+        try:
+            devices = cls._enumerate_devices(usb_context)
+            if serials is None:
+                if len(devices) == 0:
+                    raise GlasgowDeviceError("device not found")
+                serials = sorted(devices.keys())
+            for serial in serials:
+                if serial not in devices:
+                    raise GlasgowDeviceError("device with serial number {} not found"
+                                             .format(serial))
+        except:
+            usb_context.close()
+            raise
+
+        usb_poller = _PollerThread(usb_context)
+        usb_poller.start()
+        usb_users  = set()
+        opened = []
+        try:
+            for serial in serials:
+                device = cls.__new__(cls)
+                device._open(usb_context, usb_poller, usb_users, *devices[serial])
+                opened.append(device)
+        except:
+            # A device whose handle was opened is a user even if `_open` did not finish; closing
+            # the last user also shuts down the poller and the context.
+            if usb_users:
+                for device in list(usb_users):
+                    device.close()
+            else:
+                usb_poller.stop()
+                usb_context.close()
+            raise
+        return opened
+
     def __init__(self, serial=None):
         usb_context = usb1.USBContext()
         devices = self._enumerate_devices(usb_context)
@@ -210,17 +253,26 @@ class GlasgowHardwareDevice:
                 raise GlasgowDeviceError("found {} devices (serial numbers {}), but a serial "
                                          "number is not specified"
                                          .format(len(devices), ", ".join(devices.keys())))
-            self.revision, usb_device = next(iter(devices.values()))
+            revision, usb_device = next(iter(devices.values()))
         else:
             if serial not in devices:
                 raise GlasgowDeviceError("device with serial number {} not found"
                                          .format(serial))
-            self.revision, usb_device = devices[serial]
+            revision, usb_device = devices[serial]
 
+        usb_poller = _PollerThread(usb_context)
+        usb_poller.start()
+        self._open(usb_context, usb_poller, set(), revision, usb_device)
+
+    def _open(self, usb_context, usb_poller, usb_users, revision, usb_device):
+        self.revision = revision
         self.usb_context = usb_context
-        self.usb_poller = _PollerThread(self.usb_context)
-        self.usb_poller.start()
+        self.usb_poller = usb_poller
+        # The libusb context and the poller thread are shut down once the last device using them
+        # is closed.
+        self._usb_users = usb_users
         self.usb_handle = usb_device.open()
+        self._usb_users.add(self)
         try:
             self.usb_handle.setAutoDetachKernelDriver(True)
         except usb1.USBErrorNotSupported:
@@ -252,8 +304,10 @@ class GlasgowHardwareDevice:
 
     def close(self):
         self.usb_handle.close()
-        self.usb_poller.stop()
-        self.usb_context.close()
+        self._usb_users.discard(self)
+        if not self._usb_users:
+            self.usb_poller.stop()
+            self.usb_context.close()
 
     async def _do_transfer(self, is_read, setup):
         # libusb transfer cancellation is asynchronous, and moreover, it is necessary to wait for
@@ -354,35 +408,53 @@ class GlasgowHardwareDevice:
             transfer.setBulk(endpoint|usb1.ENDPOINT_OUT, data))
         logger.trace("USB: BULK EP%d OUT (completed)", endpoint & 0x7f)
 
-    async def _read_eeprom_raw(self, idx, addr, length, chunk_size=0x1000):
+    async def _read_eeprom_raw(self, idx, addr, length, chunk_size=0x1000, max_in_flight=4):
         """
         Read ``length`` bytes at ``addr`` from EEPROM at index ``idx``
-        in ``chunk_size`` byte chunks.
+        in ``chunk_size`` byte chunks, with up to ``max_in_flight`` chunks requested at once.
         """
-        data = bytearray()
-        while length > 0:
-            chunk_length = min(length, chunk_size)
-            logger.debug("reading EEPROM chip %d range %04x-%04x",
-                         idx, addr, addr + chunk_length - 1)
-            data += await self.control_read(usb1.REQUEST_TYPE_VENDOR, REQ_EEPROM,
-                                            addr, idx, chunk_length)
-            addr += chunk_length
-            length -= chunk_length
-        return data
+        chunks  = []
+        pending = []
+        try:
+            while length > 0:
+                chunk_length = min(length, chunk_size)
+                logger.debug("reading EEPROM chip %d range %04x-%04x",
+                             idx, addr, addr + chunk_length - 1)
+                pending.append(asyncio.ensure_future(
+                    self.control_read(usb1.REQUEST_TYPE_VENDOR, REQ_EEPROM,
+                                      addr, idx, chunk_length)))
+                if len(pending) >= max_in_flight:
+                    chunks.append(await pending.pop(0))
+                addr += chunk_length
+                length -= chunk_length
+            while pending:
+                chunks.append(await pending.pop(0))
+        finally:
+            for future in pending:
+                future.cancel()
+        return bytearray().join(chunks)
 
-    async def _write_eeprom_raw(self, idx, addr, data, chunk_size=0x1000):
+    async def _write_eeprom_raw(self, idx, addr, data, chunk_size=0x1000, max_in_flight=4):
         """
         Write ``data`` to ``addr`` in EEPROM at index ``idx``
-        in ``chunk_size`` byte chunks.
+        in ``chunk_size`` byte chunks, with up to ``max_in_flight`` chunks submitted at once.
         """
-        while len(data) > 0:
-            chunk_length = min(len(data), chunk_size)
-            logger.debug("writing EEPROM chip %d range %04x-%04x",
-                         idx, addr, addr + chunk_length - 1)
-            await self.control_write(usb1.REQUEST_TYPE_VENDOR, REQ_EEPROM,
-                                     addr, idx, data[:chunk_length])
-            addr += chunk_length
-            data  = data[chunk_length:]
+        data  = memoryview(data)
+        queue = TaskQueue()
+        try:
+            while len(data) > 0:
+                chunk_length = min(len(data), chunk_size)
+                logger.debug("writing EEPROM chip %d range %04x-%04x",
+                             idx, addr, addr + chunk_length - 1)
+                queue.submit(self.control_write(usb1.REQUEST_TYPE_VENDOR, REQ_EEPROM,
+                                                addr, idx, data[:chunk_length]))
+                if len(queue) >= max_in_flight:
+                    await queue.wait_one()
+                addr += chunk_length
+                data  = data[chunk_length:]
+            await queue.wait_all()
+        finally:
+            await queue.cancel()
 
     @staticmethod
     def _adjust_eeprom_addr_for_kind(kind, addr):
@@ -394,6 +466,16 @@ class GlasgowHardwareDevice:
             raise ValueError(f"Unknown EEPROM kind {kind}")
         return 0x10000 * base_offset + addr
 
+    @staticmethod
+    def _eeprom_page_size_for_kind(kind):
+        # must match the page sizes used by the firmware
+        if kind == "fx2":
+            return 64
+        elif kind == "ice":
+            return 256
+        else:
+            raise ValueError(f"Unknown EEPROM kind {kind}")
+
     async def read_eeprom(self, kind, addr, length):
         """
         Read ``length`` bytes at ``addr`` from EEPROM of kind ``kind``
@@ -426,6 +508,51 @@ class GlasgowHardwareDevice:
             addr += chunk_length
             data  = data[chunk_length:]
 
+    @staticmethod
+    def diff_eeprom_pages(old_data, new_data, page_size):
+        """
+        Compare ``old_data`` with ``new_data``, and return a list of ``(addr, chunk)`` pairs
+        covering every EEPROM page of ``page_size`` bytes that differs between them, with
+        consecutive pages merged. Pages past the end of ``old_data`` are always included.
+        """
+        old_data = memoryview(old_data)
+        new_data = memoryview(new_data)
+        diff = []
+        for addr in range(0, len(new_data), page_size):
+            new_page = new_data[addr:addr + page_size]
+            if old_data[addr:addr + len(new_page)] == new_page:
+                continue
+            if diff and diff[-1][0] + diff[-1][1] == addr:
+                diff[-1][1] += len(new_page)
+            else:
+                diff.append([addr, len(new_page)])
+        return [(addr, bytes(new_data[addr:addr + length])) for addr, length in diff]
+
+    async def update_eeprom(self, kind, data, old_data=None):
+        """
+        Write ``data`` to the beginning of EEPROM of kind ``kind``, skipping the pages that
+        already have the right contents. If ``old_data`` is not specified, the current contents
+        are read first. Returns the list of ``(addr, chunk)`` pairs that were written.
+        """
+        if old_data is None:
+            old_data = await self.read_eeprom(kind, 0, len(data))
+        diff = self.diff_eeprom_pages(old_data, data, self._eeprom_page_size_for_kind(kind))
+        for addr, chunk in diff:
+            await self.write_eeprom(kind, addr, chunk)
+        return diff
+
+    async def verify_eeprom(self, kind, chunks):
+        """
+        Read back the ``(addr, chunk)`` pairs in ``chunks`` (e.g. as returned by
+        :meth:`update_eeprom`) from EEPROM of kind ``kind``, and check that they match.
+        """
+        for addr, chunk in chunks:
+            if await self.read_eeprom(kind, addr, len(chunk)) != chunk:
+                logger.debug("%s EEPROM range %04x-%04x does not match",
+                             kind, addr, addr + len(chunk) - 1)
+                return False
+        return True
+
     async def _status(self):
         result = await self.control_read(usb1.REQUEST_TYPE_VENDOR, REQ_STATUS, 0, 0, 1)
         return result[0]
@@ -457,15 +584,26 @@ class GlasgowHardwareDevice:
             return None
         return bytes(bitstream_id)
 
-    async def download_bitstream(self, bitstream, bitstream_id=b"\xff" * 16):
+    async def download_bitstream(self, bitstream, bitstream_id=b"\xff" * 16, *, max_in_flight=8):
         """Download ``bitstream`` with ID ``bitstream_id`` to FPGA."""
         # Send consecutive chunks of bitstream.
-        # Sending 0th chunk resets the FPGA.
-        index = 0
-        while index * 1024 < len(bitstream):
-            await self.control_write(usb1.REQUEST_TYPE_VENDOR, REQ_FPGA_CFG,
-                                     0, index, bitstream[index * 1024:(index + 1) * 1024])
-            index += 1
+        # Sending 0th chunk resets the FPGA, so it is sent on its own. The rest of the chunks are
+        # submitted several at a time; control transfers complete in order of submission, and
+        # this avoids waiting for a round trip through the event loop after each chunk.
+        await self.control_write(usb1.REQUEST_TYPE_VENDOR, REQ_FPGA_CFG,
+                                 0, 0, bitstream[:1024])
+        queue = TaskQueue()
+        try:
+            index = 1
+            while index * 1024 < len(bitstream):
+                queue.submit(self.control_write(usb1.REQUEST_TYPE_VENDOR, REQ_FPGA_CFG,
+                                                0, index, bitstream[index * 1024:(index + 1) * 1024]))
+                if len(queue) >= max_in_flight:
+                    await queue.wait_one()
+                index += 1
+            await queue.wait_all()
+        finally:
+            await queue.cancel()
         # Complete configuration by setting bitstream ID.
         # This starts the FPGA.
         try:
@@ -475,11 +613,19 @@ class GlasgowHardwareDevice:
             raise GlasgowDeviceError("FPGA configuration failed")
 
     async def download_target(self, plan, *, reload=False):
-        if await self.bitstream_id() == plan.bitstream_id and not reload:
-            logger.info("device already has bitstream ID %s", plan.bitstream_id.hex())
+        loop = asyncio.get_running_loop()
+        # Computing the bitstream ID hashes the entire design, and obtaining the bitstream reads
+        # (and verifies) it from the cache or builds it; neither should stall the event loop,
+        # and the former can overlap with querying the device.
+        plan_bitstream_id, device_bitstream_id = await asyncio.gather(
+            loop.run_in_executor(None, lambda: plan.bitstream_id),
+            self.bitstream_id())
+        if device_bitstream_id == plan_bitstream_id and not reload:
+            logger.info("device already has bitstream ID %s", plan_bitstream_id.hex())
             return
-        logger.info("generating bitstream ID %s", plan.bitstream_id.hex())
-        await self.download_bitstream(plan.get_bitstream(), plan.bitstream_id)
+        logger.info("generating bitstream ID %s", plan_bitstream_id.hex())
+        bitstream = await loop.run_in_executor(None, plan.get_bitstream)
+        await self.download_bitstream(bitstream, plan_bitstream_id)
 
     async def download_prebuilt(self, plan, bitstream_file):
         bitstream_file_id = bitstream_file.read(16)
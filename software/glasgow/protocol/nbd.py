@@ -4,12 +4,13 @@
 # Ref: https://github.com/NetworkBlockDevice/nbd/blob/master/nbd.h
 # Accession: G00089
 import asyncio, logging, struct, argparse
+from collections import OrderedDict
 from dataclasses import dataclass
 
 from glasgow.support.endpoint import *
 
 
-__all__ = ["NBDServer"]
+__all__ = ["NBDServer", "NBDMemoryServer"]
 
 
 # from cliserv.h
@@ -67,6 +68,11 @@ NBD_FLAG_CAN_MULTI_CONN = (1 << 8)#   /* multiple connections are okay */
 
 # from proto.md
 
+NBD_EPERM     = 1
+NBD_EIO       = 5
+NBD_EINVAL    = 22
+NBD_ENOSPC    = 28
+
 NBD_REQUEST_MAGIC = 0x25609513
 NBD_SIMPLE_REPLY_MAGIC = 0x67446698
 
@@ -83,20 +89,30 @@ class Request:
     cookie: int
     offset: int
     length: int
+    data: bytes = b""
 
 
 class NBDServer:
-    def __init__(self, endpoint, logger, *, writable=False):
+    """Network Block Device server.
+
+    The server accepts up to ``max_in_flight`` requests before replying to any of them. Requests
+    that have been received but not yet served are handled in order of their offset (unless some
+    of them overlap a write, or are separated by a flush).
+
+    :meth:`handle` returns once the client disconnects.
+    """
+    def __init__(self, endpoint, logger, *, writable=False, max_in_flight=16):
         self._endpoint = endpoint
         self._logger = logger
         self._writable = writable
+        self._max_in_flight = max_in_flight
 
     # public API
     async def handle(self):
         # "The NBD protocol has two phases: the handshake and the transmission."
         await self._endpoint.recv_wait()
-        await self._handshake()
-        await self._transmission()
+        if await self._handshake():
+            await self._transmission()
 
     # callbacks
     async def device_size(self):
@@ -108,6 +124,9 @@ class NBDServer:
     async def device_write(self, offset, data):
         pass
 
+    async def device_flush(self):
+        pass
+
     # internal methods
     async def _send16(self, value):
         await self._endpoint.send(struct.pack(">H", value))
@@ -134,7 +153,7 @@ class NBDServer:
         # "During the handshake, a connection is established and an exported
         # NBD device along other protocol parameters are negotiated between the
         # client and the server."
-        await self._fixed_newstyle_negotiation()
+        return await self._fixed_newstyle_negotiation()
 
     async def _fixed_newstyle_negotiation(self):
         handshake_flags = NBD_FLAG_FIXED_NEWSTYLE | NBD_FLAG_NO_ZEROES
@@ -146,29 +165,46 @@ class NBDServer:
         unsupported = client_flags & ~handshake_flags
         if unsupported:
             raise RuntimeError(f"Unsupported client flags: {unsupported:#x}")
-        await self._option_haggling()
+        self._no_zeroes = bool(client_flags & NBD_FLAG_NO_ZEROES)
+        return await self._option_haggling()
 
     async def _option_haggling(self):
         # "At this point, we move on to option haggling, during which point the
         # client can send one or (in fixed newstyle) more options to the server"
-        done = False
-        while not done:
+        while True:
             option, data = await self._recv_option()
             self._logger.trace(f"option: {option}, {data=}")
             if option == NBD_OPT_GO:
-                done = True
                 await self._send_info(option)
-                await self._send_option(option, NBD_REP_ACK, struct.pack('>I', option))
+                await self._send_option(option, NBD_REP_ACK)
+                return True
+            elif option == NBD_OPT_EXPORT_NAME:
+                # "If the server is willing to export the named export, it replies with the
+                # export size and the transmission flags" (and no option reply header).
+                await self._endpoint.send(struct.pack('>QH', await self.device_size(),
+                                                      self._transmission_flags()))
+                if not self._no_zeroes:
+                    await self._endpoint.send(bytes(124))
+                return True
+            elif option == NBD_OPT_ABORT:
+                await self._send_option(option, NBD_REP_ACK)
+                await self._endpoint.close()
+                return False
             else:
                 self._logger.warn(f"client requested unknown option {option}")
                 await self._send_option(option, NBD_REP_ERR_UNSUP)
 
-    async def _send_info(self, option):
+    def _transmission_flags(self):
         transmission_flags = NBD_FLAG_HAS_FLAGS
-        if not self._writable:
+        if self._writable:
+            transmission_flags |= NBD_FLAG_SEND_FLUSH
+        else:
             transmission_flags |= NBD_FLAG_READ_ONLY
+        return transmission_flags
 
-        info = struct.pack('>HQH', NBD_INFO_EXPORT, await self.device_size(), transmission_flags)
+    async def _send_info(self, option):
+        info = struct.pack('>HQH', NBD_INFO_EXPORT, await self.device_size(),
+                           self._transmission_flags())
         await self._send_option(option, NBD_REP_INFO, info)
 
     async def _recv_option(self):
@@ -202,37 +238,257 @@ class NBDServer:
         # structured reply chunks per request. The phase continues until either
         # side terminates transmission; this can be performed cleanly only by
         # the client."
-        while True:
-            req = await self._recv_request()
-            self._logger.trace(f"command {req.command}, length {req.length}")
+        #
+        # Requests are received by a separate task, so that the next requests are already
+        # available (and can be reordered) while the current ones are being served. The client
+        # disconnecting ends the receiving task, which is signaled by a `None` in the queue.
+        self._size = await self.device_size()
+        queue = asyncio.Queue()
+        in_flight = asyncio.Semaphore(self._max_in_flight)
+        async def receive_requests():
+            try:
+                while True:
+                    await in_flight.acquire()
+                    req = await self._recv_request()
+                    if req.command == NBD_CMD_WRITE:
+                        req.data = await self._endpoint.recv(req.length)
+                    queue.put_nowait(req)
+                    if req.command == NBD_CMD_DISC:
+                        break
+            finally:
+                queue.put_nowait(None)
+        receiver = asyncio.create_task(receive_requests())
+        try:
+            while True:
+                batch = [await queue.get()]
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                for req in self._schedule(batch):
+                    if req is None:
+                        await self._flush()
+                        return
+                    if req.command == NBD_CMD_DISC:
+                        await self._flush()
+                        await self._endpoint.close()
+                        return
+                    await self._serve(req)
+                    in_flight.release()
+        finally:
+            receiver.cancel()
+
+    @staticmethod
+    def _schedule(batch):
+        # NBD allows requests that are in flight to be served in any order; only a flush
+        # orders the writes before it with respect to the requests after it. Reads and writes
+        # between such barriers are sorted by offset to improve locality, unless a write overlaps
+        # another request, since the client may (incorrectly) rely on the order of those.
+        def overlaps(a, b):
+            return a.offset < b.offset + b.length and b.offset < a.offset + a.length
+
+        def sort_segment(segment):
+            for index, req in enumerate(segment):
+                if req.command != NBD_CMD_WRITE:
+                    continue
+                if any(overlaps(req, other) for other in segment[:index] + segment[index + 1:]):
+                    return segment
+            return sorted(segment, key=lambda req: req.offset)
+
+        schedule = []
+        segment  = []
+        for req in batch:
+            if req is not None and req.command in (NBD_CMD_READ, NBD_CMD_WRITE):
+                segment.append(req)
+            else:
+                schedule += sort_segment(segment)
+                schedule.append(req)
+                segment = []
+        schedule += sort_segment(segment)
+        return schedule
+
+    async def _serve(self, req):
+        self._logger.trace(f"command {req.command}, offset {req.offset}, length {req.length}")
+        try:
             if req.command == NBD_CMD_READ:
-                data = await self.device_read(req.offset, req.length)
-                await self._write_simple_reply(0, req.cookie, data)
+                if req.offset + req.length > self._size:
+                    await self._write_simple_reply(NBD_EINVAL, req.cookie)
+                else:
+                    data = await self.device_read(req.offset, req.length)
+                    await self._write_simple_reply(0, req.cookie, data)
             elif req.command == NBD_CMD_WRITE:
-                data = await self._endpoint.recv(req.length)
-                await self.device_write(req.offset, data)
+                if not self._writable:
+                    await self._write_simple_reply(NBD_EPERM, req.cookie)
+                elif req.offset + req.length > self._size:
+                    await self._write_simple_reply(NBD_ENOSPC, req.cookie)
+                else:
+                    await self.device_write(req.offset, req.data)
+                    await self._write_simple_reply(0, req.cookie)
+            elif req.command == NBD_CMD_FLUSH:
+                await self._flush()
                 await self._write_simple_reply(0, req.cookie)
-            elif req.command == NBD_CMD_DISC:
-                await self._endpoint.close()
-                break;
             else:
-                await self._write_simple_reply(NBD_REP_ERR_INVALID, req.cookie)
+                await self._write_simple_reply(NBD_EINVAL, req.cookie)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self._logger.error(f"command {req.command} at offset {req.offset} failed: {error}")
+            await self._write_simple_reply(NBD_EIO, req.cookie)
+
+    async def _flush(self):
+        if self._writable:
+            await self.device_flush()
 
     async def _recv_request(self):
-        magic = await self._recv32()
+        data = await self._endpoint.recv(28)
+        magic, flags, command, cookie, offset, length = struct.unpack(">IHHQQI", data)
         assert magic == NBD_REQUEST_MAGIC
-        flags = await self._recv16()
-        command = await self._recv16()
-        cookie = await self._recv64()
-        offset = await self._recv64()
-        length = await self._recv32()
         return Request(flags=flags, command=command, cookie=cookie, offset=offset, length=length)
 
     async def _write_simple_reply(self, error, cookie, data=b''):
-        await self._send32(NBD_SIMPLE_REPLY_MAGIC)
-        await self._send32(error)
-        await self._send64(cookie)
-        await self._endpoint.send(data)
+        await self._endpoint.send_many([
+            struct.pack(">IIQ", NBD_SIMPLE_REPLY_MAGIC, error, cookie),
+            data
+        ])
+
+
+class NBDMemoryServer(NBDServer):
+    """Network Block Device server exporting a memory through a cache.
+
+    The memory is read in pages of ``page_size`` bytes, and written in blocks of ``block_size``
+    bytes (which is typically the erase block size, and must be a multiple of ``page_size``).
+    Up to ``cache_pages`` pages are kept in an LRU cache, and sequential reads are extended by
+    ``read_ahead`` pages. Writes are collected in up to ``dirty_blocks`` blocks, which are written
+    back when the client requests a flush or disconnects, or when more blocks become dirty; partial
+    block writes are completed with the data read from the memory.
+
+    Subclasses implement :meth:`memory_read` and :meth:`memory_write`.
+    """
+    def __init__(self, endpoint, logger, *, size, page_size, block_size=None, writable=False,
+                 cache_pages=256, read_ahead=16, dirty_blocks=16, max_in_flight=16):
+        if block_size is None:
+            block_size = page_size
+        assert size % page_size == 0 and block_size % page_size == 0
+
+        super().__init__(endpoint, logger, writable=writable, max_in_flight=max_in_flight)
+        self._memory_size  = size
+        self._page_size    = page_size
+        self._block_size   = block_size
+        self._cache_pages  = cache_pages
+        self._read_ahead   = read_ahead
+        self._dirty_blocks = dirty_blocks
+
+        self._cache = OrderedDict() # page index -> bytes
+        self._dirty = OrderedDict() # block index -> bytearray
+        self._next_offset = None
+
+    # callbacks
+    async def memory_read(self, address, length):
+        """Read ``length`` bytes at ``address``. Both are multiples of the page size."""
+        raise NotImplementedError
+
+    async def memory_write(self, address, data):
+        """Write a block of data at ``address``, which is a multiple of the block size."""
+        raise NotImplementedError
+
+    # NBDServer callbacks
+    async def device_size(self):
+        return self._memory_size
+
+    async def device_read(self, offset, length):
+        first_page = offset // self._page_size
+        last_page  = (offset + length - 1) // self._page_size
+        fetch_last = last_page
+        if offset == self._next_offset:
+            fetch_last = min(last_page + self._read_ahead,
+                             self._memory_size // self._page_size - 1)
+        self._next_offset = offset + length
+
+        pages = await self._read_pages(first_page, last_page, fetch_last)
+        data  = b"".join(pages[index] for index in range(first_page, last_page + 1))
+        start = offset - first_page * self._page_size
+        return data[start:start + length]
+
+    async def device_write(self, offset, data):
+        pages_per_block = self._block_size // self._page_size
+        data = memoryview(data)
+        while data:
+            block_index  = offset // self._block_size
+            block_offset = offset % self._block_size
+            chunk_size   = min(len(data), self._block_size - block_offset)
+            chunk, data  = data[:chunk_size], data[chunk_size:]
+
+            if block_index in self._dirty:
+                self._dirty.move_to_end(block_index)
+            elif len(chunk) == self._block_size:
+                self._dirty[block_index] = bytearray(self._block_size)
+            else:
+                first_page = block_index * pages_per_block
+                last_page  = first_page + pages_per_block - 1
+                pages = await self._read_pages(first_page, last_page, last_page)
+                self._dirty[block_index] = bytearray(b"".join(
+                    pages[index] for index in range(first_page, last_page + 1)))
+            self._dirty[block_index][block_offset:block_offset + len(chunk)] = chunk
+            offset += len(chunk)
+
+            while len(self._dirty) > self._dirty_blocks:
+                await self._write_back(*self._dirty.popitem(last=False))
+
+    async def device_flush(self):
+        for block_index in sorted(self._dirty):
+            await self._write_back(block_index, self._dirty.pop(block_index))
+
+    # internal methods
+    async def _read_pages(self, first_page, last_page, fetch_last):
+        # Returns the requested pages (taking pending writes into account), and fetches missing
+        # pages up to `fetch_last` in as few reads as possible.
+        pages_per_block = self._block_size // self._page_size
+        pages = {}
+        run_first = None
+        for index in range(first_page, fetch_last + 2):
+            if index <= fetch_last:
+                block = self._dirty.get(index // pages_per_block)
+                if block is not None:
+                    page_offset = (index % pages_per_block) * self._page_size
+                    pages[index] = bytes(block[page_offset:page_offset + self._page_size])
+                elif index in self._cache:
+                    self._cache.move_to_end(index)
+                    pages[index] = self._cache[index]
+                elif index > last_page and run_first is None:
+                    # Only read ahead if the read-ahead pages are adjacent to the requested ones.
+                    break
+                elif run_first is None:
+                    run_first = index
+                if index not in pages:
+                    continue
+            if run_first is not None:
+                data = await self.memory_read(run_first * self._page_size,
+                                              (index - run_first) * self._page_size)
+                for run_index in range(run_first, index):
+                    page_offset = (run_index - run_first) * self._page_size
+                    pages[run_index] = self._cache_page(run_index,
+                        bytes(data[page_offset:page_offset + self._page_size]))
+                run_first = None
+        return pages
+
+    def _cache_page(self, index, data):
+        self._cache[index] = data
+        self._cache.move_to_end(index)
+        while len(self._cache) > self._cache_pages:
+            self._cache.popitem(last=False)
+        return data
+
+    async def _write_back(self, block_index, data):
+        pages_per_block = self._block_size // self._page_size
+        first_page = block_index * pages_per_block
+        cached = [self._cache.get(index) for index in range(first_page,
+                                                            first_page + pages_per_block)]
+        if None not in cached and b"".join(cached) == data:
+            self._logger.trace(f"block {block_index} unchanged, skipping write")
+            return
+        await self.memory_write(block_index * self._block_size, bytes(data))
+        for index in range(pages_per_block):
+            page_offset = index * self._page_size
+            self._cache_page(first_page + index,
+                             bytes(data[page_offset:page_offset + self._page_size]))
 
 
 async def main():
@@ -1,5 +1,4 @@
 import re
-import itertools
 import operator
 from collections.abc import Sequence, MutableSequence, Iterable
 from typing_extensions import Self
@@ -51,7 +50,7 @@ class _bits_base(Sequence):
         value  = re.sub(r"[\s_]", "", value)
         if not re.match(r"^[01]*$", value):
             raise ValueError(f"invalid input for {cls.__name__}(): '{value}'")
-        return cls.from_iter(int(x) for x in reversed(value))
+        return cls.from_int(int(value or "0", 2), len(value))
 
     @classmethod
     def from_iter(cls, iterator) -> Self:
@@ -164,6 +163,9 @@ class _bits_base(Sequence):
                 res._bytes = self._bytes[bstart:bstop:-1].translate(_byterev_lut)
                 res._len = start - stop
                 return res
+            elif step == -1:
+                # unaligned reverse path
+                return self[stop + 1:start + 1].reversed()
             elif step == 1 and start % 8 == 0 and (stop % 8 == 0 or stop == self._len):
                 # byte-aligned normal fastpath (stop either byte-aligned,
                 # or matches end of sequence)
@@ -171,6 +173,10 @@ class _bits_base(Sequence):
                 res._bytes = self._bytes[start // 8 : (stop + 7) // 8]
                 res._len = stop - start
                 return res
+            elif step == 1:
+                # unaligned normal path (shift the covered bytes as an integer)
+                value = int.from_bytes(self._bytes[start // 8 : (stop + 7) // 8], 'little')
+                return self.from_int(value >> (start % 8), stop - start)
             else:
                 # slow path
                 return self.from_iter(self[i] for i in range(start, stop, step))
@@ -191,7 +197,9 @@ class _bits_base(Sequence):
 
     def to_str(self) -> str:
         """Returns the bit string as a human-readable string (MSB-first)."""
-        return ''.join(str(x) for x in reversed(self))
+        if not self._len:
+            return ""
+        return format(self.to_int(), f"0{self._len}b")
 
     def to_bytes(self) -> bytes:
         """Returns the bits packed into bytes. The bits are packed into bytes LSB-first.
@@ -216,7 +224,8 @@ class _bits_base(Sequence):
             res._bytes = self._bytes + other._bytes
             res._len = self._len + other._len
             return res
-        return self.from_iter(itertools.chain(self, other))
+        return self.from_int(self.to_int() | (other.to_int() << self._len),
+                             self._len + other._len)
 
     def __radd__(self, other) -> Self:
         if isinstance(other, (str, Iterable)):
@@ -228,17 +237,21 @@ class _bits_base(Sequence):
             res._bytes = other._bytes + self._bytes
             res._len = other._len + self._len
             return res
-        return self.from_iter(itertools.chain(other, self))
+        return self.from_int(other.to_int() | (self.to_int() << other._len),
+                             other._len + self._len)
 
     def __mul__(self, other) -> Self:
         if not isinstance(other, int):
             return NotImplemented
-        if self._len % 8 == 0:
+        if self._len % 8 == 0 or other <= 0:
             res = object.__new__(self.__class__)
             res._bytes = self._bytes * other
-            res._len = self._len * other
+            res._len = self._len * max(other, 0)
             return res
-        return self.from_iter(itertools.chain.from_iterable(itertools.repeat(self, other)))
+        # Multiplying by 0b...0001_0001 (with `other` ones spaced `self._len` bits apart) places
+        # a copy of the value at each of the ones; the copies never overlap, so there are no carries.
+        repeat = ((1 << (self._len * other)) - 1) // ((1 << self._len) - 1)
+        return self.from_int(self.to_int() * repeat, self._len * other)
 
     __rmul__ = __mul__
 
@@ -249,10 +262,7 @@ class _bits_base(Sequence):
             other = bits(other)
         if len(other) != len(self):
             raise ValueError("mismatched bitwise operator widths")
-        res = object.__new__(self.__class__)
-        res._bytes = self._bytestype(op(a, b) for (a, b) in zip(self._bytes, other._bytes))
-        res._len = self._len
-        return res
+        return self.from_int(op(self.to_int(), other.to_int()), self._len)
 
     def __and__(self, other) -> Self:
         return self._bitop(other, operator.__and__)
@@ -270,28 +280,18 @@ class _bits_base(Sequence):
     __rxor__ = __xor__
 
     def __invert__(self) -> Self:
-        if self._len % 8 == 0:
-            pad_idx = None
-        else:
-            pad_idx = self._len // 8
-            pad_mask = ~(-1 << self._len % 8)
-        res = object.__new__(self.__class__)
-        res._bytes = self._bytestype(
-            ~x & pad_mask if i == pad_idx else ~x & 0xff
-            for i, x in enumerate(self._bytes)
-        )
-        res._len = self._len
-        return res
+        return self.from_int(~self.to_int(), self._len)
 
     def reversed(self) -> Self:
         """Returns a reversed copy of this bit string. Equivalent to ``from_iter(reversed(self))``."""
+        res = object.__new__(self.__class__)
+        res._bytes = self._bytes.translate(_byterev_lut)[::-1]
+        res._len = self._len
         if self._len % 8 == 0:
-            res = object.__new__(self.__class__)
-            res._bytes = self._bytes.translate(_byterev_lut)[::-1]
-            res._len = self._len
             return res
         else:
-            return self.from_iter(reversed(self))
+            # the zero padding bits of the last byte are now the LSBs of the first byte
+            return res.from_int(res.to_int() >> (8 - self._len % 8), self._len)
 
     def byte_reversed(self) -> Self:
         """Returns a copy of this bit string with bits reversed within each byte.
@@ -317,10 +317,10 @@ class _bits_base(Sequence):
         if end is None:
             end = self._len
         end = min(end, self._len - (needle._len - 1))
-        for i in range(start, end):
-            if all(self[i + j] == needle[j] for j in range(needle._len)):
-               return i
-        return -1
+        if start >= end:
+            return -1
+        # Search in LSB-first strings of the bits, which makes the search run at C speed.
+        return self.to_str()[::-1].find(needle.to_str()[::-1], start, end + needle._len - 1)
 
     def index(self, *args, **kwargs) -> int:
         """Like ``find``, but raises ``ValueError`` when the substring is not found."""
@@ -359,6 +359,18 @@ class bitarray(_bits_base, MutableSequence):
         if self._len % 8 != 0:
             self._bytes[-1] &= ~(-1 << (self._len % 8))
 
+    def _overwrite(self, start, value):
+        # Replaces the bits in `range(start, start + len(value))` with `value`, shifting it into
+        # place as an integer over the covered bytes.
+        if not value._len:
+            return
+        bstart, bstop = start // 8, _byte_len(start + value._len)
+        shift = start % 8
+        mask  = ~(-1 << value._len) << shift
+        chunk = int.from_bytes(self._bytes[bstart:bstop], 'little')
+        chunk = (chunk & ~mask) | (value.to_int() << shift)
+        self._bytes[bstart:bstop] = chunk.to_bytes(bstop - bstart, 'little')
+
     def _resize(self, length):
         blen = _byte_len(length)
         if length < self._len:
@@ -394,14 +406,12 @@ class bitarray(_bits_base, MutableSequence):
                 self._bytes[start // 8 :] = value._bytes
                 self._len = start + value._len
             elif stop - start == value._len:
-                # slow-ish path, no resize
-                for di, bit in zip(rng, value):
-                    self[di] = bit
+                # unaligned path, no resize
+                self._overwrite(start, value)
             elif stop == self._len:
-                # slow-ish path, extend/truncate
+                # unaligned path, extend/truncate
                 self._resize(start + value._len)
-                for di, bit in enumerate(value, start=start):
-                    self[di] = bit
+                self._overwrite(start, value)
             else:
                 # slow path
                 tail = self[stop:]
@@ -433,10 +443,11 @@ class bitarray(_bits_base, MutableSequence):
                 return
             elif step != 1:
                 # insane slow path
+                rng = range(start, stop, step)
                 res = self.from_iter(
                     x
                     for (i, x) in enumerate(self)
-                    if i not in range(start, stop, step)
+                    if i not in rng
                 )
                 self._bytes = res._bytes
                 self._len = res._len
@@ -492,7 +503,7 @@ class bitarray(_bits_base, MutableSequence):
             self._bytes = self._bytes.translate(_byterev_lut)
             self._bytes.reverse()
         else:
-            super().reverse()
+            self._bytes = self.reversed()._bytes
 
     def byte_reverse(self) -> None:
         """Reverses the bits within every byte of this bitarray in-place. The length
@@ -516,9 +527,8 @@ class bitarray(_bits_base, MutableSequence):
         elif other < 0:
             raise ValueError("cannot multiply bitarray by negative count")
         elif other != 1:
-            val = self[:]
-            for _ in range(other - 1):
-                self += val
+            self._bytes = (self * other)._bytes
+            self._len *= other
         return self
 
     def _ibitop(self, other, op):
@@ -528,8 +538,7 @@ class bitarray(_bits_base, MutableSequence):
             other = bits(other)
         if len(other) != len(self):
             raise ValueError("mismatched bitwise operator widths")
-        for i, b in enumerate(other._bytes):
-            self._bytes[i] = op(self._bytes[i], b)
+        self._bytes[:] = op(self.to_int(), other.to_int()).to_bytes(len(self._bytes), 'little')
         return self
 
     def __iand__(self, other) -> Self:
@@ -1,5 +1,6 @@
 import sys
 import types
+import struct
 import textwrap
 from collections import OrderedDict
 
@@ -67,13 +68,26 @@ class _bitstruct:
                        for field in cls["_layout_"] if field in cls["_named_fields_"])}
 
         @classmethod
-        def from_bits(cls, value):
-            cls._check_bits_("initialization", cls._size_bits_, value)
+        def _from_int_(cls, value):
             self = object.__new__(cls)
-            {"; ".join(f"self._f_{field} = int(value[{offset}:{offset+width}])"
+            {"; ".join(f"self._f_{field} = (value >> {offset}) & {(1 << width) - 1:#x}"
                        for field, (offset, width) in cls["_layout_"].items())}
             return self
 
+        @classmethod
+        def from_bits(cls, value):
+            cls._check_bits_("initialization", cls._size_bits_, value)
+            return cls._from_int_(value.to_int())
+
+        @classmethod
+        def _unpack_ints_(cls, values):
+            return {{
+                {" ".join(f"{field!r}: [(value >> {offset}) & {(1 << width) - 1:#x} "
+                                     f"for value in values],"
+                          for field, (offset, width) in cls["_layout_"].items()
+                          if field in cls["_named_fields_"])}
+            }}
+
         def to_bits(self):
             value = 0
             {"; ".join(f"value |= self._f_{field} << {offset}"
@@ -104,14 +118,72 @@ class _bitstruct:
     @classmethod
     def from_bytes(cls, value):
         cls._check_bytes_("initialization", cls._size_bytes_, value)
-        return cls.from_bits(bits(value, cls._size_bits_))
+        value = int.from_bytes(value, "little")
+        if value >> cls._size_bits_:
+            raise ValueError("wrong padding in the last byte")
+        return cls._from_int_(value)
 
     from_bytearray = from_bytes
 
     @classmethod
     def from_int(cls, value):
         cls._check_int_("initialization", cls._size_bits_, value)
-        return cls.from_bits(bits(value, cls._size_bits_))
+        return cls._from_int_(value)
+
+    @classmethod
+    def _ints_from_bytes_array_(cls, value):
+        assert isinstance(value, (bytes, bytearray, memoryview))
+        stride = cls._size_bytes_
+        if len(value) % stride != 0:
+            raise ValueError("unpacking requires a multiple of %d bytes, got %d bytes"
+                             % (stride, len(value)))
+        if stride in (1, 2, 4, 8):
+            fmt = "<" + {1: "B", 2: "H", 4: "L", 8: "Q"}[stride]
+            values = [record for record, in struct.iter_unpack(fmt, value)]
+        else:
+            values = [int.from_bytes(value[offset:offset + stride], "little")
+                      for offset in range(0, len(value), stride)]
+        if cls._size_bits_ % 8 != 0:
+            if any(record >> cls._size_bits_ for record in values):
+                raise ValueError("wrong padding in the last byte")
+        return values
+
+    @classmethod
+    def from_bytes_array(cls, value):
+        """Decode a buffer of consecutive ``to_bytes()`` records into a list of structures."""
+        return [cls._from_int_(record) for record in cls._ints_from_bytes_array_(value)]
+
+    @classmethod
+    def unpack_many(cls, value, *, numpy=False):
+        """Decode a buffer of consecutive ``to_bytes()`` records into a dictionary that maps
+        the name of each field to the list of its values.
+
+        If ``numpy`` is true, the values are returned as NumPy arrays of unsigned integers
+        instead; this requires the structure to be at most 64 bits wide.
+        """
+        if not numpy:
+            return cls._unpack_ints_(cls._ints_from_bytes_array_(value))
+
+        import numpy as np
+
+        if cls._size_bits_ > 64:
+            raise ValueError("unpacking into NumPy arrays requires a structure of at most "
+                             "64 bits, got %d bits" % cls._size_bits_)
+        stride = cls._size_bytes_
+        if len(value) % stride != 0:
+            raise ValueError("unpacking requires a multiple of %d bytes, got %d bytes"
+                             % (stride, len(value)))
+        records = np.zeros((len(value) // stride, 8), dtype=np.uint8)
+        records[:, :stride] = np.frombuffer(value, dtype=np.uint8).reshape(-1, stride)
+        values = records.view("<u8")[:, 0]
+        if cls._size_bits_ % 8 != 0:
+            if np.any(values >> np.uint64(cls._size_bits_)):
+                raise ValueError("wrong padding in the last byte")
+        columns = {}
+        for name in cls._named_fields_:
+            offset, width = cls._layout_[name]
+            columns[name] = (values >> np.uint64(offset)) & np.uint64((1 << width) - 1)
+        return columns
 
     @classmethod
     def bit_length(cls):
@@ -21,7 +21,34 @@ def endpoint(spec):
     raise argparse.ArgumentTypeError(f"invalid endpoint: {spec!r}")
 
 
+class _ServerEndpointClient(asyncio.Protocol):
+    # In the multi-client mode, every connection has its own protocol instance, so that
+    # the endpoint knows which of the connections has been lost.
+    def __init__(self, endpoint):
+        self._endpoint  = endpoint
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._endpoint._client_made(transport)
+
+    def connection_lost(self, exc):
+        self._endpoint._client_lost(self._transport, exc)
+
+    def data_received(self, data):
+        self._endpoint.data_received(data)
+
+
 class ServerEndpoint(aobject, asyncio.Protocol):
+    """A stream server that the applet interacts with as if it were a single connection.
+
+    By default, only one client is served at a time, and a new connection closes the previous
+    one. If ``max_clients`` is greater than 1, up to that many clients may be connected at once;
+    the data sent by any of them is merged into a single stream in the order it arrives, and
+    the data sent by the applet is sent to all of them. In this mode, :meth:`recv` signals
+    the end of stream only when the last client disconnects.
+    """
+
     @classmethod
     def add_argument(cls, parser, name, default=None):
         metavar = name.upper().replace("_", "-")
@@ -36,20 +63,28 @@ class ServerEndpoint(aobject, asyncio.Protocol):
             name, metavar=metavar, type=endpoint, nargs=nargs, default=default,
             help=help)
 
-    async def __init__(self, name, logger, sock_addr, queue_size=None):
+    async def __init__(self, name, logger, sock_addr, queue_size=None, *, max_clients=1):
         assert isinstance(sock_addr, tuple)
+        assert max_clients >= 1
 
         self.name    = name
         self._logger = logger
 
+        if max_clients == 1:
+            protocol_factory = lambda: self
+        else:
+            protocol_factory = lambda: _ServerEndpointClient(self)
+
         proto, *proto_args = sock_addr
         loop = asyncio.get_event_loop()
         if proto == "unix":
-            self.server = await loop.create_unix_server(lambda: self, *proto_args, backlog=1)
+            self.server = await loop.create_unix_server(protocol_factory, *proto_args,
+                                                        backlog=max_clients)
             unix_path, = proto_args
             self._log(logging.INFO, "listening at unix:%s", unix_path)
         elif proto == "tcp":
-            self.server = await loop.create_server(lambda: self, *proto_args, backlog=1)
+            self.server = await loop.create_server(protocol_factory, *proto_args,
+                                                   backlog=max_clients)
             tcp_host, tcp_port = proto_args
             self._log(logging.INFO, "listening at tcp:%s:%d", tcp_host or "*", tcp_port)
         else:
@@ -57,6 +92,8 @@ class ServerEndpoint(aobject, asyncio.Protocol):
 
         self._transport     = None
         self._new_transport = None
+        self._max_clients   = max_clients
+        self._clients       = []
 
         self._send_epoch = 0
         self._recv_epoch = 1
@@ -65,7 +102,9 @@ class ServerEndpoint(aobject, asyncio.Protocol):
         self._queue_size = queue_size
         self._future     = None
 
-        self._buffer = None
+        # The data received from the connection is consumed from `_buffer` starting at `_pos`,
+        # without copying or slicing the buffer.
+        self._buffer = b""
         self._pos    = 0
 
         self._read_paused = False
@@ -73,14 +112,21 @@ class ServerEndpoint(aobject, asyncio.Protocol):
     def _log(self, level, message, *args):
         self._logger.log(level, self.name + ": " + message, *args)
 
-    def connection_made(self, transport):
-        self._send_epoch += 1
-
+    def _log_connection(self, transport, made):
         peername = transport.get_extra_info("peername")
-        if peername:
+        if made and peername:
             self._log(logging.INFO, "new connection from [%s]:%d", *peername[0:2])
-        else:
+        elif made:
             self._log(logging.INFO, "new connection")
+        elif peername:
+            self._log(logging.INFO, "connection from [%s]:%d lost", *peername[0:2])
+        else:
+            self._log(logging.INFO, "connection lost")
+
+    def connection_made(self, transport):
+        self._send_epoch += 1
+
+        self._log_connection(transport, made=True)
 
         if self._transport is None:
             self._transport = transport
@@ -91,16 +137,44 @@ class ServerEndpoint(aobject, asyncio.Protocol):
         self.data_received(b"")
 
     def connection_lost(self, exc):
-        peername = self._transport.get_extra_info("peername")
-        if peername:
-            self._log(logging.INFO, "connection from [%s]:%d lost", *peername[0:2])
-        else:
-            self._log(logging.INFO, "connection lost")
+        self._log_connection(self._transport, made=False)
 
         self._transport, self._new_transport = self._new_transport, None
         self._queue.append(exc)
         self._check_future()
 
+    def _client_made(self, transport):
+        self._log_connection(transport, made=True)
+
+        if len(self._clients) == self._max_clients:
+            self._log(logging.INFO, "too many connections, closing new connection")
+            transport.close()
+            return
+        if not self._clients:
+            self._send_epoch += 1
+        self._clients.append(transport)
+        if self._read_paused:
+            transport.pause_reading()
+        self.data_received(b"")
+
+    def _client_lost(self, transport, exc):
+        if transport not in self._clients:
+            return # rejected in `_client_made`
+        self._log_connection(transport, made=False)
+
+        self._clients.remove(transport)
+        if exc is not None:
+            self._log(logging.WARNING, "connection error: %s", exc)
+        if not self._clients:
+            self._queue.append(None)
+            self._check_future()
+
+    def _transports(self):
+        if self._max_clients == 1:
+            return [] if self._transport is None else [self._transport]
+        else:
+            return self._clients
+
     def data_received(self, data):
         self._log(logging.TRACE, "endpoint received %d bytes", len(data))
         self._queue.append(data)
@@ -113,11 +187,13 @@ class ServerEndpoint(aobject, asyncio.Protocol):
             return
         elif not self._read_paused and self._queued >= self._queue_size:
             self._log(logging.TRACE, "queue full, pausing reads")
-            self._transport.pause_reading()
+            for transport in self._transports():
+                transport.pause_reading()
             self._read_paused = True
         elif self._read_paused and self._queued < self._queue_size:
             self._log(logging.TRACE, "queue not full, resuming reads")
-            self._transport.resume_reading()
+            for transport in self._transports():
+                transport.resume_reading()
             self._read_paused = False
 
     def _check_future(self):
@@ -129,79 +205,123 @@ class ServerEndpoint(aobject, asyncio.Protocol):
                 self._future.set_result(item)
             self._future = None
 
+    def _available(self):
+        return len(self._buffer) - self._pos
+
+    def _consume(self, length):
+        chunk = memoryview(self._buffer)[self._pos:self._pos + length]
+        self._pos += len(chunk)
+        self._queued -= len(chunk)
+        self._check_pushback()
+        return chunk
+
     async def _refill(self):
         self._future = future = asyncio.Future()
         self._check_future()
-        self._buffer = await future
-        if self._buffer is None:
+        buffer = await future
+        self._pos = 0
+        if buffer is None:
             self._buffer = b""
             self._log(logging.TRACE, "recv end-of-stream")
             self._recv_epoch += 1
             raise asyncio.CancelledError
+        self._buffer = buffer
 
     async def recv(self, length=0):
         data = bytearray()
         while length == 0 or len(data) < length:
-            if not self._buffer:
+            if not self._available():
                 self._log(logging.TRACE, "recv waits for %d bytes", length - len(data))
                 await self._refill()
 
             if length == 0:
-                length = len(self._buffer)
+                length = self._available()
 
-            chunk = self._buffer[:length - len(data)]
-            self._buffer = self._buffer[len(chunk):]
-            self._queued -= len(chunk)
-            self._check_pushback()
-            data += chunk
+            data += self._consume(length - len(data))
 
         self._log(logging.TRACE, "recv <%s>", data.hex())
         return data
 
+    async def recv_into(self, buffer, length=0):
+        """Receive data into the writable bytes-like object ``buffer``.
+
+        If ``length`` is 0, receives the data that is available (waiting until there is some),
+        up to the size of ``buffer``; otherwise, receives exactly ``length`` bytes. Returns
+        the number of bytes received.
+        """
+        buffer = memoryview(buffer).cast("B")
+        if length == 0:
+            limit = len(buffer)
+        else:
+            assert length <= len(buffer)
+            limit = length
+        received = 0
+        while received < limit:
+            if not self._available():
+                if length == 0 and received > 0:
+                    break
+                self._log(logging.TRACE, "recv waits for %d bytes", limit - received)
+                await self._refill()
+
+            chunk = self._consume(limit - received)
+            buffer[received:received + len(chunk)] = chunk
+            received += len(chunk)
+
+        self._log(logging.TRACE, "recv <%s>", buffer[:received].hex())
+        return received
+
     async def recv_until(self, separator):
         separator = bytes(separator)
         data = bytearray()
         while True:
-            if not self._buffer:
+            if not self._available():
                 self._log(logging.TRACE, "recv waits for <%s>", separator.hex())
                 await self._refill()
 
-            try:
-                index = self._buffer.index(separator)
-                chunk = self._buffer[:index]
-                self._buffer = self._buffer[index + 1:]
-                self._queued -= len(chunk)
-                self._check_pushback()
-                data += chunk
+            index = self._buffer.find(separator, self._pos)
+            if index == -1:
+                data += self._consume(self._available())
+            else:
+                data += self._consume(index - self._pos)
+                self._consume(1)
                 break
 
-            except ValueError:
-                data += self._buffer
-                self._queued -= len(self._buffer)
-                self._check_pushback()
-                self._buffer = None
-
         self._log(logging.TRACE, "recv <%s%s>", data.hex(), separator.hex())
         return data
 
     async def recv_wait(self):
-        if not self._buffer:
+        if not self._available():
             self._log(logging.TRACE, "recv wait")
             await self._refill()
 
     async def send(self, data):
-        data = bytes(data)
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
         if self._send_epoch == self._recv_epoch:
             self._log(logging.TRACE, "send <%s>", data.hex())
-            self._transport.write(data)
+            for transport in self._transports():
+                transport.write(data)
+            return True
+        else:
+            self._log(logging.TRACE, "send to previous connection discarded")
+            return False
+
+    async def send_many(self, chunks):
+        """Send each of the bytes-like objects in ``chunks``, without concatenating them first."""
+        chunks = [chunk if isinstance(chunk, (bytes, bytearray, memoryview)) else bytes(chunk)
+                  for chunk in chunks]
+        if self._send_epoch == self._recv_epoch:
+            self._log(logging.TRACE, "send <%s>", "".join(chunk.hex() for chunk in chunks))
+            for transport in self._transports():
+                transport.writelines(chunks)
             return True
         else:
             self._log(logging.TRACE, "send to previous connection discarded")
             return False
 
     async def close(self):
-        if self._transport:
-            self._transport.close()
+        for transport in self._transports():
+            transport.close()
 
 
 class ClientEndpoint(aobject, asyncio.Protocol):
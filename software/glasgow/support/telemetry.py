@@ -0,0 +1,210 @@
+import json
+import math
+import asyncio
+import logging
+
+
+__all__ = ["Counter", "Gauge", "HighWaterMark", "Histogram", "MetricRegistry"]
+
+
+class Counter:
+    """A monotonically increasing value."""
+    type = "counter"
+
+    __slots__ = ("value",)
+
+    def __init__(self, value=0):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """A value that can arbitrarily go up and down."""
+    type = "gauge"
+
+    __slots__ = ("value",)
+
+    def __init__(self, value=0):
+        self.value = value
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class HighWaterMark(Gauge):
+    """The largest value ever observed."""
+
+    __slots__ = ()
+
+    def update(self, value):
+        if value > self.value:
+            self.value = value
+
+
+class Histogram:
+    """A distribution of observed values.
+
+    The bucket ``n`` counts the values no greater than ``scale * 2 ** n``; the last bucket
+    counts all of the remaining values. Finding the bucket only takes a rounding and
+    a :meth:`int.bit_length` call, so observing a value is cheap enough to do on every transfer.
+    """
+    type = "histogram"
+
+    __slots__ = ("_scale", "buckets", "count", "sum")
+
+    def __init__(self, *, scale=1, bucket_count=32):
+        self._scale  = scale
+        self.buckets = [0] * bucket_count
+        self.count   = 0
+        self.sum     = 0
+
+    def observe(self, value):
+        index = max(math.ceil(value / self._scale) - 1, 0).bit_length()
+        if index >= len(self.buckets):
+            index = len(self.buckets) - 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.sum   += value
+
+    def bounds(self):
+        """Upper bounds of the buckets; the last one is ``float("inf")``."""
+        return [self._scale * (1 << index) for index in range(len(self.buckets) - 1)] + \
+               [float("inf")]
+
+    def snapshot(self):
+        buckets = {}
+        for bound, count in zip(self.bounds(), self.buckets):
+            if count:
+                buckets["+Inf" if bound == float("inf") else _format_value(bound)] = count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(labels, extra={}):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\")
+                                                             .replace("\"", "\\\"")
+                                                             .replace("\n", "\\n"))
+                          for name, value in labels.items()) + "}"
+
+
+class MetricRegistry:
+    """A set of metrics exported in OpenMetrics text format or as JSON.
+
+    Metrics are obtained by calling ``collect`` each time they are exported; it must return
+    an iterable of ``(labels, metrics)`` pairs, where ``labels`` is a dictionary of label names
+    and values, and ``metrics`` is a dictionary that maps a metric name to a ``(help, metric)``
+    pair. This way, the metrics of sources that appear while the registry is in use (such as
+    demultiplexer interfaces claimed by an applet) are exported as well.
+    """
+    def __init__(self, collect, *, prefix="glasgow_"):
+        self._collect = collect
+        self._prefix  = prefix
+
+    def _families(self):
+        families = {}
+        for labels, metrics in self._collect():
+            for name, (help, metric) in metrics.items():
+                families.setdefault(self._prefix + name, (help, metric.type, []))[2] \
+                    .append((labels, metric))
+        return families
+
+    def openmetrics(self):
+        """Render the metrics in the OpenMetrics text format."""
+        lines = []
+        for name, (help, type, samples) in self._families().items():
+            lines.append(f"# TYPE {name} {type}")
+            lines.append(f"# HELP {name} {help}")
+            for labels, metric in samples:
+                if type == "counter":
+                    lines.append(f"{name}_total{_format_labels(labels)} "
+                                 f"{_format_value(metric.value)}")
+                elif type == "gauge":
+                    lines.append(f"{name}{_format_labels(labels)} "
+                                 f"{_format_value(metric.value)}")
+                elif type == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.bounds(), metric.buckets):
+                        cumulative += count
+                        lines.append(f"{name}_bucket"
+                                     f"{_format_labels(labels, {'le': _format_value(bound)})} "
+                                     f"{cumulative}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} "
+                                 f"{_format_value(metric.sum)}")
+                else:
+                    assert False
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def json(self):
+        """Render the metrics as a single line of JSON."""
+        return json.dumps([
+            {"labels": labels,
+             **{name: metric.snapshot() for name, (help, metric) in metrics.items()}}
+            for labels, metrics in self._collect()
+        ], separators=(",", ":"))
+
+    async def serve(self, sock_addr, logger):
+        """Serve the metrics over HTTP at ``sock_addr`` (as returned by
+        :func:`glasgow.support.endpoint.endpoint`) until cancelled."""
+        async def handle(reader, writer):
+            try:
+                request = await reader.readline()
+                while (await reader.readline()).strip():
+                    pass # skip headers
+                method, path, *_ = request.decode("latin-1").split() + ["", ""]
+                if method == "GET" and path.split("?")[0] in ("/", "/metrics"):
+                    status = "200 OK"
+                    content_type = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+                    body = self.openmetrics().encode("utf-8")
+                else:
+                    status = "404 Not Found"
+                    content_type = "text/plain; charset=utf-8"
+                    body = b"not found\n"
+                writer.write(f"HTTP/1.0 {status}\r\n"
+                             f"Content-Type: {content_type}\r\n"
+                             f"Content-Length: {len(body)}\r\n"
+                             f"Connection: close\r\n\r\n".encode("latin-1"))
+                writer.write(body)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        proto, *proto_args = sock_addr
+        if proto == "unix":
+            server = await asyncio.start_unix_server(handle, *proto_args)
+            logger.info("serving metrics at unix:%s", *proto_args)
+        elif proto == "tcp":
+            server = await asyncio.start_server(handle, *proto_args)
+            tcp_host, tcp_port = proto_args
+            logger.info("serving metrics at http://%s:%d/metrics", tcp_host or "*", tcp_port)
+        else:
+            raise ValueError("unknown protocol %s" % proto)
+        async with server:
+            await server.serve_forever()
+
+    async def log_periodically(self, interval, logger, level=logging.INFO):
+        """Log the metrics as JSON every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            logger.log(level, "metrics: %s", self.json())
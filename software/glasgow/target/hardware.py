@@ -6,6 +6,7 @@ import logging
 import hashlib
 import pathlib
 import subprocess
+import collections
 import platformdirs
 from amaranth import *
 from amaranth.lib import io
@@ -25,6 +26,13 @@ __all__ = ["GlasgowHardwareTarget"]
 logger = logging.getLogger(__name__)
 
 
+# bitstreams that have already been obtained by this process, by bitstream ID, least recently used
+# first; scripts and test stations may switch between the same few applets many times, and there
+# is no point in reading and verifying the cache files every time
+_bitstream_memo = collections.OrderedDict()
+_bitstream_memo_size = 16
+
+
 class GlasgowHardwareTarget(Elaboratable):
     def __init__(self, revision, multiplexer_cls=None, with_analyzer=False):
         if revision in ("A0", "B0"):
@@ -201,6 +209,12 @@ class GlasgowBuildPlan:
         return bitstream_data, stdout_data
 
     def get_bitstream(self, *, debug=False):
+        # the build tree is only kept if the build is executed, so a debug build must not be
+        # short-circuited by a bitstream loaded earlier
+        if not debug and self.bitstream_id in _bitstream_memo:
+            logger.debug(f"bitstream ID {self.bitstream_id.hex()} is already loaded")
+            _bitstream_memo.move_to_end(self.bitstream_id)
+            return _bitstream_memo[self.bitstream_id]
         # locate the caches in the platform-appropriate cache directory; bitstreams aren't large,
         # but it is good etiquette to indicate to the OS that they can be wiped without concern
         cache_path = platformdirs.user_cache_path("GlasgowEmbedded", appauthor=False)
@@ -246,4 +260,8 @@ class GlasgowBuildPlan:
             logger.trace(f"bitstream was written to {str(bitstream_filename)!r}")
         # finally, we have a bitstream! and chances are, we have obtained it much faster than we
         # would have otherwise.
+        _bitstream_memo[self.bitstream_id] = bitstream_data
+        _bitstream_memo.move_to_end(self.bitstream_id)
+        while len(_bitstream_memo) > _bitstream_memo_size:
+            _bitstream_memo.popitem(last=False)
         return bitstream_data
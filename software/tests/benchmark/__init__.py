@@ -0,0 +1,34 @@
+import timeit
+
+
+__all__ = ["measure", "report", "compare"]
+
+
+def measure(func, *, min_time=0.2, repeat=5):
+    """Return the best time per call of ``func``, in seconds.
+
+    The number of calls per measurement is chosen so that each measurement takes at least
+    ``min_time`` seconds, like ``python -m timeit`` does.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    while number * timer.timeit(1) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def report(results, baseline={}):
+    width = max(map(len, results), default=0)
+    for name, seconds in results.items():
+        if name in baseline:
+            change = (seconds / baseline[name] - 1) * 100
+            print(f"{name:<{width}}  {seconds * 1e6:12.2f} us  {change:+7.1f}%")
+        else:
+            print(f"{name:<{width}}  {seconds * 1e6:12.2f} us")
+
+
+def compare(baseline, results, tolerance):
+    """Return the names of benchmarks in ``results`` that are slower than in ``baseline`` by more
+    than ``tolerance`` (a fraction). Benchmarks missing from ``baseline`` are not compared."""
+    return [name for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * (1 + tolerance)]
@@ -0,0 +1,88 @@
+# Runs the benchmark suite; see `python -m tests.benchmark --help`.
+
+import re
+import sys
+import json
+import pkgutil
+import argparse
+import platform
+import importlib
+import subprocess
+
+from . import __path__ as package_path, measure, report, compare
+
+
+def get_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"],
+                              capture_output=True, check=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmark",
+        description="Run host-side benchmarks, and compare them with a previous run.")
+    parser.add_argument(
+        "-k", "--filter", metavar="REGEX", type=re.compile,
+        help="only run benchmarks whose name (`module: benchmark`) matches REGEX")
+    parser.add_argument(
+        "--min-time", metavar="SECONDS", type=float, default=0.2,
+        help="make each measurement take at least SECONDS seconds (default: %(default)s)")
+    parser.add_argument(
+        "--repeat", metavar="COUNT", type=int, default=5,
+        help="take the best of COUNT measurements (default: %(default)s)")
+    parser.add_argument(
+        "-o", "--output", metavar="FILENAME", type=argparse.FileType("w"),
+        help="save the results as JSON to FILENAME")
+    parser.add_argument(
+        "-c", "--compare", metavar="FILENAME", type=argparse.FileType("r"),
+        help="compare the results with JSON results in FILENAME, and fail if any benchmark "
+             "became slower than the tolerance allows")
+    parser.add_argument(
+        "-t", "--tolerance", metavar="PERCENT", type=float, default=10,
+        help="allow benchmarks to be up to PERCENT percent slower than the baseline "
+             "(default: %(default)s)")
+    parser.add_argument(
+        "modules", metavar="MODULE", nargs="*",
+        help="run benchmarks from MODULE, e.g. `bits` (default: all)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        baseline = json.load(args.compare)["results"]
+
+    module_names = args.modules or sorted(
+        module.name[len("bench_"):] for module in pkgutil.iter_modules(package_path)
+        if module.name.startswith("bench_"))
+    results = {}
+    for module_name in module_names:
+        module = importlib.import_module(f"{__package__}.bench_{module_name}")
+        module_results = {}
+        for name, func in module.benchmarks().items():
+            name = f"{module_name}: {name}"
+            if args.filter and not args.filter.search(name):
+                continue
+            module_results[name] = measure(func, min_time=args.min_time, repeat=args.repeat)
+        report(module_results, baseline)
+        results.update(module_results)
+
+    if args.output:
+        json.dump({
+            "revision": get_revision(),
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+            "results":  results,
+        }, args.output, indent=2)
+
+    if args.compare:
+        regressions = compare(baseline, results, args.tolerance / 100)
+        for name in regressions:
+            print(f"regression: {name}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
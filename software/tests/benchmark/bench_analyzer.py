@@ -0,0 +1,61 @@
+# Microbenchmarks for `glasgow.gateware.analyzer.TraceDecoder`; run as
+# `python -m tests.benchmark.bench_analyzer`.
+
+import random
+from types import SimpleNamespace
+
+from glasgow.gateware.analyzer import (TraceDecoder, REPORT_DELAY, REPORT_EVENT, REPORT_SPECIAL,
+                                       SPECIAL_DONE)
+from . import measure, report
+
+
+def generate_trace(event_sources, count, rng):
+    trace = bytearray()
+    for _ in range(count):
+        delay = rng.randrange(1, 1 << 14)
+        if delay >= 1 << 7:
+            trace.append(REPORT_DELAY | (delay >> 7))
+        trace.append(REPORT_DELAY | (delay & 0x7f))
+        for index in sorted(rng.sample(range(len(event_sources)), rng.randint(1, 2))):
+            event_src = event_sources[index]
+            trace.append(REPORT_EVENT | index)
+            trace += rng.getrandbits(event_src.width).to_bytes((event_src.width + 7) // 8, "big")
+    trace.append(REPORT_DELAY | 1)
+    trace.append(REPORT_SPECIAL | SPECIAL_DONE)
+    return bytes(trace)
+
+
+def benchmarks(count=10_000):
+    rng = random.Random(0)
+    # Resembles the event sources of an applet with a byte-wide data port and a few control pins.
+    event_sources = [
+        SimpleNamespace(name="data",    kind="change", width=8,  fields=[]),
+        SimpleNamespace(name="control", kind="change", width=4,
+                        fields=[("cs", 1), ("rd", 1), ("wr", 1), ("ale", 1)]),
+        SimpleNamespace(name="address", kind="strobe", width=16, fields=[]),
+    ]
+    trace = generate_trace(event_sources, count, rng)
+
+    def process():
+        decoder = TraceDecoder(event_sources)
+        decoder.process(trace)
+        decoder.flush()
+
+    def process_chunked():
+        decoder = TraceDecoder(event_sources)
+        for offset in range(0, len(trace), 512):
+            decoder.process(trace[offset:offset + 512])
+            decoder.flush()
+
+    return {
+        f"process x{count}":         process,
+        f"process chunked x{count}": process_chunked,
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Microbenchmarks for `glasgow.support.bits`; run as
+# `python -m tests.benchmark.bench_bits`.
+
+import random
+
+from glasgow.support.bits import bits, bitarray
+from . import measure, report
+
+
+def benchmarks(length=100_003):
+    rng = random.Random(0)
+    value_a = bits(rng.getrandbits(length), length)
+    value_b = bits(rng.getrandbits(length), length)
+    needle  = value_a[length - 40:length - 8]
+
+    def delitem():
+        array = bitarray(value_a)
+        del array[3:length // 2]
+
+    def setitem():
+        array = bitarray(value_a)
+        array[3:length // 2] = value_b[:length // 3]
+
+    def extend():
+        array = bitarray(value_a)
+        array.extend(value_b)
+
+    return {
+        "getitem unaligned":    lambda: value_a[3:length - 5],
+        "getitem reversed":     lambda: value_a[length - 5:3:-1],
+        "add unaligned":        lambda: value_a + value_b,
+        "radd unaligned":       lambda: value_a[:13] + value_b,
+        "mul unaligned":        lambda: value_a[:13] * 1000,
+        "reversed unaligned":   lambda: value_a.reversed(),
+        "and":                  lambda: value_a & value_b,
+        "invert":               lambda: ~value_a,
+        "find":                 lambda: value_a.find(needle),
+        "to_str":               lambda: str(value_a),
+        "bitarray delitem":     delitem,
+        "bitarray setitem":     setitem,
+        "bitarray extend":      extend,
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# Microbenchmarks for `glasgow.support.bitstruct`; run as
+# `python -m tests.benchmark.bench_bitstruct`.
+
+import random
+
+from glasgow.support.bits import bits
+from glasgow.support.bitstruct import bitstruct
+from . import measure, report
+
+
+DR_xPACC = bitstruct("DR_xPACC", 35, [
+    ("ACK",         3),
+    ("ReadResult", 32),
+])
+
+
+def benchmarks(count=10_000):
+    rng = random.Random(0)
+    value = bits(rng.getrandbits(35), 35)
+    data  = bytes(b for _ in range(count) for b in bits(rng.getrandbits(35), 35).to_bytes())
+
+    return {
+        "from_bits":                    lambda: DR_xPACC.from_bits(value),
+        "from_int":                     lambda: DR_xPACC.from_int(0x123456789),
+        f"from_bytes x{count}":         lambda: [DR_xPACC.from_bytes(data[i:i + 5])
+                                                 for i in range(0, len(data), 5)],
+        f"from_bytes_array x{count}":   lambda: DR_xPACC.from_bytes_array(data),
+        f"unpack_many x{count}":        lambda: DR_xPACC.unpack_many(data),
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
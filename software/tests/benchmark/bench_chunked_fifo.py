@@ -0,0 +1,42 @@
+# Microbenchmarks for `glasgow.support.chunked_fifo`; run as
+# `python -m tests.benchmark.bench_chunked_fifo`.
+
+from glasgow.support.chunked_fifo import ChunkedFIFO
+from . import measure, report
+
+
+def benchmarks(count=1000, size=512):
+    chunk = bytes(size)
+
+    def write_read_whole():
+        fifo = ChunkedFIFO()
+        for _ in range(count):
+            fifo.write(chunk)
+        while fifo:
+            fifo.read()
+
+    def write_read_split():
+        fifo = ChunkedFIFO()
+        for _ in range(count):
+            fifo.write(chunk)
+        while fifo:
+            fifo.read(size // 3)
+
+    def write_bytearray():
+        fifo = ChunkedFIFO()
+        for _ in range(count):
+            fifo.write(bytearray(chunk))
+
+    return {
+        f"write+read whole x{count}":   write_read_whole,
+        f"write+read split x{count}":   write_read_split,
+        f"write bytearray x{count}":    write_bytearray,
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
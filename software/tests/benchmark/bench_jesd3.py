@@ -0,0 +1,30 @@
+# Microbenchmarks for `glasgow.protocol.jesd3`; run as
+# `python -m tests.benchmark.bench_jesd3`.
+
+import random
+
+from glasgow.support.bits import bitarray
+from glasgow.protocol.jesd3 import JESD3Emitter, JESD3Parser
+from . import measure, report
+
+
+def benchmarks(fuse_count=100_000):
+    rng = random.Random(0)
+    fuses = bitarray(rng.randbytes(fuse_count // 8))
+    jed = JESD3Emitter(fuses).emit()
+
+    def parse():
+        JESD3Parser(jed).parse()
+
+    return {
+        f"parse {fuse_count} fuses":    parse,
+        f"emit {fuse_count} fuses":     lambda: JESD3Emitter(fuses).emit(),
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
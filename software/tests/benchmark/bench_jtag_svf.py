@@ -0,0 +1,66 @@
+# Microbenchmarks for `glasgow.protocol.jtag_svf`; run as
+# `python -m tests.benchmark.bench_jtag_svf`.
+
+import random
+
+from glasgow.protocol.jtag_svf import SVFParser, SVFEventHandler
+from . import measure, report
+
+
+class NullEventHandler(SVFEventHandler):
+    def svf_frequency(self, frequency): pass
+    def svf_trst(self, mode): pass
+    def svf_state(self, state, path): pass
+    def svf_endir(self, state): pass
+    def svf_enddr(self, state): pass
+    def svf_hir(self, tdi, smask, tdo, mask): pass
+    def svf_sir(self, tdi, smask, tdo, mask): pass
+    def svf_tir(self, tdi, smask, tdo, mask): pass
+    def svf_hdr(self, tdi, smask, tdo, mask): pass
+    def svf_sdr(self, tdi, smask, tdo, mask): pass
+    def svf_tdr(self, tdi, smask, tdo, mask): pass
+    def svf_runtest(self, run_state, run_count, run_clock, min_time, max_time, end_state): pass
+    def svf_piomap(self, mapping): pass
+    def svf_pio(self, vector): pass
+
+
+def generate_svf(count, rng, width=2048):
+    # Resembles a CPLD/FPGA programming file: a preamble followed by many long data shifts,
+    # each followed by a wait.
+    lines = [
+        "// generated",
+        "TRST OFF;",
+        "ENDIR IDLE;",
+        "ENDDR IDLE;",
+        "STATE RESET;",
+        "STATE IDLE;",
+        "FREQUENCY 1E6 HZ;",
+        "SIR 8 TDI (E0);",
+        "SDR 32 TDI (00000000) TDO (0A0A0093) MASK (0FFFFFFF);",
+    ]
+    for _ in range(count):
+        lines.append("SIR 8 TDI (C0);")
+        lines.append("SDR {} TDI ({:0{}X}) SMASK ({});".format(
+            width, rng.getrandbits(width), width // 4, "F" * (width // 4)))
+        lines.append("RUNTEST 100 TCK 1E-3 SEC;")
+    return "\n".join(lines) + "\n"
+
+
+def benchmarks(count=200):
+    rng = random.Random(0)
+    source = generate_svf(count, rng)
+
+    def parse():
+        SVFParser(source, NullEventHandler()).parse_file()
+
+    return {
+        f"parse_file x{count}": parse,
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
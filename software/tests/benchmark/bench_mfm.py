@@ -0,0 +1,66 @@
+# Microbenchmarks for `glasgow.applet.memory.floppy.mfm`; run as
+# `python -m tests.benchmark.bench_mfm`.
+
+import random
+import logging
+
+from glasgow.applet.memory.floppy.mfm import SoftwareMFMDecoder
+from . import measure, report
+
+
+logger = logging.getLogger(__name__)
+
+
+SYNC_CHIPS = [0,1,0,0,0,1,0,0,1,0,0,0,1,0,0,1] # K.A1
+
+
+def generate_bytestream(data, period=20):
+    """Encode ``data`` as an MFM sector (a gap, three K.A1 syncs, and the data), and return it
+    as sampled by the floppy applet: each byte is the number of samples between two edges,
+    minus one, with ``period`` samples per chip."""
+    chips = []
+    prev  = 1
+    def encode(byte):
+        nonlocal prev
+        for n in range(8):
+            curr = (byte >> (7 - n)) & 1
+            chips.extend([int(prev == 0 and curr == 0), curr])
+            prev = curr
+    for _ in range(12):
+        encode(0x00)
+    chips.extend(SYNC_CHIPS * 3)
+    prev = 1
+    for byte in data:
+        encode(byte)
+
+    bytestream = bytearray()
+    gap = 0
+    for chip in chips:
+        if chip:
+            bytestream.append((gap + 1) * period - 1)
+            gap = 0
+        else:
+            gap += 1
+    return bytes(bytestream)
+
+
+def benchmarks(length=512):
+    rng = random.Random(0)
+    bytestream = generate_bytestream(rng.randbytes(length))
+    mfm = SoftwareMFMDecoder(logger)
+
+    return {
+        f"bits {length} bytes":         lambda: list(mfm.bits(bytestream)),
+        f"edges {length} bytes":        lambda: list(mfm.edges(bytestream)),
+        f"lock {length} bytes":         lambda: list(mfm.lock(mfm.bits(bytestream))),
+        f"demodulate {length} bytes":
+            lambda: list(mfm.demodulate(mfm.lock(mfm.bits(bytestream)))),
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
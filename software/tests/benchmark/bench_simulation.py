@@ -0,0 +1,61 @@
+# Microbenchmarks for `glasgow.access.simulation.demultiplexer`; run as
+# `python -m tests.benchmark.bench_simulation`.
+
+import types
+import logging
+from amaranth import *
+from amaranth.lib.fifo import SyncFIFOBuffered
+from amaranth.sim import Simulator
+
+from glasgow.access.simulation.demultiplexer import SimulationDemultiplexerInterface
+from . import measure, report
+
+
+class LoopbackInterface(Elaboratable):
+    """Stands in for a simulation multiplexer interface whose subtarget echoes every byte."""
+    def __init__(self):
+        self.in_fifo  = SyncFIFOBuffered(width=8, depth=64)
+        self.out_fifo = SyncFIFOBuffered(width=8, depth=64)
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.in_fifo  = self.in_fifo
+        m.submodules.out_fifo = self.out_fifo
+        m.d.comb += [
+            self.in_fifo.w_data.eq(self.out_fifo.r_data),
+            self.in_fifo.w_en.eq(self.out_fifo.r_rdy & self.in_fifo.w_rdy),
+            self.out_fifo.r_en.eq(self.out_fifo.r_rdy & self.in_fifo.w_rdy),
+        ]
+        return m
+
+
+def benchmarks(length=32, count=4):
+    applet = types.SimpleNamespace(logger=logging.getLogger(__name__))
+    data   = bytes(range(length))
+
+    def loopback():
+        mux_interface = LoopbackInterface()
+        iface = SimulationDemultiplexerInterface(None, applet, mux_interface)
+
+        @types.coroutine
+        def process():
+            for _ in range(count):
+                yield from iface.write(data)
+                assert (yield from iface.read(length)) == data
+
+        sim = Simulator(mux_interface)
+        sim.add_clock(1e-9)
+        sim.add_sync_process(process)
+        sim.run()
+
+    return {
+        f"write+read {length} bytes x{count}": loopback,
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Microbenchmarks for `glasgow.support.task_queue`; run as
+# `python -m tests.benchmark.bench_task_queue`.
+
+import asyncio
+
+from glasgow.support.task_queue import TaskQueue
+from . import measure, report
+
+
+def benchmarks(count=1000, depth=8):
+    async def task():
+        await asyncio.sleep(0)
+
+    async def submit_wait_all():
+        queue = TaskQueue()
+        for _ in range(count):
+            queue.submit(task())
+        await queue.wait_all()
+
+    async def submit_wait_one():
+        # Keep a bounded number of tasks in flight, like the pipelined applet code paths do.
+        queue = TaskQueue()
+        for _ in range(count):
+            queue.submit(task())
+            if len(queue) >= depth:
+                await queue.wait_one()
+        await queue.wait_all()
+
+    # Each run includes setting up and closing an event loop, which takes a fixed amount of time.
+    return {
+        f"submit+wait_all x{count}":                lambda: asyncio.run(submit_wait_all()),
+        f"submit+wait_one x{count} depth {depth}":  lambda: asyncio.run(submit_wait_one()),
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Microbenchmarks for `glasgow.protocol.vgm`; run as
+# `python -m tests.benchmark.bench_vgm`.
+
+import io
+import random
+import struct
+import asyncio
+
+from glasgow.protocol.vgm import VGMStreamReader, VGMStreamPlayer
+from . import measure, report
+
+
+class NullPlayer(VGMStreamPlayer):
+    async def ym3812_write(self, address, data):
+        pass
+
+    async def wait_seconds(self, delay):
+        pass
+
+
+def generate_vgm(count, rng):
+    # A version 1.51 header for a YM3812 tune, followed by register writes and waits.
+    header = bytearray(0x100)
+    header[0x00:0x04] = b"Vgm "
+    struct.pack_into("<L", header, 0x08, 0x151)
+    struct.pack_into("<L", header, 0x34, 0x100 - 0x34)
+    struct.pack_into("<L", header, 0x50, 3579545)
+    data = bytearray()
+    for _ in range(count):
+        command = rng.choice((0x5A, 0x5A, 0x5A, 0x61, 0x62, 0x70))
+        if command == 0x5A:
+            data += struct.pack("<BBB", command, rng.getrandbits(8), rng.getrandbits(8))
+        elif command == 0x61:
+            data += struct.pack("<BH", command, rng.getrandbits(16))
+        else:
+            data += struct.pack("<B", command | rng.getrandbits(4) if command == 0x70 else command)
+    data += b"\x66"
+    struct.pack_into("<L", header, 0x04, len(header) + len(data) - 0x04)
+    return bytes(header + data)
+
+
+def benchmarks(count=10_000):
+    rng = random.Random(0)
+    vgm = generate_vgm(count, rng)
+
+    def parse():
+        reader = VGMStreamReader(io.BytesIO(vgm))
+        asyncio.run(reader.parse_data(NullPlayer()))
+
+    return {
+        f"parse_data x{count}": parse,
+    }
+
+
+def main():
+    report({name: measure(func) for name, func in benchmarks().items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import asyncio
+import unittest
+from unittest import mock
+import usb1
+
+from glasgow.device import GlasgowDeviceError
+from glasgow.device import hardware
+from glasgow.device.hardware import GlasgowHardwareDevice
+
+
+class EEPROMDiffTestCase(unittest.TestCase):
+    diff = staticmethod(GlasgowHardwareDevice.diff_eeprom_pages)
+
+    def test_identical(self):
+        data = bytes(range(256))
+        self.assertEqual(self.diff(data, data, 64), [])
+
+    def test_empty(self):
+        self.assertEqual(self.diff(b"", b"", 64), [])
+
+    def test_first_byte(self):
+        old = bytes(256)
+        new = b"\x01" + bytes(255)
+        self.assertEqual(self.diff(old, new, 64), [(0, new[0:64])])
+
+    def test_page_edges(self):
+        old = bytes(256)
+        for addr, page in ((63, 0), (64, 64), (127, 64), (128, 128), (255, 192)):
+            with self.subTest(addr=addr):
+                new = bytearray(old)
+                new[addr] = 0xff
+                self.assertEqual(self.diff(old, new, 64), [(page, bytes(new[page:page + 64]))])
+
+    def test_merge_adjacent(self):
+        old = bytes(256)
+        new = bytearray(old)
+        new[63] = new[64] = 0xff
+        self.assertEqual(self.diff(old, new, 64), [(0, bytes(new[0:128]))])
+
+    def test_no_merge_gap(self):
+        old = bytes(256)
+        new = bytearray(old)
+        new[0] = new[128] = 0xff
+        self.assertEqual(self.diff(old, new, 64),
+                         [(0, bytes(new[0:64])), (128, bytes(new[128:192]))])
+
+    def test_short_old_data(self):
+        old = bytes(100)
+        new = bytes(256)
+        # The page that is only partially covered by `old_data` is included, and merged with
+        # the pages past its end.
+        self.assertEqual(self.diff(old, new, 64), [(64, new[64:256])])
+        self.assertEqual(self.diff(b"", new, 64), [(0, new)])
+
+    def test_partial_last_page(self):
+        old = bytes(100)
+        new = bytearray(old)
+        new[99] = 0xff
+        self.assertEqual(self.diff(old, new, 64), [(64, bytes(new[64:100]))])
+        new[0] = 0xff
+        self.assertEqual(self.diff(old, new, 64), [(0, bytes(new))])
+
+    def test_longer_old_data(self):
+        old = bytes(256)
+        new = bytes(100)
+        self.assertEqual(self.diff(old, new, 64), [])
+
+
+class _MockEEPROMDevice(GlasgowHardwareDevice):
+    def __init__(self, contents):
+        self.contents = bytearray(contents)
+        self.writes   = []
+
+    async def read_eeprom(self, kind, addr, length):
+        return bytes(self.contents[addr:addr + length])
+
+    async def write_eeprom(self, kind, addr, data):
+        self.writes.append((addr, len(data)))
+        self.contents[addr:addr + len(data)] = data
+
+
+class EEPROMUpdateTestCase(unittest.TestCase):
+    def run_case(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def test_update(self):
+        device = _MockEEPROMDevice(bytes(1024))
+        data = bytearray(600)
+        data[300] = 1
+        data[599] = 2
+        diff = self.run_case(device.update_eeprom("ice", data))
+        self.assertEqual(device.writes, [(256, 344)])
+        self.assertEqual(device.contents[:600], data)
+        self.assertEqual(device.contents[600:], bytes(424))
+        self.assertTrue(self.run_case(device.verify_eeprom("ice", diff)))
+
+    def test_update_old_data(self):
+        device = _MockEEPROMDevice(bytes(128))
+        data = b"\xff" + bytes(127)
+        self.run_case(device.update_eeprom("fx2", data, old_data=b"\xff" + bytes(127)))
+        self.assertEqual(device.writes, [])
+        diff = self.run_case(device.update_eeprom("fx2", data))
+        self.assertEqual(device.writes, [(0, 64)])
+        self.assertEqual(diff, [(0, data[:64])])
+
+    def test_verify_mismatch(self):
+        device = _MockEEPROMDevice(bytes(128))
+        self.assertFalse(self.run_case(device.verify_eeprom("fx2", [(64, b"\x01")])))
+
+
+class _MockUSBContext:
+    def __init__(self, log):
+        self.log = log
+
+    def close(self):
+        self.log.append("context close")
+
+
+class _MockPollerThread:
+    def __init__(self, context):
+        self.log = context.log
+
+    def start(self):
+        self.log.append("poller start")
+
+    def stop(self):
+        self.log.append("poller stop")
+
+
+class _MockUSBHandle:
+    def __init__(self, serial, log, fail):
+        self.serial = serial
+        self.log    = log
+        self.fail   = fail
+
+    def setAutoDetachKernelDriver(self, enable):
+        pass
+
+    def getASCIIStringDescriptor(self, index):
+        if self.fail == "descriptor":
+            raise usb1.USBErrorPipe
+        return {
+            1: "Qi Hardware",
+            2: "Glasgow Interface Explorer",
+            3: self.serial,
+        }[index]
+
+    def close(self):
+        self.log.append(f"{self.serial} close")
+
+
+class _MockUSBDevice:
+    def __init__(self, serial, log, fail=None):
+        self.serial = serial
+        self.log    = log
+        self.fail   = fail
+
+    def open(self):
+        if self.fail == "open":
+            raise usb1.USBErrorAccess
+        self.log.append(f"{self.serial} open")
+        return _MockUSBHandle(self.serial, self.log, self.fail)
+
+    def getManufacturerDescriptor(self):
+        return 1
+
+    def getProductDescriptor(self):
+        return 2
+
+    def getSerialNumberDescriptor(self):
+        return 3
+
+
+class OpenManyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.log = []
+        self.usb_devices = {}
+
+        test_case = self
+        class _MockGlasgowDevice(GlasgowHardwareDevice):
+            @classmethod
+            def _enumerate_devices(cls, usb_context):
+                return {serial: ("C3", usb_device)
+                        for serial, usb_device in test_case.usb_devices.items()}
+        self.device_cls = _MockGlasgowDevice
+
+        for patcher in (
+            mock.patch.object(usb1, "USBContext", lambda: _MockUSBContext(self.log)),
+            mock.patch.object(hardware, "_PollerThread", _MockPollerThread),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def add_device(self, serial, **kwargs):
+        self.usb_devices[serial] = _MockUSBDevice(serial, self.log, **kwargs)
+
+    def test_open_all(self):
+        self.add_device("C3-2")
+        self.add_device("C3-1")
+        devices = self.device_cls.open_many()
+        self.assertEqual([device.serial for device in devices], ["C3-1", "C3-2"])
+        self.assertIs(devices[0].usb_context, devices[1].usb_context)
+        self.assertIs(devices[0].usb_poller, devices[1].usb_poller)
+        self.assertEqual(self.log, ["poller start", "C3-1 open", "C3-2 open"])
+
+    def test_open_serials(self):
+        self.add_device("C3-1")
+        self.add_device("C3-2")
+        self.add_device("C3-3")
+        devices = self.device_cls.open_many(["C3-3", "C3-1"])
+        self.assertEqual([device.serial for device in devices], ["C3-3", "C3-1"])
+        self.assertEqual(self.log, ["poller start", "C3-3 open", "C3-1 open"])
+
+    def test_open_none(self):
+        with self.assertRaisesRegex(GlasgowDeviceError, r"^device not found$"):
+            self.device_cls.open_many()
+        self.assertEqual(self.log, ["context close"])
+
+    def test_open_missing(self):
+        self.add_device("C3-1")
+        with self.assertRaisesRegex(GlasgowDeviceError,
+                r"^device with serial number C3-2 not found$"):
+            self.device_cls.open_many(["C3-1", "C3-2"])
+        self.assertEqual(self.log, ["context close"])
+
+    def test_open_failure(self):
+        self.add_device("C3-1")
+        self.add_device("C3-2", fail="open")
+        with self.assertRaises(usb1.USBErrorAccess):
+            self.device_cls.open_many()
+        self.assertEqual(self.log, [
+            "poller start", "C3-1 open",
+            "C3-1 close", "poller stop", "context close",
+        ])
+
+    def test_open_failure_first(self):
+        self.add_device("C3-1", fail="open")
+        with self.assertRaises(usb1.USBErrorAccess):
+            self.device_cls.open_many()
+        self.assertEqual(self.log, ["poller start", "poller stop", "context close"])
+
+    def test_open_failure_after_handle(self):
+        self.add_device("C3-1")
+        self.add_device("C3-2", fail="descriptor")
+        with self.assertRaises(usb1.USBErrorPipe):
+            self.device_cls.open_many()
+        self.assertEqual(self.log[:3], ["poller start", "C3-1 open", "C3-2 open"])
+        self.assertEqual(sorted(self.log[3:5]), ["C3-1 close", "C3-2 close"])
+        self.assertEqual(self.log[5:], ["poller stop", "context close"])
+
+    def test_close(self):
+        self.add_device("C3-1")
+        self.add_device("C3-2")
+        self.add_device("C3-3")
+        devices = self.device_cls.open_many()
+        del self.log[:]
+        devices[1].close()
+        self.assertEqual(self.log, ["C3-2 close"])
+        devices[0].close()
+        self.assertEqual(self.log, ["C3-2 close", "C3-1 close"])
+        # The shared context and poller are shut down only after the last device is closed,
+        # and after its handle is.
+        devices[2].close()
+        self.assertEqual(self.log, [
+            "C3-2 close", "C3-1 close",
+            "C3-3 close", "poller stop", "context close",
+        ])
+
+    def test_open_single(self):
+        self.add_device("C3-1")
+        device = self.device_cls()
+        device.close()
+        self.assertEqual(self.log, ["poller start", "C3-1 open",
+                                    "C3-1 close", "poller stop", "context close"])
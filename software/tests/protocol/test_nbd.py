@@ -0,0 +1,228 @@
+import struct
+import asyncio
+import logging
+import tempfile
+import unittest
+
+from glasgow.support.endpoint import ServerEndpoint
+from glasgow.protocol.nbd import *
+from glasgow.protocol.nbd import (NBDMAGIC, IHAVEOPT, REPLY_MAGIC, NBD_REQUEST_MAGIC,
+    NBD_SIMPLE_REPLY_MAGIC, NBD_FLAG_FIXED_NEWSTYLE, NBD_FLAG_NO_ZEROES, NBD_OPT_GO,
+    NBD_REP_INFO, NBD_REP_ACK, NBD_FLAG_READ_ONLY, NBD_FLAG_SEND_FLUSH, NBD_CMD_READ,
+    NBD_CMD_WRITE, NBD_CMD_DISC, NBD_CMD_FLUSH, NBD_EPERM, NBD_EINVAL)
+
+
+logger = logging.getLogger(__name__)
+
+
+class NBDClient:
+    async def connect(self, path):
+        self.reader, self.writer = await asyncio.open_unix_connection(path)
+        magic, opt_magic, flags = struct.unpack(">QQH", await self.reader.readexactly(18))
+        assert (magic, opt_magic) == (NBDMAGIC, IHAVEOPT)
+        assert flags & NBD_FLAG_FIXED_NEWSTYLE
+        self.writer.write(struct.pack(">I", NBD_FLAG_FIXED_NEWSTYLE | NBD_FLAG_NO_ZEROES))
+        self.writer.write(struct.pack(">QII", IHAVEOPT, NBD_OPT_GO, 6) + bytes(6))
+        while True:
+            magic, option, status, length = \
+                struct.unpack(">QIII", await self.reader.readexactly(20))
+            assert (magic, option) == (REPLY_MAGIC, NBD_OPT_GO)
+            data = await self.reader.readexactly(length)
+            if status == NBD_REP_INFO:
+                _, self.size, self.flags = struct.unpack(">HQH", data)
+            elif status == NBD_REP_ACK:
+                break
+        self.cookie = 0
+
+    def request(self, command, offset=0, length=0, data=b""):
+        self.cookie += 1
+        self.writer.write(struct.pack(">IHHQQI", NBD_REQUEST_MAGIC, 0, command,
+                                      self.cookie, offset, length) + data)
+        return self.cookie
+
+    async def reply(self, lengths={}):
+        magic, error, cookie = struct.unpack(">IIQ", await self.reader.readexactly(16))
+        assert magic == NBD_SIMPLE_REPLY_MAGIC
+        data = b""
+        if error == 0:
+            data = await self.reader.readexactly(lengths.get(cookie, 0))
+        return cookie, error, data
+
+    async def read(self, offset, length):
+        cookie = self.request(NBD_CMD_READ, offset, length)
+        _, error, data = await self.reply({cookie: length})
+        return error, data
+
+    async def write(self, offset, data):
+        self.request(NBD_CMD_WRITE, offset, len(data), data)
+        _, error, _ = await self.reply()
+        return error
+
+    async def flush(self):
+        self.request(NBD_CMD_FLUSH)
+        _, error, _ = await self.reply()
+        return error
+
+    def disconnect(self):
+        self.request(NBD_CMD_DISC)
+        self.writer.close()
+
+
+class MockMemoryServer(NBDMemoryServer):
+    def __init__(self, endpoint, memory, **kwargs):
+        super().__init__(endpoint, logger, size=len(memory), **kwargs)
+        self.memory = memory
+        self.log    = []
+
+    async def memory_read(self, address, length):
+        assert address % self._page_size == 0 and length % self._page_size == 0
+        self.log.append(("read", address, length))
+        return self.memory[address:address + length]
+
+    async def memory_write(self, address, data):
+        assert address % self._block_size == 0 and len(data) == self._block_size
+        self.log.append(("write", address, len(data)))
+        self.memory[address:address + len(data)] = data
+
+
+class NBDServerTestCase(unittest.TestCase):
+    def run_server(self, name, server_factory, client_coro):
+        path = f"{tempfile.gettempdir()}/test_nbd_{name}_sock"
+        async def case():
+            endpoint = await ServerEndpoint(name, logger, ("unix", path))
+            server   = server_factory(endpoint)
+            server_task = asyncio.create_task(server.handle())
+            client = NBDClient()
+            await client.connect(path)
+            try:
+                await client_coro(client, server)
+            finally:
+                client.disconnect()
+            await server_task
+            await endpoint.close()
+            endpoint.server.close()
+            return server
+        return asyncio.get_event_loop().run_until_complete(case())
+
+    def test_read_only(self):
+        memory = bytearray(range(256)) * 16
+        async def client_coro(client, server):
+            self.assertEqual(client.size, 4096)
+            self.assertTrue(client.flags & NBD_FLAG_READ_ONLY)
+            self.assertEqual(await client.read(10, 20), (0, memory[10:30]))
+            self.assertEqual(await client.write(0, b"x"), NBD_EPERM)
+            self.assertEqual((await client.read(4090, 10))[0], NBD_EINVAL)
+        self.run_server("read_only",
+            lambda endpoint: MockMemoryServer(endpoint, memory, page_size=64), client_coro)
+
+    def test_cache_read_ahead(self):
+        memory = bytearray(range(256)) * 16
+        async def client_coro(client, server):
+            self.assertEqual(await client.read(0, 64), (0, memory[0:64]))
+            self.assertEqual(server.log, [("read", 0, 64)])
+            # Sequential access triggers read-ahead.
+            self.assertEqual(await client.read(64, 64), (0, memory[64:128]))
+            self.assertEqual(server.log[1:], [("read", 64, 64 * 5)])
+            self.assertEqual(await client.read(128, 200), (0, memory[128:328]))
+            self.assertEqual(await client.read(0, 64), (0, memory[0:64]))
+            self.assertEqual(len(server.log), 2)
+        self.run_server("cache_read_ahead",
+            lambda endpoint: MockMemoryServer(endpoint, memory, page_size=64, read_ahead=4),
+            client_coro)
+
+    def test_cache_eviction(self):
+        memory = bytearray(range(256)) * 16
+        async def client_coro(client, server):
+            await client.read(0, 64)
+            await client.read(1024, 64)
+            await client.read(2048, 64)
+            await client.read(0, 64)
+            self.assertEqual(server.log, [
+                ("read", 0, 64), ("read", 1024, 64), ("read", 2048, 64), ("read", 0, 64)
+            ])
+        self.run_server("cache_eviction",
+            lambda endpoint: MockMemoryServer(endpoint, memory, page_size=64, cache_pages=2),
+            client_coro)
+
+    def test_write_coalescing(self):
+        memory = bytearray(4096)
+        async def client_coro(client, server):
+            self.assertTrue(client.flags & NBD_FLAG_SEND_FLUSH)
+            for offset in range(100, 1000, 100):
+                self.assertEqual(await client.write(offset, b"\xaa" * 10), 0)
+            self.assertEqual(await client.read(95, 20), (0, bytes(5) + b"\xaa" * 10 + bytes(5)))
+            self.assertEqual(memory, bytes(4096))
+            self.assertEqual(await client.flush(), 0)
+            self.assertEqual(server.log, [
+                ("read", 0, 1024), ("write", 0, 1024)
+            ])
+            expected = bytearray(1024)
+            for offset in range(100, 1000, 100):
+                expected[offset:offset + 10] = b"\xaa" * 10
+            self.assertEqual(memory[:1024], expected)
+            # Rewriting the same data does not cause a write.
+            self.assertEqual(await client.write(100, b"\xaa" * 10), 0)
+            self.assertEqual(await client.flush(), 0)
+            self.assertEqual(len(server.log), 2)
+        self.run_server("write_coalescing",
+            lambda endpoint: MockMemoryServer(endpoint, memory, writable=True,
+                                              page_size=256, block_size=1024),
+            client_coro)
+
+    def test_write_back_on_disconnect(self):
+        memory = bytearray(4096)
+        async def client_coro(client, server):
+            self.assertEqual(await client.write(1024, b"\x55" * 1024), 0)
+            self.assertEqual(server.log, [])
+        server = self.run_server("write_back_on_disconnect",
+            lambda endpoint: MockMemoryServer(endpoint, memory, writable=True,
+                                              page_size=256, block_size=1024),
+            client_coro)
+        self.assertEqual(server.log, [("write", 1024, 1024)])
+        self.assertEqual(memory[1024:2048], b"\x55" * 1024)
+
+    def test_pipelined(self):
+        memory = bytearray(range(256)) * 16
+        async def client_coro(client, server):
+            lengths = {}
+            for offset in (3072, 0, 2048, 1024):
+                lengths[client.request(NBD_CMD_READ, offset, 1024)] = (offset, 1024)
+            replies = {}
+            for _ in range(4):
+                cookie, error, data = \
+                    await client.reply({cookie: length for cookie, (_, length) in lengths.items()})
+                self.assertEqual(error, 0)
+                replies[cookie] = data
+            for cookie, (offset, length) in lengths.items():
+                self.assertEqual(replies[cookie], memory[offset:offset + length])
+        self.run_server("pipelined",
+            lambda endpoint: MockMemoryServer(endpoint, memory, page_size=64, read_ahead=0),
+            client_coro)
+
+
+class NBDScheduleTestCase(unittest.TestCase):
+    def request(self, command, offset, length):
+        from glasgow.protocol.nbd import Request
+        return Request(flags=0, command=command, cookie=0, offset=offset, length=length)
+
+    def test_sorted(self):
+        reqs = [self.request(NBD_CMD_READ, offset, 10) for offset in (30, 10, 20)]
+        self.assertEqual([req.offset for req in NBDServer._schedule(reqs)], [10, 20, 30])
+
+    def test_barrier(self):
+        reqs = [
+            self.request(NBD_CMD_READ, 30, 10),
+            self.request(NBD_CMD_READ, 10, 10),
+            self.request(NBD_CMD_FLUSH, 0, 0),
+            self.request(NBD_CMD_READ, 20, 10),
+            self.request(NBD_CMD_READ, 0, 10),
+        ]
+        self.assertEqual([req.offset for req in NBDServer._schedule(reqs)], [10, 30, 0, 0, 20])
+
+    def test_overlapping_write(self):
+        reqs = [
+            self.request(NBD_CMD_READ, 30, 10),
+            self.request(NBD_CMD_WRITE, 35, 10),
+            self.request(NBD_CMD_READ, 10, 10),
+        ]
+        self.assertEqual([req.offset for req in NBDServer._schedule(reqs)], [30, 35, 10])
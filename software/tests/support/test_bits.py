@@ -1,4 +1,5 @@
 import unittest
+import random
 
 from glasgow.support.bits import bits, bitarray, _byte_len
 
@@ -463,3 +464,79 @@ class BitarrayTestCase(unittest.TestCase):
         some = bitarray("1010")
         some ^= 0xc
         self.assertBitarray(some, 4, 0b0110)
+
+
+class BitsReferenceTestCase(unittest.TestCase):
+    # Checks the word-level fast paths against a list of bits, for lengths around byte boundaries.
+    def setUp(self):
+        self.random = random.Random(0)
+
+    def random_list(self, length):
+        return [self.random.randint(0, 1) for _ in range(length)]
+
+    def assertSame(self, value, reference):
+        self.assertEqual(list(value), reference)
+        self.assertEqual(value, type(value).from_iter(reference))
+
+    def test_getitem_slice(self):
+        for length in range(0, 27):
+            ref = self.random_list(length)
+            value = bits.from_iter(ref)
+            for start in range(-1, length + 1):
+                for stop in range(-1, length + 1):
+                    self.assertSame(value[start:stop], ref[start:stop])
+                    self.assertSame(value[stop:start:-1], ref[stop:start:-1])
+
+    def test_add_mul(self):
+        for length_a in range(0, 19):
+            for length_b in range(0, 19):
+                ref_a, ref_b = self.random_list(length_a), self.random_list(length_b)
+                self.assertSame(bits.from_iter(ref_a) + bits.from_iter(ref_b), ref_a + ref_b)
+                self.assertSame(ref_a + bits.from_iter(ref_b), ref_a + ref_b)
+            for count in range(0, 5):
+                self.assertSame(bits.from_iter(ref_a) * count, ref_a * count)
+
+    def test_bitop_reversed(self):
+        for length in range(0, 27):
+            ref_a, ref_b = self.random_list(length), self.random_list(length)
+            value_a, value_b = bits.from_iter(ref_a), bits.from_iter(ref_b)
+            self.assertSame(value_a & value_b, [a & b for a, b in zip(ref_a, ref_b)])
+            self.assertSame(value_a | value_b, [a | b for a, b in zip(ref_a, ref_b)])
+            self.assertSame(value_a ^ value_b, [a ^ b for a, b in zip(ref_a, ref_b)])
+            self.assertSame(~value_a, [1 - a for a in ref_a])
+            self.assertSame(value_a.reversed(), ref_a[::-1])
+            self.assertEqual(str(value_a), "".join(map(str, ref_a[::-1])))
+
+    def test_find(self):
+        for length in range(0, 27):
+            ref = self.random_list(length)
+            value = bits.from_iter(ref)
+            for needle_length in range(0, 4):
+                needle = self.random_list(needle_length)
+                for start in range(0, length + 1):
+                    expected = -1
+                    for index in range(start, min(length, length - needle_length + 1)):
+                        if ref[index:index + needle_length] == needle:
+                            expected = index
+                            break
+                    self.assertEqual(value.find(needle, start), expected)
+
+    def test_bitarray_mutation(self):
+        for length in range(0, 19):
+            ref = self.random_list(length)
+            for start in range(0, length + 1):
+                for stop in range(start, length + 1):
+                    for value_length in (0, 1, 3, 9):
+                        ref_value = self.random_list(value_length)
+                        value = bitarray.from_iter(ref)
+                        value[start:stop] = bits.from_iter(ref_value)
+                        self.assertSame(value, ref[:start] + ref_value + ref[stop:])
+                    value = bitarray.from_iter(ref)
+                    del value[start:stop]
+                    self.assertSame(value, ref[:start] + ref[stop:])
+            value = bitarray.from_iter(ref)
+            value.reverse()
+            self.assertSame(value, ref[::-1])
+            value = bitarray.from_iter(ref)
+            value *= 3
+            self.assertSame(value, ref * 3)
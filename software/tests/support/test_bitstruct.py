@@ -120,3 +120,40 @@ class BitstructTestCase(unittest.TestCase):
             x.b
         with self.assertRaises(AttributeError):
             x.b = 1
+
+    def test_from_bytes_array(self):
+        bs = bitstruct("bs", 10, [("a", 3), ("b", 7)])
+        xs = [bs(1, 2), bs(7, 127), bs(0, 0)]
+        data = b"".join(x.to_bytes() for x in xs)
+        self.assertEqual(bs.from_bytes_array(data), xs)
+        self.assertEqual(bs.from_bytes_array(b""), [])
+        with self.assertRaisesRegex(ValueError,
+                r"^unpacking requires a multiple of 2 bytes, got 3 bytes$"):
+            bs.from_bytes_array(bytes(3))
+        with self.assertRaisesRegex(ValueError,
+                r"^wrong padding in the last byte$"):
+            bs.from_bytes_array(b"\x00\x00\x00\x04")
+
+    def test_unpack_many(self):
+        bs = bitstruct("bs", 20, [("a", 3), (None, 1), ("b", 16)])
+        xs = [bs(1, 0x1234), bs(7, 0xffff), bs(5, 0)]
+        data = b"".join(x.to_bytes() for x in xs)
+        self.assertEqual(bs.unpack_many(data), {"a": [1, 7, 5], "b": [0x1234, 0xffff, 0]})
+
+    def test_unpack_many_aligned(self):
+        bs = bitstruct("bs", 32, [("a", 8), ("b", 24)])
+        xs = [bs(1, 0x123456), bs(0xff, 0)]
+        data = bytearray(b"".join(x.to_bytes() for x in xs))
+        self.assertEqual(bs.unpack_many(data), {"a": [1, 0xff], "b": [0x123456, 0]})
+
+    def test_unpack_many_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy is not installed")
+        bs = bitstruct("bs", 20, [("a", 3), (None, 1), ("b", 16)])
+        xs = [bs(1, 0x1234), bs(7, 0xffff), bs(5, 0)]
+        data = b"".join(x.to_bytes() for x in xs)
+        columns = bs.unpack_many(data, numpy=True)
+        self.assertEqual(columns["a"].tolist(), [1, 7, 5])
+        self.assertEqual(columns["b"].tolist(), [0x1234, 0xffff, 0])
@@ -135,3 +135,83 @@ class ServerEndpointTestCase(unittest.TestCase):
         logging.basicConfig(level=logging.TRACE)
         asyncio.get_event_loop().run_until_complete(
             self.do_test_server_banner())
+
+    async def do_test_recv_into(self):
+        sock = ("unix", f"{tempfile.gettempdir()}/test_recv_into_sock")
+        endp = await ServerEndpoint("test_recv_into", logging.getLogger(__name__), sock)
+
+        conn_rd, conn_wr = await asyncio.open_unix_connection(*sock[1:])
+        conn_wr.write(b"ABCDEF")
+        await conn_wr.drain()
+        buffer = bytearray(4)
+        self.assertEqual(await endp.recv_into(buffer, 2), 2)
+        self.assertEqual(buffer, b"AB\x00\x00")
+        self.assertEqual(await endp.recv_into(buffer), 4)
+        self.assertEqual(buffer, b"CDEF")
+        conn_wr.write(b"G")
+        await conn_wr.drain()
+        self.assertEqual(await endp.recv_into(buffer), 1)
+        self.assertEqual(buffer, b"GDEF")
+        conn_wr.close()
+        with self.assertRaises(asyncio.CancelledError):
+            await endp.recv_into(buffer)
+
+    def test_recv_into(self):
+        asyncio.get_event_loop().run_until_complete(
+            self.do_test_recv_into())
+
+    async def do_test_send_many(self):
+        sock = ("unix", f"{tempfile.gettempdir()}/test_send_many_sock")
+        endp = await ServerEndpoint("test_send_many", logging.getLogger(__name__), sock)
+
+        conn_rd, conn_wr = await asyncio.open_unix_connection(*sock[1:])
+        await endp.recv_wait()
+        self.assertTrue(await endp.send_many([b"AB", bytearray(b"C"), memoryview(b"DE")]))
+        self.assertEqual(await conn_rd.readexactly(5), b"ABCDE")
+        conn_wr.close()
+
+    def test_send_many(self):
+        asyncio.get_event_loop().run_until_complete(
+            self.do_test_send_many())
+
+    async def do_test_multi_client(self):
+        sock = ("unix", f"{tempfile.gettempdir()}/test_multi_client_sock")
+        endp = await ServerEndpoint("test_multi_client", logging.getLogger(__name__), sock,
+                                    max_clients=2)
+
+        conn1_rd, conn1_wr = await asyncio.open_unix_connection(*sock[1:])
+        conn2_rd, conn2_wr = await asyncio.open_unix_connection(*sock[1:])
+        conn1_wr.write(b"AB")
+        await conn1_wr.drain()
+        self.assertEqual(await endp.recv(2), b"AB")
+        conn2_wr.write(b"CD")
+        await conn2_wr.drain()
+        self.assertEqual(await endp.recv(2), b"CD")
+        await endp.send(b"XYZ")
+        self.assertEqual(await conn1_rd.readexactly(3), b"XYZ")
+        self.assertEqual(await conn2_rd.readexactly(3), b"XYZ")
+
+        # A connection over the limit is closed right away.
+        conn3_rd, conn3_wr = await asyncio.open_unix_connection(*sock[1:])
+        self.assertEqual(await conn3_rd.read(1), b"")
+        conn3_wr.close()
+
+        # The stream ends only once the last client disconnects.
+        conn1_wr.close()
+        conn2_wr.write(b"E")
+        await conn2_wr.drain()
+        self.assertEqual(await endp.recv(1), b"E")
+        conn2_wr.close()
+        with self.assertRaises(asyncio.CancelledError):
+            await endp.recv(1)
+
+        # Sending resumes once a client connects again.
+        conn4_rd, conn4_wr = await asyncio.open_unix_connection(*sock[1:])
+        await endp.recv_wait()
+        self.assertTrue(await endp.send(b"W"))
+        self.assertEqual(await conn4_rd.readexactly(1), b"W")
+        conn4_wr.close()
+
+    def test_multi_client(self):
+        asyncio.get_event_loop().run_until_complete(
+            self.do_test_multi_client())
@@ -0,0 +1,88 @@
+import json
+import asyncio
+import logging
+import tempfile
+import unittest
+
+from glasgow.support.telemetry import *
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_buckets(self):
+        h = Histogram(bucket_count=4)
+        for value in (0, 1, 2, 3, 4, 7, 8, 100):
+            h.observe(value)
+        # buckets: <=1, <=2, <=4, +Inf
+        self.assertEqual(h.buckets, [2, 1, 2, 3])
+        self.assertEqual(h.count, 8)
+        self.assertEqual(h.sum, 125)
+        self.assertEqual(h.bounds(), [1, 2, 4, float("inf")])
+
+    def test_scale(self):
+        h = Histogram(scale=1e-6, bucket_count=8)
+        h.observe(0.5e-6)
+        h.observe(3e-6)
+        self.assertEqual(h.buckets[0], 1)
+        self.assertEqual(h.buckets[2], 1)
+
+
+class MetricRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.counter = Counter(3)
+        self.peak    = HighWaterMark()
+        self.peak.update(10)
+        self.peak.update(5)
+        self.histogram = Histogram(bucket_count=3)
+        self.histogram.observe(2)
+        self.registry = MetricRegistry(lambda: [
+            ({"interface": 0}, {
+                "events":    ("number of events", self.counter),
+                "peak":      ("largest level", self.peak),
+                "size":      ("size", self.histogram),
+            })
+        ])
+
+    def test_openmetrics(self):
+        self.assertEqual(self.registry.openmetrics(),
+            "# TYPE glasgow_events counter\n"
+            "# HELP glasgow_events number of events\n"
+            "glasgow_events_total{interface=\"0\"} 3\n"
+            "# TYPE glasgow_peak gauge\n"
+            "# HELP glasgow_peak largest level\n"
+            "glasgow_peak{interface=\"0\"} 10\n"
+            "# TYPE glasgow_size histogram\n"
+            "# HELP glasgow_size size\n"
+            "glasgow_size_bucket{interface=\"0\",le=\"1\"} 0\n"
+            "glasgow_size_bucket{interface=\"0\",le=\"2\"} 1\n"
+            "glasgow_size_bucket{interface=\"0\",le=\"+Inf\"} 1\n"
+            "glasgow_size_count{interface=\"0\"} 1\n"
+            "glasgow_size_sum{interface=\"0\"} 2\n"
+            "# EOF\n")
+
+    def test_json(self):
+        self.assertEqual(json.loads(self.registry.json()), [{
+            "labels": {"interface": 0},
+            "events": 3,
+            "peak":   10,
+            "size":   {"count": 1, "sum": 2, "buckets": {"2": 1}},
+        }])
+
+    def test_serve(self):
+        path = f"{tempfile.gettempdir()}/test_telemetry_sock"
+        async def case():
+            server = asyncio.ensure_future(
+                self.registry.serve(("unix", path), logging.getLogger(__name__)))
+            await asyncio.sleep(0.1)
+            try:
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                response = await reader.read()
+                writer.close()
+            finally:
+                server.cancel()
+            return response
+        response = asyncio.get_event_loop().run_until_complete(case())
+        headers, body = response.split(b"\r\n\r\n", 1)
+        self.assertTrue(headers.startswith(b"HTTP/1.0 200 OK"))
+        self.assertIn(b"application/openmetrics-text", headers)
+        self.assertEqual(body.decode(), self.registry.openmetrics())
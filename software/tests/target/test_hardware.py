@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+import pathlib
+import unittest
+from unittest import mock
+
+from glasgow.target import hardware
+from glasgow.target.hardware import GlasgowBuildPlan
+
+
+class _MockBuildPlan(GlasgowBuildPlan):
+    def __init__(self, bitstream_id, executions):
+        self._bitstream_id = bitstream_id
+        self.executions    = executions
+
+    def execute(self, build_dir=None, *, debug=False):
+        self.executions.append((self._bitstream_id, debug))
+        return self._bitstream_id + b"bitstream", b"build log\n"
+
+
+class BitstreamMemoTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_path = pathlib.Path(tempfile.mkdtemp(prefix="glasgow_test_"))
+        self.addCleanup(shutil.rmtree, self.cache_path)
+        self.executions = []
+
+        for patcher in (
+            mock.patch.object(hardware.platformdirs, "user_cache_path",
+                              lambda *args, **kwargs: self.cache_path),
+            mock.patch.object(hardware, "_bitstream_memo", hardware.collections.OrderedDict()),
+            mock.patch.object(hardware, "_bitstream_memo_size", 2),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def plan(self, index):
+        return _MockBuildPlan(bytes([index]) * 16, self.executions)
+
+    def clear_cache(self):
+        shutil.rmtree(self.cache_path / "bitstreams")
+
+    def test_memo(self):
+        self.assertEqual(self.plan(1).get_bitstream(), b"\x01" * 16 + b"bitstream")
+        self.clear_cache()
+        self.assertEqual(self.plan(1).get_bitstream(), b"\x01" * 16 + b"bitstream")
+        self.assertEqual(self.executions, [(b"\x01" * 16, False)])
+
+    def test_debug(self):
+        self.plan(1).get_bitstream()
+        self.clear_cache()
+        self.plan(1).get_bitstream(debug=True)
+        self.assertEqual(self.executions, [(b"\x01" * 16, False), (b"\x01" * 16, True)])
+
+    def test_bound(self):
+        self.plan(1).get_bitstream()
+        self.plan(2).get_bitstream()
+        self.plan(1).get_bitstream()
+        self.plan(3).get_bitstream()
+        # The least recently used bitstream is dropped.
+        self.assertEqual(list(hardware._bitstream_memo), [b"\x01" * 16, b"\x03" * 16])
+        self.clear_cache()
+        self.plan(2).get_bitstream()
+        self.assertEqual([bitstream_id for bitstream_id, debug in self.executions],
+                         [b"\x01" * 16, b"\x02" * 16, b"\x03" * 16, b"\x02" * 16])